@@ -1,8 +1,8 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from utils.database import init_db, save_user_data, check_payment_status, save_payment, save_career_results
-from utils.career_engine import CareerEngine
+from utils.database import init_db, get_or_create_user, get_paid_results, check_payment_status, save_payment, save_career_results, start_retention_scheduler
+from utils.data_reload import get_data_snapshot, start_data_watcher
 from utils.mpesa_integration import process_mpesa_payment
 import json
 import time
@@ -19,7 +19,9 @@ st.set_page_config(
 
 # Initialize database and career engine
 init_db()
-career_engine = CareerEngine()
+start_retention_scheduler()
+start_data_watcher()
+career_engine = get_data_snapshot().engine
 
 def get_subject_grades():
     """Get KCSE subjects and grades from user"""
@@ -175,8 +177,18 @@ def validate_inputs(subjects_grades, skills_interests, student_info):
 def process_career_analysis(subjects_grades, skills_interests, student_info):
     """Process career analysis after payment"""
     try:
-        # Save user data
-        user_id = save_user_data(student_info, subjects_grades, skills_interests)
+        # Save user data (or reuse the same earlier submission)
+        user_id, reused = get_or_create_user(student_info, subjects_grades, skills_interests)
+        
+        # Already paid for this profile: show the stored report instead of charging again
+        paid_results = get_paid_results(user_id) if reused else None
+        if paid_results is not None:
+            st.session_state.user_id = user_id
+            st.session_state.recommendations = paid_results['recommendations']
+            st.session_state.payment_completed = True
+            st.success("✅ You already have a report for these results!")
+            display_career_report(paid_results['recommendations'], subjects_grades, skills_interests, student_info)
+            return
         
         # Process payment
         st.header("💳 M-Pesa Payment")
@@ -3,16 +3,22 @@ KCSE Career Guidance Tool - Data Package
 
 This package contains data files and configurations for the career guidance system:
 - career_paths.json: Career database with requirements and information
+- kuccps_clusters.json: KUCCPS cluster table used by the career engine
 """
 
 __version__ = "1.0.0"
 
 # Import data loading functions
-from .career_paths import load_career_data, get_career_clusters
+from .career_paths import load_career_data, get_career_clusters, CareerCatalog, get_catalog
+from .kuccps_clusters import load_kuccps_clusters, build_cluster_artifact
 
 __all__ = [
     'load_career_data',
-    'get_career_clusters'
+    'get_career_clusters',
+    'CareerCatalog',
+    'get_catalog',
+    'load_kuccps_clusters',
+    'build_cluster_artifact'
 ]
 
 def initialize_data():
@@ -5,22 +5,344 @@ KUCCPS 20 Clusters Version
 
 import json
 import os
+import re
+import threading
+from bisect import bisect_left, bisect_right
+
+CAREER_PATHS_FILE = os.path.join(os.path.dirname(__file__), 'career_paths.json')
+
+GRADE_POINTS = {
+    'A': 12, 'A-': 11, 'B+': 10, 'B': 9, 'B-': 8,
+    'C+': 7, 'C': 6, 'C-': 5, 'D+': 4, 'D': 3, 'D-': 2, 'E': 1
+}
+
+# Career list fields served by inverted indexes
+FACETS = ('interests', 'skills', 'universities')
+
+# Numeric columns parsed from free-text salary and duration fields
+NUMERIC_COLUMNS = ('salary_min', 'salary_max', 'duration_years')
+
+SALARY_AMOUNT = re.compile(r'\d[\d,]*')
+DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)\s*(years?|yrs?|months?)', re.IGNORECASE)
+# What may separate the parts of a fully parsed duration, e.g. "2 years, 6 months" or "2 years and 6 months"
+DURATION_SEPARATOR = re.compile(r'[\s,]+|\band\b', re.IGNORECASE)
+
+
+class CareerCatalog:
+    """
+    Indexed, in-memory view of career_paths.json.
+
+    The file is parsed once; clusters are indexed by id and name and careers
+    by name so lookups are dictionary hits instead of JSON re-parses. Inverted
+    indexes (posting sets of career ids) answer subject, interest, skill and
+    university queries without walking every career. Salary and duration text
+    is parsed into numeric columns with sorted indexes for range queries.
+    Returned dicts are shared by every caller and must be treated as read-only.
+    """
+
+    def __init__(self, data):
+        self.metadata = data.get('metadata', {})
+        self.clusters = {}             # cluster id -> cluster dict
+        self.cluster_ids_by_name = {}  # lower-cased cluster name -> cluster id
+        self.careers = []              # career id -> career dict
+        self.career_clusters = []      # career id -> cluster id
+        self.career_ids_by_name = {}   # lower-cased career name -> career id
+        self.cluster_career_ids = {}   # cluster id -> [career ids]
+
+        for cluster_id, cluster in data['career_clusters'].items():
+            self.clusters[cluster_id] = cluster
+            self.cluster_ids_by_name[cluster.get('name', cluster_id).lower()] = cluster_id
+            self.cluster_career_ids[cluster_id] = []
+            for career in cluster.get('careers', []):
+                career_id = len(self.careers)
+                self.careers.append(career)
+                self.career_clusters.append(cluster_id)
+                self.cluster_career_ids[cluster_id].append(career_id)
+                self.career_ids_by_name.setdefault(career.get('career', '').lower(), career_id)
+
+        # Metadata labels look like "13: Medicine, Health, ..."; accept the label and its name part
+        for label in self.metadata.get('kuccps_clusters', []):
+            cluster_id, _, name = label.partition(':')
+            if cluster_id.strip() in self.clusters:
+                self.cluster_ids_by_name.setdefault(label.lower(), cluster_id.strip())
+                self.cluster_ids_by_name.setdefault(name.strip().lower(), cluster_id.strip())
+
+        self._build_inverted_indexes()
+        self._build_numeric_indexes()
+
+    def _build_inverted_indexes(self):
+        """Build posting lists of career ids for every subject and facet value"""
+        subject_postings = {}
+        self.subject_labels = {}  # normalized subject -> display label
+        facet_postings = {facet: {} for facet in FACETS}
+        self.facet_labels = {facet: {} for facet in FACETS}  # normalized value -> display label
+
+        for career_id, career in enumerate(self.careers):
+            required_grades = career.get('required_grades', {})
+            subjects = set(career.get('required_subjects', [])) | set(required_grades)
+            for subject in subjects:
+                points = GRADE_POINTS.get(required_grades.get(subject, ''), 0)
+                subject_postings.setdefault(normalize_key(subject), []).append((points, career_id))
+                self.subject_labels.setdefault(normalize_key(subject), subject)
+
+            for facet in FACETS:
+                for value in career.get(facet, []):
+                    key = normalize_key(value)
+                    facet_postings[facet].setdefault(key, set()).add(career_id)
+                    self.facet_labels[facet].setdefault(key, value)
+
+        # Subject postings are sorted by required points so grade ranges are a bisect away
+        self.subject_postings = {subject: sorted(postings) for subject, postings in subject_postings.items()}
+        self.facet_postings = {
+            facet: {key: frozenset(ids) for key, ids in postings.items()}
+            for facet, postings in facet_postings.items()
+        }
+
+    @classmethod
+    def from_file(cls, json_path=CAREER_PATHS_FILE):
+        """Parse career_paths.json into a catalog"""
+        with open(json_path, 'r', encoding='utf-8') as file:
+            return cls(json.load(file))
+
+    def _build_numeric_indexes(self):
+        """Parse salary and duration text once into numeric columns and sorted indexes"""
+        self.numeric = {column: [None] * len(self.careers) for column in NUMERIC_COLUMNS}
+        self.salary_open_ended = [False] * len(self.careers)
+        self.duration_open_ended = [False] * len(self.careers)
+        self.unparsed_fields = {}  # career id -> [field names that could not be parsed]
+
+        for career_id, career in enumerate(self.careers):
+            salary = parse_salary_range(career.get('average_salary'))
+            if salary is None:
+                self.unparsed_fields.setdefault(career_id, []).append('average_salary')
+            else:
+                salary_min, salary_max, open_ended = salary
+                self.numeric['salary_min'][career_id] = salary_min
+                self.numeric['salary_max'][career_id] = salary_max
+                self.salary_open_ended[career_id] = open_ended
+
+            duration = parse_duration_years(career.get('duration'))
+            if duration is None:
+                self.unparsed_fields.setdefault(career_id, []).append('duration')
+            else:
+                self.numeric['duration_years'][career_id], self.duration_open_ended[career_id] = duration
+
+        # Sorted (value, career id) pairs per column; unparsed rows are left out
+        self.numeric_index = {}
+        self.numeric_rank = {}
+        for column, values in self.numeric.items():
+            index = sorted((value, career_id) for career_id, value in enumerate(values) if value is not None)
+            self.numeric_index[column] = index
+            self.numeric_rank[column] = {career_id: rank for rank, (_, career_id) in enumerate(index)}
+
+    def careers_in_range(self, column, low=None, high=None):
+        """Career ids whose numeric column lies within [low, high] (either bound optional)"""
+        index = self.numeric_index[column]
+        start = bisect_left(index, (low, -1)) if low is not None else 0
+        end = bisect_right(index, (high, len(self.careers))) if high is not None else len(index)
+        return frozenset(career_id for _, career_id in index[start:end])
+
+    def careers_by_salary(self, minimum=None, maximum=None):
+        """Career ids whose salary range overlaps [minimum, maximum] KES per month"""
+        results = []
+        if minimum is not None:
+            results.append(self.careers_in_range('salary_max', low=minimum))
+        if maximum is not None:
+            results.append(self.careers_in_range('salary_min', high=maximum))
+        if not results:
+            return self.careers_in_range('salary_min')
+        return frozenset.intersection(*results)
+
+    def careers_by_duration(self, min_years=None, max_years=None):
+        """
+        Career ids whose programme length lies within [min_years, max_years].
+
+        An open-ended duration such as "4 years + Law School" is only known to be at
+        least its parsed years, so a max_years bound leaves it out.
+        """
+        career_ids = self.careers_in_range('duration_years', min_years, max_years)
+        if max_years is not None:
+            career_ids = frozenset(career_id for career_id in career_ids if not self.duration_open_ended[career_id])
+        return career_ids
+
+    def sort_careers(self, career_ids, column, descending=False):
+        """Order career ids by a numeric column; careers without a value go last"""
+        rank = self.numeric_rank[column]
+        missing = len(rank)
+        if descending:
+            return sorted(career_ids, key=lambda career_id: -rank[career_id] if career_id in rank else missing)
+        return sorted(career_ids, key=lambda career_id: rank.get(career_id, missing))
+
+    def resolve_cluster_id(self, cluster_key):
+        """Resolve a cluster id ("13", 13) or cluster name to its id, or None"""
+        cluster_key = str(cluster_key)
+        if cluster_key in self.clusters:
+            return cluster_key
+        return self.cluster_ids_by_name.get(cluster_key.strip().lower())
+
+    def get_cluster(self, cluster_key):
+        """Return the cluster dict for an id or name, or None"""
+        cluster_id = self.resolve_cluster_id(cluster_key)
+        return self.clusters.get(cluster_id) if cluster_id is not None else None
+
+    def get_career(self, career_name):
+        """Return the career dict with this name, or None"""
+        career_id = self.career_ids_by_name.get(career_name.strip().lower())
+        return self.careers[career_id] if career_id is not None else None
+
+    def get_career_cluster(self, career_name):
+        """Return the cluster id a career belongs to, or None"""
+        career_id = self.career_ids_by_name.get(career_name.strip().lower())
+        return self.career_clusters[career_id] if career_id is not None else None
+
+    def cluster_careers(self, cluster_key):
+        """Return the careers in a cluster"""
+        cluster_id = self.resolve_cluster_id(cluster_key)
+        return [self.careers[career_id] for career_id in self.cluster_career_ids.get(cluster_id, [])]
+
+    def careers_by_cluster(self):
+        """Return {cluster id: careers} in file order"""
+        return {cluster_id: self.cluster_careers(cluster_id) for cluster_id in self.clusters}
+
+    def careers_requiring_subject(self, subject, min_grade=None, max_grade=None):
+        """
+        Career ids that require a subject, optionally filtered by the required grade.
+
+        Example: careers_requiring_subject('Chemistry', min_grade='B') returns careers
+        whose Chemistry requirement is B or above.
+        """
+        postings = self.subject_postings.get(normalize_key(subject), [])
+        low = bisect_left(postings, (GRADE_POINTS[min_grade], -1)) if min_grade else 0
+        high = bisect_left(postings, (GRADE_POINTS[max_grade] + 1, -1)) if max_grade else len(postings)
+        return frozenset(career_id for _, career_id in postings[low:high])
+
+    def careers_with(self, facet, value):
+        """Career ids tagged with a value of 'interests', 'skills' or 'universities'"""
+        if facet not in self.facet_postings:
+            raise ValueError(f"Unknown facet: {facet}")
+        return self.facet_postings[facet].get(normalize_key(value), frozenset())
+
+    def facet_values(self, facet):
+        """Sorted display labels for every value of a facet ('subjects' or an inverted-index facet)"""
+        labels = self.subject_labels if facet == 'subjects' else self.facet_labels[facet]
+        return sorted(labels.values(), key=str.lower)
+
+    def find_careers(self, subjects=None, interests=None, skills=None, universities=None, match='all'):
+        """
+        Combine subject and facet filters into one list of career ids.
+
+        Args:
+            subjects: {subject: min_grade or None} or an iterable of subject names
+            interests, skills, universities: Iterables of facet values
+            match (str): 'all' intersects every filter, 'any' unions them
+
+        Returns:
+            list: Matching career ids in catalog order
+        """
+        if match not in ('all', 'any'):
+            raise ValueError(f"Unknown match mode: {match}")
+
+        postings = []
+        if subjects:
+            if not isinstance(subjects, dict):
+                subjects = dict.fromkeys(subjects)
+            postings.extend(self.careers_requiring_subject(subject, min_grade)
+                            for subject, min_grade in subjects.items())
+        for facet, values in (('interests', interests), ('skills', skills), ('universities', universities)):
+            postings.extend(self.careers_with(facet, value) for value in values or [])
+
+        if not postings:
+            return list(range(len(self.careers)))
+
+        if match == 'all':
+            # Intersect smallest first so the working set shrinks as fast as possible
+            postings.sort(key=len)
+            result = set(postings[0])
+            for posting in postings[1:]:
+                result.intersection_update(posting)
+                if not result:
+                    break
+        else:
+            result = set().union(*postings)
+        return sorted(result)
+
+    def get_careers(self, career_ids):
+        """Return career dicts for a list of career ids"""
+        return [self.careers[career_id] for career_id in career_ids]
+
+
+def parse_salary_range(text):
+    """
+    Parse salary text such as "KES 70,000 - 400,000+" into (min, max, open_ended).
+
+    Returns None when no amount can be found.
+    """
+    if not isinstance(text, str):
+        return None
+    amounts = [int(amount.replace(',', '')) for amount in SALARY_AMOUNT.findall(text)]
+    if not amounts:
+        return None
+    return min(amounts), max(amounts), text.rstrip().endswith('+')
+
+
+def parse_duration_years(text):
+    """
+    Parse duration text such as "2 years 6 months" or "4 years + Law School" into (years, open_ended).
+
+    Only the numeric parts are summed; any other text ("+ Law School") makes the
+    duration open-ended, so "4 years + Law School" is (4.0, True). Returns None
+    when no duration can be found.
+    """
+    if not isinstance(text, str):
+        return None
+    parts = DURATION_PART.findall(text)
+    if not parts:
+        return None
+    years = sum(float(value) / (12 if unit.lower().startswith('month') else 1) for value, unit in parts)
+    return years, bool(DURATION_SEPARATOR.sub('', DURATION_PART.sub('', text)))
+
+
+def normalize_key(value):
+    """Normalize a subject or facet value for index lookups"""
+    return ' '.join(str(value).lower().replace('_', ' ').split())
+
+
+# Process-wide catalog, parsed on first use
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """Return the process-wide CareerCatalog, parsing career_paths.json on first use"""
+    global _catalog
+    catalog = _catalog
+    if catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = CareerCatalog.from_file()
+            catalog = _catalog
+    return catalog
+
+
+def install_catalog(catalog):
+    """Atomically replace the process-wide catalog with an already built one"""
+    global _catalog
+    with _catalog_lock:
+        _catalog = catalog
+
+
+def invalidate_catalog():
+    """Drop the cached catalog so the next get_catalog() call re-reads career_paths.json"""
+    global _catalog
+    with _catalog_lock:
+        _catalog = None
+
 
 def load_career_data():
     """Load career paths data from JSON file with KUCCPS 20 clusters"""
     try:
-        current_dir = os.path.dirname(__file__)
-        json_path = os.path.join(current_dir, 'career_paths.json')
-        
-        with open(json_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        
         # Convert to the format expected by CareerEngine
-        career_paths = {}
-        for cluster_name, cluster_data in data['career_clusters'].items():
-            career_paths[cluster_name] = cluster_data['careers']
-        
-        return career_paths
+        return get_catalog().careers_by_cluster()
         
     except Exception as e:
         print(f"Error loading career data: {e}")
@@ -29,26 +351,14 @@ def load_career_data():
 def get_career_clusters():
     """Get list of all KUCCPS career clusters"""
     try:
-        current_dir = os.path.dirname(__file__)
-        json_path = os.path.join(current_dir, 'career_paths.json')
-        
-        with open(json_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        
-        return data['metadata']['kuccps_clusters']
+        return list(get_catalog().metadata['kuccps_clusters'])
     except:
         return list(load_career_data().keys())
 
 def get_cluster_info(cluster_name):
     """Get information about a specific career cluster"""
     try:
-        current_dir = os.path.dirname(__file__)
-        json_path = os.path.join(current_dir, 'career_paths.json')
-        
-        with open(json_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        
-        cluster_data = data['career_clusters'].get(cluster_name, {})
+        cluster_data = get_catalog().get_cluster(cluster_name) or {}
         return {
             'description': cluster_data.get('description', ''),
             'icon': cluster_data.get('icon', '📁'),
@@ -78,13 +388,7 @@ def validate_career_data():
 def get_kuccps_statistics():
     """Get statistics about the KUCCPS career data"""
     try:
-        current_dir = os.path.dirname(__file__)
-        json_path = os.path.join(current_dir, 'career_paths.json')
-        
-        with open(json_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        
-        return data['metadata']
+        return get_catalog().metadata
     except:
         return {}
 
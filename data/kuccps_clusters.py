@@ -0,0 +1,114 @@
+"""
+KUCCPS cluster table loader for KCSE Career Guidance Tool
+
+The cluster table used by the career engine lives in kuccps_clusters.json.
+Running this module compiles it into kuccps_clusters.pkl, a precompiled
+artifact the engine loads on start-up instead of parsing JSON:
+
+    python -m data.kuccps_clusters
+
+The artifact records the source file's mtime, size and SHA-256. It is used
+as-is when the mtime and size still match, re-validated by content hash when
+they do not, and ignored (with a fallback to parsing the JSON) when the
+content changed.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+
+SOURCE_PATH = os.path.join(os.path.dirname(__file__), 'kuccps_clusters.json')
+ARTIFACT_PATH = os.path.join(os.path.dirname(__file__), 'kuccps_clusters.pkl')
+
+# Bump when the artifact layout changes
+ARTIFACT_FORMAT = 1
+
+
+def parse_cluster_source(source_path=SOURCE_PATH, source_bytes=None):
+    """Parse the JSON cluster table into {cluster_id: cluster} with integer ids"""
+    if source_bytes is None:
+        with open(source_path, 'rb') as file:
+            source_bytes = file.read()
+    data = json.loads(source_bytes.decode('utf-8'))
+    return {int(cluster_id): cluster for cluster_id, cluster in data['clusters'].items()}
+
+
+def build_cluster_artifact(source_path=SOURCE_PATH, artifact_path=ARTIFACT_PATH):
+    """Compile the JSON cluster table into the binary artifact and return the clusters"""
+    with open(source_path, 'rb') as file:
+        source_bytes = file.read()
+    source_stat = os.stat(source_path)
+    clusters = parse_cluster_source(source_path, source_bytes)
+    write_artifact(artifact_path, source_stat, hashlib.sha256(source_bytes).hexdigest(), clusters)
+    return clusters
+
+
+def write_artifact(artifact_path, source_stat, source_sha256, clusters):
+    """Atomically write the artifact so concurrent readers never see a partial file"""
+    artifact = {
+        'format': ARTIFACT_FORMAT,
+        'source_mtime_ns': source_stat.st_mtime_ns,
+        'source_size': source_stat.st_size,
+        'source_sha256': source_sha256,
+        'clusters': clusters
+    }
+    temp_path = f"{artifact_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as file:
+        pickle.dump(artifact, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, artifact_path)
+
+
+def read_artifact(artifact_path=ARTIFACT_PATH):
+    """Return the artifact dict, or None if it is missing, unreadable or an old format"""
+    try:
+        with open(artifact_path, 'rb') as file:
+            artifact = pickle.load(file)
+    except Exception:
+        return None
+    if not isinstance(artifact, dict) or artifact.get('format') != ARTIFACT_FORMAT:
+        return None
+    return artifact
+
+
+def load_kuccps_clusters(source_path=SOURCE_PATH, artifact_path=ARTIFACT_PATH, refresh_artifact=True):
+    """
+    Load the KUCCPS cluster table, preferring the precompiled artifact.
+
+    Args:
+        source_path (str): JSON cluster table
+        artifact_path (str): Precompiled artifact written by build_cluster_artifact
+        refresh_artifact (bool): Rewrite a stale or missing artifact after falling back
+
+    Returns:
+        dict: {cluster_id: cluster} in cluster order
+    """
+    source_stat = os.stat(source_path)
+    artifact = read_artifact(artifact_path)
+
+    if artifact is not None and artifact['source_mtime_ns'] == source_stat.st_mtime_ns \
+            and artifact['source_size'] == source_stat.st_size:
+        return artifact['clusters']
+
+    with open(source_path, 'rb') as file:
+        source_bytes = file.read()
+    source_sha256 = hashlib.sha256(source_bytes).hexdigest()
+
+    if artifact is not None and artifact['source_sha256'] == source_sha256:
+        # Content unchanged (e.g. fresh checkout); only the mtime moved
+        clusters = artifact['clusters']
+    else:
+        clusters = parse_cluster_source(source_path, source_bytes)
+
+    if refresh_artifact:
+        try:
+            write_artifact(artifact_path, source_stat, source_sha256, clusters)
+        except OSError as e:
+            print(f"Could not refresh cluster artifact: {e}")
+
+    return clusters
+
+
+if __name__ == "__main__":
+    built = build_cluster_artifact()
+    print(f"✅ Compiled {len(built)} clusters to {ARTIFACT_PATH}")
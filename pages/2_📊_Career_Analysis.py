@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
-from utils.database import init_db, save_user_data
-from utils.career_engine import CareerEngine
+from utils.database import init_db, get_or_create_user, get_paid_results
+from utils.data_reload import get_data_snapshot, start_data_watcher
 
 def main():
     st.set_page_config(
@@ -12,7 +12,8 @@ def main():
     
     # Initialize database and career engine
     init_db()
-    career_engine = CareerEngine()
+    start_data_watcher()
+    career_engine = get_data_snapshot().engine
     
     st.title("📚 KCSE Subject & Skills Analysis")
     st.markdown("### Enter your KCSE results and personal attributes for personalized career guidance")
@@ -49,13 +50,21 @@ def main():
         
         if submitted:
             if validate_inputs(subjects_grades, skills_interests, student_info):
-                # Save data and move to payment
-                user_id = save_user_data(student_info, subjects_grades, skills_interests)
+                # Save data (or find the same earlier submission) and move to payment
+                user_id, reused = get_or_create_user(student_info, subjects_grades, skills_interests)
                 st.session_state.user_id = user_id
                 st.session_state.student_info = student_info
                 st.session_state.subjects_grades = subjects_grades
                 st.session_state.skills_interests = skills_interests
                 
+                # Same phone, grades, skills and interests as a paid report: serve it again
+                paid_results = get_paid_results(user_id) if reused else None
+                if paid_results is not None:
+                    st.session_state.recommendations = paid_results['recommendations']
+                    st.session_state.payment_completed = True
+                    st.success("✅ You already have a report for these results! Opening it...")
+                    st.switch_page("pages/4_📈_Results.py")
+                
                 st.success("✅ Data saved successfully! Proceeding to payment...")
                 st.switch_page("pages/3_💳_Payment.py")
             else:
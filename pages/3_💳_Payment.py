@@ -1,8 +1,9 @@
 import streamlit as st
 import time
-from utils.database import save_payment, save_career_results
-from utils.career_engine import CareerEngine
-from utils.mpesa_integration import process_mpesa_payment
+from utils.database import (save_payment, save_career_results, get_paid_results, get_payment_by_checkout_request,
+                            claim_manual_payment)
+from utils.data_reload import get_data_snapshot, start_data_watcher
+from utils.mpesa_integration import process_mpesa_payment, mpesa_configured, MpesaDarajaAPI
 
 def main():
     st.set_page_config(
@@ -18,6 +19,8 @@ def main():
             st.switch_page("pages/2_📊_Career_Analysis.py")
         return
     
+    start_data_watcher()
+    
     st.title("💳 Payment & Report Generation")
     st.markdown("### Complete your payment to generate personalized career report")
     
@@ -26,6 +29,16 @@ def main():
     subjects_grades = st.session_state.subjects_grades
     skills_interests = st.session_state.skills_interests
     
+    # Already paid for this profile (e.g. a resubmission or retry): no second STK push
+    paid_results = get_paid_results(user_id)
+    if paid_results is not None:
+        st.session_state.recommendations = paid_results['recommendations']
+        st.session_state.payment_completed = True
+        st.success("✅ Payment already received! Your report is ready.")
+        if st.button("📊 View My Career Report", type="primary"):
+            st.switch_page("pages/4_📈_Results.py")
+        return
+    
     # Display summary
     col1, col2 = st.columns(2)
     
@@ -96,57 +109,72 @@ def main():
         st.warning("**Payment Amount: KES 20**")
         
         if st.button("💰 Pay KES 20 via M-Pesa", type="primary", use_container_width=True):
-            with st.spinner("Initiating M-Pesa payment..."):
-                try:
-                    # Process M-Pesa payment without till_number parameter
-                    payment_success = process_mpesa_payment(
-                        student_info['phone'], 
-                        20,  # Amount
-                        user_id
+            if mpesa_configured():
+                with st.spinner("Initiating M-Pesa payment..."):
+                    response = MpesaDarajaAPI().initiate_stk_push(
+                        student_info['phone'], 20, f"CAREER_{user_id}", "Career Report"
                     )
-                except TypeError as e:
-                    st.error(f"❌ Payment configuration error: {e}")
-                    st.info("Please check your M-Pesa integration setup")
-                    payment_success = False
-            
-            if payment_success:
-                # Save payment record
-                save_payment(user_id, 20, f"CAREER_{user_id}", "completed")
-                
-                # Generate career recommendations
-                with st.spinner("🎯 Generating your personalized career report..."):
-                    career_engine = CareerEngine()
-                    recommendations = career_engine.generate_recommendations(
-                        subjects_grades, skills_interests
-                    )
-                
-                # Save results to database
-                save_career_results(user_id, recommendations)
                 
-                # Store recommendations in session state
-                st.session_state.recommendations = recommendations
-                st.session_state.payment_completed = True
+                if response.get('success'):
+                    # The callback receiver (python -m utils.mpesa_callback) records the outcome on this row
+                    save_payment(user_id, 20, f"CAREER_{user_id}", "pending",
+                                 checkout_request_id=response['CheckoutRequestID'])
+                    st.session_state.checkout_request_id = response['CheckoutRequestID']
+                else:
+                    st.error(f"❌ Payment could not be started: {response.get('error_message')}")
+                    st.info(PAYMENT_TROUBLESHOOTING)
+            else:
+                with st.spinner("Initiating M-Pesa payment..."):
+                    try:
+                        # Process M-Pesa payment without till_number parameter
+                        payment_success = process_mpesa_payment(
+                            student_info['phone'], 
+                            20,  # Amount
+                            user_id
+                        )
+                    except TypeError as e:
+                        st.error(f"❌ Payment configuration error: {e}")
+                        st.info("Please check your M-Pesa integration setup")
+                        payment_success = False
                 
+                if payment_success:
+                    # Save payment record
+                    save_payment(user_id, 20, f"CAREER_{user_id}", "completed")
+                    generate_report(user_id, subjects_grades, skills_interests)
+                    
+                    st.success("✅ Payment confirmed! Your report is ready.")
+                    st.balloons()
+                    
+                    # Show success message before redirect
+                    st.info("📊 Redirecting to your career report...")
+                    
+                    # Auto-redirect to results after 3 seconds
+                    time.sleep(3)
+                    st.switch_page("pages/4_📈_Results.py")
+                    
+                else:
+                    st.error("❌ Payment failed. Please try again.")
+                    st.info(PAYMENT_TROUBLESHOOTING)
+        
+        # STK push sent: the callback receiver writes the outcome, this page reads it once per rerun
+        checkout_request_id = st.session_state.get('checkout_request_id')
+        if checkout_request_id:
+            status = get_checkout_status(checkout_request_id)
+            
+            if status == 'completed':
+                del st.session_state.checkout_request_id
+                generate_report(user_id, subjects_grades, skills_interests)
                 st.success("✅ Payment confirmed! Your report is ready.")
                 st.balloons()
-                
-                # Show success message before redirect
-                st.info("📊 Redirecting to your career report...")
-                
-                # Auto-redirect to results after 3 seconds
-                time.sleep(3)
+                time.sleep(2)
                 st.switch_page("pages/4_📈_Results.py")
-                
+            elif status == 'pending':
+                st.info("📱 Enter your M-Pesa PIN on your phone, then check your payment status.")
+                st.button("🔄 Check Payment Status", use_container_width=True)
             else:
-                st.error("❌ Payment failed. Please try again.")
-                st.info("""
-                **Troubleshooting Tips:**
-                - Ensure your phone number is correct and has M-Pesa
-                - Check your M-Pesa balance (KES 20 required)
-                - Ensure you have mobile data connectivity
-                - Try the manual Lipa na M-Pesa option
-                - Contact support if issues persist
-                """)
+                del st.session_state.checkout_request_id
+                st.error(f"❌ Payment {status}. Please try again.")
+                st.info(PAYMENT_TROUBLESHOOTING)
     
     # Manual payment confirmation section
     st.markdown("---")
@@ -167,27 +195,18 @@ def main():
             if st.button("✅ Confirm Manual Payment", use_container_width=True):
                 if transaction_code:
                     # Verify manual payment
-                    manual_payment_success = verify_manual_payment(transaction_code, user_id)
+                    manual_payment_status = verify_manual_payment(transaction_code, user_id)
                     
-                    if manual_payment_success:
-                        # Generate career recommendations
-                        with st.spinner("🎯 Generating your personalized career report..."):
-                            career_engine = CareerEngine()
-                            recommendations = career_engine.generate_recommendations(
-                                subjects_grades, skills_interests
-                            )
-                        
-                        # Save results to database
-                        save_career_results(user_id, recommendations)
-                        
-                        # Store recommendations in session state
-                        st.session_state.recommendations = recommendations
-                        st.session_state.payment_completed = True
+                    if manual_payment_status == 'completed':
+                        generate_report(user_id, subjects_grades, skills_interests)
                         
                         st.success("✅ Payment verified! Your report is ready.")
                         st.balloons()
                         time.sleep(2)
                         st.switch_page("pages/4_📈_Results.py")
+                    elif manual_payment_status == 'pending':
+                        st.info("⏳ We have not received this payment from M-Pesa yet. Your code has been saved "
+                                "for review; try again in a few minutes or contact support.")
                     else:
                         st.error("❌ Could not verify payment. Please check transaction code or contact support.")
                 else:
@@ -205,17 +224,44 @@ def main():
     This is a live Lipa na M-Pesa Buy Goods till number. All payments go directly to registered business account.
     """)
 
+PAYMENT_TROUBLESHOOTING = """
+**Troubleshooting Tips:**
+- Ensure your phone number is correct and has M-Pesa
+- Check your M-Pesa balance (KES 20 required)
+- Ensure you have mobile data connectivity
+- Try the manual Lipa na M-Pesa option
+- Contact support if issues persist
+"""
+
+def generate_report(user_id, subjects_grades, skills_interests):
+    """Generate and save the career report of a paid user and keep it in the session"""
+    with st.spinner("🎯 Generating your personalized career report..."):
+        career_engine = get_data_snapshot().engine
+        recommendations = career_engine.generate_recommendations(
+            subjects_grades, skills_interests
+        )
+    
+    # Save results to database
+    save_career_results(user_id, recommendations)
+    
+    # Store recommendations in session state
+    st.session_state.recommendations = recommendations
+    st.session_state.payment_completed = True
+
+def get_checkout_status(checkout_request_id):
+    """Recorded status of an STK push ('pending' until the callback receiver or poller records its outcome)"""
+    payment = get_payment_by_checkout_request(checkout_request_id)
+    return payment['status'] if payment else 'pending'
+
 def verify_manual_payment(transaction_code, user_id):
     """
-    Verify manual payment - you'll need to implement this based on your M-Pesa API
-    For now, this is a placeholder that returns True for demo purposes
+    Verify a Lipa na M-Pesa transaction code against the payments M-Pesa has reported.
+    
+    Returns:
+        str: 'completed' if the code is a completed payment of this user, 'pending' if M-Pesa
+            has not reported it yet (it is saved for review) or 'rejected'
     """
-    # TODO: Implement actual M-Pesa transaction verification
-    # This could involve checking your M-Pesa records or using M-Pesa API
-    if transaction_code and len(transaction_code) > 5:
-        save_payment(user_id, 20, f"CAREER_{user_id}", "completed", transaction_code)
-        return True
-    return False
+    return claim_manual_payment(user_id, transaction_code, 20)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
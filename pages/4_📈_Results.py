@@ -5,6 +5,8 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import json
 from datetime import datetime
+from data.career_paths import GRADE_POINTS
+from utils.data_reload import get_data_snapshot, start_data_watcher
 
 def main():
     st.set_page_config(
@@ -64,6 +66,8 @@ def main():
             st.switch_page("pages/2_📊_Career_Analysis.py")
         return
     
+    start_data_watcher()
+    
     recommendations = st.session_state.recommendations
     student_info = st.session_state.get('student_info', {})
     subjects_grades = st.session_state.get('subjects_grades', {})
@@ -195,6 +199,9 @@ def main():
         all_careers_df = pd.DataFrame(all_careers_data)
         st.dataframe(all_careers_df, width='stretch')
     
+    # Explore the wider career catalog
+    display_catalog_explorer()
+    
     # Subject Performance Analysis
     st.header("📈 Subject Performance Analysis")
     
@@ -347,6 +354,73 @@ def main():
         if st.button("📥 Download Report", width='stretch'):
             download_report(recommendations, student_info, subjects_grades, skills_interests)
 
+def display_catalog_explorer():
+    """Filter the career catalog by subject, interest, skill and university"""
+    st.header("🔎 Explore More Careers")
+    catalog = get_data_snapshot().catalog
+    
+    filter_col1, filter_col2, filter_col3 = st.columns(3)
+    
+    with filter_col1:
+        subject = st.selectbox("Requires Subject", ["Any"] + catalog.facet_values('subjects'))
+        min_grade = st.selectbox("Required Grade (at least)", ["Any"] + list(GRADE_POINTS.keys())[::-1],
+                                 disabled=subject == "Any")
+    
+    with filter_col2:
+        interests = st.multiselect("Interests", catalog.facet_values('interests'))
+        skills = st.multiselect("Skills", catalog.facet_values('skills'))
+    
+    with filter_col3:
+        universities = st.multiselect("Offered at", catalog.facet_values('universities'))
+        match = st.radio("Show careers matching", ["All filters", "Any filter"], horizontal=True)
+    
+    range_col1, range_col2, range_col3 = st.columns(3)
+    
+    with range_col1:
+        min_salary = st.number_input("Minimum Monthly Salary (KES)", min_value=0, value=0, step=10000)
+    with range_col2:
+        max_years = st.selectbox("Maximum Duration", ["Any", 4, 5, 6], format_func=lambda v: v if v == "Any" else f"{v} years")
+    with range_col3:
+        sort_by = st.selectbox("Sort by", ["Catalog order", "Highest salary", "Lowest starting salary", "Shortest duration"])
+    
+    subjects = {} if subject == "Any" else {subject: None if min_grade == "Any" else min_grade}
+    career_ids = catalog.find_careers(
+        subjects=subjects, interests=interests, skills=skills, universities=universities,
+        match='all' if match == "All filters" else 'any'
+    )
+    
+    # Range filters and sorting read the precomputed numeric indexes
+    if min_salary:
+        salary_matches = catalog.careers_by_salary(minimum=min_salary)
+        career_ids = [career_id for career_id in career_ids if career_id in salary_matches]
+    if max_years != "Any":
+        duration_matches = catalog.careers_by_duration(max_years=max_years)
+        career_ids = [career_id for career_id in career_ids if career_id in duration_matches]
+    if sort_by == "Highest salary":
+        career_ids = catalog.sort_careers(career_ids, 'salary_max', descending=True)
+    elif sort_by == "Lowest starting salary":
+        career_ids = catalog.sort_careers(career_ids, 'salary_min')
+    elif sort_by == "Shortest duration":
+        career_ids = catalog.sort_careers(career_ids, 'duration_years')
+    
+    if not career_ids:
+        st.info("No careers match these filters. Try removing one.")
+        return
+    
+    explorer_data = []
+    for career_id in career_ids:
+        career = catalog.careers[career_id]
+        cluster = catalog.clusters[catalog.career_clusters[career_id]]
+        explorer_data.append({
+            'Career': career['career'],
+            'Cluster': cluster.get('name', ''),
+            'Duration': career.get('duration', ''),
+            'Average Salary': career.get('average_salary', '')
+        })
+    
+    st.caption(f"{len(explorer_data)} matching careers")
+    st.dataframe(pd.DataFrame(explorer_data), width='stretch')
+
 def grade_to_points(grade):
     """Convert grade to points"""
     grade_points = {
@@ -0,0 +1,61 @@
+"""
+Shared pytest setup
+
+Settings are read with decouple when the utils modules are imported, so the
+storage and token cache paths are pointed at a scratch directory first: no
+test ever touches the shipped career_guide.db.
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+SCRATCH_DIR = tempfile.mkdtemp(prefix="career_guide_tests_")
+os.environ['CAREER_GUIDE_DB_PATH'] = os.path.join(SCRATCH_DIR, 'career_guide.db')
+os.environ['MPESA_TOKEN_CACHE'] = os.path.join(SCRATCH_DIR, 'mpesa_token_cache.db')
+
+import pytest
+
+from utils.repository import create_repository
+
+STUDENT = {'name': "Amina Otieno", 'phone': "254712345678", 'email': "amina@example.com"}
+GRADES = {'Mathematics': 'B', 'English': 'B+', 'Kiswahili': 'B', 'Biology': 'B-'}
+SKILLS = {'skills': ["Research"], 'interests': ["Medicine"]}
+# A stronger science profile, for tests that need recommendations in several clusters
+SCIENCE_GRADES = {'Mathematics': 'A-', 'English': 'B+', 'Kiswahili': 'B', 'Biology': 'A', 'Chemistry': 'B+',
+                  'Physics': 'Not Taken'}
+SCIENCE_SKILLS = {'skills': ["Research", "Problem Solving"], 'interests': ["Medicine", "Sciences"]}
+
+
+def mysql_repository():
+    """An emptied MySQLRepository on CAREER_GUIDE_TEST_MYSQL_DATABASE; skips without the driver or a server"""
+    connector = pytest.importorskip('mysql.connector')
+    try:
+        repository = create_repository(
+            'mysql', database=os.environ.get('CAREER_GUIDE_TEST_MYSQL_DATABASE', 'career_guide_test'))
+        repository.init_db()
+    except connector.Error as e:
+        pytest.skip(f"No MySQL server for the storage contract tests: {e}")
+    repository.clear_all_data()
+    return repository
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'sqlite-write-behind', 'mysql'])
+def repository(request, tmp_path):
+    """Every storage backend in turn (write-behind saves need repository.flush() before raw reads)"""
+    if request.param == 'memory':
+        repository = create_repository('memory')
+    elif request.param == 'mysql':
+        repository = mysql_repository()
+    else:
+        repository = create_repository('sqlite', path=str(tmp_path / 'career_guide.db'),
+                                       write_behind=request.param == 'sqlite-write-behind')
+    repository.init_db()
+    yield repository
+    if request.param == 'mysql':
+        repository.clear_all_data()
+    repository.close()
@@ -0,0 +1,85 @@
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+from conftest import GRADES, SKILLS, STUDENT
+from utils import analytics, database
+from utils.career_engine import get_career_engine
+from utils.repository import create_repository
+
+
+def totals(repository):
+    stats = repository.get_daily_stats()
+    return {key: sum(day[key] for day in stats) for key in
+            ('submissions', 'payments', 'completed_payments', 'revenue', 'results')}
+
+
+def test_rollups_count_saves(repository):
+    user_id = repository.save_user_data(STUDENT, GRADES, SKILLS)
+    repository.save_payment(user_id, 20, f"CAREER_{user_id}", 'pending', f"ws_CO_{user_id}")
+    repository.save_payment(user_id, 20, f"CAREER_{user_id}", 'completed', f"ws_CO_{user_id}")
+    repository.save_career_results(user_id, get_career_engine().generate_recommendations(GRADES, SKILLS))
+    repository.flush()
+
+    assert totals(repository) == {'submissions': 1, 'payments': 1, 'completed_payments': 1, 'revenue': 20.0,
+                                  'results': 1}
+    assert repository.get_grade_distribution('English') == {'English': {'B+': 1}}
+
+
+def test_rollup_days_are_utc_dates(repository):
+    user_id = repository.save_user_data(STUDENT, GRADES, SKILLS)
+    repository.save_payment(user_id, 20, f"CAREER_{user_id}", 'completed')
+    repository.flush()
+
+    today = datetime.now(timezone.utc).date().isoformat()
+    assert [day['day'] for day in repository.get_daily_stats()] == [today]
+    assert repository.get_user_data(user_id)['user_info']['created_at'][:10] == today
+
+
+def test_main_starts_from_a_utc_day(monkeypatch, capsys):
+    start_days = []
+    monkeypatch.setattr(sys, 'argv', ['analytics', '--days', '0'])
+    monkeypatch.setattr(database, 'get_daily_stats', lambda start_day: start_days.append(start_day) or [])
+    monkeypatch.setattr(database, 'get_cluster_histogram', lambda start_day: [])
+    monkeypatch.setattr(database, 'get_grade_distribution', lambda start_day: {})
+
+    analytics.main()
+
+    assert start_days == [datetime.now(timezone.utc).date().isoformat()]
+    assert '"daily_stats": []' in capsys.readouterr().out
+
+
+def test_payment_deltas_without_a_replacement_only_subtract():
+    removed = [{'created_at': '2024-05-01 10:00:00', 'amount': 20, 'status': 'completed'},
+               {'created_at': '2024-05-02 10:00:00', 'amount': 20, 'status': 'pending'}]
+
+    assert analytics.payment_deltas(removed) == [('2024-05-01', -1, -1, -20.0), ('2024-05-02', -1, 0, 0.0)]
+
+
+def test_reopening_keeps_the_totals_of_purged_users(tmp_path):
+    path = str(tmp_path / 'career_guide.db')
+    repository = create_repository('sqlite', path=path, write_behind=False)
+    purged = repository.save_user_data(STUDENT, GRADES, SKILLS)
+    kept = repository.save_user_data(STUDENT, GRADES, SKILLS)
+    for user_id in (purged, kept):
+        repository.save_payment(user_id, 20, f"CAREER_{user_id}", 'completed', f"ws_CO_{user_id}")
+    with repository.pool.transaction() as conn:
+        conn.execute("UPDATE users SET created_at = '2000-01-01 00:00:00' WHERE id = ?", (purged,))
+    repository.run_retention_job(30, archive_dir=None)
+    expected = totals(repository)
+    # A database from before payments were unique per checkout request: a duplicate row that was counted
+    with repository.pool.transaction() as conn:
+        conn.execute("DROP INDEX idx_payments_checkout_unique")
+        conn.execute("INSERT INTO payments (user_id, amount, mpesa_code, checkout_request_id, status) "
+                     "VALUES (?, 20, ?, ?, 'pending')", (kept, f"CAREER_{kept}", f"ws_CO_{kept}"))
+        analytics.rollup_payments(conn, [(None, 20, 'pending')])
+    repository.close()
+
+    repository = create_repository('sqlite', path=path, write_behind=False)
+    repository.init_db()
+
+    assert totals(repository) == expected == {'submissions': 2, 'payments': 2, 'completed_payments': 2,
+                                              'revenue': 40.0, 'results': 0}
+    assert [payment['status'] for payment in repository.get_payment_history(kept)] == ['completed']
+    repository.close()
@@ -0,0 +1,199 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from data import kuccps_clusters
+from utils import career_engine
+from utils.career_engine import CareerEngine, RecommendationCache, get_career_engine, invalidate_career_engine
+
+PROFILES = [
+    ({'Mathematics': 'A-', 'English': 'B+', 'Kiswahili': 'B', 'Biology': 'A', 'Chemistry': 'B+', 'Physics': 'Not Taken'},
+     {'skills': ["Research", "Problem Solving"], 'interests': ["Medicine", "Sciences"]}),
+    ({'Mathematics': 'C', 'English': 'C+', 'Kiswahili': 'C-', 'Biology': 'C', 'Chemistry': 'D+', 'Geography': 'C'},
+     {'skills': ["Communication"], 'interests': ["Business"]}),
+    ({'Mathematics': 'A', 'English': 'B', 'Kiswahili': 'B-', 'Physics': 'A-', 'Chemistry': 'B+',
+      'Computer Studies': 'A'},
+     {'skills': ["Programming", "Analytical"], 'interests': ["Technology", "Engineering", "Mathematics"]}),
+    ({'Mathematics': 'E', 'English': 'Select Grade'}, {'skills': [], 'interests': []})
+]
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return CareerEngine()
+
+
+def test_vectorized_scores_match_the_loop(engine):
+    loop_engine = CareerEngine(scoring_mode='loop')
+
+    for subjects_grades, skills_interests in PROFILES:
+        assert engine.generate_recommendations(subjects_grades, skills_interests) == \
+            loop_engine.generate_recommendations(subjects_grades, skills_interests)
+
+
+def test_unknown_scoring_mode_is_rejected():
+    with pytest.raises(ValueError, match="Unknown scoring mode: gpu"):
+        CareerEngine(scoring_mode='gpu')
+
+
+def test_batch_matches_single_profiles(engine):
+    expected = [engine.generate_recommendations(*profile) for profile in PROFILES]
+
+    assert engine.generate_recommendations_batch(PROFILES, chunk_size=3) == expected
+    with pytest.raises(ValueError, match="chunk_size must be at least 1"):
+        engine.generate_recommendations_batch(PROFILES, chunk_size=0)
+
+
+def test_batch_reads_a_result_sheet(engine):
+    subjects_grades, skills_interests = PROFILES[0]
+    df = pd.DataFrame([{**{subject: grade for subject, grade in subjects_grades.items() if grade != 'Not Taken'},
+                        'Physics': None,
+                        'skills': ", ".join(skills_interests['skills']),
+                        'interests': ", ".join(skills_interests['interests'])}])
+
+    assert engine.generate_recommendations_batch(df) == [engine.generate_recommendations(*PROFILES[0])]
+
+
+def test_requirement_grades_are_parsed(engine):
+    assert engine.parse_grade_requirement("C++") == "C+"
+    assert engine.parse_grade_requirement("B (PLAIN)") == "B"
+    assert engine.parse_grade_requirement(" C- ") == "C-"
+
+
+def test_requirement_index_is_read_only(engine):
+    with pytest.raises(AttributeError, match="read-only"):
+        engine.requirement_index.thresholds = ()
+
+
+def test_tables_are_read_only(engine):
+    with pytest.raises(TypeError):
+        engine.grade_points['A'] = 13
+    with pytest.raises(TypeError):
+        engine.kuccps_clusters[1]['name'] = "Renamed"
+
+
+def test_one_engine_is_shared_per_process():
+    shared = get_career_engine()
+
+    assert get_career_engine() is shared
+    invalidate_career_engine()
+    assert get_career_engine() is not shared
+
+
+def test_model_version_follows_the_cluster_table(engine):
+    clusters = {cluster_id: dict(cluster) for cluster_id, cluster in engine.kuccps_clusters.items()}
+    clusters[1]['name'] = "Renamed cluster"
+
+    assert CareerEngine().model_version == engine.model_version
+    assert CareerEngine(clusters=clusters).model_version != engine.model_version
+
+
+def test_cache_evicts_least_recently_used():
+    cache = RecommendationCache(max_entries=2)
+    cache.put('a', {'value': 1})
+    cache.put('b', {'value': 2})
+    cache.get('a')
+    cache.put('c', {'value': 3})
+
+    assert cache.get('b') is None
+    assert cache.get('a') == {'value': 1}
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['entries']) == (2, 1, 1, 2)
+    assert stats['hit_rate'] == round(2 / 3, 4)
+
+
+def test_cache_returns_copies_and_expires(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(career_engine.time, 'monotonic', lambda: now[0])
+    cache = RecommendationCache(ttl_seconds=60)
+    cache.put('a', {'careers': ["Medicine"]})
+
+    cache.get('a')['careers'].append("Law")
+    assert cache.get('a') == {'careers': ["Medicine"]}
+    now[0] += 60
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_cache_respects_the_byte_bound():
+    cache = RecommendationCache(max_bytes=200)
+    cache.put('large', "x" * 500)
+    cache.put('a', "x" * 80)
+    cache.put('b', "x" * 80)
+    cache.put('c', "x" * 80)
+
+    stats = cache.stats()
+    assert cache.get('large') is None
+    assert stats['bytes'] <= 200 and stats['entries'] == 2
+
+
+def test_equivalent_profiles_share_a_cache_entry():
+    engine = CareerEngine(recommendation_cache=RecommendationCache())
+    subjects_grades, skills_interests = PROFILES[2]
+    reordered = {'skills': skills_interests['skills'][::-1],
+                 'interests': skills_interests['interests'][:1] + skills_interests['interests'][:0:-1]}
+
+    first = engine.generate_recommendations(subjects_grades, skills_interests)
+    engine.generate_recommendations(dict(reversed(list(subjects_grades.items()))), reordered)
+    engine.generate_recommendations(subjects_grades, {**skills_interests,
+                                                      'interests': skills_interests['interests'][::-1]})
+
+    assert engine.recommendation_cache.stats()['hits'] == 1
+    assert engine.generate_recommendations(subjects_grades, skills_interests) == first
+
+
+@pytest.fixture
+def cluster_source(tmp_path):
+    source_path = str(tmp_path / 'kuccps_clusters.json')
+    with open(kuccps_clusters.SOURCE_PATH, 'rb') as source, open(source_path, 'wb') as copy:
+        copy.write(source.read())
+    return source_path, str(tmp_path / 'kuccps_clusters.pkl')
+
+
+def test_cluster_artifact_matches_the_source(cluster_source):
+    source_path, artifact_path = cluster_source
+
+    clusters = kuccps_clusters.build_cluster_artifact(source_path, artifact_path)
+
+    assert clusters == kuccps_clusters.parse_cluster_source(source_path)
+    assert kuccps_clusters.load_kuccps_clusters(source_path, artifact_path) == clusters
+    assert CareerEngine(clusters_path=source_path).model_version == CareerEngine().model_version
+
+
+def test_stale_cluster_artifact_is_rebuilt(cluster_source):
+    source_path, artifact_path = cluster_source
+    kuccps_clusters.build_cluster_artifact(source_path, artifact_path)
+    with open(source_path, encoding='utf-8') as file:
+        data = json.load(file)
+    data['clusters']['1']['name'] = "Renamed cluster"
+    with open(source_path, 'w', encoding='utf-8') as file:
+        json.dump(data, file)
+
+    assert kuccps_clusters.load_kuccps_clusters(source_path, artifact_path)[1]['name'] == "Renamed cluster"
+    assert kuccps_clusters.read_artifact(artifact_path)['clusters'][1]['name'] == "Renamed cluster"
+
+
+def test_touched_source_reuses_the_artifact_by_hash(cluster_source, monkeypatch):
+    source_path, artifact_path = cluster_source
+    kuccps_clusters.build_cluster_artifact(source_path, artifact_path)
+    stat = os.stat(source_path)
+    os.utime(source_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    monkeypatch.setattr(kuccps_clusters, 'parse_cluster_source',
+                        lambda *args: pytest.fail("unchanged source was parsed again"))
+
+    clusters = kuccps_clusters.load_kuccps_clusters(source_path, artifact_path)
+
+    assert clusters[1]['name'] == CareerEngine().kuccps_clusters[1]['name']
+    assert kuccps_clusters.read_artifact(artifact_path)['source_mtime_ns'] == stat.st_mtime_ns + 10 ** 9
+
+
+def test_unreadable_artifact_falls_back_to_the_source(cluster_source):
+    source_path, artifact_path = cluster_source
+    with open(artifact_path, 'wb') as file:
+        file.write(b"not a pickle")
+
+    assert kuccps_clusters.load_kuccps_clusters(source_path, artifact_path, refresh_artifact=False) == \
+        kuccps_clusters.parse_cluster_source(source_path)
+    assert kuccps_clusters.read_artifact(artifact_path) is None
@@ -0,0 +1,128 @@
+import pytest
+
+from data.career_paths import (GRADE_POINTS, CareerCatalog, get_catalog, install_catalog, invalidate_catalog,
+                               normalize_key, parse_duration_years, parse_salary_range)
+
+DATA = {
+    'metadata': {'kuccps_clusters': ["1: Law", "2: Engineering, Engineering Technology & Related"]},
+    'career_clusters': {
+        '1': {'name': "Law", 'careers': [
+            {'career': "Bachelor of Laws (LL.B.)", 'required_subjects': ["English", "History"],
+             'required_grades': {'English': "B", 'History': "C+"}, 'skills': ["Legal Writing"],
+             'interests': ["Justice", "Social Issues"], 'universities': ["University of Nairobi"],
+             'average_salary': "KES 70,000 - 400,000+", 'duration': "4 years + Law School"},
+            {'career': "Diploma in Paralegal Studies", 'required_subjects': ["English"],
+             'required_grades': {'English': "C"}, 'skills': ["Legal Writing", "Research"],
+             'interests': ["Justice"], 'universities': ["Kenya School of Law"],
+             'average_salary': "Varies", 'duration': "18 months"}
+        ]},
+        '2': {'name': "Engineering", 'careers': [
+            {'career': "BSc Civil Engineering", 'required_subjects': ["Mathematics", "Physics", "English"],
+             'required_grades': {'Mathematics': "B+", 'Physics': "B", 'English': "C+"},
+             'skills': ["Problem Solving", "Research"], 'interests': ["Construction"],
+             'universities': ["University of Nairobi", "JKUAT"],
+             'average_salary': "KES 80,000 - 250,000", 'duration': "5 years"}
+        ]}
+    }
+}
+
+
+@pytest.fixture
+def catalog():
+    return CareerCatalog(DATA)
+
+
+def test_lookups_by_id_and_name(catalog):
+    assert catalog.get_cluster(2)['name'] == "Engineering"
+    assert catalog.resolve_cluster_id("law") == '1'
+    assert catalog.resolve_cluster_id("2: Engineering, Engineering Technology & Related") == '2'
+    assert catalog.resolve_cluster_id("Engineering, Engineering Technology & Related") == '2'
+    assert catalog.get_cluster("Medicine") is None
+    assert catalog.get_career(" bsc civil engineering ")['duration'] == "5 years"
+    assert catalog.get_career_cluster("Diploma in Paralegal Studies") == '1'
+    assert [career['career'] for career in catalog.cluster_careers("Law")] == \
+        ["Bachelor of Laws (LL.B.)", "Diploma in Paralegal Studies"]
+
+
+def test_careers_by_cluster_keep_file_order(catalog):
+    assert {cluster_id: [career['career'] for career in careers]
+            for cluster_id, careers in catalog.careers_by_cluster().items()} == {
+        '1': ["Bachelor of Laws (LL.B.)", "Diploma in Paralegal Studies"],
+        '2': ["BSc Civil Engineering"]
+    }
+
+
+def test_subject_index_filters_by_required_grade(catalog):
+    assert catalog.careers_requiring_subject("english") == {0, 1, 2}
+    assert catalog.careers_requiring_subject("English", min_grade="C+") == {0, 2}
+    assert catalog.careers_requiring_subject("English", max_grade="C+") == {1, 2}
+    assert catalog.careers_requiring_subject("Chemistry") == frozenset()
+
+
+def test_facet_queries(catalog):
+    assert catalog.careers_with('skills', "legal_writing") == {0, 1}
+    assert catalog.careers_with('universities', "university of nairobi") == {0, 2}
+    assert catalog.facet_values('interests') == ["Construction", "Justice", "Social Issues"]
+    assert catalog.find_careers(subjects={'English': "C+"}, skills=["Research"]) == [2]
+    assert catalog.find_careers(interests=["Construction", "Social Issues"], match='any') == [0, 2]
+    assert catalog.find_careers() == [0, 1, 2]
+    with pytest.raises(ValueError, match="Unknown facet: courses"):
+        catalog.careers_with('courses', "Law")
+    with pytest.raises(ValueError, match="Unknown match mode: some"):
+        catalog.find_careers(skills=["Research"], match='some')
+
+
+def test_salary_and_duration_columns(catalog):
+    assert catalog.numeric['salary_min'] == [70000, None, 80000]
+    assert catalog.salary_open_ended == [True, False, False]
+    assert catalog.numeric['duration_years'] == [4.0, 1.5, 5.0]
+    assert catalog.duration_open_ended == [True, False, False]
+    assert catalog.unparsed_fields == {1: ['average_salary']}
+    assert catalog.careers_by_salary(minimum=300000) == {0}
+    assert catalog.careers_by_salary(maximum=75000) == {0}
+    # "4 years + Law School" takes longer than four years, by an unknown amount
+    assert catalog.careers_by_duration(max_years=4) == {1}
+    assert catalog.careers_by_duration(max_years=6) == {1, 2}
+    assert catalog.careers_by_duration(min_years=4) == {0, 2}
+    assert catalog.sort_careers([0, 1, 2], 'salary_min') == [0, 2, 1]
+    assert catalog.sort_careers([0, 1, 2], 'duration_years', descending=True) == [2, 0, 1]
+
+
+def test_text_parsers():
+    assert parse_salary_range("KES 30,000 - 80,000") == (30000, 80000, False)
+    assert parse_salary_range("Varies") is None
+    assert parse_salary_range(None) is None
+    assert parse_duration_years("2 years 6 months") == (2.5, False)
+    assert parse_duration_years("2 years and 6 months") == (2.5, False)
+    assert parse_duration_years("4 years + Law School") == (4.0, True)
+    assert parse_duration_years("Varies") is None
+
+
+def test_indexes_agree_with_a_scan_of_the_shipped_file():
+    catalog = CareerCatalog.from_file()
+
+    for subject in ("Mathematics", "Biology", "English"):
+        expected = {career_id for career_id, career in enumerate(catalog.careers)
+                    if GRADE_POINTS.get(career.get('required_grades', {}).get(subject, ''), 0) >= GRADE_POINTS['B']}
+        assert catalog.careers_requiring_subject(subject, min_grade="B") == expected
+    for facet in ('interests', 'skills', 'universities'):
+        value = catalog.facet_values(facet)[0]
+        assert catalog.careers_with(facet, value) == {
+            career_id for career_id, career in enumerate(catalog.careers)
+            if normalize_key(value) in map(normalize_key, career.get(facet, []))}
+
+
+def test_keys_are_normalized():
+    assert normalize_key("  Problem_Solving ") == "problem solving"
+
+
+def test_shared_catalog_is_parsed_once():
+    invalidate_catalog()
+    try:
+        catalog = get_catalog()
+        assert get_catalog() is catalog
+        other = CareerCatalog(DATA)
+        install_catalog(other)
+        assert get_catalog() is other
+    finally:
+        invalidate_catalog()
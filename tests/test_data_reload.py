@@ -0,0 +1,93 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from data.career_paths import CAREER_PATHS_FILE
+from data.kuccps_clusters import ARTIFACT_PATH, SOURCE_PATH
+from utils import data_reload
+from utils.data_reload import DataReloader
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Copies of both data files, with the shared catalog and engine left untouched"""
+    monkeypatch.setattr(data_reload, 'install_catalog', lambda catalog: None)
+    monkeypatch.setattr(data_reload, 'install_career_engine', lambda engine: None)
+    shutil.copy(CAREER_PATHS_FILE, tmp_path / 'career_paths.json')
+    shutil.copy(SOURCE_PATH, tmp_path / 'kuccps_clusters.json')
+    return tmp_path
+
+
+def edit_json(path, edit):
+    with open(path, encoding='utf-8') as file:
+        data = json.load(file)
+    edit(data)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(data, file)
+    # Make the change visible to the mtime check even on coarse-grained filesystems
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def rename_cluster(name):
+    def edit(data):
+        data['clusters']['1']['name'] = name
+    return edit
+
+
+def rename_first_career(name):
+    def edit(data):
+        first_cluster = next(iter(data['career_clusters'].values()))
+        first_cluster['careers'][0]['career'] = name
+    return edit
+
+
+def reloader_for(data_dir):
+    return DataReloader(str(data_dir / 'career_paths.json'), str(data_dir / 'kuccps_clusters.json'))
+
+
+def test_snapshot_is_built_from_the_configured_files(data_dir):
+    edit_json(data_dir / 'kuccps_clusters.json', rename_cluster("Law (test table)"))
+    edit_json(data_dir / 'career_paths.json', rename_first_career("Test Career"))
+    artifact_stamp = os.stat(ARTIFACT_PATH).st_mtime_ns if os.path.exists(ARTIFACT_PATH) else None
+
+    snapshot = reloader_for(data_dir).current()
+
+    assert snapshot.engine.kuccps_clusters[1]['name'] == "Law (test table)"
+    assert snapshot.catalog.get_career("Test Career") is not None
+    # The other table is compiled next to itself, never over the shipped artifact
+    assert (data_dir / 'kuccps_clusters.pkl').exists()
+    assert (os.stat(ARTIFACT_PATH).st_mtime_ns if os.path.exists(ARTIFACT_PATH) else None) == artifact_stamp
+
+
+def test_reload_swaps_in_changed_files(data_dir):
+    reloader = reloader_for(data_dir)
+    first = reloader.current()
+    assert reloader.reload() is False
+
+    edit_json(data_dir / 'kuccps_clusters.json', rename_cluster("Law (edited)"))
+    assert reloader.reload() is True
+
+    second = reloader.current()
+    assert second.version == first.version + 1
+    assert second.engine.kuccps_clusters[1]['name'] == "Law (edited)"
+    assert second.engine.model_version != first.engine.model_version
+    # A request still holding the old snapshot keeps a consistent view
+    assert first.engine.kuccps_clusters[1]['name'] == "Law"
+
+
+def test_failed_reload_keeps_serving_the_last_snapshot(data_dir):
+    reloader = reloader_for(data_dir)
+    first = reloader.current()
+
+    with open(data_dir / 'career_paths.json', 'w', encoding='utf-8') as file:
+        file.write("{not json")
+    stat = os.stat(data_dir / 'career_paths.json')
+    os.utime(data_dir / 'career_paths.json', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    assert reloader.reload() is False
+    assert reloader.current() is first
+    assert reloader.stats()['failed_reloads'] == 1
+    assert reloader.stats()['last_error'].startswith("JSONDecodeError")
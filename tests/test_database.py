@@ -0,0 +1,81 @@
+import pytest
+
+from utils import database
+from utils.repository import create_repository
+
+STUDENT = {'name': "Amina Otieno", 'phone': "0712345678", 'email': "amina@example.com"}
+GRADES = {'Mathematics': 'A-', 'English': 'B+', 'Kiswahili': 'B', 'Biology': 'A', 'Physics': 'Not Taken'}
+SKILLS = {'skills': ["Research", "Problem Solving"], 'interests': ["Medicine", "Sciences"]}
+
+
+@pytest.fixture(autouse=True)
+def backend(monkeypatch):
+    repository = create_repository('memory')
+    repository.init_db()
+    monkeypatch.setattr(database, 'get_backend', lambda: repository)
+    return repository
+
+
+def test_repeat_submission_reuses_the_user():
+    user_id, reused = database.get_or_create_user(STUDENT, GRADES, SKILLS)
+    assert not reused
+
+    same_student = {'name': " amina  OTIENO ", 'phone': "+254712345678", 'email': "Amina@Example.com"}
+    reordered = {'skills': ["Problem Solving", "Research"], 'interests': ["Medicine", "Sciences"]}
+    assert database.get_or_create_user(same_student, GRADES, reordered) == (user_id, True)
+
+
+@pytest.mark.parametrize('change', [
+    {'name': "Baraka Otieno"},
+    {'email': "baraka@example.com"},
+    {'email': ""},
+])
+def test_sibling_sharing_a_phone_gets_a_new_user(change):
+    user_id, _ = database.get_or_create_user(STUDENT, GRADES, SKILLS)
+
+    sibling_id, reused = database.get_or_create_user({**STUDENT, **change}, GRADES, SKILLS)
+
+    assert not reused
+    assert sibling_id != user_id
+
+
+def test_different_profile_gets_a_new_user():
+    user_id, _ = database.get_or_create_user(STUDENT, GRADES, SKILLS)
+
+    assert database.find_matching_user(STUDENT, {**GRADES, 'Biology': 'B'}, SKILLS) is None
+    assert database.find_matching_user(STUDENT, GRADES, {**SKILLS, 'skills': ["Research"]}) is None
+    # The first interest is the report's primary interest, so it has to match too
+    assert database.find_matching_user(STUDENT, GRADES, {**SKILLS, 'interests': ["Sciences", "Medicine"]}) is None
+    assert database.find_matching_user(STUDENT, GRADES, SKILLS) == user_id
+
+
+def test_manual_receipt_is_only_accepted_once_mpesa_reports_it():
+    user_id, _ = database.get_or_create_user(STUDENT, GRADES, SKILLS)
+
+    assert database.claim_manual_payment(user_id, "qaz45wer90 ", 20) == 'pending'
+    assert not database.check_payment_status(user_id)
+    assert database.claim_manual_payment(user_id, "QAZ45WER90", 20) == 'pending'
+
+    # The callback receiver records the same receipt for the same user
+    database.save_payment(user_id, 20, f"CAREER_{user_id}", 'completed', checkout_request_id="ws_CO_1",
+                          mpesa_receipt="QAZ45WER90")
+
+    assert database.claim_manual_payment(user_id, "QAZ45WER90", 20) == 'completed'
+    assert len(database.get_payment_history(user_id)) == 1
+
+
+def test_manual_receipt_of_another_user_is_rejected():
+    user_id, _ = database.get_or_create_user(STUDENT, GRADES, SKILLS)
+    other_id, _ = database.get_or_create_user({**STUDENT, 'name': "Baraka Otieno"}, GRADES, SKILLS)
+    database.save_payment(user_id, 20, f"CAREER_{user_id}", 'completed', mpesa_receipt="QAZ45WER90")
+
+    assert database.claim_manual_payment(other_id, "QAZ45WER90", 20) == 'rejected'
+    assert not database.check_payment_status(other_id)
+
+
+@pytest.mark.parametrize('code', ["", "12345", "QAZ45WER90X", "QAZ-5WER90"])
+def test_malformed_receipt_is_rejected(code):
+    user_id, _ = database.get_or_create_user(STUDENT, GRADES, SKILLS)
+
+    assert database.claim_manual_payment(user_id, code, 20) == 'rejected'
+    assert database.get_payment_history(user_id) == []
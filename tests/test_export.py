@@ -0,0 +1,89 @@
+import csv
+import gzip
+
+import pytest
+
+from conftest import SCIENCE_GRADES as GRADES, SCIENCE_SKILLS as SKILLS, STUDENT
+from utils.career_engine import get_career_engine
+from utils.export import Anonymizer, EXPORT_COLUMNS, export_format, export_results
+from utils.repository import create_repository
+
+
+@pytest.fixture
+def repository(tmp_path):
+    """A SQLite repository with five students' results, paid for by every other one"""
+    repository = create_repository('sqlite', path=str(tmp_path / 'career_guide.db'), write_behind=False)
+    repository.init_db()
+    recommendations = get_career_engine().generate_recommendations(GRADES, SKILLS)
+    for i in range(5):
+        user_id = repository.save_user_data({**STUDENT, 'name': f"Student {i}"}, GRADES, SKILLS)
+        if i % 2 == 0:
+            repository.save_payment(user_id, 20, f"CAREER_{user_id}", 'completed', f"ws_CO_{user_id}")
+        repository.save_career_results(user_id, recommendations)
+    yield repository
+    repository.close()
+
+
+def read_csv(path):
+    with gzip.open(path, 'rt', newline='') as file:
+        return list(csv.DictReader(file))
+
+
+def test_csv_export_streams_every_result(repository, tmp_path):
+    path = str(tmp_path / 'results.csv.gz')
+
+    report = export_results(path, chunk_size=2, repository=repository)
+
+    assert (report['format'], report['rows'], report['chunks']) == ('csv', 5, 3)
+    rows = read_csv(path)
+    assert [row['name'] for row in rows] == [f"Student {i}" for i in range(5)]
+    assert [row['paid'] for row in rows] == ["True", "False", "True", "False", "True"]
+    assert rows[0]['phone'] == STUDENT['phone']
+    assert rows[0]['subjects_count'] == "5"
+    assert rows[0]['interests'] == "Medicine;Sciences"
+    assert rows[0]['top_cluster'] and int(rows[0]['recommendations']) > 0
+
+
+def test_anonymized_export(repository, tmp_path):
+    path = str(tmp_path / 'results.csv.gz')
+    fields = {'user_id': 'hash', 'name': 'drop', 'email': 'drop', 'phone': 'mask', 'generated_at': 'month'}
+
+    report = export_results(path, anonymize=fields, salt="pepper", repository=repository)
+
+    rows = read_csv(path)
+    assert report['columns'] == [column for column in EXPORT_COLUMNS if column not in ('name', 'email')]
+    assert set(rows[0]) == set(report['columns'])
+    assert rows[0]['phone'] == "*********678"
+    assert len(rows[0]['generated_at']) == 7
+    assert len({row['user_id'] for row in rows}) == 5
+    assert all(len(row['user_id']) == 16 for row in rows)
+
+
+def test_hashes_are_keyed_by_the_salt():
+    row = {'user_id': "7"}
+
+    assert Anonymizer({'user_id': 'hash'}, "pepper")(dict(row)) == Anonymizer({'user_id': 'hash'}, "pepper")(dict(row))
+    assert Anonymizer({'user_id': 'hash'}, "pepper")(dict(row)) != Anonymizer({'user_id': 'hash'}, "salt")(dict(row))
+    assert not Anonymizer({'user_id': 'hash'}, "").salted
+
+
+def test_invalid_options_are_rejected():
+    with pytest.raises(ValueError, match="Cannot anonymize subjects"):
+        Anonymizer({'subjects': 'drop'})
+    with pytest.raises(ValueError, match="Unknown anonymization method scramble"):
+        Anonymizer({'phone': 'scramble'})
+    with pytest.raises(ValueError, match="Cannot tell the export format"):
+        export_format("results.xlsx")
+
+
+def test_parquet_export(repository, tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    path = str(tmp_path / 'results.parquet')
+
+    report = export_results(path, chunk_size=2, repository=repository)
+
+    table = pq.read_table(path)
+    assert report['format'] == 'parquet'
+    assert table.num_rows == 5
+    assert pq.ParquetFile(path).num_row_groups == 3
+    assert table.column('paid').to_pylist() == [True, False, True, False, True]
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import uuid
+
+import httpx
+import pytest
+
+from utils.mpesa_async import AsyncMpesaDarajaAPI
+from utils.mpesa_integration import MpesaDarajaAPI
+
+
+class FakeTokens:
+    def __init__(self):
+        self.fetches = 0
+
+    def __call__(self):
+        self.fetches += 1
+        return f"token-{self.fetches}", 3599
+
+
+@pytest.fixture
+def make_api(monkeypatch):
+    # A new consumer key per test, so each gets its own shared token provider
+    monkeypatch.setenv('MPESA_CONSUMER_KEY', f"consumer-{uuid.uuid4().hex}")
+    monkeypatch.setenv('MPESA_CONSUMER_SECRET', "secret")
+    monkeypatch.setenv('MPESA_BUSINESS_SHORTCODE', "174379")
+    monkeypatch.setenv('MPESA_PASSKEY', "passkey")
+    monkeypatch.setenv('MPESA_CALLBACK_URL', "https://example.com/mpesa/callback")
+
+    def make(handler, concurrency=10):
+        api = AsyncMpesaDarajaAPI(concurrency=concurrency)
+        api.client = httpx.AsyncClient(base_url=api.base_url, transport=httpx.MockTransport(handler))
+        api.tokens.fetch = FakeTokens()
+        return api
+
+    return make
+
+
+def run(api, coro):
+    async def main():
+        try:
+            return await coro
+        finally:
+            await api.aclose()
+    return asyncio.run(main())
+
+
+def test_stk_push(make_api):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={'ResponseCode': "0", 'CheckoutRequestID': "ws_CO_1",
+                                         'ResponseDescription': "Success"})
+
+    api = make_api(handler)
+    result = run(api, api.initiate_stk_push("0712345678", 20.0, "CAREER_1234567890", "Career Report"))
+
+    assert result['success'] and result['CheckoutRequestID'] == "ws_CO_1"
+    request, = requests
+    assert request.url.path == "/mpesa/stkpush/v1/processrequest"
+    assert request.headers['Authorization'] == "Bearer token-1"
+    payload = json.loads(request.content)
+    assert (payload['PhoneNumber'], payload['PartyA'], payload['Amount']) == ("254712345678", "254712345678", 20)
+    assert (payload['AccountReference'], payload['TransactionDesc']) == ("CAREER_12345", "Career Report")
+
+
+def test_stk_push_errors(make_api):
+    api = make_api(lambda request: httpx.Response(200, json={'ResponseCode': "1",
+                                                             'ResponseDescription': "Invalid shortcode"}))
+
+    assert run(api, api.initiate_stk_push("12345", 20)) == {'success': False,
+                                                           'error_message': "Invalid phone number format"}
+    api = make_api(lambda request: httpx.Response(200, json={'ResponseCode': "1",
+                                                             'ResponseDescription': "Invalid shortcode"}))
+    assert run(api, api.initiate_stk_push("0712345678", 20)) == {'success': False,
+                                                                'error_message': "Invalid shortcode"}
+
+
+def test_rejected_token_is_refreshed_once(make_api):
+    tokens_seen = []
+
+    def handler(request):
+        tokens_seen.append(request.headers['Authorization'])
+        if len(tokens_seen) == 1:
+            return httpx.Response(401, json={'errorMessage': "Invalid Access Token"})
+        return httpx.Response(200, json={'ResultCode': "0"})
+
+    api = make_api(handler)
+
+    assert run(api, api.check_transaction_status("ws_CO_1")) == {'ResultCode': "0"}
+    assert tokens_seen == ["Bearer token-1", "Bearer token-2"]
+
+
+def test_failed_status_query_returns_none(make_api):
+    api = make_api(lambda request: httpx.Response(500, json={'errorMessage': "The transaction is being processed"}))
+
+    assert run(api, api.check_transaction_status("ws_CO_1")) is None
+
+
+def test_concurrent_queries_respect_the_limit(make_api):
+    in_flight = []
+    peak = []
+
+    async def handler(request):
+        in_flight.append(request)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(request)
+        return httpx.Response(200, json={'ResultCode': json.loads(request.content)['CheckoutRequestID'][-1]})
+
+    api = make_api(handler, concurrency=3)
+    ids = [f"ws_CO_{i}" for i in range(10)]
+
+    results = run(api, api.check_transaction_statuses(ids))
+
+    assert results == {checkout_request_id: {'ResultCode': checkout_request_id[-1]} for checkout_request_id in ids}
+    assert max(peak) == 3
+    assert api.tokens.fetch.fetches == 1
+
+
+def test_sync_client_runs_on_the_background_loop(make_api):
+    api = make_api(lambda request: httpx.Response(200, json={'ResponseCode': "0", 'CheckoutRequestID': "ws_CO_1"}))
+
+    result = MpesaDarajaAPI(client=api).initiate_stk_push("0712345678", 20, "CAREER_1", "Career Report")
+
+    assert result['CheckoutRequestID'] == "ws_CO_1"
@@ -0,0 +1,154 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from conftest import GRADES, SKILLS, STUDENT
+from utils import database, mpesa_callback
+from utils.mpesa_callback import make_server, record_stk_callback
+from utils.repository import create_repository
+
+CHECKOUT = "ws_CO_191220191020363925"
+
+
+def stk_callback(result_code=0, amount=20, receipt="NLJ7RT61SV", phone=254712345678, checkout=CHECKOUT):
+    callback = {'MerchantRequestID': "29115-34620561-1", 'CheckoutRequestID': checkout,
+                'ResultCode': result_code, 'ResultDesc': "Processed"}
+    if result_code == 0:
+        callback['CallbackMetadata'] = {'Item': [
+            {'Name': 'Amount', 'Value': amount},
+            {'Name': 'MpesaReceiptNumber', 'Value': receipt},
+            {'Name': 'TransactionDate', 'Value': 20191219102115},
+            {'Name': 'PhoneNumber', 'Value': phone}
+        ]}
+    return {'Body': {'stkCallback': callback}}
+
+
+def unreachable_daraja(checkout_request_id):
+    raise AssertionError("Daraja must not be queried for a push with a pending payment")
+
+
+@pytest.fixture(autouse=True)
+def backend(monkeypatch):
+    repository = create_repository('memory')
+    repository.init_db()
+    monkeypatch.setattr(database, 'get_backend', lambda: repository)
+    return repository
+
+
+@pytest.fixture
+def user_id():
+    return database.save_user_data(STUDENT, GRADES, SKILLS)
+
+
+def push(user_id, amount=20):
+    database.save_payment(user_id, amount, f"CAREER_{user_id}", 'pending', checkout_request_id=CHECKOUT)
+
+
+def test_success_completes_the_pending_payment(user_id):
+    push(user_id)
+
+    for _ in range(2):  # Daraja may deliver a callback more than once
+        callback = record_stk_callback(stk_callback(), check_status=unreachable_daraja)
+
+    assert callback['user_id'] == user_id
+    assert database.check_payment_status(user_id)
+    history = database.get_payment_history(user_id)
+    assert [(payment['status'], payment['mpesa_receipt']) for payment in history] == [('completed', "NLJ7RT61SV")]
+
+
+def test_cancelled_push_is_recorded(user_id):
+    push(user_id)
+
+    callback = record_stk_callback(stk_callback(result_code=1032), check_status=unreachable_daraja)
+
+    assert callback['status'] == 'cancelled'
+    assert database.get_payment_by_checkout_request(CHECKOUT)['status'] == 'cancelled'
+
+
+def test_wrong_amount_is_not_credited(user_id):
+    push(user_id)
+
+    callback = record_stk_callback(stk_callback(amount=1), check_status=unreachable_daraja)
+
+    assert callback['status'] == 'failed'
+    assert not database.check_payment_status(user_id)
+
+
+def test_unknown_success_is_recorded_only_once_daraja_confirms_it(user_id):
+    assert record_stk_callback(stk_callback(), check_status=lambda checkout: None)['user_id'] is None
+    assert record_stk_callback(stk_callback(), check_status=lambda checkout: {'ResultCode': '1032'})['user_id'] is None
+    assert not database.check_payment_status(user_id)
+
+    callback = record_stk_callback(stk_callback(), check_status=lambda checkout: {'ResultCode': '0'})
+
+    assert callback['user_id'] == user_id
+    assert database.check_payment_status(user_id)
+
+
+def test_unknown_failure_is_not_recorded(user_id):
+    callback = record_stk_callback(stk_callback(result_code=1), check_status=unreachable_daraja)
+
+    assert callback['user_id'] is None
+    assert database.get_payment_by_checkout_request(CHECKOUT) is None
+
+
+def test_invalid_payload_is_rejected():
+    with pytest.raises(ValueError, match="Not an STK callback"):
+        record_stk_callback({'Body': {}})
+
+
+def test_server_needs_a_token_unless_insecure(monkeypatch):
+    monkeypatch.setattr(mpesa_callback, 'MPESA_CALLBACK_TOKEN', '')
+
+    with pytest.raises(RuntimeError, match="MPESA_CALLBACK_TOKEN"):
+        make_server('127.0.0.1', 0)
+
+
+@pytest.fixture
+def running_server(monkeypatch):
+    servers = []
+
+    def start(token, insecure=False):
+        monkeypatch.setattr(mpesa_callback, 'MPESA_CALLBACK_TOKEN', token)
+        server = make_server('127.0.0.1', 0, insecure)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}{mpesa_callback.MPESA_CALLBACK_PATH}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def test_posts_need_the_token(running_server, user_id):
+    push(user_id)
+    url = running_server('s3cret')
+
+    assert post(url, stk_callback()) == 403
+    assert post(url + "?token=wrong", stk_callback()) == 403
+    assert not database.check_payment_status(user_id)
+    assert post(url + "?token=s3cret", stk_callback()) == 200
+    assert database.check_payment_status(user_id)
+
+
+def test_insecure_server_accepts_posts_without_a_token(running_server, user_id):
+    push(user_id)
+    url = running_server('', insecure=True)
+
+    assert post(url, {'Body': {}}) == 400
+    assert post(url, stk_callback()) == 200
+    assert database.check_payment_status(user_id)
@@ -0,0 +1,166 @@
+import asyncio
+import base64
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils import mpesa_async
+from utils.mpesa_integration import MpesaDarajaAPI, format_phone_number, get_http_session
+
+
+class DarajaStandIn(BaseHTTPRequestHandler):
+    """Local HTTP/1.1 stand-in for the Daraja endpoints; counts TCP connections per HTTP client library"""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.counted = False
+
+    def count_connection(self):
+        if not self.counted:
+            self.counted = True
+            library = self.headers.get('User-Agent', '').split('/')[0]
+            with self.server.lock:
+                self.server.connections[library] = self.server.connections.get(library, 0) + 1
+
+    def do_GET(self):
+        self.count_connection()
+        self.reply({'access_token': "token", 'expires_in': "3599"})
+
+    def do_POST(self):
+        self.count_connection()
+        self.rfile.read(int(self.headers['Content-Length']))
+        if self.path == "/mpesa/stkpush/v1/processrequest":
+            self.reply({'ResponseCode': "0", 'CheckoutRequestID': "ws_CO_1"})
+        else:
+            self.reply({'ResultCode': "0", 'ResultDesc': "The service request is processed successfully."})
+
+    def reply(self, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', "application/json")
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def daraja(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), DarajaStandIn)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(mpesa_async, 'MPESA_BASE_URL', f"http://127.0.0.1:{server.server_address[1]}")
+    for name, value in (('MPESA_CONSUMER_KEY', "consumer"), ('MPESA_CONSUMER_SECRET', "secret"),
+                        ('MPESA_BUSINESS_SHORTCODE', "174379"), ('MPESA_PASSKEY', "passkey"),
+                        ('MPESA_CALLBACK_URL', "https://example.com/mpesa/callback")):
+        monkeypatch.setenv(name, value)
+    get_http_session().close()  # drop connections kept from other tests' servers
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_repeated_calls_reuse_pooled_connections(daraja):
+    client = mpesa_async.AsyncMpesaDarajaAPI(pool_size=4)
+    api = MpesaDarajaAPI(client=client)
+    try:
+        for _ in range(20):
+            # Token fetch on the requests session, STK push and status query on the httpx pool
+            assert api.tokens.refresh(True) == "token"
+            assert api.initiate_stk_push("0712345678", 20, "CAREER_1", "Career Report")['success']
+            assert api.check_transaction_status("ws_CO_1")['ResultCode'] == "0"
+    finally:
+        api._run(client.aclose())
+
+    assert daraja.connections == {'python-requests': 1, 'python-httpx': 1}
+
+
+def test_concurrent_calls_stay_within_the_pool(daraja):
+    async def query():
+        async with mpesa_async.AsyncMpesaDarajaAPI(concurrency=4, pool_size=4) as api:
+            return await api.check_transaction_statuses([f"ws_CO_{i}" for i in range(40)])
+
+    results = asyncio.run(query())
+
+    assert len(results) == 40 and all(result['ResultCode'] == "0" for result in results.values())
+    assert 1 <= daraja.connections['python-httpx'] <= 4
+    assert daraja.connections['python-requests'] == 1
+
+
+class FakeResponse:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self.data = data
+        self.text = str(data)
+
+    def json(self):
+        return self.data
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+        self.calls = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.calls.append((url, headers, timeout))
+        return self.response
+
+
+@pytest.fixture
+def api(monkeypatch):
+    monkeypatch.setenv('MPESA_CONSUMER_KEY', "consumer")
+    monkeypatch.setenv('MPESA_CONSUMER_SECRET', "secret")
+    monkeypatch.setenv('MPESA_BUSINESS_SHORTCODE', "174379")
+    monkeypatch.setenv('MPESA_PASSKEY', "passkey")
+    monkeypatch.setenv('MPESA_CALLBACK_URL', "https://example.com/mpesa/callback")
+    return mpesa_async.AsyncMpesaDarajaAPI()
+
+
+def test_sessions_are_shared_per_pool_size():
+    session = get_http_session(4)
+
+    assert get_http_session(4) is session
+    assert get_http_session(5) is not session
+    assert session.get_adapter("https://api.safaricom.co.ke")._pool_maxsize == 4
+    assert session.get_adapter("https://api.safaricom.co.ke") is session.get_adapter("http://localhost")
+
+
+def test_token_fetch_uses_the_pooled_session(api, monkeypatch):
+    session = FakeSession(FakeResponse(200, {'access_token': "token", 'expires_in': "3599"}))
+    monkeypatch.setattr(mpesa_async, 'get_http_session', lambda: session)
+
+    assert api.fetch_access_token() == ("token", 3599)
+    url, headers, timeout = session.calls[0]
+    assert url == f"{api.base_url}/oauth/v1/generate?grant_type=client_credentials"
+    assert headers == {'Authorization': "Basic " + base64.b64encode(b"consumer:secret").decode()}
+    assert timeout == api.timeout
+
+
+def test_rejected_token_fetch_raises(api, monkeypatch):
+    session = FakeSession(FakeResponse(400, {'errorMessage': "Invalid credentials"}))
+    monkeypatch.setattr(mpesa_async, 'get_http_session', lambda: session)
+
+    with pytest.raises(RuntimeError, match="400"):
+        api.fetch_access_token()
+
+
+@pytest.mark.parametrize('phone, expected', [
+    ("0712345678", "254712345678"),
+    ("+254 712 345 678", "254712345678"),
+    ("254712345678", "254712345678"),
+    ("712345678", "712345678"),
+])
+def test_format_phone_number(phone, expected):
+    assert format_phone_number(phone) == expected
@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+
+import pytest
+
+from utils.mpesa_token import TokenProvider, get_token_provider, token_cache_key
+
+
+class FakeDaraja:
+    """Counts OAuth calls; each returns a new token"""
+
+    def __init__(self, expires_in=3599, delay=0.0):
+        self.expires_in = expires_in
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        time.sleep(self.delay)
+        with self.lock:
+            self.calls += 1
+            return f"token-{self.calls}", self.expires_in
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'mpesa_token_cache.db')
+
+
+def provider(path, fetch, **kwargs):
+    return TokenProvider(token_cache_key("https://sandbox.example", "consumer"), fetch, path, **kwargs)
+
+
+def test_concurrent_callers_share_one_fetch(path):
+    fetch = FakeDaraja(delay=0.1)
+    tokens = provider(path, fetch)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(tokens.get_token())) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert fetch.calls == 1
+    assert results == ["token-1"] * 10
+
+
+def test_token_is_shared_through_the_cache_file(path):
+    fetch = FakeDaraja()
+    assert provider(path, fetch).get_token() == "token-1"
+
+    # Another worker (or a restart) with the same app credentials
+    other = provider(path, fetch)
+    assert other.get_token() == "token-1"
+    assert fetch.calls == 1
+    assert other.stats['cache_hits'] == 1
+    assert oct(os.stat(path).st_mode & 0o777) == oct(0o600)
+
+
+def test_forced_refresh_replaces_a_fresh_token(path):
+    fetch = FakeDaraja()
+    tokens = provider(path, fetch)
+    tokens.get_token()
+
+    assert tokens.refresh(force=True) == "token-2"
+    assert provider(path, fetch).get_token() == "token-2"
+    assert fetch.calls == 2
+
+
+def test_expiring_token_is_refreshed_in_the_background(path):
+    fetch = FakeDaraja(expires_in=200, delay=0.05)
+    tokens = provider(path, fetch, refresh_margin=300)
+    assert tokens.get_token() == "token-1"
+
+    # Still usable, so the caller gets it straight away while a new one is fetched
+    assert tokens.get_token() == "token-1"
+    deadline = time.time() + 5
+    while tokens.stats['background_refreshes'] == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    assert tokens.stats['background_refreshes'] == 1
+    assert tokens._token == "token-2"
+
+
+def test_expired_token_is_fetched_before_returning(path):
+    fetch = FakeDaraja(expires_in=10)
+    tokens = provider(path, fetch)
+    assert tokens.get_token() == "token-1"
+
+    # Inside the expiry skew: not usable any more
+    assert tokens.get_token() == "token-2"
+    assert fetch.calls == 2
+
+
+def test_fetch_failure_is_raised_and_counted(path):
+    def failing_fetch():
+        raise RuntimeError("401 - Invalid credentials")
+
+    tokens = provider(path, failing_fetch)
+
+    with pytest.raises(RuntimeError, match="Invalid credentials"):
+        tokens.get_token()
+    assert tokens.stats['errors'] == 1
+    assert provider(path, FakeDaraja()).get_token() == "token-1"
+
+
+def test_unavailable_cache_file_falls_back_to_fetching(tmp_path):
+    fetch = FakeDaraja()
+    tokens = provider(str(tmp_path / 'missing' / 'mpesa_token_cache.db'), fetch)
+
+    assert tokens.get_token() == "token-1"
+    assert tokens.get_token() == "token-1"
+    assert fetch.calls == 1
+
+
+def test_one_provider_per_app_and_cache_file(path):
+    fetch = FakeDaraja()
+
+    first = get_token_provider("https://sandbox.example", "consumer", fetch, path)
+
+    assert get_token_provider("https://sandbox.example", "consumer", fetch, path) is first
+    assert get_token_provider("https://sandbox.example", "other", fetch, path) is not first
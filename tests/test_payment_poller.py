@@ -0,0 +1,161 @@
+import asyncio
+import time
+
+import pytest
+
+from conftest import GRADES, SKILLS, STUDENT
+from utils import database
+from utils.payment_poller import PaymentPoller, RateLimiter
+from utils.repository import create_repository
+
+STILL_PROCESSING = {'errorCode': "500.001.1001", 'errorMessage': "The transaction is being processed"}
+
+
+class FakeDaraja:
+    """Answers status queries from a dict of checkout_request_id -> response (or exception)"""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.queries = []
+
+    async def check_transaction_status(self, checkout_request_id):
+        self.queries.append(checkout_request_id)
+        response = self.responses.get(checkout_request_id)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture(autouse=True)
+def backend(monkeypatch):
+    repository = create_repository('memory')
+    repository.init_db()
+    monkeypatch.setattr(database, 'get_backend', lambda: repository)
+    return repository
+
+
+@pytest.fixture
+def user_id():
+    return database.save_user_data(STUDENT, GRADES, SKILLS)
+
+
+def push(user_id, checkout_request_id):
+    database.save_payment(user_id, 20, f"CAREER_{user_id}", 'pending', checkout_request_id=checkout_request_id)
+
+
+def status(checkout_request_id):
+    return database.get_payment_by_checkout_request(checkout_request_id)['status']
+
+
+def poller(api, **kwargs):
+    options = dict(rps=1000, first_delay=0, base_delay=0.05, max_delay=0.1, sync_interval=0.05)
+    options.update(kwargs)
+    return PaymentPoller(api, **options)
+
+
+def test_results_are_recorded(user_id):
+    for checkout_request_id in ("ws_CO_1", "ws_CO_2", "ws_CO_3"):
+        push(user_id, checkout_request_id)
+    api = FakeDaraja({"ws_CO_1": {'ResultCode': "0"}, "ws_CO_2": {'ResultCode': "1032"},
+                      "ws_CO_3": {'ResultCode': "2001"}})
+
+    stats = asyncio.run(poller(api).run(duration=0.5))
+
+    assert [status(checkout) for checkout in ("ws_CO_1", "ws_CO_2", "ws_CO_3")] == ['completed', 'cancelled', 'failed']
+    assert sorted(api.queries) == ["ws_CO_1", "ws_CO_2", "ws_CO_3"]  # final result codes are not polled again
+    assert (stats['settled'], stats['completed'], stats['cancelled'], stats['failed']) == (3, 1, 1, 1)
+    assert stats['queued'] == 0
+
+
+def test_unsettled_checkouts_back_off_then_settle(user_id):
+    push(user_id, "ws_CO_1")
+    api = FakeDaraja({"ws_CO_1": STILL_PROCESSING})
+
+    async def settle_later():
+        task = asyncio.create_task(poller(api).run(duration=0.6))
+        await asyncio.sleep(0.3)
+        api.responses["ws_CO_1"] = {'ResultCode': 0}
+        return await task
+
+    stats = asyncio.run(settle_later())
+
+    assert status("ws_CO_1") == 'completed'
+    assert stats['unsettled'] >= 2
+    # Backoff spaces the polls out instead of querying on every loop
+    assert len(api.queries) < 15
+
+
+def test_processing_result_codes_are_polled_again(user_id):
+    push(user_id, "ws_CO_1")
+    api = FakeDaraja({"ws_CO_1": {'ResultCode': "4999", 'ResultDesc': "The transaction is still under processing"}})
+
+    stats = asyncio.run(poller(api).run(duration=0.5))
+
+    assert status("ws_CO_1") == 'pending'
+    assert (stats['settled'], stats['failed']) == (0, 0)
+    assert stats['unsettled'] == len(api.queries) >= 2
+    assert stats['queued'] == 1
+
+
+def test_query_errors_are_retried(user_id):
+    push(user_id, "ws_CO_1")
+    api = FakeDaraja({"ws_CO_1": RuntimeError("connection reset")})
+
+    async def recover_later():
+        task = asyncio.create_task(poller(api).run(duration=0.5))
+        await asyncio.sleep(0.2)
+        api.responses["ws_CO_1"] = {'ResultCode': 0}
+        return await task
+
+    stats = asyncio.run(recover_later())
+
+    assert stats['errors'] >= 1
+    assert status("ws_CO_1") == 'completed'
+
+
+def test_checkouts_are_given_up_after_max_age(user_id):
+    push(user_id, "ws_CO_1")
+    api = FakeDaraja({"ws_CO_1": STILL_PROCESSING})
+
+    stats = asyncio.run(poller(api, max_age=0.3).run(duration=0.8))
+
+    assert stats['expired'] == 1
+    assert stats['queued'] == 0
+    assert status("ws_CO_1") == 'pending'
+    assert api.queries
+
+
+def test_checkouts_settled_elsewhere_are_dropped(user_id):
+    push(user_id, "ws_CO_1")
+    api = FakeDaraja({"ws_CO_1": STILL_PROCESSING})
+
+    async def callback_arrives():
+        task = asyncio.create_task(poller(api, base_delay=0.2, max_delay=0.2).run(duration=0.8))
+        await asyncio.sleep(0.1)
+        # The callback receiver records the outcome first
+        database.save_payment(user_id, 20, f"CAREER_{user_id}", 'completed', checkout_request_id="ws_CO_1")
+        queries = len(api.queries)
+        stats = await task
+        return queries, stats
+
+    queries, stats = asyncio.run(callback_arrives())
+
+    assert stats['settled_elsewhere'] == 1
+    assert stats['settled'] == 0
+    assert len(api.queries) == queries
+    assert status("ws_CO_1") == 'completed'
+
+
+def test_rate_limiter_caps_requests_per_second():
+    limiter = RateLimiter(100)
+
+    async def acquire_many():
+        started = time.monotonic()
+        for _ in range(50):
+            await limiter.acquire()
+        return time.monotonic() - started
+
+    elapsed = asyncio.run(acquire_many())
+
+    # A bucket of 5 goes out at once, the other 45 at 100 per second
+    assert 0.4 <= elapsed < 1.5
@@ -0,0 +1,100 @@
+import pytest
+
+from conftest import GRADES, SKILLS, STUDENT
+from utils.repository import create_repository
+
+
+@pytest.fixture
+def user_id(repository):
+    return repository.save_user_data(STUDENT, GRADES, SKILLS)
+
+
+def statuses(repository, user_id):
+    return [payment['status'] for payment in repository.get_payment_history(user_id)]
+
+
+def revenue(repository):
+    return sum(day['revenue'] for day in repository.get_daily_stats())
+
+
+def test_repeat_saves_of_a_checkout_update_one_row(repository, user_id):
+    for status in ('pending', 'pending', 'completed', 'completed'):
+        repository.save_payment(user_id, 20, f"CAREER_{user_id}", status, "ws_CO_1")
+
+    assert statuses(repository, user_id) == ['completed']
+    assert repository.get_payment_by_checkout_request("ws_CO_1")['status'] == 'completed'
+    assert revenue(repository) == 20.0
+
+
+@pytest.mark.parametrize('first, later, expected', [
+    ('completed', 'failed', 'completed'),
+    ('completed', 'pending', 'completed'),
+    ('failed', 'pending', 'failed'),
+    ('cancelled', 'failed', 'cancelled'),
+    ('pending', 'cancelled', 'cancelled'),
+    ('failed', 'completed', 'completed'),
+])
+def test_status_only_moves_forward(repository, user_id, first, later, expected):
+    repository.save_payment(user_id, 20, f"CAREER_{user_id}", first, "ws_CO_1")
+    repository.save_payment(user_id, 20, f"CAREER_{user_id}", later, "ws_CO_1")
+
+    assert statuses(repository, user_id) == [expected]
+    assert repository.check_payment_status(user_id) == (expected == 'completed')
+
+
+def test_receipt_and_checkout_rows_are_merged(repository, user_id):
+    # A manual confirmation arrives before the callback that carries both keys
+    repository.save_payment(user_id, 20, f"CAREER_{user_id}", 'pending', "ws_CO_1")
+    repository.save_payment(user_id, 20, f"CAREER_{user_id}", 'pending', None, "QAZ45WER90")
+    assert statuses(repository, user_id) == ['pending', 'pending']
+
+    repository.save_payment(user_id, 20, f"CAREER_{user_id}", 'completed', "ws_CO_1", "QAZ45WER90")
+
+    history = repository.get_payment_history(user_id)
+    assert [(payment['status'], payment['checkout_request_id'], payment['mpesa_receipt'])
+            for payment in history] == [('completed', "ws_CO_1", "QAZ45WER90")]
+    assert repository.get_payment_by_receipt("QAZ45WER90")['id'] == history[0]['id']
+    assert repository.get_payment_by_checkout_request("ws_CO_1")['id'] == history[0]['id']
+    assert sum(day['payments'] for day in repository.get_daily_stats()) == 1
+    assert revenue(repository) == 20.0
+
+
+def test_pending_checkouts(repository, user_id):
+    repository.save_payment(user_id, 20, f"CAREER_{user_id}", 'pending', "ws_CO_1")
+    repository.save_payment(user_id, 20, f"CAREER_{user_id}", 'pending', "ws_CO_2")
+    repository.save_payment(user_id, 20, f"CAREER_{user_id}", 'completed', "ws_CO_2")
+    repository.save_payment(user_id, 20, f"CAREER_{user_id}", 'pending')
+
+    pending = repository.get_pending_checkouts(3600)
+
+    assert [payment['checkout_request_id'] for payment in pending] == ["ws_CO_1"]
+    assert pending[0]['user_id'] == user_id
+    assert 0 <= pending[0]['age_seconds'] < 60
+
+
+def test_unkeyed_payments_are_separate_rows(repository, user_id):
+    repository.save_payment(user_id, 20, f"CAREER_{user_id}", 'failed')
+    repository.save_payment(user_id, 20, f"CAREER_{user_id}", 'failed')
+    repository.flush()
+
+    assert statuses(repository, user_id) == ['failed', 'failed']
+
+
+def test_duplicate_checkouts_from_before_the_unique_index_are_collapsed(tmp_path):
+    path = str(tmp_path / 'career_guide.db')
+    repository = create_repository('sqlite', path=path, write_behind=False)
+    user_id = repository.save_user_data(STUDENT, GRADES, SKILLS)
+    with repository.pool.transaction() as conn:
+        conn.execute("DROP INDEX idx_payments_checkout_unique")
+        conn.executemany("INSERT INTO payments (user_id, amount, mpesa_code, checkout_request_id, status) "
+                         "VALUES (?, 20, 'CAREER', 'ws_CO_1', ?)",
+                         [(user_id, 'pending'), (user_id, 'completed'), (user_id, 'failed')])
+    repository.close()
+
+    repository = create_repository('sqlite', path=path, write_behind=False)
+    repository.init_db()
+
+    assert statuses(repository, user_id) == ['completed']
+    repository.save_payment(user_id, 20, "CAREER", 'failed', "ws_CO_1")
+    assert statuses(repository, user_id) == ['completed']
+    repository.close()
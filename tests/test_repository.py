@@ -0,0 +1,228 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from conftest import SCIENCE_GRADES as GRADES, SCIENCE_SKILLS as SKILLS, STUDENT
+from utils import repository as repository_module
+from utils.career_engine import CareerEngine, get_career_engine, install_career_engine
+from utils.repository import create_repository
+
+WEAK_GRADES = {'Mathematics': 'C', 'English': 'C+', 'Kiswahili': 'C-', 'Biology': 'C', 'Chemistry': 'D+',
+               'Geography': 'C'}
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown storage backend: postgres"):
+        create_repository('postgres')
+
+
+def test_user_round_trip(repository):
+    user_id = repository.save_user_data(STUDENT, GRADES, SKILLS)
+
+    user = repository.get_user_data(user_id)
+    assert user['user_info']['name'] == STUDENT['name']
+    assert user['user_info']['phone'] == STUDENT['phone']
+    assert user['subjects'] == {subject: grade for subject, grade in GRADES.items() if grade != 'Not Taken'}
+    assert list(user['skills']) == SKILLS['skills']
+    assert list(user['interests']) == SKILLS['interests']
+    assert repository.get_user_data(user_id + 1000) is None
+
+
+def test_users_by_phone_newest_first(repository):
+    first = repository.save_user_data(STUDENT, GRADES, SKILLS)
+    second = repository.save_user_data(STUDENT, GRADES, SKILLS)
+    repository.save_user_data({**STUDENT, 'phone': "254700000000"}, GRADES, SKILLS)
+
+    assert repository.find_user_ids_by_phone(STUDENT['phone']) == [second, first]
+
+
+def test_payment_status_and_history(repository):
+    user_id = repository.save_user_data(STUDENT, GRADES, SKILLS)
+    assert not repository.check_payment_status(user_id)
+
+    repository.save_payment(user_id, 20, f"CAREER_{user_id}", 'failed')
+    repository.save_payment(user_id, 20, f"CAREER_{user_id}", 'completed')
+
+    assert repository.check_payment_status(user_id)
+    history = repository.get_payment_history(user_id)
+    assert [payment['status'] for payment in history] == ['completed', 'failed']
+    assert all(payment['user_id'] == user_id for payment in history)
+
+
+def test_career_results_come_back_as_generated(repository):
+    user_id = repository.save_user_data(STUDENT, GRADES, SKILLS)
+    recommendations = get_career_engine().generate_recommendations(GRADES, SKILLS)
+
+    repository.save_career_results(user_id, recommendations)
+    repository.flush()
+
+    result = repository.get_career_results(user_id)
+    assert result['user_id'] == user_id
+    assert result['recommendations'] == recommendations
+    assert repository.get_career_results(user_id + 1000) is None
+
+
+def test_export_chunks(repository):
+    recommendations = get_career_engine().generate_recommendations(GRADES, SKILLS)
+    user_ids = []
+    for i in range(5):
+        user_id = repository.save_user_data({**STUDENT, 'name': f"Student {i}"}, GRADES, SKILLS)
+        repository.save_career_results(user_id, recommendations)
+        user_ids.append(user_id)
+    repository.save_payment(user_ids[0], 20, f"CAREER_{user_ids[0]}", 'completed')
+
+    chunks = list(repository.iter_export_chunks(chunk_size=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    records = [record for chunk in chunks for record in chunk]
+    assert [record['user_id'] for record in records] == user_ids
+    assert [record['paid'] for record in records] == [True, False, False, False, False]
+    top = recommendations['all_careers'][0]
+    assert records[0]['careers'][0] == (int(top['cluster'].split(':')[0].split()[1]), top['career'], top['match_score'])
+
+
+def reloaded_engine():
+    """An engine for a cluster table that renamed every cluster and dropped all but one requirement of each"""
+    clusters = json.loads(json.dumps(get_career_engine().kuccps_clusters, default=dict))
+    for cluster in clusters.values():
+        cluster['name'] = f"Renamed {cluster['name']}"
+        cluster['subject_requirements'] = dict(list(cluster['subject_requirements'].items())[:1])
+    return CareerEngine(clusters={int(cluster_id): cluster for cluster_id, cluster in clusters.items()})
+
+
+@pytest.fixture
+def shared_engine():
+    engine = get_career_engine()
+    yield engine
+    install_career_engine(engine)
+
+
+def test_compact_results_survive_a_data_reload(tmp_path, shared_engine):
+    repository = create_repository('sqlite', path=str(tmp_path / 'career_guide.db'), write_behind=False)
+    user_id = repository.save_user_data(STUDENT, WEAK_GRADES, SKILLS)
+    recommendations = shared_engine.generate_recommendations(WEAK_GRADES, SKILLS)
+    repository.save_career_results(user_id, recommendations)
+    reloaded = reloaded_engine()
+    # The reloaded table alone would rebuild a different report from the same compact rows
+    assert reloaded.expand_recommendations(*shared_engine.compact_recommendations(recommendations)) != recommendations
+
+    install_career_engine(reloaded)
+
+    assert repository.get_career_results(user_id)['recommendations'] == recommendations
+    repository.close()
+
+
+def test_compact_results_from_before_model_versions_are_pinned(tmp_path, shared_engine):
+    path = str(tmp_path / 'career_guide.db')
+    repository = create_repository('sqlite', path=path, write_behind=False)
+    user_id = repository.save_user_data(STUDENT, WEAK_GRADES, SKILLS)
+    recommendations = shared_engine.generate_recommendations(WEAK_GRADES, SKILLS)
+    repository.save_career_results(user_id, recommendations)
+    with repository.pool.transaction() as conn:
+        conn.execute("UPDATE career_results SET model_version = NULL")
+        conn.execute("DELETE FROM result_models")
+    repository.close()
+
+    # Reopening stamps the legacy rows with the model that is still loaded
+    repository = create_repository('sqlite', path=path, write_behind=False)
+    repository.init_db()
+    install_career_engine(reloaded_engine())
+
+    assert repository.get_career_results(user_id)['recommendations'] == recommendations
+    repository.close()
+
+
+def test_compact_result_with_unknown_model_is_regenerated(tmp_path):
+    repository = create_repository('sqlite', path=str(tmp_path / 'career_guide.db'), write_behind=False)
+    user_id = repository.save_user_data(STUDENT, GRADES, SKILLS)
+    repository.save_career_results(user_id, get_career_engine().generate_recommendations(GRADES, SKILLS))
+    with repository.pool.transaction() as conn:
+        conn.execute("DELETE FROM result_models")
+        conn.execute("UPDATE career_results SET model_version = '0:unknown'")
+
+    assert repository.get_career_results(user_id) is None
+    repository.close()
+
+
+def test_results_saved_in_the_same_second_are_all_kept():
+    repository = create_repository('memory')
+    repository.init_db()
+    user_id = repository.save_user_data(STUDENT, GRADES, SKILLS)
+    recommendations = get_career_engine().generate_recommendations(GRADES, SKILLS)
+
+    for _ in range(3):
+        repository.save_career_results(user_id, recommendations)
+
+    assert len(repository.state['career_results']) == 3
+    assert repository.get_career_results(user_id)['recommendations'] == recommendations
+
+
+RETENTION_REPORT_KEYS = {'cutoff', 'rows_purged', 'total_rows_purged', 'chunks', 'archive_path', 'archived_bytes',
+                         'max_chunk_seconds', 'vacuum', 'seconds'}
+PURGED_TABLES = {'users', 'user_subjects', 'user_skills', 'user_interests', 'payments', 'career_results',
+                 'career_result_items'}
+
+
+def test_retention_reports_have_the_same_shape(repository):
+    user_id = repository.save_user_data(STUDENT, GRADES, SKILLS)
+    repository.save_payment(user_id, 20, f"CAREER_{user_id}", 'completed')
+    repository.save_career_results(user_id, get_career_engine().generate_recommendations(GRADES, SKILLS))
+
+    report = repository.run_retention_job(-1, archive_dir=None)  # a cutoff in the future expires every user
+
+    assert set(report) == RETENTION_REPORT_KEYS
+    assert set(report['rows_purged']) == PURGED_TABLES
+    assert [report['rows_purged'][table] for table in ('users', 'payments', 'career_results')] == [1, 1, 1]
+    assert report['total_rows_purged'] == sum(report['rows_purged'].values())
+    assert report['chunks'] == 1
+    assert report['max_chunk_seconds'] <= report['seconds']
+    assert repository.get_user_data(user_id) is None
+
+
+def test_payment_of_another_user_is_not_merged(repository):
+    user_id = repository.save_user_data(STUDENT, GRADES, SKILLS)
+    other_id = repository.save_user_data({**STUDENT, 'name': "Baraka Otieno"}, GRADES, SKILLS)
+    repository.save_payment(user_id, 20, f"CAREER_{user_id}", 'pending', "ws_CO_1")
+    repository.save_payment(other_id, 20, f"CAREER_{other_id}", 'pending', None, "QAZ45WER90")
+
+    with pytest.raises(ValueError, match="another user"):
+        repository.save_payment(other_id, 20, f"CAREER_{other_id}", 'completed', "ws_CO_1")
+    with pytest.raises(ValueError, match="another user"):
+        repository.save_payment(user_id, 20, f"CAREER_{user_id}", 'completed', "ws_CO_1", "QAZ45WER90")
+
+    assert [payment['status'] for payment in repository.get_payment_history(user_id)] == ['pending']
+    assert [payment['status'] for payment in repository.get_payment_history(other_id)] == ['pending']
+
+
+@pytest.mark.parametrize('query, params', [
+    ('SELECT_USER_IDS_BY_PHONE', ("254712345678",)),
+    ('SELECT_COMPLETED_PAYMENT', (1,)),
+    ('SELECT_PAYMENTS', (1,)),
+    ('SELECT_PAYMENT_BY_CHECKOUT', ("ws_CO_1",)),
+    ('SELECT_PAYMENT_BY_RECEIPT', ("QAZ45WER90",)),
+    ('SELECT_PAYMENTS_BY_KEYS', ("ws_CO_1", "QAZ45WER90")),
+    ('SELECT_PENDING_CHECKOUTS', ("-3600 seconds",)),
+    ('SELECT_LATEST_RESULT', (1,)),
+])
+def test_lookups_use_an_index(tmp_path, query, params):
+    repository = create_repository('sqlite', path=str(tmp_path / 'career_guide.db'), write_behind=False)
+    repository.init_db()
+
+    with repository.pool.connection() as conn:
+        plan = [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + getattr(repository_module, query), params)]
+    repository.close()
+
+    assert plan and not any(step.startswith("SCAN") for step in plan), plan
+
+
+def test_memory_timestamps_are_utc():
+    repository = create_repository('memory')
+    repository.init_db()
+    user_id = repository.save_user_data(STUDENT, GRADES, SKILLS)
+    repository.save_payment(user_id, 20, f"CAREER_{user_id}", 'pending', "ws_CO_1")
+
+    created_at = datetime.fromisoformat(repository.get_user_data(user_id)['user_info']['created_at'])
+    assert created_at.utcoffset() == timedelta(0)
+    assert abs((datetime.now(timezone.utc) - created_at).total_seconds()) < 60
+    assert 0 <= repository.get_pending_checkouts(3600)[0]['age_seconds'] < 60
@@ -0,0 +1,131 @@
+import gzip
+import json
+import sqlite3
+from contextlib import contextmanager
+
+import pytest
+
+from conftest import GRADES, SKILLS, STUDENT
+from utils import database
+from utils.repository import create_repository
+from utils.retention import RetentionJob, RETENTION_DAYS
+
+
+@pytest.fixture
+def repository(tmp_path):
+    """SQLite only: these tests age and inspect rows through repository.pool"""
+    repository = create_repository('sqlite', path=str(tmp_path / 'career_guide.db'), write_behind=False)
+    repository.init_db()
+    yield repository
+    repository.close()
+
+
+def save_users(repository, count, old):
+    user_ids = []
+    for i in range(count):
+        user_id = repository.save_user_data({**STUDENT, 'name': f"Student {i}"}, GRADES, SKILLS)
+        repository.save_payment(user_id, 20, f"CAREER_{user_id}", 'completed', f"ws_CO_{user_id}")
+        user_ids.append(user_id)
+    if old:
+        with repository.pool.transaction() as conn:
+            conn.executemany("UPDATE users SET created_at = '2000-01-01 00:00:00' WHERE id = ?",
+                             [(user_id,) for user_id in user_ids])
+    return user_ids
+
+
+def read_archive(path):
+    with gzip.open(path, 'rt') as file:
+        return [json.loads(line) for line in file]
+
+
+def test_old_users_are_archived_and_purged(repository, tmp_path):
+    old_ids = save_users(repository, 5, old=True)
+    new_ids = save_users(repository, 2, old=False)
+
+    report = repository.run_retention_job(30, chunk_size=2, archive_dir=str(tmp_path / 'archives'))
+
+    assert report['chunks'] == 3
+    assert report['rows_purged']['users'] == 5
+    assert report['rows_purged']['payments'] == 5
+    assert [repository.get_user_data(user_id) for user_id in old_ids] == [None] * 5
+    assert all(repository.get_user_data(user_id) is not None for user_id in new_ids)
+    records = read_archive(report['archive_path'])
+    assert [record['user']['id'] for record in records] == old_ids
+    assert all(record['payments'][0]['status'] == 'completed' for record in records)
+
+
+def test_archive_is_written_outside_the_write_transaction(repository, tmp_path, monkeypatch):
+    save_users(repository, 3, old=True)
+    write_archive = RetentionJob._write_archive
+
+    def checked_write_archive(job, archive, records):
+        # Another writer can take the lock, so the job is not holding it while it compresses and syncs
+        other = sqlite3.connect(repository.pool.path, timeout=0, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        other.execute("ROLLBACK")
+        other.close()
+        return write_archive(job, archive, records)
+
+    monkeypatch.setattr(RetentionJob, '_write_archive', checked_write_archive)
+    report = repository.run_retention_job(30, chunk_size=2, archive_dir=str(tmp_path / 'archives'))
+
+    assert report['rows_purged']['users'] == 3
+
+
+def test_rows_changed_after_the_snapshot_are_archived_again(repository, tmp_path, monkeypatch):
+    user_id, = save_users(repository, 1, old=True)
+    write_archive = RetentionJob._write_archive
+    calls = []
+
+    def racing_write_archive(job, archive, records):
+        if not calls:
+            # A late confirmation lands between the snapshot and the delete
+            repository.save_payment(user_id, 20, "QAZ45WER90", 'completed', None, "QAZ45WER90")
+        calls.append(records)
+        return write_archive(job, archive, records)
+
+    monkeypatch.setattr(RetentionJob, '_write_archive', racing_write_archive)
+    report = repository.run_retention_job(30, chunk_size=10, archive_dir=str(tmp_path / 'archives'))
+
+    assert len(calls) == 2
+    assert report['rows_purged']['payments'] == 2
+    records = read_archive(report['archive_path'])
+    assert [len(record['payments']) for record in records] == [1, 2]
+    assert repository.get_payment_by_receipt("QAZ45WER90") is None
+
+
+class GrowingFreelistConnection:
+    """Fake connection whose free pages are refilled by live writes as fast as they are released"""
+
+    def __init__(self):
+        self.vacuum_steps = 0
+
+    def execute(self, sql):
+        value = 2 if sql == "PRAGMA auto_vacuum" else 1200
+        return type('Cursor', (), {'fetchone': lambda cursor: (value,)})()
+
+    def executescript(self, sql):
+        self.vacuum_steps += 1
+
+
+def test_vacuum_stops_after_the_starting_free_pages(tmp_path):
+    conn = GrowingFreelistConnection()
+
+    class Pool:
+        @contextmanager
+        def connection(self):
+            yield conn
+
+    report = RetentionJob(Pool(), pause_seconds=0, vacuum_pages=500).vacuum()
+
+    assert conn.vacuum_steps == 3
+    assert report['free_pages'] == 1200
+
+
+def test_cleanup_old_data_defaults_to_the_retention_period(monkeypatch):
+    calls = []
+    monkeypatch.setattr(database, 'run_retention_job',
+                        lambda days_old: calls.append(days_old) or {'total_rows_purged': 0})
+
+    assert database.cleanup_old_data() == 0
+    assert calls == [RETENTION_DAYS]
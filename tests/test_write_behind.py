@@ -0,0 +1,155 @@
+import sqlite3
+
+import pytest
+
+from utils.repository import SQLiteRepository
+from utils.write_behind import WriteBehindWriter
+
+STUDENT = {'name': "Amina Otieno", 'phone': "254712345678", 'email': "amina@example.com"}
+GRADES = {'Mathematics': 'B+', 'English': 'B', 'Kiswahili': 'A-', 'Biology': 'Not Taken'}
+SKILLS = {'skills': ["Research"], 'interests': ["Medicine"]}
+
+
+@pytest.fixture
+def repository(tmp_path):
+    repository = SQLiteRepository(path=str(tmp_path / 'career_guide.db'), write_behind=True)
+    repository.init_db()
+    # Hold every save in one batch until flush()
+    repository.writer.flush_seconds = 30
+    yield repository
+    repository.close()
+
+
+def test_rejected_record_does_not_block_the_batch(repository):
+    first = repository.save_user_data(STUDENT, GRADES, SKILLS)
+    second = repository.save_user_data({**STUDENT, 'name': "Brian Kamau"}, GRADES, SKILLS)
+    repository.save_payment(first, 20, f"CAREER_{first}", 'completed')
+    repository.save_payment(99999, 20, "CAREER_99999", 'completed')  # no such user
+    repository.save_payment(second, 20, f"CAREER_{second}", 'pending')
+
+    assert repository.flush(timeout=10)
+
+    assert set(repository.get_all_users()) == {first, second}
+    assert sorted(payment['user_id'] for payment in repository.get_all_payments().values()) == [first, second]
+    assert repository.check_payment_status(first)
+    assert repository.get_user_data(second)['subjects'] == {'Mathematics': 'B+', 'English': 'B', 'Kiswahili': 'A-'}
+    with repository.pool.connection() as conn:
+        dead = conn.execute("SELECT kind, row_id, record, error FROM write_behind_dead_letters").fetchall()
+        revenue = conn.execute("SELECT SUM(revenue) FROM rollup_daily").fetchone()[0]
+    assert [(row['kind'], '"user_id": 99999' in row['record']) for row in dead] == [('payments', True)]
+    assert "FOREIGN KEY" in dead[0]['error']
+    # The rejected payment's rollup delta was rolled back with it
+    assert revenue == 20
+
+    stats = repository.writer.stats()
+    assert stats['dead_letters'] == 1
+    assert stats['records_committed'] == 4
+    assert stats['pending_records'] == 0
+    assert stats['queue_depth'] == 0
+
+
+def test_writer_keeps_going_after_a_rejected_record(repository):
+    repository.save_payment(99999, 20, "CAREER_99999", 'completed')
+    assert repository.flush(timeout=10)
+
+    user_id = repository.save_user_data(STUDENT, GRADES, SKILLS)
+    repository.save_payment(user_id, 20, f"CAREER_{user_id}", 'completed')
+    assert repository.flush(timeout=10)
+    assert repository.check_payment_status(user_id)
+    assert repository.writer.stats()['failed_commits'] == 1
+
+
+def test_busy_database_retries_the_whole_batch(tmp_path):
+    repository = SQLiteRepository(path=str(tmp_path / 'career_guide.db'))
+    repository.init_db()
+    failures = []
+
+    def apply(conn, ops):
+        if not failures:
+            failures.append(True)
+            raise sqlite3.OperationalError("database is locked")
+        conn.executemany("INSERT INTO users (id, name, phone) VALUES (?, ?, ?)",
+                         [(row_id, record['name'], record['phone']) for kind, row_id, record in ops])
+
+    writer = WriteBehindWriter(repository.pool, apply, flush_ms=1)
+    writer.submit('users', 1, {'name': "Amina", 'phone': "254712345678"})
+    writer.submit('users', 2, {'name': "Brian", 'phone': "254712345679"})
+    assert writer.flush(timeout=10)
+    writer.close()
+
+    assert sorted(repository.get_all_users()) == [1, 2]
+    assert writer.stats()['dead_letters'] == 0
+    assert writer.stats()['failed_commits'] == 1
+    repository.close()
+
+
+def test_rejected_user_stays_readable(repository):
+    rejections = []
+    repository.writer.on_reject = lambda kind, row_id, record, error: rejections.append((kind, row_id, error))
+    user_id = repository.save_user_data({**STUDENT, 'name': None}, GRADES, SKILLS)  # name is NOT NULL
+
+    assert repository.flush(timeout=10)
+
+    assert user_id not in repository.get_all_users()
+    assert repository.get_user_data(user_id)['subjects'] == {'Mathematics': 'B+', 'English': 'B', 'Kiswahili': 'A-'}
+    assert [(kind, row_id) for kind, row_id, error in rejections] == [('users', user_id)]
+    assert "NOT NULL" in rejections[0][2]
+    stats = repository.writer.stats()
+    assert stats['rejected_ids'] == {'users': [user_id]}
+    assert stats['dead_letters'] == 1
+
+
+def writer_for(repository, apply):
+    writer = WriteBehindWriter(repository.pool, apply, flush_ms=1)
+    writer.RETRY_DELAY = 0.001
+    return writer
+
+
+def insert_users(conn, ops):
+    conn.executemany("INSERT INTO users (id, name, phone) VALUES (?, ?, ?)",
+                     [(row_id, record['name'], record['phone']) for kind, row_id, record in ops])
+
+
+def test_other_operational_errors_are_dead_lettered(tmp_path):
+    repository = SQLiteRepository(path=str(tmp_path / 'career_guide.db'))
+    repository.init_db()
+
+    def apply(conn, ops):
+        if any(record['name'] == "Broken" for kind, row_id, record in ops):
+            raise sqlite3.OperationalError("no such table: user_archive")
+        insert_users(conn, ops)
+
+    writer = writer_for(repository, apply)
+    writer.submit('users', 1, {'name': "Amina", 'phone': "254712345678"})
+    writer.submit('users', 2, {'name': "Broken", 'phone': "254712345679"})
+    assert writer.flush(timeout=10)
+    writer.close()
+
+    assert sorted(repository.get_all_users()) == [1]
+    stats = writer.stats()
+    assert stats['failed_commits'] == WriteBehindWriter.OPERATIONAL_RETRIES
+    assert (stats['dead_letters'], stats['rejected_ids']) == (1, {'users': [2]})
+    assert [record['name'] for record in writer.rejected('users')] == ["Broken"]
+    repository.close()
+
+
+def test_locked_database_is_retried_without_limit(tmp_path):
+    repository = SQLiteRepository(path=str(tmp_path / 'career_guide.db'))
+    repository.init_db()
+    failures = []
+
+    def apply(conn, ops):
+        if len(failures) < 2 * WriteBehindWriter.OPERATIONAL_RETRIES:
+            failures.append(True)
+            raise sqlite3.OperationalError("database is locked")
+        insert_users(conn, ops)
+
+    writer = writer_for(repository, apply)
+    writer.submit('users', 1, {'name': "Amina", 'phone': "254712345678"})
+    assert writer.flush(timeout=10)
+    writer.close()
+
+    assert sorted(repository.get_all_users()) == [1]
+    assert writer.stats()['failed_commits'] == 2 * WriteBehindWriter.OPERATIONAL_RETRIES
+    assert writer.stats()['rejected_ids'] == {}
+    repository.close()
@@ -15,37 +15,77 @@ __email__ = "support@kcsecareerguide.com"
 from .database import (
     init_db,
     save_user_data,
+    get_or_create_user,
+    get_paid_results,
     save_payment,
+    claim_manual_payment,
     save_career_results,
     check_payment_status,
     get_user_data,
     get_payment_history,
     get_career_results,
-    cleanup_old_data
+    get_payment_by_checkout_request,
+    get_payment_by_receipt,
+    get_pending_checkouts,
+    find_user_ids_by_phone,
+    flush_writes,
+    get_storage_stats,
+    cleanup_old_data,
+    run_retention_job,
+    get_daily_stats,
+    get_cluster_histogram,
+    get_grade_distribution,
+    rebuild_rollups
 )
 
-from .career_engine import CareerEngine
-from .mpesa_integration import process_mpesa_payment, MpesaDarajaAPI
+from .career_engine import CareerEngine, get_career_engine, invalidate_career_engine
+from .mpesa_integration import process_mpesa_payment, MpesaDarajaAPI, format_phone_number
+from .mpesa_async import AsyncMpesaDarajaAPI
+from .data_reload import get_data_snapshot, start_data_watcher, reload_data, get_reload_stats
 
 # Define what gets imported with "from utils import *"
 __all__ = [
     # Database functions
     'init_db',
     'save_user_data', 
+    'get_or_create_user',
+    'get_paid_results',
     'save_payment',
+    'claim_manual_payment',
     'save_career_results',
     'check_payment_status',
     'get_user_data',
     'get_payment_history',
     'get_career_results',
+    'get_payment_by_checkout_request',
+    'get_payment_by_receipt',
+    'get_pending_checkouts',
+    'find_user_ids_by_phone',
+    'flush_writes',
+    'get_storage_stats',
     'cleanup_old_data',
+    'run_retention_job',
+    'get_daily_stats',
+    'get_cluster_histogram',
+    'get_grade_distribution',
+    'rebuild_rollups',
     
     # Career engine
     'CareerEngine',
+    'get_career_engine',
+    'invalidate_career_engine',
+    
+    # Data hot reload
+    'get_data_snapshot',
+    'start_data_watcher',
+    'reload_data',
+    'get_reload_stats',
     
     # M-Pesa integration
     'process_mpesa_payment',
-    'MpesaDarajaAPI'
+    'MpesaDarajaAPI',
+    'AsyncMpesaDarajaAPI',
+    'format_phone_number'
 ]
 
 # Package initialization
@@ -0,0 +1,346 @@
+"""
+Analytics rollups for the KCSE Career Guidance dashboard
+
+Daily submission, payment and revenue counts, a per-cluster histogram of
+recommendations and per-subject grade distributions are kept in small rollup
+tables. The storage repositories update them in the same transaction as each
+save, so dashboard queries read only the rollups and never scan the raw
+users, payments or career_results tables. Rollups outlive the retention job.
+
+Rebuild them from the raw rows (e.g. after first enabling them):
+
+    python -m utils.analytics --backfill
+
+Print the last 30 days:
+
+    python -m utils.analytics --days 30
+"""
+
+import argparse
+import json
+import re
+from datetime import datetime, timedelta, timezone
+
+from .career_engine import get_career_engine
+
+CLUSTER_LABEL_PATTERN = re.compile(r'^Cluster (\d+):')
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup_daily (
+    day TEXT PRIMARY KEY,
+    submissions INTEGER NOT NULL DEFAULT 0,
+    payments INTEGER NOT NULL DEFAULT 0,
+    completed_payments INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    results INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS rollup_daily_clusters (
+    day TEXT NOT NULL,
+    cluster_id INTEGER NOT NULL,
+    top_results INTEGER NOT NULL DEFAULT 0,
+    results INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, cluster_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_daily_grades (
+    day TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    grade TEXT NOT NULL,
+    students INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, subject, grade)
+) WITHOUT ROWID;
+"""
+
+ROLLUP_TABLES = ('rollup_daily', 'rollup_daily_clusters', 'rollup_daily_grades')
+
+# A NULL day means "today" for rows stamped by CURRENT_TIMESTAMP
+UPSERT_SUBMISSION = """INSERT INTO rollup_daily (day, submissions) VALUES (COALESCE(?, date('now')), 1)
+                       ON CONFLICT (day) DO UPDATE SET submissions = submissions + 1"""
+UPSERT_PAYMENT = """INSERT INTO rollup_daily (day, payments, completed_payments, revenue)
+                    VALUES (COALESCE(?, date('now')), ?, ?, ?)
+                    ON CONFLICT (day) DO UPDATE SET payments = payments + excluded.payments,
+                        completed_payments = completed_payments + excluded.completed_payments,
+                        revenue = revenue + excluded.revenue"""
+UPSERT_RESULT = """INSERT INTO rollup_daily (day, results) VALUES (COALESCE(?, date('now')), 1)
+                   ON CONFLICT (day) DO UPDATE SET results = results + 1"""
+UPSERT_CLUSTER = """INSERT INTO rollup_daily_clusters (day, cluster_id, top_results, results)
+                    VALUES (COALESCE(?, date('now')), ?, ?, 1)
+                    ON CONFLICT (day, cluster_id) DO UPDATE SET top_results = top_results + excluded.top_results,
+                        results = results + 1"""
+UPSERT_GRADE = """INSERT INTO rollup_daily_grades (day, subject, grade, students) VALUES (COALESCE(?, date('now')), ?, ?, 1)
+                  ON CONFLICT (day, subject, grade) DO UPDATE SET students = students + 1"""
+
+
+def result_clusters(recommendations):
+    """
+    Clusters a recommendations dict touches.
+
+    Returns:
+        tuple: (cluster id of the top recommendation or None, sorted list of all recommended cluster ids)
+    """
+    cluster_ids = []
+    try:
+        for entry in recommendations.get('all_careers', []):
+            match = CLUSTER_LABEL_PATTERN.match(entry.get('cluster', ''))
+            if match:
+                cluster_ids.append(int(match.group(1)))
+    except AttributeError:
+        return None, []
+    top_cluster = cluster_ids[0] if cluster_ids else None
+    return top_cluster, sorted(set(cluster_ids))
+
+
+def payment_rollup(amount, status):
+    """(completed_payments, revenue) contribution of one payment"""
+    return (1, float(amount)) if status == 'completed' else (0, 0.0)
+
+
+def payment_deltas(old_payments, new_payment=None):
+    """
+    Rollup changes when payment rows are replaced by one upserted row.
+
+    Args:
+        old_payments (list): Rows (with created_at, amount, status) that were updated or merged away
+        new_payment (dict): The row as stored afterwards, or None if the old rows were only removed
+
+    Returns:
+        list: (day, payments, completed_payments, revenue) deltas
+    """
+    deltas = []
+    replaced = [(new_payment, 1)] if new_payment is not None else []
+    for payment, sign in [(old, -1) for old in old_payments] + replaced:
+        completed, revenue = payment_rollup(payment['amount'], payment['status'])
+        deltas.append((str(payment['created_at'])[:10], sign, sign * completed, sign * revenue))
+    return deltas
+
+
+# SQLite: called inside the repository's write transactions
+
+def rollup_users(conn, users):
+    """Count submissions; users is a list of (day or None, [(subject, grade), ...])"""
+    conn.executemany(UPSERT_SUBMISSION, [(day,) for day, subjects in users])
+    conn.executemany(UPSERT_GRADE, [(day, subject, grade) for day, subjects in users for subject, grade in subjects])
+
+
+def rollup_payments(conn, payments):
+    """Count payments and revenue; payments is a list of (day or None, amount, status)"""
+    conn.executemany(UPSERT_PAYMENT, [(day, 1, *payment_rollup(amount, status)) for day, amount, status in payments])
+
+
+def rollup_payment_deltas(conn, deltas):
+    """Apply payment_deltas output"""
+    conn.executemany(UPSERT_PAYMENT, deltas)
+
+
+def rollup_results(conn, results):
+    """Count results and recommended clusters; results is a list of (day or None, recommendations)"""
+    conn.executemany(UPSERT_RESULT, [(day,) for day, recommendations in results])
+    rows = []
+    for day, recommendations in results:
+        top_cluster, cluster_ids = result_clusters(recommendations)
+        rows.extend((day, cluster_id, int(cluster_id == top_cluster)) for cluster_id in cluster_ids)
+    conn.executemany(UPSERT_CLUSTER, rows)
+
+
+def day_filter(column, start_day, end_day, placeholder='?'):
+    """WHERE clause and parameters for an inclusive day range"""
+    clauses, params = [], []
+    if start_day:
+        clauses.append(f"{column} >= {placeholder}")
+        params.append(str(start_day))
+    if end_day:
+        clauses.append(f"{column} <= {placeholder}")
+        params.append(str(end_day))
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def query_daily_stats(conn, start_day=None, end_day=None):
+    where, params = day_filter('day', start_day, end_day)
+    return [dict(row) for row in conn.execute(
+        f"SELECT day, submissions, payments, completed_payments, revenue, results FROM rollup_daily{where} ORDER BY day",
+        params
+    )]
+
+
+def query_cluster_histogram(conn, start_day=None, end_day=None, limit=10):
+    where, params = day_filter('day', start_day, end_day)
+    rows = conn.execute(
+        f"SELECT cluster_id, SUM(top_results) AS top_results, SUM(results) AS results "
+        f"FROM rollup_daily_clusters{where} GROUP BY cluster_id", params
+    ).fetchall()
+    return cluster_histogram([(row['cluster_id'], row['top_results'], row['results']) for row in rows], limit)
+
+
+def query_grade_distribution(conn, subject=None, start_day=None, end_day=None):
+    where, params = day_filter('day', start_day, end_day)
+    if subject:
+        where += (" AND " if where else " WHERE ") + "subject = ?"
+        params.append(subject)
+    rows = conn.execute(
+        f"SELECT subject, grade, SUM(students) AS students FROM rollup_daily_grades{where} GROUP BY subject, grade",
+        params
+    ).fetchall()
+    return grade_distribution([(row['subject'], row['grade'], row['students']) for row in rows])
+
+
+def rebuild_sqlite_rollups(conn, chunk_size=500):
+    """Recompute every rollup table from the raw rows (run inside one write transaction)"""
+    for table in ROLLUP_TABLES:
+        conn.execute(f"DELETE FROM {table}")
+    conn.execute("""INSERT INTO rollup_daily (day, submissions)
+                    SELECT date(created_at), COUNT(*) FROM users GROUP BY date(created_at)""")
+    conn.execute("""INSERT INTO rollup_daily (day, payments, completed_payments, revenue)
+                    SELECT date(created_at), COUNT(*), SUM(status = 'completed'),
+                           COALESCE(SUM(CASE WHEN status = 'completed' THEN amount END), 0)
+                    FROM payments WHERE true GROUP BY date(created_at)
+                    ON CONFLICT (day) DO UPDATE SET payments = excluded.payments,
+                        completed_payments = excluded.completed_payments, revenue = excluded.revenue""")
+    conn.execute("""INSERT INTO rollup_daily (day, results)
+                    SELECT date(generated_at), COUNT(*) FROM career_results WHERE true GROUP BY date(generated_at)
+                    ON CONFLICT (day) DO UPDATE SET results = excluded.results""")
+    conn.execute("""INSERT INTO rollup_daily_grades (day, subject, grade, students)
+                    SELECT date(u.created_at), s.subject_name, s.grade, COUNT(*)
+                    FROM user_subjects s JOIN users u ON u.id = s.user_id
+                    GROUP BY date(u.created_at), s.subject_name, s.grade""")
+    # Compact results keep their clusters in career_result_items (position 0 is the top recommendation)
+    conn.execute("""INSERT INTO rollup_daily_clusters (day, cluster_id, top_results, results)
+                    SELECT date(r.generated_at), i.cluster_id, SUM(i.is_top), COUNT(*)
+                    FROM (SELECT result_id, cluster_id, MAX(position = 0) AS is_top
+                          FROM career_result_items GROUP BY result_id, cluster_id) i
+                    JOIN career_results r ON r.id = i.result_id
+                    GROUP BY date(r.generated_at), i.cluster_id""")
+    # Results stored as JSON text have to be parsed, a chunk at a time
+    last_id = 0
+    while True:
+        rows = conn.execute("""SELECT id, date(generated_at) AS day, recommendations FROM career_results
+                               WHERE recommendations IS NOT NULL AND id > ? ORDER BY id LIMIT ?""",
+                            (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1]['id']
+        cluster_rows = []
+        for row in rows:
+            try:
+                recommendations = json.loads(row['recommendations'])
+            except ValueError:
+                continue
+            top_cluster, cluster_ids = result_clusters(recommendations)
+            cluster_rows.extend((row['day'], cluster_id, int(cluster_id == top_cluster)) for cluster_id in cluster_ids)
+        conn.executemany(UPSERT_CLUSTER, cluster_rows)
+
+
+# In-memory rollups for the memory and session repositories
+
+def new_memory_rollups():
+    return {'daily': {}, 'clusters': {}, 'grades': {}}
+
+
+def memory_daily(rollups, day):
+    return rollups['daily'].setdefault(day, {
+        'day': day, 'submissions': 0, 'payments': 0, 'completed_payments': 0, 'revenue': 0.0, 'results': 0
+    })
+
+
+def memory_rollup_user(rollups, day, subjects):
+    memory_daily(rollups, day)['submissions'] += 1
+    grades = rollups['grades'].setdefault(day, {})
+    for subject, grade in subjects:
+        grades[(subject, grade)] = grades.get((subject, grade), 0) + 1
+
+
+def memory_rollup_payment(rollups, day, amount, status):
+    memory_rollup_payment_delta(rollups, day, 1, *payment_rollup(amount, status))
+
+
+def memory_rollup_payment_delta(rollups, day, payments, completed_payments, revenue):
+    daily = memory_daily(rollups, day)
+    daily['payments'] += payments
+    daily['completed_payments'] += completed_payments
+    daily['revenue'] += revenue
+
+
+def memory_rollup_result(rollups, day, recommendations):
+    memory_daily(rollups, day)['results'] += 1
+    top_cluster, cluster_ids = result_clusters(recommendations)
+    clusters = rollups['clusters'].setdefault(day, {})
+    for cluster_id in cluster_ids:
+        counts = clusters.setdefault(cluster_id, [0, 0])
+        counts[0] += int(cluster_id == top_cluster)
+        counts[1] += 1
+
+
+def in_range(day, start_day, end_day):
+    return (not start_day or day >= str(start_day)) and (not end_day or day <= str(end_day))
+
+
+def memory_daily_stats(rollups, start_day=None, end_day=None):
+    return [dict(rollups['daily'][day]) for day in sorted(rollups['daily']) if in_range(day, start_day, end_day)]
+
+
+def memory_cluster_histogram(rollups, start_day=None, end_day=None, limit=10):
+    totals = {}
+    for day, clusters in rollups['clusters'].items():
+        if in_range(day, start_day, end_day):
+            for cluster_id, (top_results, results) in clusters.items():
+                total = totals.setdefault(cluster_id, [0, 0])
+                total[0] += top_results
+                total[1] += results
+    return cluster_histogram([(cluster_id, top, results) for cluster_id, (top, results) in totals.items()], limit)
+
+
+def memory_grade_distribution(rollups, subject=None, start_day=None, end_day=None):
+    totals = {}
+    for day, grades in rollups['grades'].items():
+        if in_range(day, start_day, end_day):
+            for key, students in grades.items():
+                if not subject or key[0] == subject:
+                    totals[key] = totals.get(key, 0) + students
+    return grade_distribution([(s, g, students) for (s, g), students in totals.items()])
+
+
+# Shared result shapes
+
+def cluster_histogram(rows, limit=10):
+    """[{'cluster_id', 'cluster_name', 'top_results', 'results'}], most often top-ranked first"""
+    clusters = get_career_engine().kuccps_clusters
+    histogram = [
+        {'cluster_id': cluster_id,
+         'cluster_name': clusters[cluster_id]['name'] if cluster_id in clusters else f"Cluster {cluster_id}",
+         'top_results': int(top_results or 0),
+         'results': int(results or 0)}
+        for cluster_id, top_results, results in rows
+    ]
+    histogram.sort(key=lambda x: (-x['top_results'], -x['results'], x['cluster_id']))
+    return histogram[:limit] if limit else histogram
+
+
+def grade_distribution(rows):
+    """{subject: {grade: students}} with grades from best to worst"""
+    grade_points = get_career_engine().grade_points
+    distribution = {}
+    for subject, grade, students in sorted(rows, key=lambda x: (x[0], -grade_points.get(x[1], 0), x[1])):
+        distribution.setdefault(subject, {})[grade] = int(students)
+    return distribution
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Career guide analytics rollups")
+    parser.add_argument('--backfill', action='store_true', help="Rebuild all rollups from the raw tables")
+    parser.add_argument('--days', type=int, default=30, help="Days of daily stats to print")
+    args = parser.parse_args()
+
+    from . import database
+
+    if args.backfill:
+        database.rebuild_rollups()
+        print("✅ Rollups rebuilt from raw rows")
+    # Rollup days are UTC dates, like the retention cutoff
+    start_day = (datetime.now(timezone.utc).date() - timedelta(days=args.days)).isoformat()
+    print(json.dumps({
+        'daily_stats': database.get_daily_stats(start_day),
+        'cluster_histogram': database.get_cluster_histogram(start_day),
+        'grade_distribution': database.get_grade_distribution(start_day=start_day)
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,10 +5,226 @@ from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.feature_extraction.text import TfidfVectorizer
 import os
 import re
+import time
+import pickle
+import hashlib
+import threading
+from collections import namedtuple, OrderedDict
+from types import MappingProxyType
+from data.kuccps_clusters import load_kuccps_clusters as load_cluster_table
+
+# Bump whenever scoring logic changes so cached recommendations are invalidated
+SCORING_MODEL_VERSION = "1"
+
+
+def freeze(value):
+    """Recursively convert dicts to read-only mappings and lists/sets to tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    return value
+
+
+# One compiled "SubjectN" requirement: option subjects as a bitmask and an integer threshold
+CompiledRequirement = namedtuple(
+    'CompiledRequirement',
+    ['key', 'option_mask', 'min_points', 'required_grade', 'subject_names']
+)
+
+
+class RequirementIndex:
+    """
+    Frozen index of every cluster's subject requirements.
+    
+    Subject names are resolved to canonical bit positions and grades to integer
+    thresholds once, so eligibility checks are integer compares and bitmask tests.
+    """
+    __slots__ = ('subjects', 'subject_bits', 'thresholds', 'requirements',
+                 'required_subjects', 'required_grades', '_cluster_by_requirements')
+    
+    def __init__(self, engine, clusters):
+        subject_bits = {}
+        requirements = {}
+        required_subjects = {}
+        required_grades = {}
+        cluster_by_requirements = {}
+        
+        for cluster_id, cluster in clusters.items():
+            requirements[cluster_id] = self.compile_requirements(engine, cluster['subject_requirements'], subject_bits)
+            cluster_by_requirements[id(cluster['subject_requirements'])] = cluster_id
+            
+            # Same construction as the original per-call helpers so list order is unchanged
+            subjects_set = set()
+            grades = {}
+            for requirement in cluster['subject_requirements'].values():
+                grade = "C+" if requirement['min_grade'] == "C++" else requirement['min_grade']
+                for subject in requirement['subjects']:
+                    mapped_subject = engine.subject_mapping.get(subject, subject)
+                    subjects_set.add(mapped_subject)
+                    grades[mapped_subject] = grade
+            required_subjects[cluster_id] = tuple(list(subjects_set))
+            required_grades[cluster_id] = MappingProxyType(grades)
+        
+        set_slot = object.__setattr__
+        set_slot(self, 'subjects', tuple(subject_bits))
+        set_slot(self, 'subject_bits', MappingProxyType(subject_bits))
+        set_slot(self, 'thresholds', tuple(sorted({
+            requirement.min_points for compiled in requirements.values() for requirement in compiled
+        })))
+        set_slot(self, 'requirements', MappingProxyType(requirements))
+        set_slot(self, 'required_subjects', MappingProxyType(required_subjects))
+        set_slot(self, 'required_grades', MappingProxyType(required_grades))
+        set_slot(self, '_cluster_by_requirements', MappingProxyType(cluster_by_requirements))
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("RequirementIndex is read-only")
+    
+    @staticmethod
+    def compile_requirements(engine, cluster_requirements, subject_bits):
+        """Compile one cluster's requirements dict, assigning bits to new subjects"""
+        compiled = []
+        for req_key, requirement in cluster_requirements.items():
+            required_grade = engine.parse_grade_requirement(requirement['min_grade'])
+            subject_names = tuple(engine.subject_mapping.get(sub, sub) for sub in requirement['subjects'])
+            option_mask = 0
+            for subject in subject_names:
+                if subject not in subject_bits:
+                    subject_bits[subject] = 1 << len(subject_bits)
+                option_mask |= subject_bits[subject]
+            compiled.append(CompiledRequirement(
+                req_key, option_mask, engine.grade_to_points(required_grade), required_grade, subject_names
+            ))
+        return tuple(compiled)
+    
+    def cluster_for(self, cluster_requirements):
+        """Return the cluster id owning a requirements dict, or None for ad hoc dicts"""
+        return self._cluster_by_requirements.get(id(cluster_requirements))
+    
+    def subject_masks(self, engine, user_subjects, subject_bits=None, thresholds=None):
+        """Map each grade threshold to the bitmask of subjects the user passed at that level"""
+        subject_bits = self.subject_bits if subject_bits is None else subject_bits
+        thresholds = self.thresholds if thresholds is None else thresholds
+        masks = dict.fromkeys(thresholds, 0)
+        for subject, grade in user_subjects.items():
+            bit = subject_bits.get(subject)
+            if bit is None or grade in engine.NOT_TAKEN_GRADES:
+                continue
+            points = engine.grade_to_points(grade)
+            for threshold in thresholds:
+                if points >= threshold:
+                    masks[threshold] |= bit
+        return masks
+
+
+class RecommendationCache:
+    """
+    Thread-safe LRU cache of generate_recommendations results.
+    
+    Entries are stored pickled, which bounds the cache by bytes as well as by
+    entry count and hands every caller its own copy of the result.
+    """
+    
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024, ttl_seconds=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (payload, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, key):
+        """Return a copy of the cached result for key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, expires_at = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return pickle.loads(payload)
+    
+    def put(self, key, value):
+        """Store a result, evicting least recently used entries to stay within bounds"""
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (payload, expires_at)
+            self._bytes += len(payload)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+    
+    def _remove(self, key):
+        payload, _ = self._entries.pop(key)
+        self._bytes -= len(payload)
+    
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def stats(self):
+        """Return hit/miss/eviction counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._bytes
+            }
+
 
 class CareerEngine:
-    def __init__(self):
-        self.kuccps_clusters = self.load_kuccps_clusters()
+    # Subject grades that mean the candidate did not sit the paper
+    NOT_TAKEN_GRADES = ("Not Taken", "Select Grade")
+    # Skills that earn a bonus when they overlap with a cluster's skills
+    CRITICAL_SKILLS = ('analytical', 'problem_solving', 'research', 'communication')
+    # Overall score weights for subjects, skills and interests
+    SCORE_WEIGHTS = (0.4, 0.3, 0.3)
+    # Reasoning added to the medicine cluster for students interested in Medicine
+    MEDICAL_REASONING = "Perfect match for medical career aspirations"
+
+    def __init__(self, scoring_mode='vectorized', recommendation_cache=None, clusters_path=None, clusters=None):
+        """
+        Build the engine.
+
+        Args:
+            scoring_mode (str): 'vectorized' scores all clusters with NumPy array
+                operations; 'loop' uses the original per-cluster Python loop.
+            recommendation_cache (RecommendationCache): Optional cache consulted by
+                generate_recommendations
+            clusters_path (str): Cluster table JSON to load instead of data/kuccps_clusters.json
+            clusters (dict): Already loaded cluster table to use instead of either file
+        """
+        if scoring_mode not in ('vectorized', 'loop'):
+            raise ValueError(f"Unknown scoring mode: {scoring_mode}")
+        self.scoring_mode = scoring_mode
+        self.recommendation_cache = recommendation_cache
+        self.clusters_path = clusters_path
+        self.kuccps_clusters = freeze(clusters if clusters is not None else self.load_kuccps_clusters())
         self.grade_points = {
             'A': 12, 'A-': 11, 'B+': 10, 'B': 9, 'B-': 8,
             'C+': 7, 'C': 6, 'C-': 5, 'D+': 4, 'D': 3, 'D-': 2, 'E': 1
@@ -50,607 +266,26 @@ class CareerEngine:
             'Mathematics': ['mathematics', 'analysis', 'engineering', 'sciences']
         }
         
+        # Lookup tables are read-only so one engine can be shared across threads
+        self.grade_points = freeze(self.grade_points)
+        self.subject_mapping = freeze(self.subject_mapping)
+        self.enhanced_interest_mappings = freeze(self.enhanced_interest_mappings)
+        
+        # Subject requirements compiled to bitmasks and integer thresholds
+        self.requirement_index = RequirementIndex(self, self.kuccps_clusters)
+        
+        # Cluster table compiled into NumPy arrays for the vectorized scorer
+        self.score_tables = freeze(self.compile_score_tables())
+        
+        # Changes whenever the scoring code version or any scoring table changes
+        self.model_version = self.compute_model_version()
+        
     def load_kuccps_clusters(self):
-        """Load all KUCCPS clusters with complete programme data"""
-        return {
-            # CLUSTER 1 - LAW
-            1: {
-                'name': 'Law',
-                'programmes': ['Bachelor of Laws (LL.B.)'],
-                'subject_requirements': {
-                    'Subject1': {'subjects': ['English'], 'min_grade': 'B'},
-                    'Subject2': {'subjects': ['Mathematics', 'Biology', 'Physics', 'Chemistry'], 'min_grade': 'C+'},
-                    'Subject3': {'subjects': ['History', 'Geography', 'CRE', 'IRE', 'HRE'], 'min_grade': 'C+'},
-                    'Subject4': {'subjects': ['Business Studies', 'Computer Studies', 'Agriculture', 'Home Science', 'Art & Design', 'Music', 'French', 'German'], 'min_grade': 'C+'}
-                },
-                'skills': ['analytical', 'communication', 'research', 'critical_thinking', 'persuasion', 'logical_reasoning'],
-                'interests': ['law', 'justice', 'politics', 'debate', 'social_issues', 'governance']
-            },
-            
-            # CLUSTER 2 - BUSINESS & HOSPITALITY
-            2: {
-                'name': 'Business, Hospitality & Related',
-                'programmes': [
-                    'Bachelor in Business Administration', 'Bachelor in Business Administration, With IT',
-                    'Bachelor of Business and Office Management', 'Bachelor of Business Management',
-                    'Bachelor of Business Management (Marine Business Management)', 'Bachelor of Business Management (Aviation Management)',
-                    'Bachelor of Art (Business Issues, With IT)', 'Bachelor of Science (Research Management and Information Technology)',
-                    'Bachelor of Co-operative Management', 'Bachelor of Co-operative Business', 'Bachelor of Co-operative and Community Development',
-                    'Bachelor of Secretarial Management and Administration', 'Bachelor of Technology (Office Administration and Technology)',
-                    'Bachelor of Entrepreneurship & Small Business Management', 'Bachelor of Entrepreneurship and Small Business',
-                    'Bachelor of Science (Entrepreneurship and Small Enterprise Management)', 'Bachelor of Science (Entrepreneurship Studies)',
-                    'Bachelor of Science in Entrepreneurship', 'Bachelor of Procurement and Control Management',
-                    'Bachelor of Procurement and Supply Chain Management', 'Bachelor of Purchasing & Supplies Management',
-                    'Bachelor of Supply Chain Management', 'Bachelor of Logistics and Supply Chain Management',
-                    'Bachelor of Procurement and Supplies Management', 'Bachelor of Purchasing and Supplies Management',
-                    'Bachelor of Science (Management Sciences)', 'Bachelor of Science in Strategic Management',
-                    'Bachelor of Science (Strategic Management)', 'Bachelor of Science in International Business Management',
-                    'Bachelor of Science in Marketing With IT', 'Bachelor of Science in Co-operative and Entrepreneurship Management',
-                    'Bachelor of Project Planning and Management', 'Bachelor of Science (Project Planning Management)',
-                    'Bachelor of Science in Project Management', 'Bachelor of Human Resources Management',
-                    'Bachelor of Science (Human Resource Management)', 'Bachelor of Human Resource Management',
-                    'Bachelor of Science in Human Resource Management, With IT', 'Bachelor of Science (Hospitality & Tourism Management)',
-                    'Bachelor of Science (Hospitality Management)', 'Bachelor of Sustainable Tourism & Hospitality Management',
-                    'Bachelor of Tourism & Trade Management', 'Bachelor of Travel & Travel Operations Management',
-                    'Bachelor of Science in Travel and Tourism Management', 'Bachelor of Catering & World Management',
-                    'Bachelor of Retail and Hospitality Management', 'Bachelor of International Tourism Management',
-                    'Bachelor of Science (Hospitality and Tourism Management)', 'Bachelor of Science (Fairman Management)',
-                    'Bachelor of Science in Hospitality Management', 'Bachelor of Technology (Institutional Planning and Accommodation)',
-                    'Bachelor of Technology in Hotel & Hospitality Management', 'Bachelor of Tourism Management',
-                    'Bachelor of Travel and Travel Operations Management', 'Bachelor of Science (Food Operations Management)',
-                    'Bachelor of Science in Food Services and Hospitality Management'
-                ],
-                'subject_requirements': {
-                    'Subject1': {'subjects': ['Mathematics'], 'min_grade': 'C+'},
-                    'Subject2': {'subjects': ['English', 'Kiswahili'], 'min_grade': 'C+'},
-                    'Subject3': {'subjects': ['Biology', 'Physics', 'Chemistry'], 'min_grade': 'C+'},
-                    'Subject4': {'subjects': ['History', 'Geography', 'CRE', 'IRE', 'HRE', 'Business Studies', 'Computer Studies', 'Agriculture', 'Home Science'], 'min_grade': 'C+'}
-                },
-                'skills': ['leadership', 'numeracy', 'communication', 'strategic_thinking', 'customer_service', 'organization'],
-                'interests': ['business', 'entrepreneurship', 'management', 'finance', 'hospitality', 'tourism']
-            },
-            
-            # CLUSTER 3 - SOCIAL SCIENCES, MEDIA, ARTS
-            3: {
-                'name': 'Social Sciences, Media Studies, Fine Arts, Film, Animation, Graphics & Related',
-                'programmes': [
-                    'Bachelor of Arts', 'Bachelor of Arts (With IT)', 'Bachelor of Applied Communication',
-                    'Bachelor of Science (Communication and Public Relations)', 'Bachelor of Arts (Applied Linguistics)',
-                    'Bachelor of Science (Communication & Journalism)', 'Bachelor of Arts (Communications & Media)',
-                    'Bachelor of Science (Citizens & Public Relations)', 'Bachelor of Arts (Drama and Theatre Studies, With IT)',
-                    'Bachelor of Communication & Public Relations', 'Bachelor of Communication and Public Relations',
-                    'Bachelor of Science (Communication and Journalism)', 'Bachelor of Arts (International Relations and Diplomas, With IT)',
-                    'Bachelor of Arts in Government and International Relations', 'Bachelor of Arts in International Relations',
-                    'Bachelor of Arts Language and Communication, With IT', 'Bachelor of Arts (Linguistics, Media and Communication)',
-                    'Bachelor of Arts (Literature, With IT)', 'Bachelor of Arts (Literature)', 'Bachelor of Arts in Linguistics and Literature',
-                    'Bachelor of Arts (Theatre Arts & Film Technology)', 'Bachelor of Arts (Transactions and Interventions)',
-                    'Bachelor of Communication & Journalism', 'Bachelor of Communication and Media Studies',
-                    'Bachelor of Journalism & Mass Communication', 'Bachelor of Arts in Mass Communication',
-                    'Bachelor of Science in Mass Communication', 'Bachelor of Mass Communication',
-                    'Bachelor of Arts (English & Communication)', 'Bachelor of Arts (Straight and Communication)',
-                    'Bachelor of Psychology (With IT)', 'Bachelor of Science (Counseling Psychology)', 'Bachelor of Arts (Foundering Psychology)',
-                    'Bachelor of Arts (Psychology)', 'Bachelor of Arts in Counselling Psychology', 'Bachelor of Psychology',
-                    'Bachelor of Arts (Sociology and Social Work)', 'Bachelor of Arts (Social Work)', 'Bachelor of Social Work',
-                    'Bachelor of Social Work and Administration', 'Bachelor of Arts (Sociology and Anthropology, With IT)',
-                    'Bachelor of Conflict Resolution and Humanitarian Assistance', 'Bachelor of Arts (Sociology)',
-                    'Bachelor of Science in Sociology', 'Bachelor of Science in Public Administration and Leadership',
-                    'Bachelor of Science (Disaster Mitigation and Sustainable Development)', 'Bachelor of Science in Medical Social Work',
-                    'Bachelor of Science (Disaster Risk Management and Sustainable Development)', 'Bachelor of Arts (Disaster Management, With IT)',
-                    'Bachelor of Disaster Management & International Diplomacy', 'Bachelor of Arts in Community Development',
-                    'Bachelor of Science (Disaster Preparedness and Environment Technology)', 'Bachelor of Arts (Peace and Conflict Studies)',
-                    'Bachelor of Arts Community Development', 'Bachelor of Community Development', 'Bachelor of Development Studies',
-                    'Bachelor of Arts in Development Studies', 'Bachelor of Arts (Gender)', 'Bachelor of Science (Community Development)',
-                    'Bachelor of Science (Public Management and Development)', 'Bachelor of Science in Community Development',
-                    'Bachelor of Public Management and Development', 'Bachelor of Science (Community Development and Environment)',
-                    'Bachelor of Science in Development Studies', 'Bachelor of Community Development and Environment',
-                    'Bachelor of Arts (Developmental and Policy Studies)', 'Bachelor of Science (Community Resource Management)',
-                    'Bachelor of Arts in Management', 'Bachelor of Arts in Leadership and Philosophy',
-                    'Bachelor of Arts (Fine Art, With IT)', 'Bachelor of Science (Graphic, Communication and Advertising)',
-                    'Bachelor of Arts (Fine Arts)', 'Bachelor of Science (Graphic, Comm. & Advertising)',
-                    'Bachelor of Science in Gaming and Animation Technology', 'Bachelor of Arts (Design)',
-                    'Bachelor of Arts (Interior Design, With IT)', 'Bachelor of Arts (Textiles, Apparel Design and Fashion Merchandising, With IT)',
-                    'Bachelor of Science (Apparel & Fashion Technology)', 'Bachelor of Science (Clothing Textile & Interior Design)',
-                    'Bachelor of Science (Fashion Design & Marketing)', 'Bachelor of Science (Fashion Design and Textile Technology)',
-                    'Bachelor of Science in Fashion Design and Marketing'
-                ],
-                'subject_requirements': {
-                    'Subject1': {'subjects': ['English', 'Kiswahili', 'History', 'Geography', 'CRE', 'IRE', 'HRE'], 'min_grade': 'C+'},
-                    'Subject2': {'subjects': ['English', 'Kiswahili', 'History', 'Geography', 'CRE', 'IRE', 'HRE'], 'min_grade': 'C+'},
-                    'Subject3': {'subjects': ['English', 'Kiswahili', 'History', 'Geography', 'CRE', 'IRE', 'HRE'], 'min_grade': 'C+'},
-                    'Subject4': {'subjects': ['Mathematics', 'Biology', 'Physics', 'Chemistry', 'Business Studies', 'Computer Studies', 'Agriculture', 'Home Science', 'Art & Design', 'Music', 'French', 'German'], 'min_grade': 'C+'}
-                },
-                'skills': ['creative', 'communication', 'analytical', 'research', 'empathy', 'critical_thinking'],
-                'interests': ['arts', 'media', 'culture', 'society', 'communication', 'design', 'psychology']
-            },
-            
-            # CLUSTER 4 - GEOSCIENCES
-            4: {
-                'name': 'Geosciences & Related',
-                'programmes': [
-                    'Bachelor of Science (Geospatial Engineering)', 'Bachelor of Science (Geophysical and Mineralogy)',
-                    'Bachelor of Science (Earth Science, With IT)', 'Bachelor of Science (Meteorology)',
-                    'Bachelor of Science (Geology)', 'Bachelor of Science (Astronomy and Astrophysics)',
-                    'Bachelor of Science (Geophysics)', 'Bachelor of Science (Geospatial Information Science, With IT)',
-                    'Bachelor of Technology (Geospatial Engineering Technology)', 'Bachelor of Technology (Geoinformation Technology)',
-                    'Bachelor of Science (Geospatial Information Science)', 'Bachelor of Science in Geospatial Information Science',
-                    'Bachelor of Engineering (Geospatial Engineering)', 'Bachelor of Science (Spatial Management)',
-                    'Bachelor of Science in Geomatic Engineering and Geospatial Information Systems', 'Bachelor of Science in Mining Physics (Geophysics)',
-                    'Bachelor of Science in Geophysics', 'Bachelor of Science (Hydrology and Water Resources Management)',
-                    'Bachelor of Science (Geomatic & Geospatial Information Systems)', 'Bachelor of Applied Science (Geo-informatics)',
-                    'Bachelor of Science (Geospatial Information Science and Remote Sensing)', 'Bachelor of Science (Geomatic Engineering and Geospatial Information Systems)',
-                    'Bachelor of Arts (Geography)', 'Bachelor of Science (Geography)', 'Bachelor of Arts (Geography and Economics)',
-                    'Bachelor of Arts (Kiswahili and Geography)', 'Bachelor of Science (Geography and Natural Resource Management, With IT)'
-                ],
-                'subject_requirements': {
-                    'Subject1': {'subjects': ['Mathematics'], 'min_grade': 'C+'},
-                    'Subject2': {'subjects': ['Physics'], 'min_grade': 'C+'},
-                    'Subject3': {'subjects': ['Biology', 'Chemistry', 'Geography'], 'min_grade': 'C'},
-                    'Subject4': {'subjects': ['English', 'Kiswahili', 'History', 'Business Studies', 'Computer Studies', 'Agriculture', 'Home Science'], 'min_grade': 'C+'}
-                },
-                'skills': ['analytical', 'technical', 'research', 'problem_solving', 'spatial_thinking', 'data_analysis'],
-                'interests': ['environment', 'earth_sciences', 'geography', 'research', 'nature', 'maps']
-            },
-            
-            # CLUSTER 5 - ENGINEERING
-            5: {
-                'name': 'Engineering, Engineering Technology & Related',
-                'programmes': [
-                    'Bachelor of Engineering (Aeronautical Engineering)', 'Bachelor of Science (Civil and Structural Engineering)',
-                    'Bachelor of Engineering (Chemical and Process Engineering)', 'Bachelor of Science in Civil Engineering',
-                    'Bachelor of Engineering (Civil & Structural Engineering)', 'Bachelor of Science (Civil Engineering)',
-                    'Bachelor of Engineering (Electrical and Electronic Engineering)', 'Bachelor of Engineering (Electrical and Telecommunication Engineering)',
-                    'Bachelor of Engineering (Mechanical & Production Engineering)', 'Bachelor of Engineering (Mechanical and Production Engineering)',
-                    'Bachelor of Engineering (Mechanical Engineering)', 'Bachelor of Science (Mechatronic Engineering)',
-                    'Bachelor of Science (Electrical and Electronics Engineering)', 'Bachelor of Science in Water and Environmental Engineering',
-                    'Bachelor of Science (Applications Engineering)', 'Bachelor of Science (Telecommunications and Information Engineering)',
-                    'Bachelor of Science in Telecommunications and Information Engineering', 'Bachelor of Science (Control and Instrumentation)',
-                    'Bachelor of Science (Instrumentation & Control)', 'Bachelor of Science (Information and Technologies) and Instrumentation',
-                    'Bachelor of Science (Instrumentation & Control Engineering)', 'Bachelor of Science (Telecommunications & Information Technology)',
-                    'Bachelor of Science (Applications Engineering & Technology)', 'Bachelor of Science (Applied Optics and Lasers)',
-                    'Bachelor of Science (Engineering)', 'Bachelor of Science (Engineering Physics)', 'Bachelor of Science in Engineering Physics',
-                    'Bachelor of Science (Applied Bioengineering)', 'Bachelor of Science in Applied Bioengineering', 'Bachelor of Science (Biomedical Engineering)',
-                    'Bachelor of Science (Agricultural and Biosystems Engineering)', 'Bachelor of Engineering (Mechanical & Bio-systems Engineering)',
-                    'Bachelor of Science (Agricultural & Bio-systems Engineering)', 'Bachelor of Science in Agricultural and Biosystems Engineering',
-                    'Bachelor of Technology (Civil Engineering Technology)', 'Bachelor of Technology in Electrical and Electronic Engineering',
-                    'Bachelor of Technology in Applied Engineering', 'Bachelor of Science (Biomedical Engineering) and Technology',
-                    'Bachelor of Science in Renewable Energy and Technology', 'Bachelor of Technology in Renewable Energy and Technology',
-                    'Bachelor of Technology in Renewable Energy & Environmental Physics', 'Bachelor of Science (Electrical and Communication Engineering)',
-                    'Bachelor of Science (Electronic and Computer Engineering)', 'Bachelor of Science in Electronic and Computer Engineering',
-                    'Bachelor of Science (Mechanical and Industrial Engineering)', 'Bachelor of Science (Mechanical & Manufacturing Engineering)',
-                    'Bachelor of Science in Mechanical Engineering', 'Bachelor of Science (Mechanical Engineering)',
-                    'Bachelor of Engineering (Industrial and Tensile Engineering)', 'Bachelor of Science (Electrical and Electronic Engineering)',
-                    'Bachelor of Science (Aeronomic Engineering)', 'Bachelor of Engineering (Chemical Engineering)',
-                    'Bachelor of Science (Marine Engineering)', 'Bachelor of Science in Marine Engineering',
-                    'Bachelor of Science (Petroleum Engineering)', 'Bachelor of Science in Mining and Mineral Process Engineering'
-                ],
-                'subject_requirements': {
-                    'Subject1': {'subjects': ['Mathematics'], 'min_grade': 'C+'},
-                    'Subject2': {'subjects': ['Physics'], 'min_grade': 'C+'},
-                    'Subject3': {'subjects': ['Chemistry'], 'min_grade': 'C+'},
-                    'Subject4': {'subjects': ['English', 'Kiswahili'], 'min_grade': 'C+'}
-                },
-                'skills': ['problem_solving', 'technical', 'analytical', 'mathematics', 'design', 'innovation'],
-                'interests': ['technology', 'engineering', 'innovation', 'design', 'construction', 'electronics']
-            },
-            
-            # CLUSTER 6 - ARCHITECTURE & CONSTRUCTION
-            6: {
-                'name': 'Architecture, Building Construction & Related',
-                'programmes': [
-                    'Bachelor of Architectural Studies/Bachelor of Architecture', 'Bachelor of Architecture',
-                    'Bachelor of Quantity Surveying', 'Bachelor of Science (Quantity Surveying)',
-                    'Bachelor of Architectural Technology', 'Bachelor of Landscape Architecture',
-                    'Bachelor of Real Estate', 'Bachelor of Science (Real Estate)',
-                    'Bachelor of Technology (Real Estate and Property Management)', 'Bachelor of Science (Land Administration)',
-                    'Bachelor of Arts (Planning)', 'Bachelor of Construction Management', 'Bachelor of Arts (Spatial Planning)',
-                    'Bachelor of Science (Construction Management)', 'Bachelor of Arts (Design)',
-                    'Bachelor of The Built Environment (Construction Management)', 'Bachelor of Technology (Design)',
-                    'Bachelor of The Built Environment (Urban and Regional Planning)', 'Bachelor of Technology (Building Construction)',
-                    'Bachelor of Arts (Urban and Regional Planning, With IT)', 'Bachelor of Science (Urban Design and Development)'
-                ],
-                'subject_requirements': {
-                    'Subject1': {'subjects': ['Mathematics'], 'min_grade': 'C+'},
-                    'Subject2': {'subjects': ['Physics'], 'min_grade': 'C+'},
-                    'Subject3': {'subjects': ['History', 'Geography', 'CRE', 'IRE', 'HRE'], 'min_grade': 'C+'},
-                    'Subject4': {'subjects': ['English', 'Kiswahili'], 'min_grade': 'C+'}
-                },
-                'skills': ['design', 'technical', 'spatial_thinking', 'project_management', 'creative', 'mathematics'],
-                'interests': ['architecture', 'design', 'construction', 'planning', 'real_estate', 'buildings']
-            },
-            
-            # CLUSTER 7 - COMPUTING & IT
-            7: {
-                'name': 'Computing, IT & Related',
-                'programmes': [
-                    'Bachelor of Science (Computer Science)', 'Bachelor of Science (Mathematics & Computer Science)',
-                    'Bachelor of Science in Computer Science', 'Bachelor of Science (Mathematics and Computer Science)',
-                    'Bachelor of Science (Applied Computer Science)', 'Bachelor of Science in Mathematics & Computer Science',
-                    'Bachelor of Science in Applied Computer Science', 'Bachelor of Science (Maths and Computer Science)',
-                    'Bachelor of Science in Applied Physics and Computer Science', 'Bachelor of Technology (Computer Technology)',
-                    'Bachelor of Science (Computer Security and Forensics)', 'Bachelor of Science in Computer Information Systems',
-                    'Bachelor of Science in Computer Security and Forensics', 'Bachelor of Science in Software Engineering',
-                    'Bachelor of Science in Statistics & Computer Science', 'Bachelor of Science (Computer Technology)',
-                    'Bachelor of Technology (Communication and Computer Networks)', 'Bachelor of Science (Information Technology)',
-                    'Bachelor of Technology (Information Technology)', 'Bachelor of Technology in Information Technology',
-                    'Bachelor of Science (Information and Communication Technology)', 'Bachelor of Technology in Information & Communication Technology',
-                    'Bachelor of Information Technology', 'Bachelor of Science (Applied Statistics With Computing)',
-                    'Bachelor of Science in Applied Statistics With Computing', 'Bachelor of Science (Mathematics and Computing)',
-                    'Bachelor of Science (Statistics & Programming)', 'Bachelor of Science (Informatics)',
-                    'Bachelor of Science (Biometry and Informatics)', 'Bachelor of Science (Applied Statistics With Programming)',
-                    'Bachelor of Science in Statistics and Programming', 'Bachelor of Science (Informatics and Mathematics)',
-                    'Bachelor of Science (Business Computing)', 'Bachelor of Science in Business Computing',
-                    'Bachelor of Science in Informatics', 'Bachelor of Science in Computer Technology',
-                    'Bachelor of Applied Computer Science'
-                ],
-                'subject_requirements': {
-                    'Subject1': {'subjects': ['Mathematics'], 'min_grade': 'C+'},
-                    'Subject2': {'subjects': ['Physics'], 'min_grade': 'C+'},
-                    'Subject3': {'subjects': ['English', 'Kiswahili', 'History', 'Geography', 'CRE', 'IRE', 'HRE'], 'min_grade': 'C+'},
-                    'Subject4': {'subjects': ['English', 'Kiswahili'], 'min_grade': 'C'}
-                },
-                'skills': ['technical', 'analytical', 'problem_solving', 'programming', 'logic', 'mathematics'],
-                'interests': ['technology', 'computers', 'programming', 'innovation', 'problem_solving', 'data']
-            },
-            
-            # CLUSTER 8 - AGRIBUSINESS
-            8: {
-                'name': 'Agribusiness & Related',
-                'programmes': [
-                    'Bachelor of Science (Agribusiness)', 'Bachelor of Science (Agricultural Economics & Resource Management)',
-                    'Bachelor of Agribusiness Management', 'Bachelor of Science (Agricultural Economics, With IT)',
-                    'Bachelor of Science (Agribusiness Management)', 'Bachelor of Science (Agribusiness Economics and Food Industry Management)',
-                    'Bachelor of Science Agribusiness Management', 'Bachelor of Science in Agricultural Economics',
-                    'Bachelor of Science in Agricultural Resource Management', 'Bachelor of Science (Agribusiness Management, With IT)',
-                    'Bachelor of Science (Agricultural Economics and Rural Development)', 'Bachelor of Science in Agricultural Economics and Rural Development',
-                    'Bachelor of Science (Agricultural Economics and Resource Management)', 'Bachelor of Science (Agricultural Economics)',
-                    'Bachelor of Science (Agricultural Resource Management)', 'Bachelor of Science in Agribusiness Management and Marketing',
-                    'Bachelor of Science in Agribusiness Management', 'Bachelor of Science in Agricultural Resource Economics and Management',
-                    'Bachelor of Science Agribusiness Management and Enterprise Development', 'Bachelor of Science (Agri Business Management)',
-                    'Bachelor of Science (Agribusiness Management & Trade)', 'Bachelor of Science in Agribusiness Management and Trade'
-                ],
-                'subject_requirements': {
-                    'Subject1': {'subjects': ['Mathematics'], 'min_grade': 'C'},
-                    'Subject2': {'subjects': ['Biology'], 'min_grade': 'C'},
-                    'Subject3': {'subjects': ['Chemistry', 'Physics', 'Agriculture'], 'min_grade': 'C'},
-                    'Subject4': {'subjects': ['English', 'Kiswahili', 'History', 'Geography', 'Business Studies', 'Computer Studies', 'Home Science'], 'min_grade': 'C+'}
-                },
-                'skills': ['analytical', 'business', 'agricultural', 'management', 'entrepreneurship', 'problem_solving'],
-                'interests': ['agriculture', 'business', 'economics', 'farming', 'management', 'rural_development']
-            },
-            
-            # CLUSTER 9 - GENERAL SCIENCES
-            9: {
-                'name': 'General Science, Biological Sciences, Physics, Chemistry & Related',
-                'programmes': [
-                    'Bachelor of Science', 'Bachelor of Science (Basic Science, With IT)', 'Bachelor of Science (B.sc)',
-                    'Bachelor of Science in Biology', 'Bachelor of Science (Cellular and Molecular Biology)',
-                    'Bachelor of Science (Biological Sciences)', 'Bachelor of Science (Molecular & Cellular Biology)',
-                    'Bachelor of Science (Microbiology and Biotechnology)', 'Bachelor of Science (Conservation Biology)',
-                    'Bachelor of Science in Microbiology and Biotechnology', 'Bachelor of Science (Genomic Sciences)',
-                    'Bachelor of Science in Microbiology', 'Bachelor of Science (Forensic Biology)', 'Bachelor of Science (Applied Biology)',
-                    'Bachelor of Science in Entomology and Parasitology', 'Bachelor of Science in Applied Biology',
-                    'Bachelor of Science in Biotechnology', 'Bachelor of Technology (Applied Biology)', 'Bachelor of Science (Biotechnology)',
-                    'Bachelor of Technology in Industrial Microbiology & Biotechnology', 'Bachelor of Science (Botany)',
-                    'Bachelor of Science (Biochemistry and Molecular Biology)', 'Bachelor of Science (Chemistry)',
-                    'Bachelor of Science in Chemistry', 'Bachelor of Science (Environmental Chemistry)',
-                    'Bachelor of Science (Physics)', 'Bachelor of Science in Physics', 'Bachelor of Science (Physics, With IT)',
-                    'Bachelor of Technology (Technical and Applied Physics)', 'Bachelor of Technology in Applied Physics (Electronics & Instrumentation)',
-                    'Bachelor of Science in Biochemistry', 'Bachelor of Science (Medical Biochemistry)',
-                    'Bachelor of Science in Medical Biochemistry', 'Bachelor of Science in Medical Microbiology',
-                    'Bachelor of Science in Biochemistry and Molecular Biology', 'Bachelor of Science in Biosciences',
-                    'Bachelor of Science (Biochemistry)', 'Bachelor of Science (Microbiology)', 'Bachelor of Science in Genomic Science',
-                    'Bachelor of Science in Biology (Botany or Zoology Option)', 'Bachelor of Science (Zoology)',
-                    'Bachelor of Science in Zoology', 'Bachelor of Science in Molecular Biology and Forensic Technology',
-                    'Bachelor of Science Industrial Biotechnology', 'Bachelor of Technology (Biotechnology)',
-                    'Bachelor of Science in Biotechnology and Biosafety', 'Bachelor of Science (Forensic Science)',
-                    'Bachelor of Science (Analytical Chemistry with Management)', 'Bachelor of Science (Analytical Chemistry)',
-                    'Bachelor of Science in Analytical Chemistry with Computing', 'Bachelor of Science (Computer Science, Physical and Optics Options)',
-                    'Bachelor of Technology in Applied Chemistry (Analytical & Industrial Options)', 'Bachelor of Science (Industrial Chemistry With Management)',
-                    'Bachelor of Science (Industrial Chemistry, With IT)', 'Bachelor of Science (Industrial Chemistry)',
-                    'Bachelor of Technology (Industrial and Applied Chemistry)'
-                ],
-                'subject_requirements': {
-                    'Subject1': {'subjects': ['Mathematics'], 'min_grade': 'C'},
-                    'Subject2': {'subjects': ['Biology', 'Physics', 'Chemistry'], 'min_grade': 'C'},
-                    'Subject3': {'subjects': ['History', 'Geography', 'CRE', 'IRE', 'HRE'], 'min_grade': 'C'},
-                    'Subject4': {'subjects': ['English', 'Kiswahili', 'Business Studies', 'Computer Studies', 'Agriculture', 'Home Science', 'Art & Design', 'Music'], 'min_grade': 'C+'}
-                },
-                'skills': ['research', 'analytical', 'technical', 'problem_solving', 'laboratory', 'scientific_thinking'],
-                'interests': ['science', 'research', 'biology', 'chemistry', 'physics', 'experimentation']
-            },
-            
-            # CLUSTER 10 - ACTUARIAL, MATHEMATICS, ECONOMICS
-            10: {
-                'name': 'Actuarial Science, Accountancy, Mathematics, Economics, Statistics & Related',
-                'programmes': [
-                    'Bachelor of Actuarial Science', 'Bachelor of Science (Actuarial Science)', 'Bachelor of Science in Actuarial Science',
-                    'Bachelor of Science (Actuarial Science With IT)', 'Bachelor of Science (Mathematics)', 'Bachelor of Science in Mathematics',
-                    'Bachelor of Science (Statistics)', 'Bachelor of Science (Applied Statistics, With IT)', 'Bachelor of Science (Applied Statistics)',
-                    'Bachelor of Science (Mathematical Sciences, With IT)', 'Bachelor of Science in Applied Statistics',
-                    'Bachelor of Science (Mathematics and Economics)', 'Bachelor of Science (Mathematics & Business Studies, With IT)',
-                    'Bachelor of Science in Mathematics (Pure Mathematics, Applied Mathematics)', 'Bachelor of Science (Mathematics & Economics, With IT)',
-                    'Bachelor of Science (Financial Engineering)', 'Bachelor of Science in Mathematics and Finance',
-                    'Bachelor of Science in Finance', 'Bachelor of Science (Operations Research)', 'Bachelor of Science (Finance)',
-                    'Bachelor of Economics', 'Bachelor of Arts (Economics & Sociology)', 'Bachelor of Economics & Finance',
-                    'Bachelor of Science in Economics', 'Bachelor of Arts (Economics, With IT)', 'Bachelor of Science (Economics and Statistics)',
-                    'Bachelor of Arts (Economics and Sociology)', 'Bachelor of Science in Economics & Statistics',
-                    'Bachelor of Economics & Statistics', 'Bachelor of Arts (Economics)', 'Bachelor of Economics (Economics & Finance, With IT)',
-                    'Bachelor of Economics and Finance', 'Bachelor of Science (Accountancy)', 'Bachelor of Science (Financial Engineering)',
-                    'Bachelor of Science in Financial Economics', 'Bachelor of Science (Industrial Mathematics)',
-                    'Bachelor of Arts (History and Economics)', 'Bachelor of Science in Mathematics and Economics',
-                    'Bachelor of Science (Mathematics & Business Studies, With IT)', 'Bachelor of Science in Mathematics and Finance and Statistics)',
-                    'Bachelor of Science (Mathematics & Economics, With IT)', 'Bachelor of Arts in Economics',
-                    'Bachelor of Arts (History & Economics)'
-                ],
-                'subject_requirements': {
-                    'Subject1': {'subjects': ['Mathematics'], 'min_grade': 'C+'},
-                    'Subject2': {'subjects': ['Biology', 'Physics', 'Chemistry'], 'min_grade': 'C+'},
-                    'Subject3': {'subjects': ['History', 'Geography', 'CRE', 'IRE', 'HRE'], 'min_grade': 'C+'},
-                    'Subject4': {'subjects': ['English', 'Kiswahili'], 'min_grade': 'C+'}
-                },
-                'skills': ['numeracy', 'analytical', 'problem_solving', 'statistical', 'financial_analysis', 'logical_thinking'],
-                'interests': ['mathematics', 'economics', 'finance', 'statistics', 'analysis', 'numbers']
-            },
-            
-            # CLUSTER 11 - DESIGN
-            11: {
-                'name': 'Interior Design, Fashion Design, Textiles & Related',
-                'programmes': [
-                    'Bachelor of Arts (Interior Design, With IT)', 'Bachelor of Arts (Textiles, Apparel Design and Fashion Merchandising, With IT)',
-                    'Bachelor of Science (Apparel & Fashion Technology)', 'Bachelor of Science (Clothing Textile & Interior Design)',
-                    'Bachelor of Science (Fashion Design & Marketing)', 'Bachelor of Science (Fashion Design and Textile Technology)',
-                    'Bachelor of Science in Fashion Design and Marketing'
-                ],
-                'subject_requirements': {
-                    'Subject1': {'subjects': ['Chemistry'], 'min_grade': 'C'},
-                    'Subject2': {'subjects': ['Mathematics', 'Physics'], 'min_grade': 'C'},
-                    'Subject3': {'subjects': ['Biology', 'Home Science'], 'min_grade': 'C'},
-                    'Subject4': {'subjects': ['English', 'Kiswahili', 'History', 'Geography', 'Business Studies', 'Computer Studies', 'Agriculture'], 'min_grade': 'C+'}
-                },
-                'skills': ['creative', 'design', 'technical', 'artistic', 'fashion_sense', 'innovation'],
-                'interests': ['fashion', 'design', 'textiles', 'creativity', 'art', 'style']
-            },
-            
-            # CLUSTER 12 - SPORTS SCIENCE
-            12: {
-                'name': 'Sport Science & Related',
-                'programmes': [
-                    'Bachelor of Science (Health Promotion and Sports Science)', 'Bachelor of Science (Exercise & Sport Science)',
-                    'Bachelor of Science (Recreation and Sports Management)', 'Bachelor of Sports Science & Management',
-                    'Bachelor of Sports Management', 'Bachelor of Education (Physical Education and Sports)',
-                    'Bachelor of Education (Physical Education)'
-                ],
-                'subject_requirements': {
-                    'Subject1': {'subjects': ['Biology', 'General Science'], 'min_grade': 'C+'},
-                    'Subject2': {'subjects': ['Mathematics'], 'min_grade': 'C+'},
-                    'Subject3': {'subjects': ['English', 'Kiswahili', 'History', 'Geography', 'CRE', 'IRE', 'HRE'], 'min_grade': 'C+'},
-                    'Subject4': {'subjects': ['English', 'Kiswahili', 'Business Studies', 'Computer Studies', 'Agriculture', 'Home Science', 'Art & Design', 'Music'], 'min_grade': 'C+'}
-                },
-                'skills': ['physical_fitness', 'coaching', 'leadership', 'health_knowledge', 'teamwork', 'communication'],
-                'interests': ['sports', 'fitness', 'health', 'coaching', 'physical_activity', 'recreation']
-            },
-            
-            # CLUSTER 13 - MEDICINE & HEALTH
-            13: {
-                'name': 'Medicine, Health, Veterinary Medicine & Related',
-                'programmes': [
-                    'Bachelor of Medicine and Bachelor of Surgery (MBChB)',
-                    'Bachelor of Dental Surgery',
-                    'Bachelor of Pharmacy',
-                    'Bachelor of Science in Nursing',
-                    'Bachelor of Science in Clinical Medicine',
-                    'Bachelor of Science in Medical Laboratory Sciences',
-                    'Bachelor of Science in Public Health',
-                    'Bachelor of Physiotherapy',
-                    'Bachelor of Science in Nutrition and Dietetics',
-                    'Bachelor of Veterinary Medicine',
-                    'Bachelor of Science (Medical Laboratory Science & Technology)',
-                    'Bachelor of Science in Environmental Health',
-                    'Bachelor of Science (Food, Nutrition & Dietetics)',
-                    'Bachelor of Science in Biomedical Science and Technology'
-                ],
-                'subject_requirements': {
-                    'Subject1': {'subjects': ['Biology'], 'min_grade': 'B'},
-                    'Subject2': {'subjects': ['Chemistry'], 'min_grade': 'B'},
-                    'Subject3': {'subjects': ['Mathematics', 'Physics'], 'min_grade': 'B'},
-                    'Subject4': {'subjects': ['English', 'Kiswahili'], 'min_grade': 'B'}
-                },
-                'skills': ['empathy', 'analytical', 'problem_solving', 'communication', 'medical_knowledge', 'attention_to_detail'],
-                'interests': ['medicine', 'healthcare', 'biology', 'helping_people', 'research', 'science', 'community_service']
-            },
-            
-            # CLUSTER 14 - HISTORY & ARCHAEOLOGY
-            14: {
-                'name': 'History, Archeology & Related',
-                'programmes': [
-                    'Bachelor of Arts (History and Archaeology)', 'Bachelor of Arts (History)',
-                    'Bachelor of Arts (History and Archaeology, With IT)', 'Bachelor of Arts in History & International Studies'
-                ],
-                'subject_requirements': {
-                    'Subject1': {'subjects': ['History'], 'min_grade': 'C+'},
-                    'Subject2': {'subjects': ['English', 'Kiswahili'], 'min_grade': 'C+'},
-                    'Subject3': {'subjects': ['Mathematics', 'Biology', 'Physics', 'Chemistry'], 'min_grade': 'C+'},
-                    'Subject4': {'subjects': ['Geography', 'CRE', 'IRE', 'HRE', 'Business Studies', 'Computer Studies', 'Agriculture', 'Home Science'], 'min_grade': 'C+'}
-                },
-                'skills': ['research', 'analytical', 'historical_analysis', 'writing', 'critical_thinking', 'cultural_understanding'],
-                'interests': ['history', 'archaeology', 'culture', 'research', 'heritage', 'ancient_civilizations']
-            },
-            
-            # CLUSTER 15 - AGRICULTURE & ENVIRONMENT
-            15: {
-                'name': 'Agriculture, Animal Health, Food Science, Nutrition Dietetics, Environmental Sciences, Natural Resources & Related',
-                'programmes': [
-                    'Bachelor of Science (Animal Science & Management)', 'Bachelor of Science (Animal Science, With IT)',
-                    'Bachelor of Science in Animal Science', 'Bachelor of Science in Animal Science & Technology',
-                    'Bachelor of Science in Animal Products Technology', 'Bachelor of Science (Animal Health & Production)',
-                    'Bachelor of Science (Animal Health and Production)', 'Bachelor of Science (Animal Health, Production & Processing)',
-                    'Bachelor of Science (Animal Production & Health Management)', 'Bachelor of Science in Animal Health Management',
-                    'Bachelor of Science in Animal Production', 'Bachelor of Science in Applied Animal Laboratory Science',
-                    'Bachelor of Science (Food Nutrition and Dietetics)', 'Bachelor of Science (Human Nutrition and Dietetics)',
-                    'Bachelor of Environmental Science', 'Bachelor of Environmental Studies', 'Bachelor of Science in Environmental Studies',
-                    'Bachelor of Environmental Studies (Arts)', 'Bachelor of Environmental Studies (Science)',
-                    'Bachelor of Science in Environmental Science', 'Bachelor of Environmental Education',
-                    'Bachelor of Science (Climate Change and Development, With IT)', 'Bachelor of Science (Crop Improvement & Protection)',
-                    'Bachelor of Science (Waste Management)', 'Bachelor of Science (Water Resource Management)',
-                    'Bachelor of Science in Ethno botany', 'Bachelor of Science (Agriculture & Human Ecology Extension)',
-                    'Bachelor of Science (Agriculture and Enterprise Development)', 'Bachelor of Science (Dairy Technology & Management)',
-                    'Bachelor of Science (Leather Technology)', 'Bachelor of Science (Soil Science)',
-                    'Bachelor of Science (Soils & Land Use Management)', 'Bachelor of Science (Water and Environment Management)',
-                    'Bachelor of Science (Wood Science and Industrial Processes)', 'Bachelor of Science (Soil Science, With IT)',
-                    'Bachelor of Science (Wildlife Management)', 'Bachelor of Science (Agricultural Biotechnology)',
-                    'Bachelor of Science (Horticultural Science & Management)', 'Bachelor of Science (Horticulture, With IT)',
-                    'Bachelor of Science (Range Management)', 'Bachelor of Science (Bio-resources Management and Conservation)',
-                    'Bachelor of Science (Integrated Forest Resources Management)', 'Bachelor of Science (Natural Products)',
-                    'Bachelor of Science in Agriculture', 'Bachelor of Science (Natural Resources Management)',
-                    'Bachelor of Science (Environmental Horticulture & Landscaping Technology)', 'Bachelor of Science (Forestry)',
-                    'Bachelor of Science (Horticulture)', 'Bachelor of Science in Horticulture',
-                    'Bachelor of Science in Horticultural Science & Management', 'Bachelor of Science (Wildlife Enterprises & Management)',
-                    'Bachelor of Science in Wildlife Enterprise & Management', 'Bachelor of Science (Dryland, Agriculture & Enterprise Development)',
-                    'Bachelor of Science in Natural Resource Management', 'Bachelor of Science (Dryland Animal Science)',
-                    'Bachelor of Science in Soil Environment & Land Use Management)', 'Bachelor of Science (Seed Science & Technology)',
-                    'Bachelor of Science (Nutraceutical Science and Technology)', 'Bachelor of Science (Agroforestry & Rural Development)',
-                    'Bachelor of Science in Nutraceutical Science and Technology', 'Bachelor of Science (Aquatic Resources Conservation and Development, With IT)',
-                    'Bachelor of Science (Utilization & Sustainability of Arid Lands (Usal))', 'Bachelor of Technology (Environmental Resource Management)',
-                    'Bachelor of Science (Environmental Management)', 'Bachelor of Science (Environmental Science, With IT)',
-                    'Bachelor of Science (Environmental Science)', 'Bachelor of Science in Environmental Science and Technology',
-                    'Bachelor of Science (Environmental Sciences)', 'Bachelor of Environmental Studies (Community Development)',
-                    'Bachelor of Science (Agriculture and Biotechnology)', 'Bachelor of Environmental Planning & Development Management',
-                    'Bachelor of Environmental Studies and Community Development', 'Bachelor of Science in Environment, Lands and Sustainable Development',
-                    'Bachelor of Science in Natural Resources', 'Bachelor of Science (Sustainable Energy & Climate Change Systems)',
-                    'Bachelor of Environmental (Environmental Resource Conservation)', 'Bachelor of Science (Food Processing Technology)',
-                    'Bachelor of Science in Food Science & Technology', 'Bachelor of Science (Food Science & Technology)',
-                    'Bachelor of Science (Food Science and Management)', 'Bachelor of Science (Food Security)',
-                    'Bachelor of Science in Food Technology & Quality Assurance', 'Bachelor of Science (Applied Aquatic Science)',
-                    'Bachelor of Science (Fisheries & Aquatic Sciences)', 'Bachelor of Science in Aquaculture and Fisheries Technology',
-                    'Bachelor of Science in Fisheries and Oceanography', 'Bachelor of Science in Marine Resource Management',
-                    'Bachelor of Science (Coastal & Marine Resource Management)', 'Bachelor of Science (Marine Biology & Fisheries)',
-                    'Bachelor of Science (Fisheries and Aquaculture Management)', 'Bachelor of Science (Fisheries and Aquaculture, With IT)',
-                    'Bachelor of Science Fisheries Management and Aquaculture Technology', 'Bachelor of Science in Fisheries and Aquaculture',
-                    'Bachelor of Science in Water and Environment Management', 'Bachelor of Science (Dryland Agriculture)',
-                    'Bachelor of Science (Land Resource Management)', 'Bachelor of Science (Agriculture)'
-                ],
-                'subject_requirements': {
-                    'Subject1': {'subjects': ['Biology'], 'min_grade': 'C+'},
-                    'Subject2': {'subjects': ['Chemistry'], 'min_grade': 'C+'},
-                    'Subject3': {'subjects': ['Mathematics', 'Physics', 'Geography'], 'min_grade': 'C+'},
-                    'Subject4': {'subjects': ['English', 'Kiswahili'], 'min_grade': 'C+'}
-                },
-                'skills': ['agricultural', 'environmental', 'analytical', 'research', 'sustainability', 'problem_solving'],
-                'interests': ['agriculture', 'environment', 'animals', 'farming', 'conservation', 'sustainability']
-            },
-            
-            # CLUSTER 16 - GEOGRAPHY
-            16: {
-                'name': 'Geography & Related',
-                'programmes': [
-                    'Bachelor of Arts (Geography)', 'Bachelor of Science (Geography)',
-                    'Bachelor of Arts (Geography and Economics)', 'Bachelor of Arts (Kiswahili and Geography)',
-                    'Bachelor of Science (Geography and Natural Resource Management, With IT)',
-                    'Bachelor of Science (Environmental Conservation and Natural Resources Management)',
-                    'Bachelor of Science (Land Resource Planning & Management)', 'Bachelor of Science in Land Resource Planning & Management'
-                ],
-                'subject_requirements': {
-                    'Subject1': {'subjects': ['Geography'], 'min_grade': 'C+'},
-                    'Subject2': {'subjects': ['Mathematics'], 'min_grade': 'C+'},
-                    'Subject3': {'subjects': ['Biology', 'Physics', 'Chemistry'], 'min_grade': 'C+'},
-                    'Subject4': {'subjects': ['English', 'Kiswahili', 'History', 'Business Studies', 'Computer Studies', 'Agriculture', 'Home Science'], 'min_grade': 'C+'}
-                },
-                'skills': ['spatial_thinking', 'analytical', 'research', 'environmental', 'mapping', 'data_analysis'],
-                'interests': ['geography', 'environment', 'maps', 'spatial_analysis', 'nature', 'conservation']
-            },
-            
-            # CLUSTER 17 - LANGUAGES
-            17: {
-                'name': 'French & German',
-                'programmes': [
-                    'Bachelor of Arts (French)', 'Bachelor of Arts (French, With IT)', 'Bachelor of Arts (German)',
-                    'Bachelor of Education (French)', 'Bachelor of Education (French, With IT)', 'Bachelor of Education (German)',
-                    'Bachelor of Education (Arts) German'
-                ],
-                'subject_requirements': {
-                    'Subject1': {'subjects': ['French', 'German'], 'min_grade': 'C+'},
-                    'Subject2': {'subjects': ['English', 'Kiswahili'], 'min_grade': 'C+'},
-                    'Subject3': {'subjects': ['Mathematics', 'Biology', 'Physics', 'Chemistry', 'History', 'Geography', 'CRE', 'IRE', 'HRE'], 'min_grade': 'C+'},
-                    'Subject4': {'subjects': ['Business Studies', 'Computer Studies', 'Agriculture', 'Home Science', 'Art & Design', 'Music'], 'min_grade': 'C+'}
-                },
-                'skills': ['linguistic', 'communication', 'cultural_understanding', 'translation', 'analytical', 'writing'],
-                'interests': ['languages', 'culture', 'communication', 'translation', 'literature', 'international_relations']
-            },
-            
-            # CLUSTER 18 - MUSIC
-            18: {
-                'name': 'Music & Related',
-                'programmes': [
-                    'Bachelor of Arts (Music)', 'Bachelor of Arts (Music, With IT)', 'Bachelor of Music',
-                    'Bachelor of Music (Technology)', 'Bachelor of Education (Music)', 'Bachelor of Education (Music, With IT)'
-                ],
-                'subject_requirements': {
-                    'Subject1': {'subjects': ['Music'], 'min_grade': 'C+'},
-                    'Subject2': {'subjects': ['English', 'Kiswahili'], 'min_grade': 'C+'},
-                    'Subject3': {'subjects': ['Mathematics', 'Biology', 'Physics', 'Chemistry', 'History', 'Geography', 'CRE', 'IRE', 'HRE'], 'min_grade': 'C+'},
-                    'Subject4': {'subjects': ['Business Studies', 'Computer Studies', 'Agriculture', 'Home Science', 'Art & Design', 'French', 'German'], 'min_grade': 'C+'}
-                },
-                'skills': ['musical', 'creative', 'performance', 'composition', 'technical', 'artistic'],
-                'interests': ['music', 'performance', 'composition', 'arts', 'creativity', 'entertainment']
-            },
-            
-            # CLUSTER 19 - EDUCATION
-            19: {
-                'name': 'Education & Related',
-                'programmes': [
-                    'Bachelor of Education (Arts)', 'Bachelor of Education (Early Childhood Development Education)',
-                    'Bachelor of Education (Early Childhood Development)', 'Bachelor of Education (Early Childhood Education)',
-                    'Bachelor of Education (Early Childhood Education, With IT)', 'Bachelor of Education (Early Childhood)',
-                    'Bachelor of Education in Early Childhood Education', 'Bachelor of Education (Library Science)',
-                    'Bachelor of Education (Early Childhood and Primary Education)', 'Bachelor of Arts (With Education)',
-                    'Bachelor of Education (Science)', 'Bachelor of Education (Science,With IT)', 'Bachelor of Education (Science with IT)',
-                    'Bachelor of Education (Arts) With Guidance and Counselling', 'Bachelor of Education (Arts, With IT)',
-                    'Bachelor of Education (Home Science and Technology)', 'Bachelor of Education (Guidance and Counselling)',
-                    'Bachelor of Education Arts (Home Economics)', 'Bachelor of Education (Agricultural Education)',
-                    'Bachelor of Science in Agricultural Education & Extension', 'Bachelor of Science (Agricultural Education and Extension)',
-                    'Bachelor of Education (Computer Studies)', 'Bachelor of Education (ICT)', 'Bachelor of Education (Agriculture)',
-                    'Bachelor of Agricultural Education & Extension', 'Bachelor of Agricultural Education and Extension',
-                    'Bachelor of Science in Agricultural Extension', 'Bachelor of Science (Agriculture Education and Extension)',
-                    'Bachelor of Science Agricultural Extension and Education', 'Bachelor of Science (Agricultural Extension Education)',
-                    'Bachelor of Science (Agricultural Education & Extension)', 'Bachelor of Science (Agricultural Extension and Education)',
-                    'Bachelor of Science (Agriculture Education & Extension)', 'Bachelor of Science (Agriculture Education and Extension, With IT)',
-                    'Bachelor of Education Arts(Business Studies)', 'Bachelor of Education (Physical Education and Sports)',
-                    'Bachelor of Education (Physical Education)', 'Bachelor of Education (Special Needs Education - Secondary Option)',
-                    'Bachelor of Education (Special Needs Education)', 'Bachelor of Education (Visual and Performing Arts)',
-                    'Bachelor of Science with Education', 'Bachelor of Education (Technical and Vocational Education)',
-                    'Bachelor of Education (Technology)', 'Bachelor of Education (Technology Education)'
-                ],
-                'subject_requirements': {
-                    'Subject1': {'subjects': ['English', 'Kiswahili', 'Mathematics', 'History', 'Geography', 'CRE', 'IRE', 'HRE', 'Social Studies', 'Home Science', 'Art & Design', 'Computer Studies', 'Music', 'French', 'German'], 'min_grade': 'C+'},
-                    'Subject2': {'subjects': ['English', 'Kiswahili', 'Mathematics', 'History', 'Geography', 'CRE', 'IRE', 'HRE', 'Social Studies', 'Home Science', 'Art & Design', 'Computer Studies', 'Music', 'French', 'German'], 'min_grade': 'C+'},
-                    'Subject3': {'subjects': ['Biology', 'Physics', 'Chemistry', 'Business Studies', 'Agriculture'], 'min_grade': 'C+'},
-                    'Subject4': {'subjects': ['Biology', 'Physics', 'Chemistry', 'Business Studies', 'Agriculture'], 'min_grade': 'C+'}
-                },
-                'skills': ['teaching', 'communication', 'patience', 'leadership', 'organization', 'subject_expertise'],
-                'interests': ['education', 'teaching', 'mentoring', 'children', 'learning', 'community_development']
-            },
-            
-            # CLUSTER 20 - RELIGIOUS STUDIES
-            20: {
-                'name': 'Religious Studies, Theology, Islamic Studies & Related',
-                'programmes': [
-                    'Bachelor of Arts (Religion, With IT)', 'Bachelor of Arts in Sociology and Religious Studies',
-                    'Bachelor of Arts (Religious Studies)', 'Bachelor of Arts (Theology, With IT)',
-                    'Bachelor of Arts (Sociology & Religion)', 'Bachelor of Theology',
-                    'Bachelor of Arts in Intercultural Studies', 'Bachelor of Arts in Biblical Studies',
-                    'Bachelor of Arts in Islamic Studies', 'Bachelor of Arts in Church Education Ministries',
-                    'Bachelor of Arts in Islamic Sharia', 'Bachelor of Arts in Christian Ministries'
-                ],
-                'subject_requirements': {
-                    'Subject1': {'subjects': ['CRE', 'IRE', 'HRE'], 'min_grade': 'C+'},
-                    'Subject2': {'subjects': ['English', 'Kiswahili'], 'min_grade': 'C'},
-                    'Subject3': {'subjects': ['History', 'Geography'], 'min_grade': 'C+'},
-                    'Subject4': {'subjects': ['Mathematics', 'Biology', 'Physics', 'Chemistry', 'Business Studies', 'Computer Studies', 'Agriculture', 'Home Science'], 'min_grade': 'C+'}
-                },
-                'skills': ['theological', 'communication', 'counseling', 'leadership', 'research', 'ethical_reasoning'],
-                'interests': ['religion', 'theology', 'spirituality', 'philosophy', 'community_service', 'counseling']
-            }
-        }
+        """Load all KUCCPS clusters with complete programme data from the precompiled data artifact"""
+        if self.clusters_path is None:
+            return load_cluster_table()
+        # Another table gets its own artifact next to it
+        return load_cluster_table(self.clusters_path, os.path.splitext(self.clusters_path)[0] + '.pkl')
     
     def parse_grade_requirement(self, grade_text):
         """Parse grade requirements like 'C+', 'C (PLAIN)', 'B (PLAIN)'"""
@@ -660,32 +295,30 @@ class CareerEngine:
             return grade_text.split('(')[0].strip()
         return grade_text.strip()
     
-    def meets_subject_requirements(self, user_subjects, cluster_requirements):
+    def meets_subject_requirements(self, user_subjects, cluster_requirements, subject_masks=None):
         """Check if user meets subject requirements for a cluster"""
-        user_subjects_clean = {subject: grade for subject, grade in user_subjects.items() 
-                              if grade not in ["Not Taken", "Select Grade"]}
+        index = self.requirement_index
+        cluster_id = index.cluster_for(cluster_requirements)
+        
+        if cluster_id is None:
+            # Ad hoc requirements dict: compile it on the fly against its own bit table
+            subject_bits = dict(index.subject_bits)
+            compiled = index.compile_requirements(self, cluster_requirements, subject_bits)
+            thresholds = {requirement.min_points for requirement in compiled}
+            subject_masks = index.subject_masks(self, user_subjects, subject_bits, thresholds)
+        else:
+            compiled = index.requirements[cluster_id]
+            if subject_masks is None:
+                subject_masks = index.subject_masks(self, user_subjects)
         
         missing_requirements = []
         
-        for req_key, requirement in cluster_requirements.items():
-            requirement_met = False
-            required_grade = self.parse_grade_requirement(requirement['min_grade'])
-            required_points = self.grade_to_points(required_grade)
-            
-            for subject_option in requirement['subjects']:
-                mapped_subject = self.subject_mapping.get(subject_option, subject_option)
-                
-                user_grade = user_subjects_clean.get(mapped_subject, "Not Taken")
-                if user_grade != "Not Taken" and self.grade_to_points(user_grade) >= required_points:
-                    requirement_met = True
-                    break
-            
-            if not requirement_met:
-                subject_names = [self.subject_mapping.get(sub, sub) for sub in requirement['subjects']]
+        for requirement in compiled:
+            if not subject_masks[requirement.min_points] & requirement.option_mask:
                 missing_requirements.append({
-                    'requirement': req_key,
-                    'required_subjects': subject_names,
-                    'required_grade': required_grade
+                    'requirement': requirement.key,
+                    'required_subjects': list(requirement.subject_names),
+                    'required_grade': requirement.required_grade
                 })
         
         if missing_requirements:
@@ -693,12 +326,14 @@ class CareerEngine:
         
         return True, []
 
-    def calculate_cluster_match_score(self, user_subjects, user_skills, user_interests, cluster_id):
+    def calculate_cluster_match_score(self, user_subjects, user_skills, user_interests, cluster_id, subject_masks=None):
         """Calculate how well user matches a cluster with 60% weight for interests/skills"""
         cluster = self.kuccps_clusters[cluster_id]
         
         # Subject match (40% weight)
-        subject_requirements_met, missing_reqs = self.meets_subject_requirements(user_subjects, cluster['subject_requirements'])
+        subject_requirements_met, missing_reqs = self.meets_subject_requirements(
+            user_subjects, cluster['subject_requirements'], subject_masks
+        )
         subject_score = 100 if subject_requirements_met else 0
         
         # Skills match (30% weight)
@@ -724,7 +359,7 @@ class CareerEngine:
             'skills_match': round(skills_match, 1),
             'interests_match': round(interests_match, 1),
             'missing_requirements': missing_reqs,
-            'eligible_programmes': cluster['programmes'][:5] if subject_requirements_met else [],
+            'eligible_programmes': list(cluster['programmes'][:5]) if subject_requirements_met else [],
             'total_programmes': len(cluster['programmes']),
             'requirements_met': subject_requirements_met
         }
@@ -750,8 +385,7 @@ class CareerEngine:
         base_match = (len(intersection) / len(cluster_skills_set)) * 100
         
         # Bonus for critical skills matches
-        critical_skills = ['analytical', 'problem_solving', 'research', 'communication']
-        critical_matches = len(intersection.intersection(set(critical_skills)))
+        critical_matches = len(intersection.intersection(set(self.CRITICAL_SKILLS)))
         
         return min(base_match + (critical_matches * 10), 100)
     
@@ -788,38 +422,351 @@ class CareerEngine:
         
         return min(total_match, 100)
     
+    def compile_score_tables(self):
+        """Compile the cluster table into NumPy arrays used by the vectorized scorer"""
+        cluster_ids = list(self.kuccps_clusters.keys())
+        clusters = [self.kuccps_clusters[cluster_id] for cluster_id in cluster_ids]
+        
+        # Canonical subjects come from the requirement index; skills and interests from the clusters
+        index = self.requirement_index
+        subject_index = {subject: i for i, subject in enumerate(index.subjects)}
+        skills = sorted({skill for cluster in clusters for skill in cluster['skills']})
+        interests = sorted({interest for cluster in clusters for interest in cluster['interests']}
+                           | set(self.enhanced_interest_mappings.keys()))
+        skill_index = {skill: i for i, skill in enumerate(skills)}
+        interest_index = {interest: i for i, interest in enumerate(interests)}
+        
+        # Requirement x subject minimum points; subjects outside a requirement can never satisfy it
+        max_requirements = max((len(index.requirements[cluster_id]) for cluster_id in cluster_ids), default=0)
+        unreachable = max(self.grade_points.values()) + 1
+        requirement_points = np.full((len(clusters), max_requirements, len(subject_index)), unreachable, dtype=np.int16)
+        requirement_active = np.zeros((len(clusters), max_requirements), dtype=bool)
+        
+        for c, cluster_id in enumerate(cluster_ids):
+            for r, requirement in enumerate(index.requirements[cluster_id]):
+                requirement_active[c, r] = True
+                for subject in requirement.subject_names:
+                    requirement_points[c, r, subject_index[subject]] = requirement.min_points
+        
+        # Skill and interest incidence matrices
+        skill_incidence = np.zeros((len(clusters), len(skills)), dtype=np.int16)
+        interest_incidence = np.zeros((len(clusters), len(interests)), dtype=np.int16)
+        expanded_incidence = np.zeros((len(clusters), len(interests)), dtype=np.int16)
+        
+        for c, cluster in enumerate(clusters):
+            cluster_interests = set(cluster['interests'])
+            for skill in set(cluster['skills']):
+                skill_incidence[c, skill_index[skill]] = 1
+            for interest in cluster_interests:
+                interest_incidence[c, interest_index[interest]] = 1
+            for user_interest, mapped_interests in self.enhanced_interest_mappings.items():
+                expanded_incidence[c, interest_index[user_interest]] = sum(
+                    1 for mapped_interest in mapped_interests if mapped_interest in cluster_interests
+                )
+        
+        critical_mask = np.array([skill in self.CRITICAL_SKILLS for skill in skills], dtype=np.int16)
+        
+        return {
+            'cluster_ids': cluster_ids,
+            'subject_index': subject_index,
+            'skill_index': skill_index,
+            'interest_index': interest_index,
+            'requirement_points': requirement_points,
+            'requirement_active': requirement_active,
+            'skill_incidence': skill_incidence,
+            'critical_incidence': skill_incidence * critical_mask,
+            'skill_counts': skill_incidence.sum(axis=1),
+            'interest_incidence': interest_incidence,
+            'expanded_incidence': expanded_incidence,
+            'interest_counts': interest_incidence.sum(axis=1),
+            'medical_clusters': np.array(['medicine' in c['interests'] for c in clusters]),
+            'weights': np.array(self.SCORE_WEIGHTS)
+        }
+    
+    def encode_profiles(self, profiles):
+        """Encode (user_subjects, user_skills, user_interests) tuples as score-table vectors"""
+        tables = self.score_tables
+        subject_index = tables['subject_index']
+        skill_index = tables['skill_index']
+        interest_index = tables['interest_index']
+        
+        grades = np.full((len(profiles), len(subject_index)), -1, dtype=np.int16)
+        skills = np.zeros((len(profiles), len(skill_index)), dtype=np.int16)
+        interests = np.zeros((len(profiles), len(interest_index)), dtype=np.int16)
+        
+        for n, (user_subjects, user_skills, user_interests) in enumerate(profiles):
+            for subject, grade in user_subjects.items():
+                s = subject_index.get(subject)
+                if s is not None and grade not in self.NOT_TAKEN_GRADES:
+                    grades[n, s] = self.grade_to_points(grade)
+            for skill in user_skills:
+                k = skill_index.get(skill.lower().replace(' ', '_'))
+                if k is not None:
+                    skills[n, k] = 1
+            for interest in user_interests:
+                i = interest_index.get(interest)
+                if i is not None:
+                    interests[n, i] = 1
+        
+        return grades, skills, interests
+    
+    def score_profiles(self, grades, skills, interests):
+        """Score encoded profiles against every cluster in a few array operations"""
+        tables = self.score_tables
+        
+        # Subject match: a requirement is met when any option reaches its minimum points
+        option_met = grades[:, None, None, :] >= tables['requirement_points'][None, :, :, :]
+        requirement_met = option_met.any(axis=3) | ~tables['requirement_active'][None, :, :]
+        eligible = requirement_met.all(axis=2)
+        subject_score = np.where(eligible, 100.0, 0.0)
+        
+        # Skills match: share of cluster skills covered plus a bonus for critical skills
+        skill_counts = tables['skill_counts']
+        skill_hits = skills @ tables['skill_incidence'].T
+        critical_hits = skills @ tables['critical_incidence'].T
+        skills_raw = np.where(
+            skill_counts > 0,
+            (skill_hits / np.maximum(skill_counts, 1)) * 100 + critical_hits * 10,
+            0.0
+        )
+        
+        # Interests match: direct overlap, half credit per mapped interest and the medical bonus
+        interest_counts = tables['interest_counts']
+        direct_hits = interests @ tables['interest_incidence'].T
+        expanded_hits = interests @ tables['expanded_incidence'].T
+        medicine = interests[:, tables['interest_index']['Medicine']] > 0
+        medical_bonus = np.where(medicine[:, None] & tables['medical_clusters'][None, :], 30, 0)
+        interests_raw = np.where(
+            interest_counts > 0,
+            ((direct_hits / np.maximum(interest_counts, 1)) * 70) + ((expanded_hits * 0.5) * 10) + medical_bonus,
+            50.0
+        )
+        
+        weights = tables['weights']
+        overall = ((subject_score * weights[0])
+                   + (np.minimum(skills_raw, 100) * weights[1])
+                   + (np.minimum(interests_raw, 100) * weights[2]))
+        
+        return {
+            'requirement_met': requirement_met,
+            'eligible': eligible,
+            'skills_raw': skills_raw,
+            'interests_raw': interests_raw,
+            'overall': overall
+        }
+    
+    def build_cluster_matches(self, scores, row, user_skills, user_interests, eligible_only=False):
+        """Turn one row of score_profiles output into calculate_cluster_match_score dicts"""
+        tables = self.score_tables
+        requirement_met = scores['requirement_met'][row].tolist()
+        eligible = scores['eligible'][row].tolist()
+        skills_raw = scores['skills_raw'][row].tolist()
+        interests_raw = scores['interests_raw'][row].tolist()
+        overall_raw = scores['overall'][row].tolist()
+        medical_interest = 'Medicine' in user_interests
+        
+        cluster_matches = []
+        for c, cluster_id in enumerate(tables['cluster_ids']):
+            subject_requirements_met = eligible[c]
+            if eligible_only and not subject_requirements_met:
+                continue
+            cluster = self.kuccps_clusters[cluster_id]
+            
+            # Mirror the Python min()/early-return semantics so types match the loop scorer
+            skills_match = min(skills_raw[c], 100) if user_skills else 0
+            interests_match = min(interests_raw[c], 100) if user_interests else 50
+            if user_skills and user_interests:
+                overall_score = overall_raw[c]
+            else:
+                overall_score = ((100 if subject_requirements_met else 0) * self.SCORE_WEIGHTS[0]) + \
+                                (skills_match * self.SCORE_WEIGHTS[1]) + (interests_match * self.SCORE_WEIGHTS[2])
+            
+            if cluster_id == 13 and medical_interest:
+                overall_score = min(overall_score * 1.3, 100)
+            
+            missing_reqs = [] if subject_requirements_met else [
+                {'requirement': requirement.key,
+                 'required_subjects': list(requirement.subject_names),
+                 'required_grade': requirement.required_grade}
+                for r, requirement in enumerate(self.requirement_index.requirements[cluster_id])
+                if not requirement_met[c][r]
+            ]
+            
+            cluster_matches.append({
+                'cluster_id': cluster_id,
+                'cluster_name': cluster['name'],
+                'match_score': round(overall_score, 1),
+                'subject_score': 100 if subject_requirements_met else 0,
+                'skills_match': round(skills_match, 1),
+                'interests_match': round(interests_match, 1),
+                'missing_requirements': missing_reqs,
+                'eligible_programmes': list(cluster['programmes'][:5]) if subject_requirements_met else [],
+                'total_programmes': len(cluster['programmes']),
+                'requirements_met': subject_requirements_met
+            })
+        
+        return cluster_matches
+    
+    def score_clusters(self, user_subjects, user_skills, user_interests, eligible_only=False):
+        """
+        Score a user against every cluster using the configured scoring mode.
+        
+        With eligible_only=True only clusters whose subject requirements are met are
+        returned; those are the only ones that can yield programme recommendations.
+        """
+        if self.scoring_mode == 'loop':
+            subject_masks = self.requirement_index.subject_masks(self, user_subjects)
+            cluster_matches = [
+                self.calculate_cluster_match_score(user_subjects, user_skills, user_interests, cluster_id, subject_masks)
+                for cluster_id in self.kuccps_clusters.keys()
+            ]
+            if eligible_only:
+                cluster_matches = [match for match in cluster_matches if match['requirements_met']]
+            return cluster_matches
+        
+        grades, skills, interests = self.encode_profiles([(user_subjects, user_skills, user_interests)])
+        scores = self.score_profiles(grades, skills, interests)
+        return self.build_cluster_matches(scores, 0, user_skills, user_interests, eligible_only)
+    
     def generate_recommendations(self, subjects_grades, skills_interests):
         """Generate career recommendations with 60% weight for interests/skills"""
         user_subjects = {subject: grade for subject, grade in subjects_grades.items() 
-                        if grade not in ["Not Taken", "Select Grade"]}
+                        if grade not in self.NOT_TAKEN_GRADES}
         user_skills = skills_interests.get('skills', [])
         user_interests = skills_interests.get('interests', [])
         
+        cache = self.recommendation_cache
+        if cache is not None:
+            cache_key = self.profile_cache_key(user_subjects, user_skills, user_interests)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        cluster_matches = self.score_clusters(user_subjects, user_skills, user_interests, eligible_only=True)
+        recommendations = self.build_recommendations(cluster_matches, user_subjects, user_skills, user_interests)
+        
+        if cache is not None:
+            cache.put(cache_key, recommendations)
+        return recommendations
+    
+    def compute_model_version(self):
+        """Hash the scoring version and every table that affects scores"""
+        tables = [
+            self.kuccps_clusters, self.grade_points, self.subject_mapping,
+            self.enhanced_interest_mappings, self.SCORE_WEIGHTS, self.CRITICAL_SKILLS
+        ]
+        digest = hashlib.sha256(json.dumps(tables, default=dict, sort_keys=True).encode('utf-8'))
+        return f"{SCORING_MODEL_VERSION}:{digest.hexdigest()[:16]}"
+    
+    def profile_cache_key(self, user_subjects, user_skills, user_interests):
+        """
+        Canonical hash of a normalized profile.
+        
+        Subjects and skills are sorted; interests keep their first entry in place
+        because it becomes the report's primary interest.
+        """
+        profile = {
+            'model': self.model_version,
+            'subjects': sorted((subject, grade) for subject, grade in user_subjects.items()
+                               if grade not in self.NOT_TAKEN_GRADES),
+            'skills': sorted(user_skills),
+            'interests': list(user_interests[:1]) + sorted(user_interests[1:])
+        }
+        return hashlib.sha256(json.dumps(profile, separators=(',', ':')).encode('utf-8')).hexdigest()
+    
+    def generate_recommendations_batch(self, profiles, chunk_size=1000):
+        """
+        Generate recommendations for a whole cohort, returned in input order.
+        
+        Args:
+            profiles: Iterable of (subjects_grades, skills_interests) pairs, or a pandas
+                DataFrame with one row per candidate (see profiles_from_dataframe)
+            chunk_size (int): Number of candidates scored per vectorized pass
+        
+        Returns:
+            list: One generate_recommendations result per profile
+        """
+        return list(self.iter_recommendations_batch(profiles, chunk_size))
+    
+    def iter_recommendations_batch(self, profiles, chunk_size=1000):
+        """Yield batch recommendations chunk by chunk so memory stays bounded for large files"""
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        if isinstance(profiles, pd.DataFrame):
+            profiles = self.profiles_from_dataframe(profiles)
+        
+        chunk = []
+        for subjects_grades, skills_interests in profiles:
+            chunk.append((
+                {subject: grade for subject, grade in subjects_grades.items()
+                 if grade not in self.NOT_TAKEN_GRADES},
+                skills_interests.get('skills', []),
+                skills_interests.get('interests', [])
+            ))
+            if len(chunk) >= chunk_size:
+                yield from self.score_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield from self.score_chunk(chunk)
+    
+    def score_chunk(self, chunk):
+        """Score a chunk of (user_subjects, user_skills, user_interests) tuples in one pass"""
+        if self.scoring_mode == 'loop':
+            scores = None
+        else:
+            scores = self.score_profiles(*self.encode_profiles(chunk))
+        
+        results = []
+        for row, (user_subjects, user_skills, user_interests) in enumerate(chunk):
+            if scores is None:
+                cluster_matches = self.score_clusters(user_subjects, user_skills, user_interests, eligible_only=True)
+            else:
+                cluster_matches = self.build_cluster_matches(scores, row, user_skills, user_interests, eligible_only=True)
+            results.append(self.build_recommendations(cluster_matches, user_subjects, user_skills, user_interests))
+        return results
+    
+    def profiles_from_dataframe(self, df, skills_column='skills', interests_column='interests'):
+        """
+        Yield (subjects_grades, skills_interests) pairs from a KCSE result sheet.
+        
+        Every column other than the skills and interests columns is read as a subject
+        grade; empty cells count as not taken. Skills and interests may be lists or
+        comma-separated strings.
+        """
+        subject_columns = [column for column in df.columns if column not in (skills_column, interests_column)]
+        
+        def as_list(value):
+            if isinstance(value, (list, tuple)):
+                return list(value)
+            if value is None or (isinstance(value, float) and np.isnan(value)):
+                return []
+            return [item.strip() for item in str(value).split(',') if item.strip()]
+        
+        for row in df.itertuples(index=False, name=None):
+            values = dict(zip(df.columns, row))
+            subjects_grades = {}
+            for subject in subject_columns:
+                grade = values[subject]
+                if isinstance(grade, str) and grade.strip():
+                    subjects_grades[subject] = grade.strip()
+            yield subjects_grades, {
+                'skills': as_list(values.get(skills_column)),
+                'interests': as_list(values.get(interests_column))
+            }
+    
+    def build_recommendations(self, cluster_matches, user_subjects, user_skills, user_interests):
+        """Expand scored clusters into the programme-level recommendations dict"""
         recommendations = []
         
-        for cluster_id in self.kuccps_clusters.keys():
-            cluster_match = self.calculate_cluster_match_score(
-                user_subjects, user_skills, user_interests, cluster_id
-            )
+        for cluster_match in cluster_matches:
+            cluster_id = cluster_match['cluster_id']
             
             # Include clusters even with partial matches due to high interest/skill weights
             if cluster_match['match_score'] >= 40:  # Lower threshold to show more options
+                reasoning = self.generate_reasoning(cluster_match, user_interests)
+                
                 for programme in cluster_match['eligible_programmes']:
-                    recommendations.append({
-                        'career': programme,
-                        'cluster': f"Cluster {cluster_id}: {cluster_match['cluster_name']}",
-                        'match_score': cluster_match['match_score'],
-                        'subject_match': cluster_match['subject_score'],
-                        'skills_match': cluster_match['skills_match'],
-                        'interests_match': cluster_match['interests_match'],
-                        'description': f"Degree programme in {cluster_match['cluster_name']}",
-                        'recommended_courses': [programme],
-                        'universities': ["Various Kenyan Universities"],
-                        'reasoning': self.generate_reasoning(cluster_match, user_interests),
-                        'required_subjects': self.get_required_subjects_list(cluster_id),
-                        'required_grades': self.get_required_grades_dict(cluster_id),
-                        'missing_requirements': cluster_match['missing_requirements']
-                    })
+                    recommendations.append(self.programme_recommendation(cluster_match, programme, reasoning))
         
         # Sort by match score (now heavily weighted towards interests/skills)
         recommendations.sort(key=lambda x: x['match_score'], reverse=True)
@@ -835,6 +782,90 @@ class CareerEngine:
             }
         }
     
+    def programme_recommendation(self, cluster_match, programme, reasoning):
+        """Build the recommendation entry for one programme of a scored cluster"""
+        cluster_id = cluster_match['cluster_id']
+        return {
+            'career': programme,
+            'cluster': f"Cluster {cluster_id}: {cluster_match['cluster_name']}",
+            'match_score': cluster_match['match_score'],
+            'subject_match': cluster_match['subject_score'],
+            'skills_match': cluster_match['skills_match'],
+            'interests_match': cluster_match['interests_match'],
+            'description': f"Degree programme in {cluster_match['cluster_name']}",
+            'recommended_courses': [programme],
+            'universities': ["Various Kenyan Universities"],
+            'reasoning': reasoning,
+            'required_subjects': self.get_required_subjects_list(cluster_id),
+            'required_grades': self.get_required_grades_dict(cluster_id),
+            'missing_requirements': cluster_match['missing_requirements']
+        }
+    
+    def compact_recommendations(self, recommendations):
+        """
+        Reduce a generate_recommendations result to the fields it cannot be rebuilt without.
+        
+        Everything else (cluster names, requirements, descriptions, reasoning) is
+        derived from the cluster table again by expand_recommendations.
+        
+        Returns:
+            tuple: (user_profile, items) where each item is (cluster_id, programme,
+            match_score, subject_match, skills_match, interests_match, missing_codes),
+            or None if the result does not round-trip exactly
+        """
+        try:
+            medical_interest = False
+            items = []
+            for entry in recommendations['all_careers']:
+                cluster_id = int(entry['cluster'].split(':', 1)[0].replace('Cluster', ''))
+                requirement_keys = [requirement.key for requirement in self.requirement_index.requirements[cluster_id]]
+                missing_codes = tuple(requirement_keys.index(missing['requirement'])
+                                      for missing in entry['missing_requirements'])
+                if cluster_id == 13 and entry['reasoning'].endswith(self.MEDICAL_REASONING):
+                    medical_interest = True
+                items.append((cluster_id, entry['career'], entry['match_score'], entry['subject_match'],
+                              entry['skills_match'], entry['interests_match'], missing_codes))
+            user_profile = dict(recommendations['user_profile'])
+            user_profile['medical_interest'] = medical_interest
+            compacted = (user_profile, items)
+            if self.expand_recommendations(*compacted) != recommendations:
+                return None
+        except (KeyError, ValueError, TypeError, AttributeError):
+            return None
+        return compacted
+    
+    def expand_recommendations(self, user_profile, items):
+        """Rebuild the full generate_recommendations dict from compact_recommendations output"""
+        medical_interests = ['Medicine'] if user_profile.get('medical_interest') else []
+        recommendations = []
+        for cluster_id, programme, match_score, subject_match, skills_match, interests_match, missing_codes in items:
+            requirements = self.requirement_index.requirements[cluster_id]
+            missing_requirements = [
+                {'requirement': requirements[code].key,
+                 'required_subjects': list(requirements[code].subject_names),
+                 'required_grade': requirements[code].required_grade}
+                for code in missing_codes
+            ]
+            cluster_match = {
+                'cluster_id': cluster_id,
+                'cluster_name': self.kuccps_clusters[cluster_id]['name'],
+                'match_score': match_score,
+                'subject_score': subject_match,
+                'skills_match': skills_match,
+                'interests_match': interests_match,
+                'missing_requirements': missing_requirements,
+                'requirements_met': not missing_requirements
+            }
+            reasoning = self.generate_reasoning(cluster_match, medical_interests)
+            recommendations.append(self.programme_recommendation(cluster_match, programme, reasoning))
+        
+        return {
+            'top_careers': recommendations[:15],
+            'all_careers': recommendations,
+            'user_profile': {key: user_profile[key] for key in
+                             ('subjects_count', 'skills_count', 'interests_count', 'primary_interest')}
+        }
+    
     def generate_reasoning(self, cluster_match, user_interests):
         """Generate reasoning based on match scores"""
         reasoning = []
@@ -856,36 +887,17 @@ class CareerEngine:
             
         # Special reasoning for medical interests
         if 'Medicine' in user_interests and cluster_match['cluster_id'] == 13:
-            reasoning.append("Perfect match for medical career aspirations")
+            reasoning.append(self.MEDICAL_REASONING)
         
         return "; ".join(reasoning)
     
     def get_required_subjects_list(self, cluster_id):
         """Get list of required subjects for a cluster"""
-        cluster = self.kuccps_clusters[cluster_id]
-        required_subjects = set()
-        
-        for requirement in cluster['subject_requirements'].values():
-            for subject in requirement['subjects']:
-                mapped_subject = self.subject_mapping.get(subject, subject)
-                required_subjects.add(mapped_subject)
-        
-        return list(required_subjects)
+        return list(self.requirement_index.required_subjects[cluster_id])
     
     def get_required_grades_dict(self, cluster_id):
         """Get required grades for subjects in a cluster"""
-        cluster = self.kuccps_clusters[cluster_id]
-        required_grades = {}
-        
-        for req_key, requirement in cluster['subject_requirements'].items():
-            for subject in requirement['subjects']:
-                mapped_subject = self.subject_mapping.get(subject, subject)
-                grade = requirement['min_grade']
-                if grade == "C++":
-                    grade = "C+"
-                required_grades[mapped_subject] = grade
-        
-        return required_grades
+        return dict(self.requirement_index.required_grades[cluster_id])
     
     def get_career_insights(self, recommendations):
         """Generate insights about the career recommendations"""
@@ -923,13 +935,7 @@ class CareerEngine:
 
     def get_cluster_recommendations(self, user_subjects, user_skills, user_interests):
         """Get KUCCPS cluster recommendations for user"""
-        recommendations = []
-        
-        for cluster_id in self.kuccps_clusters.keys():
-            cluster_match = self.calculate_cluster_match_score(
-                user_subjects, user_skills, user_interests, cluster_id
-            )
-            recommendations.append(cluster_match)
+        recommendations = self.score_clusters(user_subjects, user_skills, user_interests)
         
         # Sort by match score
         recommendations.sort(key=lambda x: x['match_score'], reverse=True)
@@ -942,4 +948,56 @@ class CareerEngine:
                 'skills_count': len(user_skills),
                 'interests_count': len(user_interests)
             }
-        }
\ No newline at end of file
+        }
+
+
+# Process-wide engine shared by every Streamlit session and thread
+_shared_engine = None
+_shared_engine_lock = threading.Lock()
+
+# Bounds for the shared engine's recommendation cache
+RECOMMENDATION_CACHE_MAX_ENTRIES = 20000
+RECOMMENDATION_CACHE_MAX_BYTES = 128 * 1024 * 1024
+RECOMMENDATION_CACHE_TTL_SECONDS = 6 * 60 * 60
+
+
+def build_career_engine(recommendation_cache=None, clusters_path=None):
+    """Build a CareerEngine configured like the shared one, optionally reusing a cache or another cluster table"""
+    if recommendation_cache is None:
+        recommendation_cache = RecommendationCache(
+            max_entries=RECOMMENDATION_CACHE_MAX_ENTRIES,
+            max_bytes=RECOMMENDATION_CACHE_MAX_BYTES,
+            ttl_seconds=RECOMMENDATION_CACHE_TTL_SECONDS
+        )
+    return CareerEngine(recommendation_cache=recommendation_cache, clusters_path=clusters_path)
+
+
+def get_career_engine():
+    """
+    Return the process-wide CareerEngine, building it on first use.
+    
+    The engine's tables are frozen, so the same instance is safe to use from
+    concurrent Streamlit sessions without locking.
+    """
+    global _shared_engine
+    engine = _shared_engine
+    if engine is None:
+        with _shared_engine_lock:
+            if _shared_engine is None:
+                _shared_engine = build_career_engine()
+            engine = _shared_engine
+    return engine
+
+
+def install_career_engine(engine):
+    """Atomically replace the shared engine with an already built one"""
+    global _shared_engine
+    with _shared_engine_lock:
+        _shared_engine = engine
+
+
+def invalidate_career_engine():
+    """Drop the shared engine so the next get_career_engine() call rebuilds it from fresh cluster data"""
+    global _shared_engine
+    with _shared_engine_lock:
+        _shared_engine = None
@@ -0,0 +1,189 @@
+"""
+Hot reload of career and cluster data for the KCSE Career Guidance Tool
+
+A background thread polls the mtimes of data/career_paths.json and
+data/kuccps_clusters.json. When either changes it builds a new CareerCatalog
+and CareerEngine off the request path and swaps them in as one versioned
+DataSnapshot. Requests that already hold a snapshot keep using it; new
+requests pick up the new one.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+
+from decouple import config
+
+from data.career_paths import CareerCatalog, CAREER_PATHS_FILE, install_catalog
+from data.kuccps_clusters import SOURCE_PATH as CLUSTERS_FILE
+from .career_engine import build_career_engine, install_career_engine
+
+WATCHED_FILES = (CAREER_PATHS_FILE, CLUSTERS_FILE)
+RELOAD_POLL_SECONDS = config('DATA_RELOAD_POLL_SECONDS', default=5.0, cast=float)
+
+
+class DataSnapshot:
+    """Immutable pairing of a catalog and engine built from the same data files"""
+    __slots__ = ('version', 'catalog', 'engine', 'file_stamps', 'loaded_at', 'reload_seconds')
+
+    def __init__(self, version, catalog, engine, file_stamps, reload_seconds):
+        set_slot = object.__setattr__
+        set_slot(self, 'version', version)
+        set_slot(self, 'catalog', catalog)
+        set_slot(self, 'engine', engine)
+        set_slot(self, 'file_stamps', file_stamps)
+        set_slot(self, 'loaded_at', datetime.now().isoformat())
+        set_slot(self, 'reload_seconds', reload_seconds)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("DataSnapshot is read-only")
+
+
+def file_stamps(paths=WATCHED_FILES):
+    """Return (mtime_ns, size) for each watched file"""
+    stamps = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            stamps[path] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stamps[path] = None
+    return stamps
+
+
+class DataReloader:
+    """
+    Builds data snapshots and swaps them in when the watched files change.
+
+    Args:
+        career_paths_file (str): Career catalog JSON
+        clusters_file (str): KUCCPS cluster table JSON the engine scores against
+        poll_seconds (float): Seconds between checks of the files' mtimes
+    """
+
+    def __init__(self, career_paths_file=CAREER_PATHS_FILE, clusters_file=CLUSTERS_FILE,
+                 poll_seconds=RELOAD_POLL_SECONDS):
+        self.career_paths_file = career_paths_file
+        self.clusters_file = clusters_file
+        self.paths = (career_paths_file, clusters_file)
+        self.poll_seconds = poll_seconds
+        self._snapshot = None
+        self._build_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.reload_count = 0
+        self.failed_reloads = 0
+        self.last_error = None
+        self.last_checked_at = None
+
+    def current(self):
+        """Return the active snapshot, building the first one if needed"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._build_lock:
+                if self._snapshot is None:
+                    self._swap(self._build(file_stamps(self.paths)))
+                snapshot = self._snapshot
+        return snapshot
+
+    def _build(self, stamps):
+        """Build a new snapshot without touching the active one"""
+        started = time.perf_counter()
+        previous = self._snapshot
+        catalog = CareerCatalog.from_file(self.career_paths_file)
+        # Reuse the recommendation cache; its keys carry the model version, so stale entries never hit
+        engine = build_career_engine(previous.engine.recommendation_cache if previous else None, self.clusters_file)
+        version = previous.version + 1 if previous else 1
+        return DataSnapshot(version, catalog, engine, stamps, time.perf_counter() - started)
+
+    def _swap(self, snapshot):
+        """Publish a snapshot; a single reference assignment makes the swap atomic"""
+        self._snapshot = snapshot
+        install_catalog(snapshot.catalog)
+        install_career_engine(snapshot.engine)
+
+    def reload(self, force=False):
+        """
+        Rebuild and swap in a new snapshot if the watched files changed.
+
+        Returns:
+            bool: True if a new snapshot was published
+        """
+        with self._build_lock:
+            self.last_checked_at = datetime.now().isoformat()
+            stamps = file_stamps(self.paths)
+            if not force and self._snapshot is not None and stamps == self._snapshot.file_stamps:
+                return False
+            try:
+                snapshot = self._build(stamps)
+            except Exception as e:
+                # Keep serving the last good snapshot; retry on the next poll
+                self.failed_reloads += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"❌ Data reload failed: {self.last_error}")
+                return False
+            self._swap(snapshot)
+            self.reload_count += 1
+            self.last_error = None
+            print(f"✅ Data snapshot v{snapshot.version} loaded in {snapshot.reload_seconds:.3f}s")
+            return True
+
+    def start(self):
+        """Start the background polling thread (idempotent)"""
+        with self._build_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._watch, name="data-reloader", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the background polling thread"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _watch(self):
+        self.current()
+        while not self._stop_event.wait(self.poll_seconds):
+            self.reload()
+
+    def stats(self):
+        """Snapshot version and reload timings for monitoring"""
+        snapshot = self._snapshot
+        return {
+            'version': snapshot.version if snapshot else None,
+            'model_version': snapshot.engine.model_version if snapshot else None,
+            'loaded_at': snapshot.loaded_at if snapshot else None,
+            'last_reload_seconds': snapshot.reload_seconds if snapshot else None,
+            'reload_count': self.reload_count,
+            'failed_reloads': self.failed_reloads,
+            'last_error': self.last_error,
+            'last_checked_at': self.last_checked_at,
+            'watching': self._thread is not None and self._thread.is_alive()
+        }
+
+
+# Process-wide reloader shared by every Streamlit session
+_reloader = DataReloader()
+
+
+def get_data_snapshot():
+    """Return the current data snapshot; hold on to it for the whole request"""
+    return _reloader.current()
+
+
+def start_data_watcher():
+    """Start watching the data files for changes (safe to call on every rerun)"""
+    _reloader.start()
+
+
+def reload_data(force=False):
+    """Reload immediately instead of waiting for the next poll"""
+    return _reloader.reload(force=force)
+
+
+def get_reload_stats():
+    """Return snapshot version and reload metrics"""
+    return _reloader.stats()
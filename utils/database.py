@@ -1,156 +1,226 @@
-import streamlit as st
-import json
-from datetime import datetime
+"""
+Storage functions used by the KCSE Career Guidance pages
+
+Every function delegates to the repository selected by CAREER_GUIDE_DB_BACKEND
+(see utils.repository): 'sqlite' (default), 'mysql', 'session' or 'memory'.
+"""
+
+import re
+import threading
+from decouple import config
+from .mpesa_integration import format_phone_number
+from .repository import create_repository
+from .retention import RetentionScheduler, RETENTION_DAYS, ARCHIVE_DIR
+
+# Storage backend: 'sqlite' persists to career_guide.db, 'mysql' to a MySQL server,
+# 'session' keeps data in st.session_state and 'memory' in process memory
+DB_BACKEND = config('CAREER_GUIDE_DB_BACKEND', default='sqlite')
+# Newest users per phone number compared when looking for a repeat submission
+DEDUPE_CANDIDATES = config('CAREER_GUIDE_DEDUPE_CANDIDATES', default=5, cast=int)
+# M-Pesa receipt numbers are ten letters and digits, e.g. QAZ45WER90
+RECEIPT_PATTERN = re.compile(r'[A-Z0-9]{10}')
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the configured storage repository (one instance per process)"""
+    backend = _backends.get(DB_BACKEND)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(DB_BACKEND)
+            if backend is None:
+                backend = create_repository(DB_BACKEND)
+                _backends[DB_BACKEND] = backend
+    return backend
 
 def init_db():
-    """Initialize session state for data storage"""
-    if 'users' not in st.session_state:
-        st.session_state.users = {}
-    if 'user_subjects' not in st.session_state:
-        st.session_state.user_subjects = {}
-    if 'user_skills' not in st.session_state:
-        st.session_state.user_skills = {}
-    if 'user_interests' not in st.session_state:
-        st.session_state.user_interests = {}
-    if 'payments' not in st.session_state:
-        st.session_state.payments = {}
-    if 'career_results' not in st.session_state:
-        st.session_state.career_results = {}
-    if 'user_counter' not in st.session_state:
-        st.session_state.user_counter = 0
+    """Initialize storage (session state or the database schema)"""
+    get_backend().init_db()
 
 def save_user_data(student_info, subjects_grades, skills_interests):
-    """Save user data to session state and return user ID"""
-    # Generate user ID
-    st.session_state.user_counter += 1
-    user_id = st.session_state.user_counter
-    
-    # Save user info
-    st.session_state.users[user_id] = {
-        'name': student_info['name'],
-        'phone': student_info['phone'],
-        'email': student_info.get('email', ''),
-        'created_at': datetime.now().isoformat()
-    }
-    
-    # Save subjects
-    st.session_state.user_subjects[user_id] = {}
-    for subject, grade in subjects_grades.items():
-        if grade != "Not Taken" and grade != "Select Grade":
-            st.session_state.user_subjects[user_id][subject] = grade
-    
-    # Save skills
-    st.session_state.user_skills[user_id] = skills_interests.get('skills', [])
-    
-    # Save interests
-    st.session_state.user_interests[user_id] = skills_interests.get('interests', [])
-    
-    return user_id
+    """Save user data and return user ID (the phone number is stored as 2547XXXXXXXX)"""
+    student_info = {**student_info, 'phone': format_phone_number(student_info['phone'])}
+    return get_backend().save_user_data(student_info, subjects_grades, skills_interests)
+
+def normalize_contact(value):
+    """Case- and whitespace-insensitive form of a name or email (None and '' match)"""
+    return " ".join((value or "").split()).casefold()
+
+def find_matching_user(student_info, subjects_grades, skills_interests):
+    """
+    Get the newest user with the same phone, name, email, grades, skills and interests, or None.
 
-def save_payment(user_id, amount, mpesa_code, status, checkout_request_id=None):
-    """Save payment information to session state"""
-    payment_id = f"payment_{user_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    Skills and interests are compared regardless of order, except for the first interest,
+    which is the report's primary interest.
+    """
+    name = normalize_contact(student_info.get('name'))
+    email = normalize_contact(student_info.get('email'))
+    subjects = {subject: grade for subject, grade in subjects_grades.items()
+                if grade != "Not Taken" and grade != "Select Grade"}
+    skills = set(skills_interests.get('skills', []))
+    interests = list(skills_interests.get('interests', []))
+    for user_id in find_user_ids_by_phone(student_info['phone'])[:DEDUPE_CANDIDATES]:
+        user = get_backend().get_user_data(user_id)
+        if (user is not None and normalize_contact(user['user_info']['name']) == name and
+                normalize_contact(user['user_info'].get('email')) == email and user['subjects'] == subjects and
+                set(user['skills']) == skills and set(user['interests']) == set(interests) and
+                list(user['interests'])[:1] == interests[:1]):
+            return user_id
+    return None
+
+def get_or_create_user(student_info, subjects_grades, skills_interests):
+    """
+    Reuse the user who already submitted this phone number and profile, or save a new one.
     
-    st.session_state.payments[payment_id] = {
-        'user_id': user_id,
-        'amount': amount,
-        'mpesa_code': mpesa_code,
-        'checkout_request_id': checkout_request_id,
-        'status': status,
-        'created_at': datetime.now().isoformat()
-    }
+    Returns:
+        tuple: (user_id, reused) - reused is True when an existing user was found
+    """
+    user_id = find_matching_user(student_info, subjects_grades, skills_interests)
+    if user_id is not None:
+        return user_id, True
+    return save_user_data(student_info, subjects_grades, skills_interests), False
+
+def get_paid_results(user_id):
+    """Get the latest career results of a user who has paid, or None (they are served without recomputing)"""
+    if not check_payment_status(user_id):
+        return None
+    return get_career_results(user_id)
+
+def save_payment(user_id, amount, mpesa_code, status, checkout_request_id=None, mpesa_receipt=None):
+    """
+    Save payment information (repeat saves for one checkout request or receipt update a single row).
+
+    Raises:
+        ValueError: If the checkout request or receipt is already recorded for another user
+    """
+    get_backend().save_payment(user_id, amount, mpesa_code, status, checkout_request_id, mpesa_receipt)
+
+def claim_manual_payment(user_id, mpesa_receipt, amount):
+    """
+    Check an M-Pesa receipt number a student typed in.
+
+    The receipt counts only if it was recorded as a completed payment of this user (by the
+    callback receiver or the status poller). A receipt that is not recorded yet is saved as
+    a pending payment for manual review, and a receipt recorded for another user is refused.
+
+    Returns:
+        str: 'completed', 'pending' (saved or already waiting for review) or 'rejected'
+    """
+    mpesa_receipt = mpesa_receipt.strip().upper()
+    if not RECEIPT_PATTERN.fullmatch(mpesa_receipt):
+        return 'rejected'
+    payment = get_payment_by_receipt(mpesa_receipt)
+    if payment is None:
+        try:
+            save_payment(user_id, amount, f"CAREER_{user_id}", 'pending', mpesa_receipt=mpesa_receipt)
+        except ValueError:
+            return 'rejected'  # claimed by another user in the meantime
+        return 'pending'
+    if payment['user_id'] != user_id or payment['status'] not in ('completed', 'pending'):
+        return 'rejected'
+    return payment['status']
 
 def save_career_results(user_id, recommendations):
-    """Save career recommendations to session state"""
-    result_id = f"result_{user_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-    
-    st.session_state.career_results[result_id] = {
-        'user_id': user_id,
-        'recommendations': recommendations,
-        'generated_at': datetime.now().isoformat()
-    }
+    """Save career recommendations"""
+    get_backend().save_career_results(user_id, recommendations)
 
 def check_payment_status(user_id):
     """Check if user has completed payment"""
-    for payment_id, payment in st.session_state.payments.items():
-        if payment['user_id'] == user_id and payment['status'] == 'completed':
-            return True
-    return False
+    return get_backend().check_payment_status(user_id)
 
 def get_user_data(user_id):
-    """Get user data by ID from session state"""
+    """Get user data by ID"""
     user_id = int(user_id)  # Ensure it's integer for consistency
-    
-    if user_id not in st.session_state.users:
-        return None
-    
-    return {
-        'user_info': {
-            'id': user_id,
-            'name': st.session_state.users[user_id]['name'],
-            'phone': st.session_state.users[user_id]['phone'],
-            'email': st.session_state.users[user_id]['email'],
-            'created_at': st.session_state.users[user_id]['created_at']
-        },
-        'subjects': st.session_state.user_subjects.get(user_id, {}),
-        'skills': st.session_state.user_skills.get(user_id, []),
-        'interests': st.session_state.user_interests.get(user_id, [])
-    }
+    return get_backend().get_user_data(user_id)
 
 def get_payment_history(user_id):
-    """Get payment history for a user from session state"""
+    """Get payment history for a user (newest first)"""
     user_id = int(user_id)
-    payment_list = []
-    
-    for payment_id, payment in st.session_state.payments.items():
-        if payment['user_id'] == user_id:
-            payment_list.append({
-                'id': payment_id,
-                'user_id': payment['user_id'],
-                'amount': payment['amount'],
-                'mpesa_code': payment['mpesa_code'],
-                'checkout_request_id': payment['checkout_request_id'],
-                'status': payment['status'],
-                'created_at': payment['created_at']
-            })
-    
-    # Sort by creation date (newest first)
-    payment_list.sort(key=lambda x: x['created_at'], reverse=True)
-    return payment_list
+    return get_backend().get_payment_history(user_id)
 
 def get_career_results(user_id):
-    """Get career results for a user from session state"""
+    """Get the latest career results for a user"""
     user_id = int(user_id)
-    latest_result = None
+    return get_backend().get_career_results(user_id)
+
+def get_payment_by_checkout_request(checkout_request_id):
+    """Get the payment for an M-Pesa CheckoutRequestID, or None"""
+    return get_backend().get_payment_by_checkout_request(checkout_request_id)
+
+def get_payment_by_receipt(mpesa_receipt):
+    """Get the payment for an M-Pesa receipt number, or None"""
+    return get_backend().get_payment_by_receipt(mpesa_receipt.strip().upper())
+
+def get_pending_checkouts(max_age_seconds=3600):
+    """Get pending STK push payments made in the last max_age_seconds, oldest first (with their age_seconds)"""
+    return get_backend().get_pending_checkouts(max_age_seconds)
+
+def find_user_ids_by_phone(phone):
+    """Get the IDs of users registered with a phone number in any format (newest first)"""
+    phone = format_phone_number(phone)
+    user_ids = set(get_backend().find_user_ids_by_phone(phone))
+    if phone.startswith('254'):
+        # Users saved before phone numbers were normalized may hold the local 07XXXXXXXX form
+        user_ids.update(get_backend().find_user_ids_by_phone('0' + phone[3:]))
+    return sorted(user_ids, reverse=True)
+
+def flush_writes(timeout=None):
+    """Block until queued write-behind saves are committed"""
+    return get_backend().flush(timeout)
+
+def get_storage_stats():
+    """Storage backend and write-behind queue metrics"""
+    return get_backend().stats()
+
+def cleanup_old_data(days_old=RETENTION_DAYS):
+    """Clean up data older than specified days (for maintenance) and return the number of rows purged"""
+    return run_retention_job(days_old)['total_rows_purged']
+
+def run_retention_job(days_old=RETENTION_DAYS, chunk_size=200, archive_dir=ARCHIVE_DIR):
+    """
+    Purge users created more than days_old days ago, with all of their rows.
     
-    for result_id, result in st.session_state.career_results.items():
-        if result['user_id'] == user_id:
-            if latest_result is None or result['generated_at'] > latest_result['generated_at']:
-                latest_result = result
+    SQLite deletes in chunks of chunk_size users, archiving each chunk to a
+    .jsonl.gz file in archive_dir first (None skips archiving).
     
-    return latest_result
+    Returns:
+        dict: Rows purged per table, chunk count, archive path and timings
+    """
+    return get_backend().run_retention_job(days_old, chunk_size=chunk_size, archive_dir=archive_dir)
+
+_retention_scheduler = RetentionScheduler(run_retention_job)
+
+def start_retention_scheduler():
+    """Run the retention job every CAREER_GUIDE_RETENTION_INTERVAL_HOURS (no-op when unset)"""
+    _retention_scheduler.start()
+
+def get_daily_stats(start_day=None, end_day=None):
+    """Daily submissions, payments, completed payments, revenue and results ('YYYY-MM-DD' days, inclusive)"""
+    return get_backend().get_daily_stats(start_day, end_day)
+
+def get_cluster_histogram(start_day=None, end_day=None, limit=10):
+    """Most recommended clusters: how often each was the top match and how often it appeared at all"""
+    return get_backend().get_cluster_histogram(start_day, end_day, limit)
+
+def get_grade_distribution(subject=None, start_day=None, end_day=None):
+    """Number of students per grade, per subject"""
+    return get_backend().get_grade_distribution(subject, start_day, end_day)
 
-def cleanup_old_data(days_old=30):
-    """Clean up data older than specified days (for maintenance) - Not needed for session state"""
-    # Session state is temporary and clears when app restarts
-    # No cleanup needed for demo purposes
-    return 0
+def rebuild_rollups():
+    """Recompute the analytics rollups from the stored rows (one-off backfill; totals of purged users are lost)"""
+    get_backend().rebuild_rollups()
 
-# Additional helper functions for session state management
+# Additional helper functions for storage management
 def get_all_users():
-    """Get all users from session state (for debugging)"""
-    return st.session_state.users
+    """Get all users (for debugging)"""
+    return get_backend().get_all_users()
 
 def get_all_payments():
-    """Get all payments from session state (for debugging)"""
-    return st.session_state.payments
+    """Get all payments (for debugging)"""
+    return get_backend().get_all_payments()
 
 def clear_all_data():
-    """Clear all data from session state (for testing)"""
-    st.session_state.users = {}
-    st.session_state.user_subjects = {}
-    st.session_state.user_skills = {}
-    st.session_state.user_interests = {}
-    st.session_state.payments = {}
-    st.session_state.career_results = {}
-    st.session_state.user_counter = 0
\ No newline at end of file
+    """Clear all data (for testing)"""
+    get_backend().clear_all_data()
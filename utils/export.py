@@ -0,0 +1,236 @@
+"""
+Bulk export of career results for partners and schools
+
+Streams one row per career result (the student's profile and the clusters
+recommended to them) to CSV or Parquet, a chunk of results at a time, so
+memory use stays flat however many results are exported:
+
+    python -m utils.export results.csv --anonymize
+    python -m utils.export results.parquet --anonymize --field phone=mask
+
+--anonymize drops names and emails, hashes phone numbers and user ids and
+keeps only the month of timestamps; --field overrides one field at a time.
+Hashes are keyed with CAREER_GUIDE_EXPORT_SALT, so the same student gets the
+same hash in every export made with the same salt (a random salt is used
+when it is unset). Parquet needs pyarrow (pip install pyarrow).
+"""
+
+import argparse
+import csv
+import gzip
+import hashlib
+import hmac
+import json
+import secrets
+import time
+
+from decouple import config
+
+from .career_engine import get_career_engine
+
+EXPORT_SALT = config('CAREER_GUIDE_EXPORT_SALT', default='')
+
+# Every exported column; personal fields can be anonymized
+EXPORT_COLUMNS = (
+    'result_id', 'user_id', 'generated_at', 'registered_at', 'name', 'phone', 'email',
+    'subjects', 'subjects_count', 'mean_points', 'skills', 'interests', 'paid',
+    'top_cluster_id', 'top_cluster', 'top_career', 'top_match_score', 'recommended_clusters', 'recommendations'
+)
+PERSONAL_FIELDS = ('result_id', 'user_id', 'generated_at', 'registered_at', 'name', 'phone', 'email')
+ANONYMIZATION_METHODS = ('keep', 'drop', 'hash', 'mask', 'month')
+DEFAULT_ANONYMIZATION = {
+    'user_id': 'hash',
+    'name': 'drop',
+    'phone': 'hash',
+    'email': 'drop',
+    'generated_at': 'month',
+    'registered_at': 'month'
+}
+
+
+def export_row(record, clusters, grade_points):
+    """Flatten one iter_export_chunks record into an export row"""
+    careers = record['careers']
+    grades = [grade_points.get(grade, 0) for grade in record['subjects'].values()]
+    recommended_clusters = list(dict.fromkeys(cluster_id for cluster_id, career, match_score in careers))
+    top_cluster_id, top_career, top_match_score = careers[0] if careers else (None, None, None)
+    return {
+        'result_id': str(record['result_id']),
+        'user_id': str(record['user_id']),
+        'generated_at': record['generated_at'],
+        'registered_at': record['registered_at'],
+        'name': record['name'],
+        'phone': record['phone'],
+        'email': record['email'],
+        'subjects': ";".join(f"{subject}={grade}" for subject, grade in record['subjects'].items()),
+        'subjects_count': len(grades),
+        'mean_points': round(sum(grades) / len(grades), 2) if grades else None,
+        'skills': ";".join(record['skills']),
+        'interests': ";".join(record['interests']),
+        'paid': record['paid'],
+        'top_cluster_id': top_cluster_id,
+        'top_cluster': clusters[top_cluster_id]['name'] if top_cluster_id in clusters else None,
+        'top_career': top_career,
+        'top_match_score': float(top_match_score) if top_match_score is not None else None,
+        'recommended_clusters': ";".join(map(str, recommended_clusters)),
+        'recommendations': len(careers)
+    }
+
+
+class Anonymizer:
+    """
+    Applies a field -> method mapping to export rows.
+
+    Args:
+        fields (dict): Personal field name -> 'keep', 'drop', 'hash', 'mask' or 'month'
+        salt (str): Key for 'hash'; a random one when empty
+    """
+
+    def __init__(self, fields=None, salt=EXPORT_SALT):
+        fields = dict(fields or {})
+        for field, method in fields.items():
+            if field not in PERSONAL_FIELDS:
+                raise ValueError(f"Cannot anonymize {field}; choose from {', '.join(PERSONAL_FIELDS)}")
+            if method not in ANONYMIZATION_METHODS:
+                raise ValueError(f"Unknown anonymization method {method}; choose from {', '.join(ANONYMIZATION_METHODS)}")
+        self.fields = {field: method for field, method in fields.items() if method != 'keep'}
+        self.columns = tuple(column for column in EXPORT_COLUMNS if self.fields.get(column) != 'drop')
+        self.salted = bool(salt)
+        self._key = (salt or secrets.token_hex(16)).encode('utf-8')
+
+    def __call__(self, row):
+        for field, method in self.fields.items():
+            value = row.pop(field) if method == 'drop' else row[field]
+            if value is None or method == 'drop':
+                continue
+            if method == 'hash':
+                row[field] = hmac.new(self._key, str(value).encode('utf-8'), hashlib.sha256).hexdigest()[:16]
+            elif method == 'mask':
+                value = str(value)
+                row[field] = "*" * max(len(value) - 3, 0) + value[-3:]
+            elif method == 'month':
+                row[field] = str(value)[:7]
+        return row
+
+
+class CSVSink:
+    """Writes rows to a CSV file (gzip-compressed when the path ends in .gz)"""
+
+    def __init__(self, path, columns):
+        opener = gzip.open if path.endswith('.gz') else open
+        self.file = opener(path, 'wt', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=columns)
+        self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetSink:
+    """Writes each chunk of rows as one Parquet row group"""
+
+    def __init__(self, path, columns):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet export needs pyarrow (pip install pyarrow)") from e
+        types = {
+            'subjects_count': pa.int32(),
+            'mean_points': pa.float64(),
+            'paid': pa.bool_(),
+            'top_cluster_id': pa.int32(),
+            'top_match_score': pa.float64(),
+            'recommendations': pa.int32()
+        }
+        self.pa = pa
+        self.schema = pa.schema([(column, types.get(column, pa.string())) for column in columns])
+        self.writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+
+    def write(self, rows):
+        self.writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+SINKS = {'csv': CSVSink, 'parquet': ParquetSink}
+
+
+def export_format(path):
+    """Guess the export format from the file name"""
+    name = path.lower()
+    if name.endswith('.parquet') or name.endswith('.pq'):
+        return 'parquet'
+    if name.endswith('.csv') or name.endswith('.csv.gz'):
+        return 'csv'
+    raise ValueError(f"Cannot tell the export format of {path}; use a .csv, .csv.gz or .parquet file name")
+
+
+def export_results(path, fmt=None, anonymize=None, chunk_size=1000, salt=EXPORT_SALT, repository=None):
+    """
+    Stream every career result to a CSV or Parquet file.
+
+    Args:
+        path (str): Output file
+        fmt (str): 'csv' or 'parquet'; guessed from path when None
+        anonymize (dict): Personal field -> anonymization method (see DEFAULT_ANONYMIZATION)
+        chunk_size (int): Results read and written at a time
+        salt (str): Key for hashed fields
+        repository: Storage repository to read; the configured backend when None
+
+    Returns:
+        dict: Output path, format, columns, rows, chunks and seconds
+    """
+    fmt = fmt or export_format(path)
+    if fmt not in SINKS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if repository is None:
+        from .database import get_backend
+        repository = get_backend()
+
+    started = time.perf_counter()
+    anonymizer = Anonymizer(anonymize, salt)
+    engine = get_career_engine()
+    clusters, grade_points = engine.kuccps_clusters, engine.grade_points
+    report = {'path': path, 'format': fmt, 'columns': list(anonymizer.columns), 'rows': 0, 'chunks': 0,
+              'hashes_linkable': anonymizer.salted, 'seconds': 0.0}
+
+    sink = SINKS[fmt](path, anonymizer.columns)
+    try:
+        for chunk in repository.iter_export_chunks(chunk_size):
+            sink.write([anonymizer(export_row(record, clusters, grade_points)) for record in chunk])
+            report['rows'] += len(chunk)
+            report['chunks'] += 1
+    finally:
+        sink.close()
+
+    report['seconds'] = time.perf_counter() - started
+    print(f"✅ Exported {report['rows']} results to {path} ({report['seconds']:.2f}s)")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export career guide results to CSV or Parquet")
+    parser.add_argument('path', help="Output file (.csv, .csv.gz or .parquet)")
+    parser.add_argument('--format', choices=sorted(SINKS), help="Output format (default: from the file name)")
+    parser.add_argument('--anonymize', action='store_true', help="Apply the default anonymization")
+    parser.add_argument('--field', action='append', default=[], metavar='FIELD=METHOD',
+                        help=f"Anonymize one field ({', '.join(ANONYMIZATION_METHODS)}); repeatable")
+    parser.add_argument('--chunk-size', type=int, default=1000, help="Results per chunk")
+    args = parser.parse_args()
+
+    fields = dict(DEFAULT_ANONYMIZATION) if args.anonymize else {}
+    for option in args.field:
+        field, _, method = option.partition('=')
+        fields[field.strip()] = method.strip()
+
+    report = export_results(args.path, args.format, fields, chunk_size=args.chunk_size)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
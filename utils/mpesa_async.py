@@ -0,0 +1,233 @@
+"""
+Asyncio M-Pesa Daraja client
+
+AsyncMpesaDarajaAPI has the same calls as MpesaDarajaAPI, as coroutines, so
+one event loop can drive hundreds of STK pushes and status queries at once
+(e.g. a school paying for a whole class, or a reconciliation job checking
+pending checkouts):
+
+    async with AsyncMpesaDarajaAPI(concurrency=100) as api:
+        results = await api.check_transaction_statuses(checkout_request_ids)
+
+At most `concurrency` requests are in flight; the rest wait their turn.
+MpesaDarajaAPI runs the same coroutines on a process-wide background event
+loop (run_coroutine), so Streamlit pages keep their synchronous calls.
+Needs httpx (pip install httpx).
+"""
+
+import asyncio
+import base64
+import threading
+from datetime import datetime
+
+from decouple import config
+
+from .mpesa_integration import (MPESA_BASE_URL, MPESA_CONNECT_TIMEOUT, MPESA_POOL_SIZE, MPESA_READ_TIMEOUT,
+                                format_phone_number, get_http_session)
+from .mpesa_token import get_token_provider
+
+MPESA_CONCURRENCY = config('MPESA_CONCURRENCY', default=50, cast=int)
+
+_loop = None
+_background_client = None
+_loop_lock = threading.Lock()
+
+
+class AsyncMpesaDarajaAPI:
+    """
+    Asyncio client for the LIVE Daraja API.
+
+    Args:
+        concurrency (int): Most requests in flight at once
+        pool_size (int): Idle keep-alive connections kept for reuse
+        connect_timeout (float): Seconds to open a connection
+        read_timeout (float): Seconds to wait for a response
+    """
+
+    def __init__(self, concurrency=MPESA_CONCURRENCY, pool_size=MPESA_POOL_SIZE,
+                 connect_timeout=MPESA_CONNECT_TIMEOUT, read_timeout=MPESA_READ_TIMEOUT):
+        try:
+            import httpx
+        except ImportError as e:
+            raise ImportError("The asyncio M-Pesa client needs httpx (pip install httpx)") from e
+        self.consumer_key = config('MPESA_CONSUMER_KEY')
+        self.consumer_secret = config('MPESA_CONSUMER_SECRET')
+        self.business_shortcode = config('MPESA_BUSINESS_SHORTCODE')  # e.g., 6910505
+        self.passkey = config('MPESA_PASSKEY')
+        self.callback_url = config('MPESA_CALLBACK_URL')
+
+        self.base_url = MPESA_BASE_URL.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            # httpcore checks every idle connection per request, so a small idle pool beats one per slot
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+        )
+        self.limit = asyncio.Semaphore(concurrency)
+        # Shared with every client and worker process using the same app credentials
+        self.tokens = get_token_provider(self.base_url, self.consumer_key, self.fetch_access_token)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the connection pool"""
+        await self.client.aclose()
+
+    def fetch_access_token(self):
+        """
+        Request a new access token from Daraja; returns (access_token, expires_in seconds).
+
+        Runs synchronously on the pooled requests session: the shared token cache calls
+        it from whichever thread finds the token missing, about once an hour per app.
+        """
+        auth_url = f"{self.base_url}/oauth/v1/generate?grant_type=client_credentials"
+        auth_string = f"{self.consumer_key}:{self.consumer_secret}"
+        encoded_auth = base64.b64encode(auth_string.encode()).decode()
+        headers = {"Authorization": f"Basic {encoded_auth}"}
+
+        response = get_http_session().get(auth_url, headers=headers, timeout=self.timeout)
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.status_code} - {response.text}")
+        data = response.json()
+        return data['access_token'], int(data.get('expires_in') or 3599)
+
+    async def get_access_token(self, force=False):
+        """Get M-Pesa API access token (from the shared cache when another worker already has one)"""
+        token = None if force else self.tokens.cached_token()
+        if token:
+            return token
+        try:
+            # The shared cache may wait on SQLite or a fetch: keep the event loop free meanwhile
+            if force:
+                return await asyncio.to_thread(self.tokens.refresh, True)
+            return await asyncio.to_thread(self.tokens.get_token)
+        except Exception as e:
+            print(f"❌ Access token error: {str(e)}")
+            return None
+
+    def format_phone_number(self, phone_number):
+        """Format phone number to 2547XXXXXXXX"""
+        return format_phone_number(phone_number)
+
+    def generate_password(self, timestamp):
+        """Generate M-Pesa password for STK Push"""
+        data = f"{self.business_shortcode}{self.passkey}{timestamp}"
+        return base64.b64encode(data.encode()).decode()
+
+    async def _post(self, path, payload):
+        """POST to Daraja within the concurrency limit, retrying once with a new token if it is rejected"""
+        async with self.limit:
+            for attempt in range(2):
+                access_token = await self.get_access_token(force=attempt > 0)
+                if not access_token:
+                    return None
+                headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
+                response = await self.client.post(path, json=payload, headers=headers)
+                if response.status_code != 401:
+                    break
+            return response
+
+    async def initiate_stk_push(self, phone_number, amount, account_reference="Order", transaction_desc="Payment"):
+        """Initiate LIVE STK Push for Buy Goods Till"""
+        try:
+            formatted_phone = self.format_phone_number(phone_number)
+            if len(formatted_phone) != 12:
+                return {"success": False, "error_message": "Invalid phone number format"}
+
+            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+            password = self.generate_password(timestamp)
+            shortcode = self.business_shortcode
+
+            payload = {
+                "BusinessShortCode": shortcode,
+                "Password": password,
+                "Timestamp": timestamp,
+                "TransactionType": "CustomerBuyGoodsOnline",
+                "Amount": int(amount),
+                "PartyA": formatted_phone,
+                "PartyB": shortcode,
+                "PhoneNumber": formatted_phone,
+                "CallBackURL": self.callback_url,
+                "AccountReference": account_reference[:12],
+                "TransactionDesc": transaction_desc[:13]
+            }
+
+            response = await self._post("/mpesa/stkpush/v1/processrequest", payload)
+            if response is None:
+                return {"success": False, "error_message": "Authentication failed"}
+
+            if response.status_code == 200:
+                data = response.json()
+                if data.get('ResponseCode') == '0':
+                    return {"success": True, **data}
+                else:
+                    return {"success": False, "error_message": data.get('ResponseDescription')}
+            else:
+                return {"success": False, "error_message": response.text}
+        except Exception as e:
+            return {"success": False, "error_message": str(e) or e.__class__.__name__}
+
+    async def check_transaction_status(self, checkout_request_id):
+        """Query transaction status"""
+        try:
+            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+            password = self.generate_password(timestamp)
+
+            payload = {
+                "BusinessShortCode": self.business_shortcode,
+                "Password": password,
+                "Timestamp": timestamp,
+                "CheckoutRequestID": checkout_request_id
+            }
+
+            response = await self._post("/mpesa/stkpushquery/v1/query", payload)
+            if response is not None and response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            print(f"❌ Transaction status error: {str(e) or e.__class__.__name__}")
+            return None
+
+    async def initiate_stk_pushes(self, payments):
+        """
+        Initiate many STK pushes concurrently.
+
+        Args:
+            payments (list): (phone_number, amount, account_reference, transaction_desc) tuples;
+                the last two are optional
+
+        Returns:
+            list: initiate_stk_push results, in the order of payments
+        """
+        return await asyncio.gather(*(self.initiate_stk_push(*payment) for payment in payments))
+
+    async def check_transaction_statuses(self, checkout_request_ids):
+        """Query many transactions concurrently; returns checkout_request_id -> response (None on failure)"""
+        checkout_request_ids = list(checkout_request_ids)
+        responses = await asyncio.gather(*(self.check_transaction_status(checkout_request_id)
+                                           for checkout_request_id in checkout_request_ids))
+        return dict(zip(checkout_request_ids, responses))
+
+
+def run_coroutine(coro, timeout=None):
+    """Run a coroutine on the process-wide background event loop and wait for its result"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="mpesa-event-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result(timeout)
+
+
+def get_background_client():
+    """Get the AsyncMpesaDarajaAPI that MpesaDarajaAPI instances share on the background loop"""
+    global _background_client
+    with _loop_lock:
+        if _background_client is None:
+            _background_client = AsyncMpesaDarajaAPI()
+        return _background_client
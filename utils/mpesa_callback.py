@@ -0,0 +1,254 @@
+"""
+M-Pesa STK callback receiver
+
+Daraja posts the outcome of every STK push to MPESA_CALLBACK_URL. This small
+HTTP service parses the Body.stkCallback payload and records the outcome with
+save_payment, keyed by CheckoutRequestID and M-Pesa receipt, so repeated
+deliveries update a single payment row; the Payment page only reads the
+payment status:
+
+    python -m utils.mpesa_callback --port 8080
+    python -m utils.mpesa_callback --replay data/mpesa_callbacks/success.json
+
+Set MPESA_CALLBACK_URL to https://<host>/mpesa/callback?token=<MPESA_CALLBACK_TOKEN>;
+posts without the token are rejected, and the server refuses to start without
+one unless --insecure is given (local testing only). --replay records saved
+payloads without a server.
+
+A completed payment is only credited for the amount of the push it answers
+(or MPESA_EXPECTED_AMOUNT). A success for a push with no pending payment is
+checked with Daraja's status query before it is recorded.
+"""
+
+import argparse
+import hmac
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from decouple import config
+
+from .database import find_user_ids_by_phone, flush_writes, get_payment_by_checkout_request, save_payment
+from .mpesa_integration import MpesaDarajaAPI, mpesa_configured
+
+MPESA_CALLBACK_PATH = config('MPESA_CALLBACK_PATH', default='/mpesa/callback')
+MPESA_CALLBACK_TOKEN = config('MPESA_CALLBACK_TOKEN', default='')
+# Price of a career report in KES, for successful pushes that have no pending payment
+MPESA_EXPECTED_AMOUNT = config('MPESA_EXPECTED_AMOUNT', default=20.0, cast=float)
+MAX_CALLBACK_BYTES = 64 * 1024
+
+# Daraja ResultCode -> payment status; other non-zero codes are failures
+RESULT_STATUSES = {
+    0: 'completed',
+    1032: 'cancelled'  # Request cancelled by the user
+}
+
+
+def parse_stk_callback(payload):
+    """
+    Read the fields of an STK callback payload.
+
+    Args:
+        payload (dict): The JSON Daraja posted ({"Body": {"stkCallback": {...}}})
+
+    Returns:
+        dict: merchant_request_id, checkout_request_id, result_code, result_desc, status,
+            and amount, mpesa_receipt, phone and transaction_date (None unless the payment succeeded)
+
+    Raises:
+        ValueError: If the payload is not an STK callback
+    """
+    try:
+        callback = payload['Body']['stkCallback']
+        checkout_request_id = callback['CheckoutRequestID']
+        result_code = int(callback['ResultCode'])
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Not an STK callback: missing or invalid {e}") from e
+    if not checkout_request_id:
+        raise ValueError("Not an STK callback: empty CheckoutRequestID")
+
+    items = callback.get('CallbackMetadata', {}).get('Item', [])
+    metadata = {item.get('Name'): item.get('Value') for item in items if isinstance(item, dict)}
+    amount, receipt, phone = metadata.get('Amount'), metadata.get('MpesaReceiptNumber'), metadata.get('PhoneNumber')
+    return {
+        'merchant_request_id': callback.get('MerchantRequestID'),
+        'checkout_request_id': checkout_request_id,
+        'result_code': result_code,
+        'result_desc': callback.get('ResultDesc'),
+        'status': RESULT_STATUSES.get(result_code, 'failed'),
+        'amount': float(amount) if amount is not None else None,
+        'mpesa_receipt': str(receipt).strip().upper() if receipt else None,
+        'phone': str(phone) if phone is not None else None,
+        'transaction_date': str(metadata['TransactionDate']) if metadata.get('TransactionDate') else None
+    }
+
+
+def query_checkout_status(checkout_request_id):
+    """Ask Daraja for the outcome of an STK push; None if M-Pesa is not configured or the query failed"""
+    if not mpesa_configured():
+        return None
+    return MpesaDarajaAPI().check_transaction_status(checkout_request_id)
+
+
+def record_stk_callback(payload, check_status=query_checkout_status):
+    """
+    Store the outcome of an STK push; safe to call again with the same payload.
+
+    The payment saved when the push was initiated gives the user and the amount due.
+    A successful push without one is only recorded once check_status confirms it with
+    Daraja; it is then matched to the newest user registered with the phone. A success
+    for a different amount than was due is recorded as failed.
+
+    Args:
+        payload (dict): The JSON Daraja posted
+        check_status: Callable(checkout_request_id) returning the Daraja status query response or None
+
+    Returns:
+        dict: parse_stk_callback fields plus user_id (None if nothing was recorded)
+    """
+    callback = parse_stk_callback(payload)
+    callback['user_id'] = None
+    checkout_request_id = callback['checkout_request_id']
+    payment = get_payment_by_checkout_request(checkout_request_id)
+    if payment is not None:
+        user_id = payment['user_id']
+        amount_due = float(payment['amount'])
+    elif callback['status'] != 'completed':
+        print(f"❌ No pending payment for STK callback {checkout_request_id} ({callback['status']}); not recorded")
+        return callback
+    else:
+        response = check_status(checkout_request_id)
+        if not response or str(response.get('ResultCode')) != '0':
+            print(f"❌ Daraja did not confirm STK callback {checkout_request_id}; not recorded")
+            return callback
+        user_ids = find_user_ids_by_phone(callback['phone']) if callback['phone'] else []
+        if not user_ids:
+            print(f"❌ No user for STK callback {checkout_request_id} ({callback['status']}); not recorded")
+            return callback
+        user_id = user_ids[0]
+        amount_due = MPESA_EXPECTED_AMOUNT
+
+    if callback['status'] == 'completed' and callback['amount'] != amount_due:
+        print(f"❌ STK callback {checkout_request_id} paid KES {callback['amount']}, expected KES {amount_due}; "
+              f"recorded as failed")
+        callback['status'] = 'failed'
+
+    callback['user_id'] = user_id
+    save_payment(user_id, amount_due, f"CAREER_{user_id}", callback['status'],
+                 checkout_request_id=checkout_request_id, mpesa_receipt=callback['mpesa_receipt'])
+    return callback
+
+
+class CallbackHandler(BaseHTTPRequestHandler):
+    """Accepts STK callbacks on MPESA_CALLBACK_PATH and answers GET /health"""
+
+    server_version = "CareerGuideCallback/1.0"
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _authorized(self, url):
+        if not MPESA_CALLBACK_TOKEN:
+            # Only a server started with --insecure accepts posts while no token is configured
+            return getattr(self.server, 'insecure', False)
+        token = parse_qs(url.query).get('token', [''])[0]
+        return hmac.compare_digest(token, MPESA_CALLBACK_TOKEN)
+
+    def do_GET(self):
+        if urlsplit(self.path).path == '/health':
+            self._reply(200, {'status': 'ok'})
+        else:
+            self._reply(404, {'ResultCode': 1, 'ResultDesc': 'Not found'})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != MPESA_CALLBACK_PATH:
+            self._reply(404, {'ResultCode': 1, 'ResultDesc': 'Not found'})
+            return
+        if not self._authorized(url):
+            self._reply(403, {'ResultCode': 1, 'ResultDesc': 'Forbidden'})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if not 0 < length <= MAX_CALLBACK_BYTES:
+            self._reply(413 if length else 400, {'ResultCode': 1, 'ResultDesc': 'Bad request'})
+            return
+
+        try:
+            callback = record_stk_callback(json.loads(self.rfile.read(length)))
+        except ValueError as e:
+            self._reply(400, {'ResultCode': 1, 'ResultDesc': str(e)})
+            return
+        except Exception as e:
+            print(f"❌ Error recording STK callback: {e}")
+            self._reply(500, {'ResultCode': 1, 'ResultDesc': 'Not recorded'})
+            return
+        if callback['user_id'] is not None:
+            print(f"✅ STK callback {callback['checkout_request_id']}: {callback['status']} (user {callback['user_id']})")
+        self._reply(200, {'ResultCode': 0, 'ResultDesc': 'Accepted'})
+
+    def log_message(self, format, *args):
+        # The default log line carries the request path, and with it the callback token
+        pass
+
+
+def make_server(host='0.0.0.0', port=8080, insecure=False):
+    """
+    Create the callback HTTP server.
+
+    Raises:
+        RuntimeError: If MPESA_CALLBACK_TOKEN is not set and insecure is False
+    """
+    if not MPESA_CALLBACK_TOKEN and not insecure:
+        raise RuntimeError("MPESA_CALLBACK_TOKEN is not set: anyone could post payment outcomes "
+                           "(use --insecure for local testing only)")
+    server = ThreadingHTTPServer((host, port), CallbackHandler)
+    server.daemon_threads = True
+    server.insecure = insecure
+    return server
+
+
+def serve(host='0.0.0.0', port=8080, insecure=False):
+    """Receive STK callbacks until interrupted"""
+    server = make_server(host, port, insecure)
+    if not MPESA_CALLBACK_TOKEN:
+        print("⚠️ MPESA_CALLBACK_TOKEN is not set; accepting unauthenticated callbacks (--insecure)")
+    print(f"✅ Receiving M-Pesa callbacks on http://{host}:{port}{MPESA_CALLBACK_PATH}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        flush_writes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Receive M-Pesa STK callbacks and record payment outcomes")
+    parser.add_argument('--host', default='0.0.0.0', help="Address to listen on")
+    parser.add_argument('--port', type=int, default=8080, help="Port to listen on")
+    parser.add_argument('--replay', nargs='+', metavar='FILE',
+                        help="Record saved callback payloads (JSON files) instead of serving")
+    parser.add_argument('--insecure', action='store_true',
+                        help="Accept callbacks without MPESA_CALLBACK_TOKEN (local testing only)")
+    args = parser.parse_args()
+
+    if not args.replay:
+        try:
+            serve(args.host, args.port, args.insecure)
+        except RuntimeError as e:
+            parser.error(str(e))
+        return
+    for path in args.replay:
+        with open(path, encoding='utf-8') as f:
+            callback = record_stk_callback(json.load(f))
+        print(json.dumps(callback, indent=2))
+    flush_writes()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Shared Daraja OAuth token cache
+
+Every worker process reads the access token from one small SQLite file
+(MPESA_TOKEN_CACHE), so new MpesaDarajaAPI instances, extra workers and
+restarts reuse a live token instead of requesting their own. A token is
+refreshed in a background thread once it is within MPESA_TOKEN_REFRESH_MARGIN
+seconds of expiry, while callers keep using the current one; only when there
+is no usable token does a caller wait for the fetch.
+
+Fetches are single-flight: threads of one process share a lock, and
+processes serialize on the cache file's write lock and re-check the cache
+once they hold it, so a cold or expiring cache costs one OAuth call however
+many callers arrive together.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from decouple import config
+
+TOKEN_CACHE_PATH = config('MPESA_TOKEN_CACHE', default='mpesa_token_cache.db')
+TOKEN_REFRESH_MARGIN = config('MPESA_TOKEN_REFRESH_MARGIN', default=300, cast=int)
+# Tokens are not used in their last seconds, in case the clocks of the workers and Daraja drift
+TOKEN_EXPIRY_SKEW = 30
+
+TOKEN_SCHEMA = """CREATE TABLE IF NOT EXISTS oauth_tokens (
+                      cache_key TEXT PRIMARY KEY,
+                      access_token TEXT NOT NULL,
+                      expires_at REAL NOT NULL,
+                      fetched_at REAL NOT NULL
+                  )"""
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def token_cache_key(base_url, consumer_key):
+    """Cache key of one Daraja app (the consumer key itself is not stored)"""
+    return hashlib.sha256(f"{base_url}|{consumer_key}".encode('utf-8')).hexdigest()[:32]
+
+
+class TokenProvider:
+    """
+    Access token for one Daraja app, cached in memory and in the shared file.
+
+    Args:
+        cache_key (str): See token_cache_key
+        fetch (callable): Requests a new token; returns (access_token, expires_in seconds) or raises
+        path (str): SQLite cache file shared by every worker
+        refresh_margin (int): Seconds before expiry at which the background refresh starts
+        lock_timeout (float): Longest wait for another process's fetch
+    """
+
+    def __init__(self, cache_key, fetch, path=TOKEN_CACHE_PATH, refresh_margin=TOKEN_REFRESH_MARGIN,
+                 lock_timeout=60):
+        self.cache_key = cache_key
+        self.fetch = fetch
+        self.path = path
+        self.refresh_margin = refresh_margin
+        self.lock_timeout = lock_timeout
+        self._token = None
+        self._expires_at = 0.0
+        self._fetch_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False
+        self._schema_ready = False
+        self.stats = {'memory_hits': 0, 'cache_hits': 0, 'fetches': 0, 'background_refreshes': 0, 'errors': 0}
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.lock_timeout, isolation_level=None)
+        if not self._schema_ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(TOKEN_SCHEMA)
+            try:
+                # The file holds bearer tokens
+                os.chmod(self.path, 0o600)
+            except OSError:
+                pass
+            self._schema_ready = True
+        return conn
+
+    def _usable(self, expires_at, now):
+        return now < expires_at - TOKEN_EXPIRY_SKEW
+
+    def _fresh(self, expires_at, now):
+        return now < expires_at - max(self.refresh_margin, TOKEN_EXPIRY_SKEW)
+
+    def _read(self, conn):
+        row = conn.execute("SELECT access_token, expires_at FROM oauth_tokens WHERE cache_key = ?",
+                           (self.cache_key,)).fetchone()
+        if row is not None:
+            self._token, self._expires_at = row
+        return row
+
+    def cached_token(self):
+        """Get the in-memory token if it is not due for a refresh, else None (never blocks)"""
+        if self._token and self._fresh(self._expires_at, time.time()):
+            self.stats['memory_hits'] += 1
+            return self._token
+        return None
+
+    def get_token(self):
+        """Get a usable access token, fetching one only when no worker holds one"""
+        token = self.cached_token()
+        if token:
+            return token
+
+        now = time.time()
+
+        try:
+            conn = self._connect()
+            try:
+                self._read(conn)
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"❌ Token cache unavailable ({e}); using the in-memory token only")
+
+        if self._token and self._usable(self._expires_at, now):
+            self.stats['cache_hits'] += 1
+            if not self._fresh(self._expires_at, now):
+                self._refresh_in_background()
+            return self._token
+        return self.refresh()
+
+    def refresh(self, force=False):
+        """
+        Fetch a new token unless another thread or process just did.
+
+        Args:
+            force (bool): Replace the cached token even if it is still fresh (e.g. Daraja rejected it)
+
+        Returns:
+            str: The access token
+        """
+        stale_token = self._token if force else None
+        with self._fetch_lock:
+            try:
+                conn = self._connect()
+            except sqlite3.Error as e:
+                print(f"❌ Token cache unavailable ({e}); fetching without it")
+                return self._fetch(None)
+            try:
+                # Holding the write lock during the fetch makes other processes wait here, then reuse its token
+                conn.execute("BEGIN IMMEDIATE")
+                row = self._read(conn)
+                if row is not None and row[0] != stale_token and self._fresh(row[1], time.time()):
+                    conn.commit()
+                    return self._token
+                token = self._fetch(conn)
+                conn.commit()
+                return token
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            finally:
+                conn.close()
+
+    def _fetch(self, conn):
+        try:
+            access_token, expires_in = self.fetch()
+        except Exception:
+            self.stats['errors'] += 1
+            raise
+        fetched_at = time.time()
+        self.stats['fetches'] += 1
+        self._token, self._expires_at = access_token, fetched_at + float(expires_in)
+        if conn is not None:
+            conn.execute("""INSERT INTO oauth_tokens (cache_key, access_token, expires_at, fetched_at)
+                            VALUES (?, ?, ?, ?)
+                            ON CONFLICT(cache_key) DO UPDATE SET access_token = excluded.access_token,
+                                expires_at = excluded.expires_at, fetched_at = excluded.fetched_at""",
+                         (self.cache_key, self._token, self._expires_at, fetched_at))
+        return self._token
+
+    def _refresh_in_background(self):
+        with self._refresh_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+                self.stats['background_refreshes'] += 1
+            except Exception as e:
+                print(f"❌ Background token refresh failed: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="mpesa-token-refresh", daemon=True).start()
+
+
+def get_token_provider(base_url, consumer_key, fetch, path=TOKEN_CACHE_PATH):
+    """Get the process-wide TokenProvider of a Daraja app (created with fetch on first use)"""
+    key = token_cache_key(base_url, consumer_key)
+    with _providers_lock:
+        provider = _providers.get((key, path))
+        if provider is None:
+            provider = _providers[(key, path)] = TokenProvider(key, fetch, path)
+        return provider
@@ -0,0 +1,283 @@
+"""
+Status polling for pending STK pushes
+
+When a callback is late or lost, the poller asks Daraja for the outcome of
+each pending checkout (a payment saved as 'pending' with a CheckoutRequestID)
+and records it the way the callback receiver would:
+
+    python -m utils.payment_poller --rps 20 --report-every 60
+
+Checkouts wait in a heap ordered by when each is next due. A checkout is first
+polled MPESA_POLL_FIRST_DELAY seconds after its push, then again with
+exponential backoff and jitter up to MPESA_POLL_MAX_DELAY seconds, until
+Daraja returns a final result code (TERMINAL_RESULT_CODES) or the push is
+MPESA_POLL_MAX_AGE seconds old. Any other code, such as 4999 (still under
+processing), is polled again. All polls share one requests-per-second
+budget (MPESA_POLL_RPS), however many checkouts are due. The pending list is
+re-read every MPESA_POLL_SYNC_INTERVAL seconds, which queues new pushes and
+drops checkouts the callback receiver has already settled.
+"""
+
+import argparse
+import asyncio
+import heapq
+import itertools
+import json
+import random
+import time
+from collections import deque
+
+from decouple import config
+
+from .database import flush_writes, get_pending_checkouts, save_payment
+from .mpesa_callback import RESULT_STATUSES
+
+POLL_RPS = config('MPESA_POLL_RPS', default=10.0, cast=float)
+POLL_CONCURRENCY = config('MPESA_POLL_CONCURRENCY', default=20, cast=int)
+POLL_FIRST_DELAY = config('MPESA_POLL_FIRST_DELAY', default=30.0, cast=float)
+POLL_BASE_DELAY = config('MPESA_POLL_BASE_DELAY', default=15.0, cast=float)
+POLL_MAX_DELAY = config('MPESA_POLL_MAX_DELAY', default=300.0, cast=float)
+POLL_MAX_AGE = config('MPESA_POLL_MAX_AGE', default=3600, cast=int)
+POLL_SYNC_INTERVAL = config('MPESA_POLL_SYNC_INTERVAL', default=15.0, cast=float)
+
+# STK query ResultCodes that settle a push, recorded with RESULT_STATUSES (failed unless listed there)
+TERMINAL_RESULT_CODES = frozenset({
+    0,     # paid
+    1,     # insufficient balance
+    1001,  # the subscriber has another transaction in progress
+    1019,  # transaction expired
+    1025,  # the push could not be sent
+    1032,  # cancelled by the user
+    1037,  # the phone could not be reached
+    2001,  # wrong PIN
+    9999   # the push could not be sent
+})
+
+
+class RateLimiter:
+    """Token bucket: acquire() waits until one more request fits in `rate` per second"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        # A small bucket keeps every one-second window close to the rate, even after an idle spell
+        self.capacity = burst or max(1.0, rate / 20)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class PaymentPoller:
+    """
+    Polls Daraja for the outcome of pending checkouts and records it.
+
+    Args:
+        api: AsyncMpesaDarajaAPI to query; one is created (and closed) by run() when None
+        rps (float): Most status queries per second
+        concurrency (int): Most status queries in flight
+        first_delay (float): Seconds after the push before the first poll
+        base_delay (float): Wait after the first unsettled poll; doubles after each one
+        max_delay (float): Longest wait between polls of one checkout
+        max_age (int): Seconds after the push at which a checkout is given up
+        sync_interval (float): Seconds between reads of the pending payments
+    """
+
+    def __init__(self, api=None, rps=POLL_RPS, concurrency=POLL_CONCURRENCY, first_delay=POLL_FIRST_DELAY,
+                 base_delay=POLL_BASE_DELAY, max_delay=POLL_MAX_DELAY, max_age=POLL_MAX_AGE,
+                 sync_interval=POLL_SYNC_INTERVAL):
+        self.api = api
+        self.limiter = RateLimiter(rps)
+        self.concurrency = concurrency
+        self.first_delay = first_delay
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_age = max_age
+        self.sync_interval = sync_interval
+        # (due, seq, checkout_request_id); an entry is live only while its due matches the checkout's
+        self._heap = []
+        self._seq = itertools.count()
+        self._checkouts = {}
+        # checkout_request_id -> when this poller settled it, until a sync no longer sees it pending
+        self._settled = {}
+        self._lags = deque(maxlen=1000)
+        self._started = None
+        self.metrics = {'polls': 0, 'unsettled': 0, 'settled': 0, 'completed': 0, 'failed': 0, 'cancelled': 0,
+                        'expired': 0, 'settled_elsewhere': 0, 'errors': 0}
+
+    def _schedule(self, checkout_request_id, checkout, due):
+        checkout['due'] = due
+        heapq.heappush(self._heap, (due, next(self._seq), checkout_request_id))
+
+    async def sync(self):
+        """Queue new pending checkouts and drop the ones settled elsewhere (e.g. by a callback)"""
+        read_at = time.time()
+        payments = await asyncio.to_thread(get_pending_checkouts, self.max_age)
+        now = time.time()
+        pending = {payment['checkout_request_id']: payment for payment in payments}
+        for checkout_request_id, checkout in list(self._checkouts.items()):
+            if checkout_request_id not in pending and not checkout['in_flight']:
+                del self._checkouts[checkout_request_id]
+                # Pushes older than max_age drop out of the pending read without being settled
+                expired = now >= checkout['created'] + self.max_age
+                self.metrics['expired' if expired else 'settled_elsewhere'] += 1
+        # Settled while the read ran: the read may still have seen them pending
+        self._settled = {checkout_request_id: settled_at for checkout_request_id, settled_at in self._settled.items()
+                         if settled_at >= read_at}
+        for checkout_request_id, payment in pending.items():
+            if checkout_request_id in self._checkouts or checkout_request_id in self._settled:
+                continue
+            checkout = dict(payment, created=now - float(payment['age_seconds']), attempts=0, in_flight=False)
+            self._checkouts[checkout_request_id] = checkout
+            self._schedule(checkout_request_id, checkout, max(now, checkout['created'] + self.first_delay))
+
+    def _backoff(self, checkout_request_id, checkout):
+        checkout['attempts'] += 1
+        delay = min(self.max_delay, self.base_delay * 2 ** (checkout['attempts'] - 1))
+        # Equal jitter: checkouts pushed together drift apart instead of polling in lockstep
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        now = time.time()
+        deadline = checkout['created'] + self.max_age
+        if now >= deadline:
+            del self._checkouts[checkout_request_id]
+            self.metrics['expired'] += 1
+            return
+        self._schedule(checkout_request_id, checkout, min(now + delay, deadline))
+
+    async def _poll(self, checkout_request_id, checkout):
+        try:
+            response = await self.api.check_transaction_status(checkout_request_id)
+            self.metrics['polls'] += 1
+            result_code = response.get('ResultCode') if response else None
+            if result_code in (None, '') or int(result_code) not in TERMINAL_RESULT_CODES:
+                # Still being processed (an error status or a code such as 4999) or the query failed
+                self.metrics['unsettled'] += 1
+                if checkout_request_id in self._checkouts:
+                    self._backoff(checkout_request_id, checkout)
+                return
+
+            status = RESULT_STATUSES.get(int(result_code), 'failed')
+            user_id = checkout['user_id']
+            await asyncio.to_thread(save_payment, user_id, checkout['amount'],
+                                    checkout['mpesa_code'] or f"CAREER_{user_id}", status,
+                                    checkout_request_id=checkout_request_id)
+            self._checkouts.pop(checkout_request_id, None)
+            self._settled[checkout_request_id] = time.time()
+            self.metrics['settled'] += 1
+            self.metrics[status] += 1
+        except Exception as e:
+            print(f"❌ Error polling checkout {checkout_request_id}: {e}")
+            self.metrics['errors'] += 1
+            if checkout_request_id in self._checkouts:
+                self._backoff(checkout_request_id, checkout)
+        finally:
+            checkout['in_flight'] = False
+            self._slots.release()
+
+    async def run(self, duration=None, report_every=None):
+        """
+        Poll until cancelled, or for duration seconds.
+
+        Args:
+            duration (float): Seconds to run; forever when None
+            report_every (float): Print stats() every this many seconds
+
+        Returns:
+            dict: stats() when the run ends
+        """
+        own_api = self.api is None
+        if own_api:
+            from .mpesa_async import AsyncMpesaDarajaAPI
+            self.api = AsyncMpesaDarajaAPI(concurrency=self.concurrency)
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._started = time.monotonic()
+        end = self._started + duration if duration is not None else None
+        next_sync = next_report = self._started
+        tasks = set()
+        try:
+            while end is None or time.monotonic() < end:
+                if time.monotonic() >= next_sync:
+                    await self.sync()
+                    next_sync = time.monotonic() + self.sync_interval
+                if report_every and time.monotonic() >= next_report:
+                    print(json.dumps(self.stats()))
+                    next_report = time.monotonic() + report_every
+
+                now = time.time()
+                if not self._heap or self._heap[0][0] > now:
+                    wake = next_sync - time.monotonic()
+                    if self._heap:
+                        wake = min(wake, self._heap[0][0] - now)
+                    if end is not None:
+                        wake = min(wake, end - time.monotonic())
+                    await asyncio.sleep(max(wake, 0.01))
+                    continue
+
+                due, _, checkout_request_id = heapq.heappop(self._heap)
+                checkout = self._checkouts.get(checkout_request_id)
+                if checkout is None or checkout['due'] != due:
+                    continue
+                await self.limiter.acquire()
+                await self._slots.acquire()
+                checkout['in_flight'] = True
+                self._lags.append(time.time() - due)
+                task = asyncio.create_task(self._poll(checkout_request_id, checkout))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            if own_api:
+                await self.api.aclose()
+                self.api = None
+        return self.stats()
+
+    def stats(self):
+        """
+        Throughput and queue-age metrics.
+
+        Returns:
+            dict: metrics counters plus queued and due checkouts, the age of the oldest
+                queued push, polls per second, and how late polls start (p50/p95 seconds)
+        """
+        now = time.time()
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        lags = sorted(self._lags)
+        return dict(
+            self.metrics,
+            queued=len(self._checkouts),
+            due=sum(1 for checkout in self._checkouts.values() if checkout['due'] <= now),
+            oldest_age_seconds=round(max((now - checkout['created'] for checkout in self._checkouts.values()),
+                                         default=0.0), 1),
+            polls_per_second=round(self.metrics['polls'] / elapsed, 2) if elapsed else 0.0,
+            lag_p50_seconds=round(lags[len(lags) // 2], 3) if lags else 0.0,
+            lag_p95_seconds=round(lags[int(len(lags) * 0.95)], 3) if lags else 0.0
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Poll Daraja for the outcome of pending M-Pesa checkouts")
+    parser.add_argument('--rps', type=float, default=POLL_RPS, help="Most status queries per second")
+    parser.add_argument('--concurrency', type=int, default=POLL_CONCURRENCY, help="Most status queries in flight")
+    parser.add_argument('--duration', type=float, help="Seconds to run (default: until interrupted)")
+    parser.add_argument('--report-every', type=float, default=60, help="Seconds between stats lines (0 = off)")
+    args = parser.parse_args()
+
+    poller = PaymentPoller(rps=args.rps, concurrency=args.concurrency)
+    try:
+        report = asyncio.run(poller.run(args.duration, args.report_every))
+    except KeyboardInterrupt:
+        report = poller.stats()
+    flush_writes()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
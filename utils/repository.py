@@ -0,0 +1,2118 @@
+"""
+Storage repositories for the KCSE Career Guidance Tool
+
+utils.database exposes the storage functions the pages call; this module
+holds the interchangeable backends behind them:
+
+    memory   - dicts in process memory, for tests and benchmarks
+    session  - st.session_state, per browser session (the original behaviour)
+    sqlite   - career_guide.db, shared by every session and worker process
+    mysql    - a MySQL server (a local instance is enough), via mysql-connector-python
+
+All of them implement StorageRepository and return the same shapes, so the
+backend can be chosen per deployment with CAREER_GUIDE_DB_BACKEND and
+compared with python -m utils.storage_benchmark.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+
+import streamlit as st
+from decouple import config
+
+from . import analytics
+from .career_engine import CareerEngine, get_career_engine
+from .retention import RetentionJob, ARCHIVE_DIR, USER_CHILD_TABLES, retention_cutoff
+from .write_behind import IdAllocator, WriteBehindWriter
+
+DB_PATH = config('CAREER_GUIDE_DB_PATH',
+                 default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'career_guide.db'))
+# Idle connections kept open for reuse across Streamlit reruns
+DB_POOL_SIZE = config('CAREER_GUIDE_DB_POOL_SIZE', default=8, cast=int)
+# Optional write-behind: queue SQLite saves and group-commit them from a background thread
+DB_WRITE_BEHIND = config('CAREER_GUIDE_DB_WRITE_BEHIND', default=False, cast=bool)
+DB_FLUSH_MS = config('CAREER_GUIDE_DB_FLUSH_MS', default=50, cast=int)
+DB_BATCH_SIZE = config('CAREER_GUIDE_DB_BATCH_SIZE', default=200, cast=int)
+
+MYSQL_HOST = config('CAREER_GUIDE_MYSQL_HOST', default='localhost')
+MYSQL_PORT = config('CAREER_GUIDE_MYSQL_PORT', default=3306, cast=int)
+MYSQL_USER = config('CAREER_GUIDE_MYSQL_USER', default='career_guide')
+MYSQL_PASSWORD = config('CAREER_GUIDE_MYSQL_PASSWORD', default='')
+MYSQL_DATABASE = config('CAREER_GUIDE_MYSQL_DATABASE', default='career_guide')
+MYSQL_POOL_SIZE = config('CAREER_GUIDE_MYSQL_POOL_SIZE', default=8, cast=int)
+
+# Same tables as the shipped career_guide.db
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    email TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS user_subjects (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    subject_name TEXT NOT NULL,
+    grade TEXT NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+CREATE TABLE IF NOT EXISTS user_skills (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    skill TEXT NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+CREATE TABLE IF NOT EXISTS user_interests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    interest TEXT NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+CREATE TABLE IF NOT EXISTS payments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    amount REAL NOT NULL,
+    mpesa_code TEXT,
+    checkout_request_id TEXT,
+    status TEXT DEFAULT 'pending',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+CREATE TABLE IF NOT EXISTS career_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    recommendations TEXT,
+    generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+CREATE TABLE IF NOT EXISTS programmes (
+    id INTEGER PRIMARY KEY,
+    cluster_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    UNIQUE (cluster_id, name)
+);
+-- One row per recommended programme; everything else is rebuilt from the cluster table.
+-- Score columns are untyped so ints and floats come back exactly as the engine produced them.
+CREATE TABLE IF NOT EXISTS career_result_items (
+    result_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    cluster_id INTEGER NOT NULL,
+    programme_id INTEGER NOT NULL,
+    match_score NOT NULL,
+    subject_match NOT NULL,
+    skills_match NOT NULL,
+    interests_match NOT NULL,
+    missing_codes TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (result_id, position),
+    FOREIGN KEY (result_id) REFERENCES career_results (id),
+    FOREIGN KEY (programme_id) REFERENCES programmes (id)
+) WITHOUT ROWID;
+-- Cluster table of every engine model version that wrote compact rows, so they are rebuilt
+-- from the table they were generated with even after the data files are reloaded
+CREATE TABLE IF NOT EXISTS result_models (
+    model_version TEXT PRIMARY KEY,
+    clusters TEXT NOT NULL
+);
+"""
+
+# Profile columns added to career_results for compact rows, whose recommendations column is NULL,
+# and the engine model version (see result_models) their items were compacted with
+RESULT_PROFILE_COLUMNS = (
+    ('subjects_count', 'INTEGER'),
+    ('skills_count', 'INTEGER'),
+    ('interests_count', 'INTEGER'),
+    ('primary_interest', 'TEXT'),
+    ('medical_interest', 'INTEGER'),
+    ('model_version', 'TEXT')
+)
+
+# M-Pesa receipt number (e.g. QAZ45WER90) of a confirmed payment, added after the shipped schema
+PAYMENT_COLUMNS = (
+    ('mpesa_receipt', 'TEXT'),
+)
+
+# Payment statuses in the order they can move: a payment never goes back to an earlier one
+PAYMENT_STATUS_RANK = {'pending': 0, 'failed': 1, 'cancelled': 1, 'completed': 2}
+
+# Access paths for the per-user lookups done on every page load
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_users_phone ON users (phone);
+CREATE INDEX IF NOT EXISTS idx_user_subjects_user ON user_subjects (user_id);
+CREATE INDEX IF NOT EXISTS idx_user_skills_user ON user_skills (user_id);
+CREATE INDEX IF NOT EXISTS idx_user_interests_user ON user_interests (user_id);
+CREATE INDEX IF NOT EXISTS idx_payments_user_status ON payments (user_id, status);
+CREATE INDEX IF NOT EXISTS idx_payments_user_created ON payments (user_id, created_at);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_payments_checkout_unique ON payments (checkout_request_id)
+    WHERE checkout_request_id IS NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_payments_receipt_unique ON payments (mpesa_receipt)
+    WHERE mpesa_receipt IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_payments_pending ON payments (created_at)
+    WHERE status = 'pending' AND checkout_request_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_career_results_user_generated ON career_results (user_id, generated_at);
+CREATE INDEX IF NOT EXISTS idx_career_result_items_programme ON career_result_items (cluster_id, programme_id);
+"""
+
+# Statements are module constants so sqlite3's per-connection statement cache reuses them
+INSERT_USER = "INSERT INTO users (name, phone, email) VALUES (?, ?, ?)"
+INSERT_SUBJECT = "INSERT INTO user_subjects (user_id, subject_name, grade) VALUES (?, ?, ?)"
+INSERT_SKILL = "INSERT INTO user_skills (user_id, skill) VALUES (?, ?)"
+INSERT_INTEREST = "INSERT INTO user_interests (user_id, interest) VALUES (?, ?)"
+INSERT_PAYMENT = """INSERT INTO payments (user_id, amount, mpesa_code, checkout_request_id, status)
+                    VALUES (?, ?, ?, ?, ?)"""
+INSERT_RESULT = """INSERT INTO career_results (id, user_id, recommendations, subjects_count, skills_count,
+                                               interests_count, primary_interest, medical_interest, model_version,
+                                               generated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))"""
+INSERT_RESULT_MODEL = "INSERT OR IGNORE INTO result_models (model_version, clusters) VALUES (?, ?)"
+SELECT_RESULT_MODEL = "SELECT clusters FROM result_models WHERE model_version = ?"
+INSERT_PROGRAMME = "INSERT OR IGNORE INTO programmes (cluster_id, name) VALUES (?, ?)"
+INSERT_RESULT_ITEM = """INSERT INTO career_result_items (result_id, position, cluster_id, programme_id, match_score,
+                                                         subject_match, skills_match, interests_match, missing_codes)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+INSERT_USER_WITH_ID = "INSERT INTO users (id, name, phone, email, created_at) VALUES (?, ?, ?, ?, ?)"
+INSERT_PAYMENT_WITH_ID = """INSERT INTO payments (id, user_id, amount, mpesa_code, checkout_request_id, status, created_at)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)"""
+# One row per checkout request and per receipt: a confirmation from the poller, the callback or manual
+# entry updates the row the others created. Statuses only move forward (pending, failed, completed).
+UPSERT_PAYMENT_SET = """mpesa_code = COALESCE(mpesa_code, excluded.mpesa_code),
+        checkout_request_id = COALESCE(checkout_request_id, excluded.checkout_request_id),
+        mpesa_receipt = COALESCE(mpesa_receipt, excluded.mpesa_receipt),
+        status = CASE WHEN excluded.status = 'completed' OR status = 'pending' THEN excluded.status ELSE status END"""
+UPSERT_PAYMENT = f"""INSERT INTO payments (user_id, amount, mpesa_code, checkout_request_id, mpesa_receipt, status)
+                     VALUES (?, ?, ?, ?, ?, ?)
+                     ON CONFLICT (checkout_request_id) WHERE checkout_request_id IS NOT NULL DO UPDATE SET
+                         {UPSERT_PAYMENT_SET}
+                     ON CONFLICT (mpesa_receipt) WHERE mpesa_receipt IS NOT NULL DO UPDATE SET
+                         {UPSERT_PAYMENT_SET}
+                     RETURNING id, amount, status, created_at"""
+SELECT_PAYMENTS_BY_KEYS = """SELECT id, user_id, amount, checkout_request_id, mpesa_receipt, status, created_at
+                             FROM payments
+                             WHERE checkout_request_id = ? OR mpesa_receipt = ?"""
+SELECT_USER = "SELECT id, name, phone, email, created_at FROM users WHERE id = ?"
+SELECT_SUBJECTS = "SELECT subject_name, grade FROM user_subjects WHERE user_id = ? ORDER BY id"
+SELECT_SKILLS = "SELECT skill FROM user_skills WHERE user_id = ? ORDER BY id"
+SELECT_INTERESTS = "SELECT interest FROM user_interests WHERE user_id = ? ORDER BY id"
+SELECT_COMPLETED_PAYMENT = "SELECT 1 FROM payments WHERE user_id = ? AND status = 'completed' LIMIT 1"
+SELECT_PAYMENTS = """SELECT id, user_id, amount, mpesa_code, checkout_request_id, mpesa_receipt, status, created_at
+                     FROM payments WHERE user_id = ? ORDER BY created_at DESC, id DESC"""
+SELECT_LATEST_RESULT = """SELECT id, user_id, recommendations, subjects_count, skills_count, interests_count,
+                                 primary_interest, medical_interest, model_version, generated_at
+                          FROM career_results WHERE user_id = ? ORDER BY generated_at DESC, id DESC LIMIT 1"""
+SELECT_RESULT_ITEMS = """SELECT i.cluster_id, p.name, i.match_score, i.subject_match, i.skills_match,
+                                i.interests_match, i.missing_codes
+                         FROM career_result_items i JOIN programmes p ON p.id = i.programme_id
+                         WHERE i.result_id = ? ORDER BY i.position"""
+SELECT_PAYMENT_BY_CHECKOUT = """SELECT id, user_id, amount, mpesa_code, checkout_request_id, mpesa_receipt, status,
+                                       created_at
+                                FROM payments WHERE checkout_request_id = ?"""
+SELECT_PAYMENT_BY_RECEIPT = """SELECT id, user_id, amount, mpesa_code, checkout_request_id, mpesa_receipt, status,
+                                      created_at
+                               FROM payments WHERE mpesa_receipt = ?"""
+SELECT_PENDING_CHECKOUTS = """SELECT id, user_id, amount, mpesa_code, checkout_request_id,
+                                     (julianday('now') - julianday(created_at)) * 86400 AS age_seconds
+                              FROM payments
+                              WHERE status = 'pending' AND checkout_request_id IS NOT NULL
+                                AND created_at >= datetime('now', ?)
+                              ORDER BY created_at"""
+SELECT_USER_IDS_BY_PHONE = "SELECT id FROM users WHERE phone = ? ORDER BY id DESC"
+SELECT_EXPORT_RESULTS = """SELECT r.id, r.user_id, r.generated_at, r.recommendations, u.created_at, u.name, u.phone, u.email
+                           FROM career_results r JOIN users u ON u.id = r.user_id
+                           WHERE r.id > ? ORDER BY r.id LIMIT ?"""
+SELECT_EXPORT_SUBJECTS = """SELECT user_id, subject_name, grade FROM user_subjects
+                            WHERE user_id IN (SELECT value FROM json_each(?)) ORDER BY id"""
+SELECT_EXPORT_SKILLS = """SELECT user_id, skill FROM user_skills
+                          WHERE user_id IN (SELECT value FROM json_each(?)) ORDER BY id"""
+SELECT_EXPORT_INTERESTS = """SELECT user_id, interest FROM user_interests
+                             WHERE user_id IN (SELECT value FROM json_each(?)) ORDER BY id"""
+SELECT_EXPORT_PAID_USERS = """SELECT DISTINCT user_id FROM payments
+                              WHERE status = 'completed' AND user_id IN (SELECT value FROM json_each(?))"""
+SELECT_EXPORT_CAREERS = """SELECT i.result_id, i.cluster_id, p.name, i.match_score
+                           FROM career_result_items i JOIN programmes p ON p.id = i.programme_id
+                           WHERE i.result_id IN (SELECT value FROM json_each(?)) ORDER BY i.result_id, i.position"""
+
+
+def check_payment_owner(existing, user_id, checkout_request_id, mpesa_receipt):
+    """Refuse to merge a payment into rows of another user (e.g. a receipt someone else already claimed)"""
+    for payment in existing:
+        if payment['user_id'] != user_id:
+            raise ValueError(f"Payment {checkout_request_id or mpesa_receipt} is recorded for another user")
+
+
+def sqlite_timestamp():
+    """Current UTC time in the format SQLite's CURRENT_TIMESTAMP uses"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def utc_timestamp():
+    """Current UTC time as an ISO 8601 string, for the memory and session backends"""
+    return datetime.now(timezone.utc).isoformat()
+
+
+def migrate_career_results(conn):
+    """Add the compact-storage profile columns to a career_results table created before them"""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(career_results)")}
+    for column, column_type in RESULT_PROFILE_COLUMNS:
+        if column not in existing:
+            conn.execute(f"ALTER TABLE career_results ADD COLUMN {column} {column_type}")
+
+
+def store_result_model(conn, engine):
+    """Keep the cluster table of engine.model_version, once, so its compact rows can be rebuilt later"""
+    if conn.execute(SELECT_RESULT_MODEL, (engine.model_version,)).fetchone() is None:
+        conn.execute(INSERT_RESULT_MODEL, (engine.model_version, json.dumps(engine.kuccps_clusters, default=dict)))
+
+
+def stamp_result_models(conn, engine):
+    """
+    Assign the current model version to compact rows written before versions were recorded.
+
+    Those rows were compacted against the cluster table in use up to now, so they are
+    pinned to it before a reload can change it.
+    """
+    if conn.execute("SELECT 1 FROM career_results WHERE recommendations IS NULL AND model_version IS NULL "
+                    "LIMIT 1").fetchone() is None:
+        return
+    store_result_model(conn, engine)
+    conn.execute("UPDATE career_results SET model_version = ? WHERE recommendations IS NULL AND model_version IS NULL",
+                 (engine.model_version,))
+
+
+def result_model_engine(clusters):
+    """Engine for a cluster table stored in result_models"""
+    # JSON object keys are strings; the engine indexes clusters by int id
+    return CareerEngine(clusters={int(cluster_id): cluster for cluster_id, cluster in json.loads(clusters).items()})
+
+
+def migrate_payments(conn, adjust_rollups=True):
+    """
+    Add the receipt column and collapse duplicate checkout requests so the unique indexes can be built.
+
+    Of each set of rows sharing a checkout request the most advanced status wins (newest on a tie).
+    With adjust_rollups the removed rows are subtracted from the analytics rollups in the same transaction.
+    Returns the number of rows removed.
+    """
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(payments)")}
+    for column, column_type in PAYMENT_COLUMNS:
+        if column not in existing:
+            conn.execute(f"ALTER TABLE payments ADD COLUMN {column} {column_type}")
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_payments_checkout_unique'").fetchone():
+        return 0
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        duplicates = conn.execute("""SELECT id, amount, checkout_request_id, status, created_at FROM payments
+                                     WHERE checkout_request_id IN (SELECT checkout_request_id FROM payments
+                                         WHERE checkout_request_id IS NOT NULL
+                                         GROUP BY checkout_request_id HAVING COUNT(*) > 1)""").fetchall()
+        keep = {}
+        for row in duplicates:
+            rank = (PAYMENT_STATUS_RANK.get(row['status'], 0), row['id'])
+            if row['checkout_request_id'] not in keep or rank > keep[row['checkout_request_id']]:
+                keep[row['checkout_request_id']] = rank
+        removed = [row for row in duplicates if keep[row['checkout_request_id']][1] != row['id']]
+        conn.executemany("DELETE FROM payments WHERE id = ?", [(row['id'],) for row in removed])
+        if adjust_rollups:
+            analytics.rollup_payment_deltas(conn, analytics.payment_deltas(removed))
+        conn.execute("DROP INDEX IF EXISTS idx_payments_checkout")
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+    return len(removed)
+
+
+class SQLiteConnectionPool:
+    """
+    Pool of SQLite connections shared by all Streamlit sessions in the process.
+
+    A connection is used by one thread at a time and returned to the pool
+    afterwards, so connections outlive the script-runner thread of a rerun.
+    """
+
+    def __init__(self, path, max_idle=DB_POOL_SIZE):
+        self.path = path
+        self.max_idle = max_idle
+        self._idle = queue.LifoQueue()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                               check_same_thread=False, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        # Must precede journal_mode, which writes the header of a new file; existing files need one VACUUM
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of the with-block"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            if self._idle.qsize() < self.max_idle:
+                self._idle.put(conn)
+            else:
+                conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """Borrow a connection and run the with-block as one write transaction"""
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def close(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def synchronized(method):
+    """Run a repository method while holding the repository's lock"""
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return locked
+
+
+def career_summary(recommendations):
+    """(cluster_id, career, match_score) of each recommendation in a recommendations dict, best first"""
+    summary = []
+    for entry in recommendations.get('all_careers', []):
+        match = analytics.CLUSTER_LABEL_PATTERN.match(entry.get('cluster', ''))
+        if match:
+            summary.append((int(match.group(1)), entry.get('career'), entry.get('match_score')))
+    return summary
+
+
+def export_records(results, subjects, skills, interests, paid_user_ids, careers):
+    """Assemble iter_export_chunks records from the rows fetched for one chunk"""
+    return [{
+        'result_id': row['id'],
+        'user_id': row['user_id'],
+        'generated_at': row['generated_at'],
+        'registered_at': row['created_at'],
+        'name': row['name'],
+        'phone': row['phone'],
+        'email': row['email'],
+        'subjects': subjects.get(row['user_id'], {}),
+        'skills': skills.get(row['user_id'], []),
+        'interests': interests.get(row['user_id'], []),
+        'paid': row['user_id'] in paid_user_ids,
+        'careers': careers.get(row['id'], [])
+    } for row in results]
+
+
+class StorageRepository:
+    """
+    Interface shared by every storage backend.
+
+    User ids are integers. Timestamps are strings that sort chronologically.
+    Career results come back as the dict generate_recommendations produced.
+    """
+
+    name = None
+
+    def init_db(self):
+        """Create whatever storage the backend needs (safe to call on every rerun)"""
+        raise NotImplementedError
+
+    def save_user_data(self, student_info, subjects_grades, skills_interests):
+        """Store a student and their subjects, skills and interests; return the new user id"""
+        raise NotImplementedError
+
+    def save_payment(self, user_id, amount, mpesa_code, status, checkout_request_id=None, mpesa_receipt=None):
+        """
+        Record a payment.
+
+        Payments with a checkout request id or M-Pesa receipt are upserted: every save for the same
+        checkout request or receipt updates one row, and a completed payment stays completed.
+
+        Raises:
+            ValueError: If the checkout request or receipt is already recorded for another user
+        """
+        raise NotImplementedError
+
+    def save_career_results(self, user_id, recommendations):
+        raise NotImplementedError
+
+    def check_payment_status(self, user_id):
+        """True if the user has a completed payment"""
+        raise NotImplementedError
+
+    def get_user_data(self, user_id):
+        """{'user_info', 'subjects', 'skills', 'interests'} or None"""
+        raise NotImplementedError
+
+    def get_payment_history(self, user_id):
+        """Payment dicts, newest first"""
+        raise NotImplementedError
+
+    def get_career_results(self, user_id):
+        """{'user_id', 'recommendations', 'generated_at'} for the latest result, or None"""
+        raise NotImplementedError
+
+    def get_payment_by_checkout_request(self, checkout_request_id):
+        raise NotImplementedError
+
+    def get_payment_by_receipt(self, mpesa_receipt):
+        raise NotImplementedError
+
+    def get_pending_checkouts(self, max_age_seconds):
+        """
+        Pending payments with a checkout request made in the last max_age_seconds, oldest first.
+
+        Each is a dict of id, user_id, amount, mpesa_code, checkout_request_id and age_seconds.
+        """
+        raise NotImplementedError
+
+    def find_user_ids_by_phone(self, phone):
+        """User ids registered with the phone number, newest first"""
+        raise NotImplementedError
+
+    def get_all_users(self):
+        raise NotImplementedError
+
+    def get_all_payments(self):
+        raise NotImplementedError
+
+    def iter_export_chunks(self, chunk_size=1000):
+        """
+        Yield every career result, oldest first, as lists of at most chunk_size records.
+
+        Each record holds the result and user ids, generated_at, registered_at, name,
+        phone, email, subjects, skills, interests, paid and careers, a list of
+        (cluster_id, career, match_score) best first. Only one chunk is held in memory.
+        """
+        raise NotImplementedError
+
+    def clear_all_data(self):
+        raise NotImplementedError
+
+    def run_retention_job(self, days_old, chunk_size=200, archive_dir=None):
+        """Purge users older than days_old days; return a report dict"""
+        raise NotImplementedError
+
+    def get_daily_stats(self, start_day=None, end_day=None):
+        """Per-day submissions, payments, completed payments, revenue and results, oldest first"""
+        raise NotImplementedError
+
+    def get_cluster_histogram(self, start_day=None, end_day=None, limit=10):
+        """Clusters by how often they were the top recommendation"""
+        raise NotImplementedError
+
+    def get_grade_distribution(self, subject=None, start_day=None, end_day=None):
+        """{subject: {grade: students}}"""
+        raise NotImplementedError
+
+    def rebuild_rollups(self):
+        """Recompute the analytics rollups from the stored rows"""
+        raise NotImplementedError
+
+    def flush(self, timeout=None):
+        """Wait for buffered writes to reach storage"""
+        return True
+
+    def stats(self):
+        return {'backend': self.name}
+
+    def close(self):
+        """Release connections held by the repository"""
+
+
+class InMemoryRepository(StorageRepository):
+    """
+    Keeps data in plain dicts in process memory (for tests and benchmarks).
+
+    Secondary indexes in state['storage_indexes'] give per-user, per-phone and
+    per-checkout lookups without scanning every payment or result.
+    """
+
+    name = 'memory'
+
+    def __init__(self, state=None):
+        self._state = {} if state is None else state
+        self._lock = threading.RLock()
+
+    @property
+    def state(self):
+        return self._state
+
+    @synchronized
+    def init_db(self):
+        if 'users' not in self.state:
+            self.state['users'] = {}
+        if 'user_subjects' not in self.state:
+            self.state['user_subjects'] = {}
+        if 'user_skills' not in self.state:
+            self.state['user_skills'] = {}
+        if 'user_interests' not in self.state:
+            self.state['user_interests'] = {}
+        if 'payments' not in self.state:
+            self.state['payments'] = {}
+        if 'career_results' not in self.state:
+            self.state['career_results'] = {}
+        if 'user_counter' not in self.state:
+            self.state['user_counter'] = 0
+        if 'payment_counter' not in self.state:
+            self.state['payment_counter'] = 0
+        if 'result_counter' not in self.state:
+            self.state['result_counter'] = 0
+        if 'storage_indexes' not in self.state:
+            self.rebuild_indexes()
+        if 'rollups' not in self.state:
+            self.rebuild_rollups()
+
+    @synchronized
+    def rebuild_indexes(self):
+        """Build the secondary indexes from the stored rows"""
+        self.state['storage_indexes'] = {
+            'users_by_phone': {},
+            'payments_by_user': {},
+            'completed_payments': {},
+            'payment_by_checkout': {},
+            'payment_by_receipt': {},
+            'latest_result': {}
+        }
+        for user_id, user in self.state['users'].items():
+            self._index_user(user_id, user)
+        for payment_id, payment in self.state['payments'].items():
+            self._index_payment(payment_id, payment)
+        for result_id, result in self.state['career_results'].items():
+            self._index_result(result_id, result)
+
+    def _indexes(self):
+        if 'storage_indexes' not in self.state:
+            self.rebuild_indexes()
+        return self.state['storage_indexes']
+
+    @synchronized
+    def rebuild_rollups(self):
+        """Recompute the analytics rollups from the stored rows"""
+        rollups = self.state['rollups'] = analytics.new_memory_rollups()
+        for user_id, user in self.state['users'].items():
+            analytics.memory_rollup_user(rollups, user['created_at'][:10],
+                                         self.state['user_subjects'].get(user_id, {}).items())
+        for payment in self.state['payments'].values():
+            analytics.memory_rollup_payment(rollups, payment['created_at'][:10], payment['amount'], payment['status'])
+        for result in self.state['career_results'].values():
+            analytics.memory_rollup_result(rollups, result['generated_at'][:10], result['recommendations'])
+
+    def _rollups(self):
+        if 'rollups' not in self.state:
+            self.rebuild_rollups()
+        return self.state['rollups']
+
+    def _index_user(self, user_id, user):
+        self._indexes()['users_by_phone'].setdefault(user['phone'], []).append(user_id)
+
+    def _unindex_payment(self, payment_id, payment):
+        indexes = self._indexes()
+        indexes['payments_by_user'].get(payment['user_id'], {}).pop(payment_id, None)
+        indexes['completed_payments'].get(payment['user_id'], set()).discard(payment_id)
+        indexes['payment_by_checkout'].pop(payment['checkout_request_id'], None)
+        indexes['payment_by_receipt'].pop(payment.get('mpesa_receipt'), None)
+
+    def _index_payment(self, payment_id, payment):
+        indexes = self._indexes()
+        user_id = payment['user_id']
+        indexes['payments_by_user'].setdefault(user_id, {})[payment_id] = None
+        completed = indexes['completed_payments'].setdefault(user_id, set())
+        if payment['status'] == 'completed':
+            completed.add(payment_id)
+        else:
+            completed.discard(payment_id)
+        if payment['checkout_request_id']:
+            indexes['payment_by_checkout'][payment['checkout_request_id']] = payment_id
+        if payment.get('mpesa_receipt'):
+            indexes['payment_by_receipt'][payment['mpesa_receipt']] = payment_id
+
+    def _index_result(self, result_id, result):
+        latest = self._indexes()['latest_result']
+        current_id = latest.get(result['user_id'])
+        if current_id is None or result['generated_at'] >= self.state['career_results'][current_id]['generated_at']:
+            latest[result['user_id']] = result_id
+
+    @synchronized
+    def save_user_data(self, student_info, subjects_grades, skills_interests):
+        # Generate user ID
+        self.state['user_counter'] += 1
+        user_id = self.state['user_counter']
+
+        # Save user info
+        self.state['users'][user_id] = {
+            'name': student_info['name'],
+            'phone': student_info['phone'],
+            'email': student_info.get('email', ''),
+            'created_at': utc_timestamp()
+        }
+        self._index_user(user_id, self.state['users'][user_id])
+
+        # Save subjects
+        self.state['user_subjects'][user_id] = {}
+        for subject, grade in subjects_grades.items():
+            if grade != "Not Taken" and grade != "Select Grade":
+                self.state['user_subjects'][user_id][subject] = grade
+
+        # Save skills
+        self.state['user_skills'][user_id] = skills_interests.get('skills', [])
+
+        # Save interests
+        self.state['user_interests'][user_id] = skills_interests.get('interests', [])
+
+        analytics.memory_rollup_user(self._rollups(), self.state['users'][user_id]['created_at'][:10],
+                                     self.state['user_subjects'][user_id].items())
+        return user_id
+
+    @synchronized
+    def save_payment(self, user_id, amount, mpesa_code, status, checkout_request_id=None, mpesa_receipt=None):
+        indexes = self._indexes()
+        existing_ids = list(dict.fromkeys(
+            indexes[index].get(key) for index, key in (('payment_by_checkout', checkout_request_id),
+                                                        ('payment_by_receipt', mpesa_receipt))
+            if key and indexes[index].get(key) is not None
+        ))
+        existing = [dict(self.state['payments'][payment_id]) for payment_id in existing_ids]
+        check_payment_owner(existing, user_id, checkout_request_id, mpesa_receipt)
+
+        if not existing_ids:
+            self.state['payment_counter'] += 1
+            payment_id = self.state['payment_counter']
+            self.state['payments'][payment_id] = {
+                'user_id': user_id,
+                'amount': amount,
+                'mpesa_code': mpesa_code,
+                'checkout_request_id': checkout_request_id,
+                'mpesa_receipt': mpesa_receipt,
+                'status': status,
+                'created_at': utc_timestamp()
+            }
+        else:
+            # Same rules as the SQLite upsert: keep the checkout request's row, fill in missing keys,
+            # and only move the status forward
+            payment_id = existing_ids[0]
+            for merged_id in existing_ids[1:]:
+                self._unindex_payment(merged_id, self.state['payments'].pop(merged_id))
+            payment = self.state['payments'][payment_id]
+            self._unindex_payment(payment_id, payment)
+            payment['mpesa_code'] = payment['mpesa_code'] or mpesa_code
+            payment['checkout_request_id'] = payment['checkout_request_id'] or checkout_request_id
+            payment['mpesa_receipt'] = payment.get('mpesa_receipt') or mpesa_receipt
+            if status == 'completed' or payment['status'] == 'pending':
+                payment['status'] = status
+        self._index_payment(payment_id, self.state['payments'][payment_id])
+        for day, payments, completed_payments, revenue in analytics.payment_deltas(existing,
+                                                                                   self.state['payments'][payment_id]):
+            analytics.memory_rollup_payment_delta(self._rollups(), day, payments, completed_payments, revenue)
+
+    @synchronized
+    def save_career_results(self, user_id, recommendations):
+        # A counter, not a timestamp: two saves in the same second must not overwrite each other
+        self.state['result_counter'] += 1
+        result_id = f"result_{user_id}_{self.state['result_counter']}"
+
+        self.state['career_results'][result_id] = {
+            'user_id': user_id,
+            'recommendations': recommendations,
+            'generated_at': utc_timestamp()
+        }
+        self._index_result(result_id, self.state['career_results'][result_id])
+        analytics.memory_rollup_result(self._rollups(), self.state['career_results'][result_id]['generated_at'][:10],
+                                       recommendations)
+
+    @synchronized
+    def check_payment_status(self, user_id):
+        return bool(self._indexes()['completed_payments'].get(user_id))
+
+    @synchronized
+    def get_user_data(self, user_id):
+        if user_id not in self.state['users']:
+            return None
+
+        return {
+            'user_info': {
+                'id': user_id,
+                'name': self.state['users'][user_id]['name'],
+                'phone': self.state['users'][user_id]['phone'],
+                'email': self.state['users'][user_id]['email'],
+                'created_at': self.state['users'][user_id]['created_at']
+            },
+            'subjects': self.state['user_subjects'].get(user_id, {}),
+            'skills': self.state['user_skills'].get(user_id, []),
+            'interests': self.state['user_interests'].get(user_id, [])
+        }
+
+    def _payment_record(self, payment_id):
+        payment = self.state['payments'][payment_id]
+        return {
+            'id': payment_id,
+            'user_id': payment['user_id'],
+            'amount': payment['amount'],
+            'mpesa_code': payment['mpesa_code'],
+            'checkout_request_id': payment['checkout_request_id'],
+            'mpesa_receipt': payment.get('mpesa_receipt'),
+            'status': payment['status'],
+            'created_at': payment['created_at']
+        }
+
+    @synchronized
+    def get_payment_history(self, user_id):
+        payment_ids = self._indexes()['payments_by_user'].get(user_id, {})
+        payment_list = [self._payment_record(payment_id) for payment_id in payment_ids]
+
+        # Sort by creation date (newest first)
+        payment_list.sort(key=lambda x: x['created_at'], reverse=True)
+        return payment_list
+
+    @synchronized
+    def get_career_results(self, user_id):
+        result_id = self._indexes()['latest_result'].get(user_id)
+        return self.state['career_results'][result_id] if result_id is not None else None
+
+    @synchronized
+    def get_payment_by_checkout_request(self, checkout_request_id):
+        payment_id = self._indexes()['payment_by_checkout'].get(checkout_request_id)
+        return self._payment_record(payment_id) if payment_id is not None else None
+
+    @synchronized
+    def get_payment_by_receipt(self, mpesa_receipt):
+        payment_id = self._indexes()['payment_by_receipt'].get(mpesa_receipt)
+        return self._payment_record(payment_id) if payment_id is not None else None
+
+    @synchronized
+    def get_pending_checkouts(self, max_age_seconds):
+        now = datetime.now(timezone.utc)
+        pending = []
+        for payment_id, payment in self.state['payments'].items():
+            if payment['status'] != 'pending' or not payment['checkout_request_id']:
+                continue
+            age_seconds = (now - datetime.fromisoformat(payment['created_at'])).total_seconds()
+            if age_seconds <= max_age_seconds:
+                pending.append({
+                    'id': payment_id,
+                    'user_id': payment['user_id'],
+                    'amount': payment['amount'],
+                    'mpesa_code': payment['mpesa_code'],
+                    'checkout_request_id': payment['checkout_request_id'],
+                    'age_seconds': age_seconds
+                })
+        pending.sort(key=lambda payment: payment['age_seconds'], reverse=True)
+        return pending
+
+    @synchronized
+    def find_user_ids_by_phone(self, phone):
+        return list(reversed(self._indexes()['users_by_phone'].get(phone, [])))
+
+    @synchronized
+    def get_all_users(self):
+        return self.state['users']
+
+    @synchronized
+    def get_all_payments(self):
+        return self.state['payments']
+
+    def iter_export_chunks(self, chunk_size=1000):
+        with self._lock:
+            result_ids = sorted(self.state['career_results'],
+                                key=lambda x: self.state['career_results'][x]['generated_at'])
+        for start in range(0, len(result_ids), chunk_size):
+            with self._lock:
+                results, careers = [], {}
+                for result_id in result_ids[start:start + chunk_size]:
+                    result = self.state['career_results'].get(result_id)
+                    user = self.state['users'].get(result['user_id']) if result is not None else None
+                    if user is None:
+                        continue
+                    results.append({'id': result_id, 'user_id': result['user_id'],
+                                    'generated_at': result['generated_at'], **user})
+                    careers[result_id] = career_summary(result['recommendations'])
+                paid_user_ids = {row['user_id'] for row in results
+                                 if self._indexes()['completed_payments'].get(row['user_id'])}
+                chunk = export_records(results, self.state['user_subjects'], self.state['user_skills'],
+                                       self.state['user_interests'], paid_user_ids, careers)
+            if chunk:
+                yield chunk
+
+    @synchronized
+    def run_retention_job(self, days_old, chunk_size=200, archive_dir=None):
+        """Drop users older than the cutoff, in one step (nothing is archived); same report as the SQLite job"""
+        started = time.perf_counter()
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=days_old)).isoformat()
+        expired = {user_id for user_id, user in self.state['users'].items() if user['created_at'] < cutoff}
+        # Results are kept whole, so there are no career_result_items rows to count
+        rows_purged = {table: 0 for table in ('users',) + USER_CHILD_TABLES + ('career_result_items',)}
+        rows_purged['users'] = len(expired)
+        for table in ('user_subjects', 'user_skills', 'user_interests'):
+            store = self.state[table]
+            rows_purged[table] = sum(len(store.pop(user_id, ())) for user_id in expired)
+        for table in ('payments', 'career_results'):
+            store = self.state[table]
+            stale = [key for key, row in store.items() if row['user_id'] in expired]
+            for key in stale:
+                del store[key]
+            rows_purged[table] = len(stale)
+        for user_id in expired:
+            del self.state['users'][user_id]
+        if expired:
+            self.rebuild_indexes()
+        return {
+            'cutoff': cutoff,
+            'rows_purged': rows_purged,
+            'total_rows_purged': sum(rows_purged.values()),
+            'chunks': 1 if expired else 0,
+            'archive_path': None,
+            'archived_bytes': 0,
+            'max_chunk_seconds': time.perf_counter() - started if expired else 0.0,
+            'vacuum': None,
+            'seconds': time.perf_counter() - started
+        }
+
+    @synchronized
+    def get_daily_stats(self, start_day=None, end_day=None):
+        return analytics.memory_daily_stats(self._rollups(), start_day, end_day)
+
+    @synchronized
+    def get_cluster_histogram(self, start_day=None, end_day=None, limit=10):
+        return analytics.memory_cluster_histogram(self._rollups(), start_day, end_day, limit)
+
+    @synchronized
+    def get_grade_distribution(self, subject=None, start_day=None, end_day=None):
+        return analytics.memory_grade_distribution(self._rollups(), subject, start_day, end_day)
+
+    def stats(self):
+        return {'backend': self.name, 'write_behind': None}
+
+    @synchronized
+    def clear_all_data(self):
+        self.state['users'] = {}
+        self.state['user_subjects'] = {}
+        self.state['user_skills'] = {}
+        self.state['user_interests'] = {}
+        self.state['payments'] = {}
+        self.state['career_results'] = {}
+        self.state['user_counter'] = 0
+        self.state['payment_counter'] = 0
+        self.state['result_counter'] = 0
+        self.rebuild_indexes()
+        self.state['rollups'] = analytics.new_memory_rollups()
+
+
+class SessionStateRepository(InMemoryRepository):
+    """Keeps data in st.session_state; it is lost when the session or worker ends"""
+
+    name = 'session'
+
+    def __init__(self):
+        super().__init__()
+
+    @property
+    def state(self):
+        return st.session_state
+
+
+class SQLiteRepository(StorageRepository):
+    """
+    Persists data to career_guide.db; each save call is a single transaction.
+
+    With write_behind=True saves are handed to a WriteBehindWriter instead and
+    reads merge in its pending records, so callers see their own writes. A user
+    the database rejected stays readable by id (it is listed in stats() under
+    rejected_ids); its later payments and results are rejected with it.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path=DB_PATH, write_behind=DB_WRITE_BEHIND):
+        self.pool = SQLiteConnectionPool(path)
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+        self.writer = None
+        self.ids = None
+        # Engines rebuilt from result_models for rows written with an earlier model version
+        self._result_engines = {}
+        if write_behind:
+            self.ids = IdAllocator(self.pool)
+            self.writer = WriteBehindWriter(self.pool, self._apply_writes,
+                                            flush_ms=DB_FLUSH_MS, batch_size=DB_BATCH_SIZE)
+
+    def init_db(self):
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if not self._schema_ready:
+                with self.pool.connection() as conn:
+                    conn.executescript(SCHEMA)
+                    conn.executescript(analytics.ROLLUP_SCHEMA)
+                    # Rollups keep the totals of users the retention job purged, so they are only rebuilt
+                    # from the raw rows for databases written before the rollups existed
+                    backfill = (conn.execute("SELECT 1 FROM rollup_daily LIMIT 1").fetchone() is None and
+                                conn.execute("SELECT 1 FROM users LIMIT 1").fetchone() is not None)
+                    migrate_career_results(conn)
+                    stamp_result_models(conn, get_career_engine())
+                    migrate_payments(conn, adjust_rollups=not backfill)
+                    conn.executescript(INDEXES)
+                    conn.execute("PRAGMA optimize")
+                if backfill:
+                    self._rebuild_rollups()
+                self._schema_ready = True
+
+    def save_user_data(self, student_info, subjects_grades, skills_interests):
+        self.init_db()
+        subjects = [(subject, grade) for subject, grade in subjects_grades.items()
+                    if grade != "Not Taken" and grade != "Select Grade"]
+
+        if self.writer is not None:
+            user_id = self.ids.next_id('users')
+            self.writer.submit('users', user_id, {
+                'id': user_id,
+                'name': student_info['name'],
+                'phone': student_info['phone'],
+                'email': student_info.get('email', ''),
+                'created_at': sqlite_timestamp(),
+                'subjects': dict(subjects),
+                'skills': list(skills_interests.get('skills', [])),
+                'interests': list(skills_interests.get('interests', []))
+            })
+            return user_id
+
+        with self.pool.transaction() as conn:
+            user_id = conn.execute(INSERT_USER, (
+                student_info['name'], student_info['phone'], student_info.get('email', '')
+            )).lastrowid
+            conn.executemany(INSERT_SUBJECT, [(user_id, subject, grade) for subject, grade in subjects])
+            conn.executemany(INSERT_SKILL, [(user_id, skill) for skill in skills_interests.get('skills', [])])
+            conn.executemany(INSERT_INTEREST, [(user_id, interest) for interest in skills_interests.get('interests', [])])
+            analytics.rollup_users(conn, [(None, subjects)])
+
+        return user_id
+
+    def save_payment(self, user_id, amount, mpesa_code, status, checkout_request_id=None, mpesa_receipt=None):
+        self.init_db()
+        if checkout_request_id or mpesa_receipt:
+            # Keyed payments are upserted synchronously, even with write-behind, so they collapse
+            # against committed rows and reads never see two versions of one payment
+            if self._pending('users', id=user_id):
+                self.flush()  # the payment row references the user
+            with self.pool.transaction() as conn:
+                self._upsert_payment(conn, user_id, amount, mpesa_code, status, checkout_request_id, mpesa_receipt)
+            return
+
+        if self.writer is not None:
+            payment_id = self.ids.next_id('payments')
+            self.writer.submit('payments', payment_id, {
+                'id': payment_id,
+                'user_id': user_id,
+                'amount': float(amount),
+                'mpesa_code': mpesa_code,
+                'checkout_request_id': checkout_request_id,
+                'mpesa_receipt': None,
+                'status': status,
+                'created_at': sqlite_timestamp()
+            })
+            return
+
+        with self.pool.transaction() as conn:
+            conn.execute(INSERT_PAYMENT, (user_id, amount, mpesa_code, checkout_request_id, status))
+            analytics.rollup_payments(conn, [(None, amount, status)])
+
+    def _upsert_payment(self, conn, user_id, amount, mpesa_code, status, checkout_request_id, mpesa_receipt):
+        """Insert or update the payment for a checkout request and/or receipt (inside a write transaction)"""
+        existing = conn.execute(SELECT_PAYMENTS_BY_KEYS, (checkout_request_id, mpesa_receipt)).fetchall()
+        check_payment_owner(existing, user_id, checkout_request_id, mpesa_receipt)
+        if len(existing) > 1:
+            # The checkout request and the receipt were first recorded as separate rows (e.g. a manual
+            # confirmation before the callback): keep the checkout request's row and drop the other
+            conn.executemany("DELETE FROM payments WHERE id = ?", [
+                (row['id'],) for row in existing if row['checkout_request_id'] != checkout_request_id
+            ])
+        payment = conn.execute(UPSERT_PAYMENT, (user_id, amount, mpesa_code, checkout_request_id,
+                                                mpesa_receipt, status)).fetchone()
+        analytics.rollup_payment_deltas(conn, analytics.payment_deltas(existing, payment))
+
+    def save_career_results(self, user_id, recommendations):
+        self.init_db()
+        if self.writer is not None:
+            result_id = self.ids.next_id('career_results')
+            self.writer.submit('career_results', result_id, {
+                'id': result_id,
+                'user_id': user_id,
+                'recommendations': json.dumps(recommendations),
+                'generated_at': sqlite_timestamp()
+            })
+            return
+
+        with self.pool.transaction() as conn:
+            self._insert_result(conn, None, user_id, recommendations)
+
+    def _insert_result(self, conn, result_id, user_id, recommendations, generated_at=None):
+        """
+        Store a recommendations dict as compact programme rows.
+
+        Results the engine cannot rebuild exactly are stored as JSON text instead.
+        """
+        analytics.rollup_results(conn, [(generated_at[:10] if generated_at else None, recommendations)])
+        engine = get_career_engine()
+        compacted = engine.compact_recommendations(recommendations)
+        if compacted is None:
+            conn.execute(INSERT_RESULT, (result_id, user_id, json.dumps(recommendations),
+                                         None, None, None, None, None, None, generated_at))
+            return
+
+        user_profile, items = compacted
+        store_result_model(conn, engine)
+        result_id = conn.execute(INSERT_RESULT, (
+            result_id, user_id, None, user_profile['subjects_count'], user_profile['skills_count'],
+            user_profile['interests_count'], user_profile['primary_interest'], user_profile['medical_interest'],
+            engine.model_version, generated_at
+        )).lastrowid
+
+        programmes = sorted({(item[0], item[1]) for item in items})
+        programme_ids = {}
+        if programmes:
+            conn.executemany(INSERT_PROGRAMME, programmes)
+            cluster_ids = sorted({cluster_id for cluster_id, name in programmes})
+            placeholders = ", ".join("?" * len(cluster_ids))
+            for row in conn.execute(f"SELECT id, cluster_id, name FROM programmes WHERE cluster_id IN ({placeholders})",
+                                    cluster_ids):
+                programme_ids[(row['cluster_id'], row['name'])] = row['id']
+
+        conn.executemany(INSERT_RESULT_ITEM, [
+            (result_id, position, cluster_id, programme_ids[(cluster_id, programme)], match_score, subject_match,
+             skills_match, interests_match, ",".join(map(str, missing_codes)))
+            for position, (cluster_id, programme, match_score, subject_match, skills_match, interests_match,
+                           missing_codes) in enumerate(items)
+        ])
+
+    def _load_result(self, conn, row):
+        """Rebuild the recommendations dict of a career_results row, or None if its model is unknown"""
+        if row['recommendations'] is not None:
+            return json.loads(row['recommendations'])
+        engine = self._result_engine(conn, row['model_version'])
+        if engine is None:
+            print(f"❌ Career result {row['id']} was stored with unknown model {row['model_version']}")
+            return None
+        user_profile = {
+            'subjects_count': row['subjects_count'],
+            'skills_count': row['skills_count'],
+            'interests_count': row['interests_count'],
+            'primary_interest': row['primary_interest'],
+            'medical_interest': bool(row['medical_interest'])
+        }
+        items = [
+            (item[0], item[1], item[2], item[3], item[4], item[5],
+             tuple(int(code) for code in item[6].split(',')) if item[6] else ())
+            for item in conn.execute(SELECT_RESULT_ITEMS, (row['id'],))
+        ]
+        return engine.expand_recommendations(user_profile, items)
+
+    def _result_engine(self, conn, model_version):
+        """The shared engine, or one rebuilt from the cluster table stored for an earlier model_version"""
+        engine = get_career_engine()
+        if model_version == engine.model_version:
+            return engine
+        engine = self._result_engines.get(model_version)
+        if engine is None:
+            row = conn.execute(SELECT_RESULT_MODEL, (model_version,)).fetchone()
+            if row is None:
+                return None
+            engine = result_model_engine(row['clusters'])
+            self._result_engines[model_version] = engine
+        return engine
+
+    def _apply_writes(self, conn, ops):
+        """Write one batch of queued (kind, row_id, record) ops"""
+        users = [record for kind, row_id, record in ops if kind == 'users']
+        conn.executemany(INSERT_USER_WITH_ID, [
+            (user['id'], user['name'], user['phone'], user['email'], user['created_at']) for user in users
+        ])
+        conn.executemany(INSERT_SUBJECT, [
+            (user['id'], subject, grade) for user in users for subject, grade in user['subjects'].items()
+        ])
+        conn.executemany(INSERT_SKILL, [(user['id'], skill) for user in users for skill in user['skills']])
+        conn.executemany(INSERT_INTEREST, [(user['id'], interest) for user in users for interest in user['interests']])
+        analytics.rollup_users(conn, [(user['created_at'][:10], user['subjects'].items()) for user in users])
+        payments = [record for kind, row_id, record in ops if kind == 'payments']
+        conn.executemany(INSERT_PAYMENT_WITH_ID, [
+            (record['id'], record['user_id'], record['amount'], record['mpesa_code'],
+             record['checkout_request_id'], record['status'], record['created_at'])
+            for record in payments
+        ])
+        analytics.rollup_payments(conn, [(record['created_at'][:10], record['amount'], record['status'])
+                                         for record in payments])
+        for kind, row_id, record in ops:
+            if kind == 'career_results':
+                self._insert_result(conn, record['id'], record['user_id'], json.loads(record['recommendations']),
+                                    record['generated_at'])
+
+    def _pending(self, kind, **filters):
+        """Queued records of one kind matching every filter (empty without write-behind)"""
+        if self.writer is None:
+            return []
+        return [record for record in self.writer.pending(kind)
+                if all(record[field] == value for field, value in filters.items())]
+
+    def _rejected(self, kind, **filters):
+        """Records of one kind the writer could not store, matching every filter"""
+        if self.writer is None:
+            return []
+        return [record for record in self.writer.rejected(kind)
+                if all(record[field] == value for field, value in filters.items())]
+
+    def flush(self, timeout=None):
+        """Commit queued writes; a no-op without write-behind"""
+        return self.writer.flush(timeout) if self.writer is not None else True
+
+    def check_payment_status(self, user_id):
+        self.init_db()
+        if self._pending('payments', user_id=user_id, status='completed'):
+            return True
+        with self.pool.connection() as conn:
+            return conn.execute(SELECT_COMPLETED_PAYMENT, (user_id,)).fetchone() is not None
+
+    def get_user_data(self, user_id):
+        self.init_db()
+        # The id was handed out before the row was written, so a rejected user is still answered
+        for user in self._pending('users', id=user_id) + self._rejected('users', id=user_id):
+            return {
+                'user_info': {key: user[key] for key in ('id', 'name', 'phone', 'email', 'created_at')},
+                'subjects': dict(user['subjects']),
+                'skills': list(user['skills']),
+                'interests': list(user['interests'])
+            }
+        with self.pool.connection() as conn:
+            user = conn.execute(SELECT_USER, (user_id,)).fetchone()
+            if user is None:
+                return None
+            return {
+                'user_info': {
+                    'id': user['id'],
+                    'name': user['name'],
+                    'phone': user['phone'],
+                    'email': user['email'],
+                    'created_at': user['created_at']
+                },
+                'subjects': {row['subject_name']: row['grade'] for row in conn.execute(SELECT_SUBJECTS, (user_id,))},
+                'skills': [row['skill'] for row in conn.execute(SELECT_SKILLS, (user_id,))],
+                'interests': [row['interest'] for row in conn.execute(SELECT_INTERESTS, (user_id,))]
+            }
+
+    def get_payment_history(self, user_id):
+        self.init_db()
+        # Read the overlay before the database: a row committed in between shows up in both, never in neither
+        pending = self._pending('payments', user_id=user_id)
+        with self.pool.connection() as conn:
+            payments = [dict(row) for row in conn.execute(SELECT_PAYMENTS, (user_id,))]
+        if pending:
+            stored_ids = {payment['id'] for payment in payments}
+            payments.extend(dict(payment) for payment in pending if payment['id'] not in stored_ids)
+            payments.sort(key=lambda x: (x['created_at'], x['id']), reverse=True)
+        return payments
+
+    def get_career_results(self, user_id):
+        self.init_db()
+        pending = self._pending('career_results', user_id=user_id)
+        latest = max(pending, key=lambda x: (x['generated_at'], x['id'])) if pending else None
+        with self.pool.connection() as conn:
+            row = conn.execute(SELECT_LATEST_RESULT, (user_id,)).fetchone()
+            if row is not None and (latest is None or (row['generated_at'], row['id']) > (latest['generated_at'], latest['id'])):
+                recommendations = self._load_result(conn, row)
+                if recommendations is None:
+                    return None  # callers regenerate the report
+                return {
+                    'user_id': row['user_id'],
+                    'recommendations': recommendations,
+                    'generated_at': row['generated_at']
+                }
+        if latest is None:
+            return None
+        return {
+            'user_id': latest['user_id'],
+            'recommendations': json.loads(latest['recommendations']),
+            'generated_at': latest['generated_at']
+        }
+
+    def get_payment_by_checkout_request(self, checkout_request_id):
+        # Keyed payments skip the write-behind queue, so there is nothing pending to merge
+        self.init_db()
+        with self.pool.connection() as conn:
+            row = conn.execute(SELECT_PAYMENT_BY_CHECKOUT, (checkout_request_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def get_payment_by_receipt(self, mpesa_receipt):
+        self.init_db()
+        with self.pool.connection() as conn:
+            row = conn.execute(SELECT_PAYMENT_BY_RECEIPT, (mpesa_receipt,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def get_pending_checkouts(self, max_age_seconds):
+        # Keyed payments skip the write-behind queue, so the table holds every pending checkout
+        self.init_db()
+        with self.pool.connection() as conn:
+            return [dict(row) for row in conn.execute(SELECT_PENDING_CHECKOUTS, (f"-{int(max_age_seconds)} seconds",))]
+
+    def find_user_ids_by_phone(self, phone):
+        self.init_db()
+        pending_ids = [user['id'] for user in self._pending('users', phone=phone)]
+        with self.pool.connection() as conn:
+            user_ids = [row['id'] for row in conn.execute(SELECT_USER_IDS_BY_PHONE, (phone,))]
+        return sorted(set(user_ids).union(pending_ids), reverse=True)
+
+    def get_all_users(self):
+        self.init_db()
+        self.flush()
+        with self.pool.connection() as conn:
+            return {row['id']: {'name': row['name'], 'phone': row['phone'], 'email': row['email'],
+                                'created_at': row['created_at']}
+                    for row in conn.execute("SELECT id, name, phone, email, created_at FROM users")}
+
+    def get_all_payments(self):
+        self.init_db()
+        self.flush()
+        with self.pool.connection() as conn:
+            return {row['id']: dict(row) for row in conn.execute(
+                "SELECT id, user_id, amount, mpesa_code, checkout_request_id, mpesa_receipt, status, created_at FROM payments"
+            )}
+
+    def iter_export_chunks(self, chunk_size=1000):
+        self.init_db()
+        self.flush()
+        last_id = 0
+        while True:
+            # Keyset pagination: each chunk is one short read on a pooled connection. Id lists are
+            # bound as one JSON array so every chunk reuses the same cached statements.
+            with self.pool.connection() as conn:
+                results = conn.execute(SELECT_EXPORT_RESULTS, (last_id, chunk_size)).fetchall()
+                if not results:
+                    return
+                last_id = results[-1]['id']
+                user_ids = json.dumps(sorted({row['user_id'] for row in results}))
+                subjects, skills, interests = {}, {}, {}
+                for row in conn.execute(SELECT_EXPORT_SUBJECTS, (user_ids,)):
+                    subjects.setdefault(row['user_id'], {})[row['subject_name']] = row['grade']
+                for row in conn.execute(SELECT_EXPORT_SKILLS, (user_ids,)):
+                    skills.setdefault(row['user_id'], []).append(row['skill'])
+                for row in conn.execute(SELECT_EXPORT_INTERESTS, (user_ids,)):
+                    interests.setdefault(row['user_id'], []).append(row['interest'])
+                paid_user_ids = {row['user_id'] for row in conn.execute(SELECT_EXPORT_PAID_USERS, (user_ids,))}
+                careers = {row['id']: career_summary(json.loads(row['recommendations']))
+                           for row in results if row['recommendations'] is not None}
+                compact_ids = [row['id'] for row in results if row['recommendations'] is None]
+                if compact_ids:
+                    for row in conn.execute(SELECT_EXPORT_CAREERS, (json.dumps(compact_ids),)):
+                        careers.setdefault(row['result_id'], []).append((row['cluster_id'], row['name'], row['match_score']))
+            yield export_records(results, subjects, skills, interests, paid_user_ids, careers)
+
+    def clear_all_data(self):
+        self.init_db()
+        self.flush()
+        with self.pool.transaction() as conn:
+            for table in ('user_subjects', 'user_skills', 'user_interests', 'payments', 'career_result_items',
+                          'career_results', 'users') + analytics.ROLLUP_TABLES:
+                conn.execute(f"DELETE FROM {table}")
+
+    def run_retention_job(self, days_old, chunk_size=200, archive_dir=ARCHIVE_DIR):
+        self.init_db()
+        self.flush()
+        return RetentionJob(self.pool, chunk_size=chunk_size, archive_dir=archive_dir).run(days_old)
+
+    # Analytics queries read only the rollup tables; queued saves are counted once committed
+
+    def get_daily_stats(self, start_day=None, end_day=None):
+        self.init_db()
+        with self.pool.connection() as conn:
+            return analytics.query_daily_stats(conn, start_day, end_day)
+
+    def get_cluster_histogram(self, start_day=None, end_day=None, limit=10):
+        self.init_db()
+        with self.pool.connection() as conn:
+            return analytics.query_cluster_histogram(conn, start_day, end_day, limit)
+
+    def get_grade_distribution(self, subject=None, start_day=None, end_day=None):
+        self.init_db()
+        with self.pool.connection() as conn:
+            return analytics.query_grade_distribution(conn, subject, start_day, end_day)
+
+    def rebuild_rollups(self):
+        self.init_db()
+        self.flush()
+        self._rebuild_rollups()
+
+    def _rebuild_rollups(self):
+        with self.pool.transaction() as conn:
+            analytics.rebuild_sqlite_rollups(conn)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.pool.close()
+
+    def stats(self):
+        """Write-behind queue metrics (None when saves are synchronous)"""
+        return {
+            'backend': self.name,
+            'path': self.pool.path,
+            'write_behind': self.writer.stats() if self.writer is not None else None
+        }
+
+
+# MySQL equivalent of SCHEMA plus INDEXES. Score columns get an integer_scores bitmask because
+# DOUBLE cannot tell 100 from 100.0 and the rebuilt results must match what the engine produced.
+# Every connection runs with time_zone '+00:00', so TIMESTAMP columns and DATE() are UTC like SQLite's.
+MYSQL_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS users (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        phone VARCHAR(32) NOT NULL,
+        email VARCHAR(255),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_users_phone (phone),
+        INDEX idx_users_created (created_at)
+    ) ENGINE=InnoDB""",
+    """CREATE TABLE IF NOT EXISTS user_subjects (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT,
+        subject_name VARCHAR(100) NOT NULL,
+        grade VARCHAR(16) NOT NULL,
+        INDEX idx_user_subjects_user (user_id),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    ) ENGINE=InnoDB""",
+    """CREATE TABLE IF NOT EXISTS user_skills (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT,
+        skill VARCHAR(100) NOT NULL,
+        INDEX idx_user_skills_user (user_id),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    ) ENGINE=InnoDB""",
+    """CREATE TABLE IF NOT EXISTS user_interests (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT,
+        interest VARCHAR(100) NOT NULL,
+        INDEX idx_user_interests_user (user_id),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    ) ENGINE=InnoDB""",
+    """CREATE TABLE IF NOT EXISTS payments (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT,
+        amount DOUBLE NOT NULL,
+        mpesa_code VARCHAR(64),
+        checkout_request_id VARCHAR(100),
+        mpesa_receipt VARCHAR(32),
+        status VARCHAR(20) DEFAULT 'pending',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_payments_user_status (user_id, status),
+        INDEX idx_payments_user_created (user_id, created_at),
+        INDEX idx_payments_pending (status, created_at),
+        UNIQUE KEY uq_payments_checkout (checkout_request_id),
+        UNIQUE KEY uq_payments_receipt (mpesa_receipt),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    ) ENGINE=InnoDB""",
+    """CREATE TABLE IF NOT EXISTS career_results (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT,
+        recommendations LONGTEXT,
+        subjects_count INT,
+        skills_count INT,
+        interests_count INT,
+        primary_interest VARCHAR(100),
+        medical_interest TINYINT,
+        model_version VARCHAR(64),
+        generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_career_results_user_generated (user_id, generated_at),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    ) ENGINE=InnoDB""",
+    """CREATE TABLE IF NOT EXISTS programmes (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        cluster_id INT NOT NULL,
+        name VARCHAR(255) NOT NULL,
+        UNIQUE KEY uq_programmes_cluster_name (cluster_id, name)
+    ) ENGINE=InnoDB""",
+    """CREATE TABLE IF NOT EXISTS career_result_items (
+        result_id INT NOT NULL,
+        position SMALLINT NOT NULL,
+        cluster_id INT NOT NULL,
+        programme_id INT NOT NULL,
+        match_score DOUBLE NOT NULL,
+        subject_match DOUBLE NOT NULL,
+        skills_match DOUBLE NOT NULL,
+        interests_match DOUBLE NOT NULL,
+        integer_scores TINYINT NOT NULL DEFAULT 0,
+        missing_codes VARCHAR(64) NOT NULL DEFAULT '',
+        PRIMARY KEY (result_id, position),
+        INDEX idx_career_result_items_programme (cluster_id, programme_id),
+        FOREIGN KEY (result_id) REFERENCES career_results (id),
+        FOREIGN KEY (programme_id) REFERENCES programmes (id)
+    ) ENGINE=InnoDB""",
+    """CREATE TABLE IF NOT EXISTS result_models (
+        model_version VARCHAR(64) PRIMARY KEY,
+        clusters LONGTEXT NOT NULL
+    ) ENGINE=InnoDB""",
+    """CREATE TABLE IF NOT EXISTS rollup_daily (
+        day DATE PRIMARY KEY,
+        submissions INT NOT NULL DEFAULT 0,
+        payments INT NOT NULL DEFAULT 0,
+        completed_payments INT NOT NULL DEFAULT 0,
+        revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+        results INT NOT NULL DEFAULT 0
+    ) ENGINE=InnoDB""",
+    """CREATE TABLE IF NOT EXISTS rollup_daily_clusters (
+        day DATE NOT NULL,
+        cluster_id INT NOT NULL,
+        top_results INT NOT NULL DEFAULT 0,
+        results INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, cluster_id)
+    ) ENGINE=InnoDB""",
+    """CREATE TABLE IF NOT EXISTS rollup_daily_grades (
+        day DATE NOT NULL,
+        subject VARCHAR(100) NOT NULL,
+        grade VARCHAR(5) NOT NULL,
+        students INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, subject, grade)
+    ) ENGINE=InnoDB"""
+)
+
+MYSQL_TIME_ZONE = '+00:00'
+MYSQL_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Rows are stamped with sqlite_timestamp() and rolled up under its date, so a save just before
+# midnight UTC is counted on the day its row carries; a NULL day means today (UTC)
+MYSQL_UPSERT_SUBMISSION = """INSERT INTO rollup_daily (day, submissions) VALUES (COALESCE(%s, UTC_DATE()), 1)
+                             ON DUPLICATE KEY UPDATE submissions = submissions + 1"""
+MYSQL_UPSERT_GRADE = """INSERT INTO rollup_daily_grades (day, subject, grade, students)
+                        VALUES (COALESCE(%s, UTC_DATE()), %s, %s, 1)
+                        ON DUPLICATE KEY UPDATE students = students + 1"""
+MYSQL_UPSERT_PAYMENT = """INSERT INTO rollup_daily (day, payments, completed_payments, revenue)
+                          VALUES (COALESCE(%s, UTC_DATE()), %s, %s, %s)
+                          ON DUPLICATE KEY UPDATE payments = payments + VALUES(payments),
+                              completed_payments = completed_payments + VALUES(completed_payments),
+                              revenue = revenue + VALUES(revenue)"""
+MYSQL_UPSERT_RESULT = """INSERT INTO rollup_daily (day, results) VALUES (COALESCE(%s, UTC_DATE()), 1)
+                         ON DUPLICATE KEY UPDATE results = results + 1"""
+MYSQL_UPSERT_CLUSTER = """INSERT INTO rollup_daily_clusters (day, cluster_id, top_results, results)
+                          VALUES (COALESCE(%s, UTC_DATE()), %s, %s, 1)
+                          ON DUPLICATE KEY UPDATE top_results = top_results + VALUES(top_results), results = results + 1"""
+# Same merge rules as the SQLite UPSERT_PAYMENT; MySQL matches either unique key
+MYSQL_UPSERT_PAYMENT_ROW = """INSERT INTO payments (user_id, amount, mpesa_code, checkout_request_id, mpesa_receipt,
+                                                    status, created_at)
+                              VALUES (%s, %s, %s, %s, %s, %s, %s)
+                              ON DUPLICATE KEY UPDATE mpesa_code = COALESCE(mpesa_code, VALUES(mpesa_code)),
+                                  checkout_request_id = COALESCE(checkout_request_id, VALUES(checkout_request_id)),
+                                  mpesa_receipt = COALESCE(mpesa_receipt, VALUES(mpesa_receipt)),
+                                  status = IF(VALUES(status) = 'completed' OR status = 'pending', VALUES(status), status)"""
+MYSQL_SELECT_PAYMENTS_BY_KEYS = """SELECT id, user_id, amount, mpesa_code, checkout_request_id, mpesa_receipt, status,
+                                          created_at
+                                   FROM payments WHERE checkout_request_id = %s OR mpesa_receipt = %s"""
+MYSQL_SELECT_PENDING_CHECKOUTS = """SELECT id, user_id, amount, mpesa_code, checkout_request_id,
+                                           TIMESTAMPDIFF(SECOND, created_at, UTC_TIMESTAMP()) AS age_seconds
+                                    FROM payments
+                                    WHERE status = 'pending' AND checkout_request_id IS NOT NULL
+                                      AND created_at >= UTC_TIMESTAMP() - INTERVAL %s SECOND
+                                    ORDER BY created_at"""
+# Deadlock and lock wait timeout: the locking read in _upsert_payment can collide with a concurrent confirmation
+MYSQL_RETRY_ERRNOS = (1205, 1213)
+MYSQL_RETRIES = 3
+
+
+class MySQLRepository(StorageRepository):
+    """
+    Stores data on a MySQL server through a mysql-connector-python connection pool.
+
+    Uses the same tables and compact career result rows as SQLiteRepository. Sessions
+    run in UTC and rows are stamped with sqlite_timestamp(), so timestamps, retention
+    cutoffs and rollup days all agree with the SQLite backend whatever the server's zone.
+    """
+
+    name = 'mysql'
+
+    def __init__(self, host=MYSQL_HOST, port=MYSQL_PORT, user=MYSQL_USER, password=MYSQL_PASSWORD,
+                 database=MYSQL_DATABASE, pool_size=MYSQL_POOL_SIZE):
+        try:
+            from mysql.connector import errors, pooling
+        except ImportError as e:
+            raise ImportError("The mysql storage backend needs mysql-connector-python "
+                              "(pip install mysql-connector-python)") from e
+        self.errors = errors
+        self.database = database
+        # time_zone is applied again whenever the pool resets a returned connection
+        self.pool = pooling.MySQLConnectionPool(
+            pool_name=f"career_guide_{id(self)}", pool_size=pool_size, host=host, port=port,
+            user=user, password=password, database=database, autocommit=False, charset='utf8mb4',
+            time_zone=MYSQL_TIME_ZONE
+        )
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+        self._result_engines = {}
+
+    @contextmanager
+    def cursor(self, commit=False):
+        """Borrow a pooled connection; commit at the end if asked, otherwise roll back"""
+        conn = self.pool.get_connection()
+        try:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                yield cursor
+                if commit:
+                    conn.commit()
+                else:
+                    conn.rollback()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        finally:
+            conn.close()
+
+    def init_db(self):
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if not self._schema_ready:
+                with self.cursor(commit=True) as cursor:
+                    for statement in MYSQL_SCHEMA:
+                        cursor.execute(statement)
+                    # Rollups keep the totals of purged users, so they are only rebuilt when they are empty
+                    cursor.execute("SELECT EXISTS (SELECT 1 FROM rollup_daily) AS rolled_up, "
+                                   "EXISTS (SELECT 1 FROM users) AS has_users")
+                    row = cursor.fetchone()
+                    backfill = not row['rolled_up'] and bool(row['has_users'])
+                    self._migrate(cursor, adjust_rollups=not backfill)
+                    self._stamp_result_models(cursor, get_career_engine())
+                if backfill:
+                    self._rebuild_rollups()
+                self._schema_ready = True
+
+    def _columns(self, cursor, table):
+        cursor.execute("SELECT column_name AS name FROM information_schema.columns "
+                       "WHERE table_schema = DATABASE() AND table_name = %s", (table,))
+        return {row['name'] for row in cursor.fetchall()}
+
+    def _indexes(self, cursor, table):
+        cursor.execute("SELECT DISTINCT index_name AS name FROM information_schema.statistics "
+                       "WHERE table_schema = DATABASE() AND table_name = %s", (table,))
+        return {row['name'] for row in cursor.fetchall()}
+
+    def _migrate(self, cursor, adjust_rollups):
+        """
+        Bring tables created by earlier versions up to MYSQL_SCHEMA.
+
+        Duplicate checkout requests are collapsed like migrate_payments does (the most advanced
+        status wins, newest on a tie) before the unique keys are added. MySQL commits each ALTER
+        TABLE on its own, so the removed rows and their rollup deltas are committed first.
+        """
+        if 'model_version' not in self._columns(cursor, 'career_results'):
+            cursor.execute("ALTER TABLE career_results ADD COLUMN model_version VARCHAR(64) AFTER medical_interest")
+        if 'mpesa_receipt' not in self._columns(cursor, 'payments'):
+            cursor.execute("""SELECT id, amount, checkout_request_id, status, created_at FROM payments
+                              WHERE checkout_request_id IN (SELECT checkout_request_id FROM (
+                                  SELECT checkout_request_id FROM payments WHERE checkout_request_id IS NOT NULL
+                                  GROUP BY checkout_request_id HAVING COUNT(*) > 1) d)
+                              FOR UPDATE""")
+            duplicates = cursor.fetchall()
+            keep = {}
+            for row in duplicates:
+                rank = (PAYMENT_STATUS_RANK.get(row['status'], 0), row['id'])
+                if row['checkout_request_id'] not in keep or rank > keep[row['checkout_request_id']]:
+                    keep[row['checkout_request_id']] = rank
+            removed = [row for row in duplicates if keep[row['checkout_request_id']][1] != row['id']]
+            if removed:
+                cursor.executemany("DELETE FROM payments WHERE id = %s", [(row['id'],) for row in removed])
+                if adjust_rollups:
+                    cursor.executemany(MYSQL_UPSERT_PAYMENT, analytics.payment_deltas(removed))
+            drop = ("DROP INDEX idx_payments_checkout, "
+                    if 'idx_payments_checkout' in self._indexes(cursor, 'payments') else "")
+            cursor.execute(f"""ALTER TABLE payments ADD COLUMN mpesa_receipt VARCHAR(32) AFTER checkout_request_id,
+                                   {drop}ADD UNIQUE KEY uq_payments_checkout (checkout_request_id),
+                                   ADD UNIQUE KEY uq_payments_receipt (mpesa_receipt)""")
+        if 'idx_payments_pending' not in self._indexes(cursor, 'payments'):
+            cursor.execute("ALTER TABLE payments ADD INDEX idx_payments_pending (status, created_at)")
+
+    def _store_result_model(self, cursor, engine):
+        """Keep the cluster table of engine.model_version, once (see store_result_model)"""
+        cursor.execute("SELECT 1 FROM result_models WHERE model_version = %s", (engine.model_version,))
+        if cursor.fetchone() is None:
+            cursor.execute("INSERT IGNORE INTO result_models (model_version, clusters) VALUES (%s, %s)",
+                           (engine.model_version, json.dumps(engine.kuccps_clusters, default=dict)))
+
+    def _stamp_result_models(self, cursor, engine):
+        """Pin compact rows written before model versions were recorded to the loaded engine (see stamp_result_models)"""
+        cursor.execute("SELECT 1 FROM career_results WHERE recommendations IS NULL AND model_version IS NULL LIMIT 1")
+        if cursor.fetchone() is None:
+            return
+        self._store_result_model(cursor, engine)
+        cursor.execute("UPDATE career_results SET model_version = %s "
+                       "WHERE recommendations IS NULL AND model_version IS NULL", (engine.model_version,))
+
+    def save_user_data(self, student_info, subjects_grades, skills_interests):
+        self.init_db()
+        subjects = [(subject, grade) for subject, grade in subjects_grades.items()
+                    if grade != "Not Taken" and grade != "Select Grade"]
+        created_at = sqlite_timestamp()
+
+        with self.cursor(commit=True) as cursor:
+            cursor.execute("INSERT INTO users (name, phone, email, created_at) VALUES (%s, %s, %s, %s)",
+                           (student_info['name'], student_info['phone'], student_info.get('email', ''), created_at))
+            user_id = cursor.lastrowid
+            rows = [(user_id, subject, grade) for subject, grade in subjects]
+            if rows:
+                cursor.executemany("INSERT INTO user_subjects (user_id, subject_name, grade) VALUES (%s, %s, %s)", rows)
+            rows = [(user_id, skill) for skill in skills_interests.get('skills', [])]
+            if rows:
+                cursor.executemany("INSERT INTO user_skills (user_id, skill) VALUES (%s, %s)", rows)
+            rows = [(user_id, interest) for interest in skills_interests.get('interests', [])]
+            if rows:
+                cursor.executemany("INSERT INTO user_interests (user_id, interest) VALUES (%s, %s)", rows)
+            cursor.execute(MYSQL_UPSERT_SUBMISSION, (created_at[:10],))
+            if subjects:
+                cursor.executemany(MYSQL_UPSERT_GRADE, [(created_at[:10], subject, grade) for subject, grade in subjects])
+
+        return user_id
+
+    def save_payment(self, user_id, amount, mpesa_code, status, checkout_request_id=None, mpesa_receipt=None):
+        self.init_db()
+        created_at = sqlite_timestamp()
+        if not (checkout_request_id or mpesa_receipt):
+            with self.cursor(commit=True) as cursor:
+                cursor.execute("""INSERT INTO payments (user_id, amount, mpesa_code, status, created_at)
+                                  VALUES (%s, %s, %s, %s, %s)""", (user_id, amount, mpesa_code, status, created_at))
+                cursor.execute(MYSQL_UPSERT_PAYMENT, (created_at[:10], 1, *analytics.payment_rollup(amount, status)))
+            return
+
+        for attempt in range(MYSQL_RETRIES):
+            try:
+                with self.cursor(commit=True) as cursor:
+                    self._upsert_payment(cursor, user_id, amount, mpesa_code, status, checkout_request_id,
+                                         mpesa_receipt, created_at)
+                return
+            except self.errors.DatabaseError as e:
+                if e.errno not in MYSQL_RETRY_ERRNOS or attempt == MYSQL_RETRIES - 1:
+                    raise
+
+    def _upsert_payment(self, cursor, user_id, amount, mpesa_code, status, checkout_request_id, mpesa_receipt,
+                        created_at):
+        """Insert or update the payment for a checkout request and/or receipt (inside one transaction)"""
+        keys = (checkout_request_id, mpesa_receipt)
+        # The locking read holds the rows (or the gap a new row goes into) until commit,
+        # so concurrent confirmations of one payment run one after the other
+        cursor.execute(MYSQL_SELECT_PAYMENTS_BY_KEYS + " FOR UPDATE", keys)
+        existing = cursor.fetchall()
+        check_payment_owner(existing, user_id, checkout_request_id, mpesa_receipt)
+        if len(existing) > 1:
+            # Checkout request and receipt were first recorded as separate rows: keep the checkout request's
+            cursor.executemany("DELETE FROM payments WHERE id = %s", [
+                (row['id'],) for row in existing if row['checkout_request_id'] != checkout_request_id
+            ])
+        cursor.execute(MYSQL_UPSERT_PAYMENT_ROW, (user_id, amount, mpesa_code, checkout_request_id, mpesa_receipt,
+                                                  status, created_at))
+        cursor.execute(MYSQL_SELECT_PAYMENTS_BY_KEYS, keys)
+        payment = cursor.fetchone()
+        cursor.fetchall()
+        cursor.executemany(MYSQL_UPSERT_PAYMENT, analytics.payment_deltas(existing, payment))
+
+    def save_career_results(self, user_id, recommendations):
+        self.init_db()
+        generated_at = sqlite_timestamp()
+        engine = get_career_engine()
+        compacted = engine.compact_recommendations(recommendations)
+        with self.cursor(commit=True) as cursor:
+            cursor.execute(MYSQL_UPSERT_RESULT, (generated_at[:10],))
+            self._rollup_clusters(cursor, [(generated_at[:10], recommendations)])
+            if compacted is None:
+                cursor.execute("INSERT INTO career_results (user_id, recommendations, generated_at) VALUES (%s, %s, %s)",
+                               (user_id, json.dumps(recommendations), generated_at))
+                return
+
+            user_profile, items = compacted
+            self._store_result_model(cursor, engine)
+            cursor.execute("""INSERT INTO career_results (user_id, subjects_count, skills_count, interests_count,
+                                                          primary_interest, medical_interest, model_version,
+                                                          generated_at)
+                              VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+                           (user_id, user_profile['subjects_count'], user_profile['skills_count'],
+                            user_profile['interests_count'], user_profile['primary_interest'],
+                            int(user_profile['medical_interest']), engine.model_version, generated_at))
+            result_id = cursor.lastrowid
+
+            programmes = sorted({(item[0], item[1]) for item in items})
+            programme_ids = {}
+            if programmes:
+                cursor.executemany("INSERT IGNORE INTO programmes (cluster_id, name) VALUES (%s, %s)", programmes)
+                cluster_ids = sorted({cluster_id for cluster_id, name in programmes})
+                cursor.execute(f"SELECT id, cluster_id, name FROM programmes WHERE cluster_id IN "
+                               f"({', '.join(['%s'] * len(cluster_ids))})", cluster_ids)
+                for row in cursor.fetchall():
+                    programme_ids[(row['cluster_id'], row['name'])] = row['id']
+
+                rows = []
+                for position, (cluster_id, programme, *scores, missing_codes) in enumerate(items):
+                    integer_scores = sum(1 << i for i, score in enumerate(scores) if isinstance(score, int))
+                    rows.append((result_id, position, cluster_id, programme_ids[(cluster_id, programme)],
+                                 *scores, integer_scores, ",".join(map(str, missing_codes))))
+                cursor.executemany("""INSERT INTO career_result_items (result_id, position, cluster_id, programme_id,
+                                          match_score, subject_match, skills_match, interests_match,
+                                          integer_scores, missing_codes)
+                                      VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""", rows)
+
+    def _rollup_clusters(self, cursor, results):
+        """Count recommended clusters; results is a list of (day, recommendations)"""
+        rows = []
+        for day, recommendations in results:
+            top_cluster, cluster_ids = analytics.result_clusters(recommendations)
+            rows.extend((day, cluster_id, int(cluster_id == top_cluster)) for cluster_id in cluster_ids)
+        if rows:
+            cursor.executemany(MYSQL_UPSERT_CLUSTER, rows)
+
+    def _load_result(self, cursor, row):
+        """Rebuild the recommendations dict of a career_results row, or None if its model is unknown"""
+        if row['recommendations'] is not None:
+            return json.loads(row['recommendations'])
+        engine = self._result_engine(cursor, row['model_version'])
+        if engine is None:
+            print(f"❌ Career result {row['id']} was stored with unknown model {row['model_version']}")
+            return None
+        cursor.execute("""SELECT i.cluster_id, p.name, i.match_score, i.subject_match, i.skills_match,
+                                 i.interests_match, i.integer_scores, i.missing_codes
+                          FROM career_result_items i JOIN programmes p ON p.id = i.programme_id
+                          WHERE i.result_id = %s ORDER BY i.position""", (row['id'],))
+        items = []
+        for item in cursor.fetchall():
+            scores = [item['match_score'], item['subject_match'], item['skills_match'], item['interests_match']]
+            scores = [int(score) if item['integer_scores'] & (1 << i) else score for i, score in enumerate(scores)]
+            missing_codes = tuple(int(code) for code in item['missing_codes'].split(',')) if item['missing_codes'] else ()
+            items.append((item['cluster_id'], item['name'], *scores, missing_codes))
+        user_profile = {
+            'subjects_count': row['subjects_count'],
+            'skills_count': row['skills_count'],
+            'interests_count': row['interests_count'],
+            'primary_interest': row['primary_interest'],
+            'medical_interest': bool(row['medical_interest'])
+        }
+        return engine.expand_recommendations(user_profile, items)
+
+    def _result_engine(self, cursor, model_version):
+        """The shared engine, or one rebuilt from the cluster table stored for an earlier model_version"""
+        engine = get_career_engine()
+        if model_version == engine.model_version:
+            return engine
+        engine = self._result_engines.get(model_version)
+        if engine is None:
+            cursor.execute("SELECT clusters FROM result_models WHERE model_version = %s", (model_version,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            engine = result_model_engine(row['clusters'])
+            self._result_engines[model_version] = engine
+        return engine
+
+    def check_payment_status(self, user_id):
+        self.init_db()
+        with self.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM payments WHERE user_id = %s AND status = 'completed' LIMIT 1", (user_id,))
+            return cursor.fetchone() is not None
+
+    def get_user_data(self, user_id):
+        self.init_db()
+        with self.cursor() as cursor:
+            cursor.execute("SELECT id, name, phone, email, created_at FROM users WHERE id = %s", (user_id,))
+            user = cursor.fetchone()
+            if user is None:
+                return None
+            cursor.execute("SELECT subject_name, grade FROM user_subjects WHERE user_id = %s ORDER BY id", (user_id,))
+            subjects = {row['subject_name']: row['grade'] for row in cursor.fetchall()}
+            cursor.execute("SELECT skill FROM user_skills WHERE user_id = %s ORDER BY id", (user_id,))
+            skills = [row['skill'] for row in cursor.fetchall()]
+            cursor.execute("SELECT interest FROM user_interests WHERE user_id = %s ORDER BY id", (user_id,))
+            interests = [row['interest'] for row in cursor.fetchall()]
+        user['created_at'] = self._timestamp(user['created_at'])
+        return {'user_info': user, 'subjects': subjects, 'skills': skills, 'interests': interests}
+
+    def _timestamp(self, value):
+        """UTC datetime of a TIMESTAMP column as the 'YYYY-MM-DD HH:MM:SS' string SQLite returns"""
+        return value.strftime(MYSQL_TIMESTAMP_FORMAT) if value is not None else None
+
+    def _payment(self, row):
+        row['created_at'] = self._timestamp(row['created_at'])
+        return row
+
+    def get_payment_history(self, user_id):
+        self.init_db()
+        with self.cursor() as cursor:
+            cursor.execute("""SELECT id, user_id, amount, mpesa_code, checkout_request_id, mpesa_receipt, status, created_at
+                              FROM payments WHERE user_id = %s ORDER BY created_at DESC, id DESC""", (user_id,))
+            return [self._payment(row) for row in cursor.fetchall()]
+
+    def get_career_results(self, user_id):
+        self.init_db()
+        with self.cursor() as cursor:
+            cursor.execute("""SELECT id, user_id, recommendations, subjects_count, skills_count, interests_count,
+                                     primary_interest, medical_interest, model_version, generated_at
+                              FROM career_results WHERE user_id = %s
+                              ORDER BY generated_at DESC, id DESC LIMIT 1""", (user_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            recommendations = self._load_result(cursor, row)
+        if recommendations is None:
+            return None  # callers regenerate the report
+        return {
+            'user_id': row['user_id'],
+            'recommendations': recommendations,
+            'generated_at': self._timestamp(row['generated_at'])
+        }
+
+    def get_payment_by_checkout_request(self, checkout_request_id):
+        self.init_db()
+        with self.cursor() as cursor:
+            cursor.execute("""SELECT id, user_id, amount, mpesa_code, checkout_request_id, mpesa_receipt, status, created_at
+                              FROM payments WHERE checkout_request_id = %s""", (checkout_request_id,))
+            row = cursor.fetchone()
+        return self._payment(row) if row is not None else None
+
+    def get_payment_by_receipt(self, mpesa_receipt):
+        self.init_db()
+        with self.cursor() as cursor:
+            cursor.execute("""SELECT id, user_id, amount, mpesa_code, checkout_request_id, mpesa_receipt, status, created_at
+                              FROM payments WHERE mpesa_receipt = %s""", (mpesa_receipt,))
+            row = cursor.fetchone()
+        return self._payment(row) if row is not None else None
+
+    def get_pending_checkouts(self, max_age_seconds):
+        self.init_db()
+        with self.cursor() as cursor:
+            cursor.execute(MYSQL_SELECT_PENDING_CHECKOUTS, (int(max_age_seconds),))
+            return cursor.fetchall()
+
+    def find_user_ids_by_phone(self, phone):
+        self.init_db()
+        with self.cursor() as cursor:
+            cursor.execute("SELECT id FROM users WHERE phone = %s ORDER BY id DESC", (phone,))
+            return [row['id'] for row in cursor.fetchall()]
+
+    def get_all_users(self):
+        self.init_db()
+        with self.cursor() as cursor:
+            cursor.execute("SELECT id, name, phone, email, created_at FROM users")
+            return {row.pop('id'): {**row, 'created_at': self._timestamp(row['created_at'])} for row in cursor.fetchall()}
+
+    def get_all_payments(self):
+        self.init_db()
+        with self.cursor() as cursor:
+            cursor.execute("SELECT id, user_id, amount, mpesa_code, checkout_request_id, mpesa_receipt, status, created_at "
+                           "FROM payments")
+            return {row['id']: self._payment(row) for row in cursor.fetchall()}
+
+    def iter_export_chunks(self, chunk_size=1000):
+        self.init_db()
+        last_id = 0
+        while True:
+            with self.cursor() as cursor:
+                cursor.execute("""SELECT r.id, r.user_id, r.generated_at, r.recommendations, u.created_at,
+                                         u.name, u.phone, u.email
+                                  FROM career_results r JOIN users u ON u.id = r.user_id
+                                  WHERE r.id > %s ORDER BY r.id LIMIT %s""", (last_id, chunk_size))
+                results = [{**row, 'generated_at': self._timestamp(row['generated_at']),
+                            'created_at': self._timestamp(row['created_at'])} for row in cursor.fetchall()]
+                if not results:
+                    return
+                last_id = results[-1]['id']
+                user_ids = sorted({row['user_id'] for row in results})
+                users = ", ".join(['%s'] * len(user_ids))
+                subjects, skills, interests = {}, {}, {}
+                cursor.execute(f"SELECT user_id, subject_name, grade FROM user_subjects WHERE user_id IN ({users}) "
+                               f"ORDER BY id", user_ids)
+                for row in cursor.fetchall():
+                    subjects.setdefault(row['user_id'], {})[row['subject_name']] = row['grade']
+                cursor.execute(f"SELECT user_id, skill FROM user_skills WHERE user_id IN ({users}) ORDER BY id", user_ids)
+                for row in cursor.fetchall():
+                    skills.setdefault(row['user_id'], []).append(row['skill'])
+                cursor.execute(f"SELECT user_id, interest FROM user_interests WHERE user_id IN ({users}) ORDER BY id",
+                               user_ids)
+                for row in cursor.fetchall():
+                    interests.setdefault(row['user_id'], []).append(row['interest'])
+                cursor.execute(f"SELECT DISTINCT user_id FROM payments WHERE status = 'completed' AND user_id IN ({users})",
+                               user_ids)
+                paid_user_ids = {row['user_id'] for row in cursor.fetchall()}
+                careers = {row['id']: career_summary(json.loads(row['recommendations']))
+                           for row in results if row['recommendations'] is not None}
+                compact_ids = [row['id'] for row in results if row['recommendations'] is None]
+                if compact_ids:
+                    cursor.execute(f"SELECT i.result_id, i.cluster_id, p.name, i.match_score, i.integer_scores "
+                                   f"FROM career_result_items i JOIN programmes p ON p.id = i.programme_id "
+                                   f"WHERE i.result_id IN ({', '.join(['%s'] * len(compact_ids))}) "
+                                   f"ORDER BY i.result_id, i.position", compact_ids)
+                    for row in cursor.fetchall():
+                        match_score = int(row['match_score']) if row['integer_scores'] & 1 else row['match_score']
+                        careers.setdefault(row['result_id'], []).append((row['cluster_id'], row['name'], match_score))
+            yield export_records(results, subjects, skills, interests, paid_user_ids, careers)
+
+    def clear_all_data(self):
+        self.init_db()
+        with self.cursor(commit=True) as cursor:
+            for table in ('user_subjects', 'user_skills', 'user_interests', 'payments', 'career_result_items',
+                          'career_results', 'users') + analytics.ROLLUP_TABLES:
+                cursor.execute(f"DELETE FROM {table}")
+
+    def run_retention_job(self, days_old, chunk_size=200, archive_dir=None):
+        """Chunked purge like the SQLite job, with the same report; archiving and vacuum are left to MySQL tooling"""
+        self.init_db()
+        started = time.perf_counter()
+        cutoff = retention_cutoff(days_old)
+        rows_purged = {table: 0 for table in ('users',) + USER_CHILD_TABLES + ('career_result_items',)}
+        chunks = 0
+        max_chunk_seconds = 0.0
+        while True:
+            chunk_started = time.perf_counter()
+            with self.cursor(commit=True) as cursor:
+                cursor.execute("SELECT id FROM users WHERE created_at < %s ORDER BY id LIMIT %s FOR UPDATE",
+                               (cutoff, chunk_size))
+                user_ids = [row['id'] for row in cursor.fetchall()]
+                if not user_ids:
+                    break
+                placeholders = ", ".join(['%s'] * len(user_ids))
+                cursor.execute(f"DELETE i FROM career_result_items i JOIN career_results r ON r.id = i.result_id "
+                               f"WHERE r.user_id IN ({placeholders})", user_ids)
+                rows_purged['career_result_items'] += cursor.rowcount
+                for table in USER_CHILD_TABLES:
+                    cursor.execute(f"DELETE FROM {table} WHERE user_id IN ({placeholders})", user_ids)
+                    rows_purged[table] += cursor.rowcount
+                cursor.execute(f"DELETE FROM users WHERE id IN ({placeholders})", user_ids)
+                rows_purged['users'] += cursor.rowcount
+            chunks += 1
+            max_chunk_seconds = max(max_chunk_seconds, time.perf_counter() - chunk_started)
+        return {
+            'cutoff': cutoff,
+            'rows_purged': rows_purged,
+            'total_rows_purged': sum(rows_purged.values()),
+            'chunks': chunks,
+            'archive_path': None,
+            'archived_bytes': 0,
+            'max_chunk_seconds': max_chunk_seconds,
+            'vacuum': None,
+            'seconds': time.perf_counter() - started
+        }
+
+    def get_daily_stats(self, start_day=None, end_day=None):
+        self.init_db()
+        where, params = analytics.day_filter('day', start_day, end_day, placeholder='%s')
+        with self.cursor() as cursor:
+            cursor.execute(f"SELECT day, submissions, payments, completed_payments, revenue, results "
+                           f"FROM rollup_daily{where} ORDER BY day", params)
+            return [{**row, 'day': row['day'].isoformat(), 'revenue': float(row['revenue'])}
+                    for row in cursor.fetchall()]
+
+    def get_cluster_histogram(self, start_day=None, end_day=None, limit=10):
+        self.init_db()
+        where, params = analytics.day_filter('day', start_day, end_day, placeholder='%s')
+        with self.cursor() as cursor:
+            cursor.execute(f"SELECT cluster_id, SUM(top_results) AS top_results, SUM(results) AS results "
+                           f"FROM rollup_daily_clusters{where} GROUP BY cluster_id", params)
+            rows = cursor.fetchall()
+        return analytics.cluster_histogram([(row['cluster_id'], row['top_results'], row['results']) for row in rows],
+                                           limit)
+
+    def get_grade_distribution(self, subject=None, start_day=None, end_day=None):
+        self.init_db()
+        where, params = analytics.day_filter('day', start_day, end_day, placeholder='%s')
+        if subject:
+            where += (" AND " if where else " WHERE ") + "subject = %s"
+            params.append(subject)
+        with self.cursor() as cursor:
+            cursor.execute(f"SELECT subject, grade, SUM(students) AS students FROM rollup_daily_grades{where} "
+                           f"GROUP BY subject, grade", params)
+            rows = cursor.fetchall()
+        return analytics.grade_distribution([(row['subject'], row['grade'], row['students']) for row in rows])
+
+    def rebuild_rollups(self):
+        self.init_db()
+        self._rebuild_rollups()
+
+    def _rebuild_rollups(self, chunk_size=500):
+        with self.cursor(commit=True) as cursor:
+            for table in analytics.ROLLUP_TABLES:
+                cursor.execute(f"DELETE FROM {table}")
+            cursor.execute("""INSERT INTO rollup_daily (day, submissions)
+                              SELECT DATE(created_at), COUNT(*) FROM users GROUP BY DATE(created_at)""")
+            cursor.execute("""INSERT INTO rollup_daily (day, payments, completed_payments, revenue)
+                              SELECT * FROM (SELECT DATE(created_at) AS d, COUNT(*) AS n, SUM(status = 'completed') AS c,
+                                  COALESCE(SUM(CASE WHEN status = 'completed' THEN amount END), 0) AS r
+                                  FROM payments GROUP BY DATE(created_at)) p
+                              ON DUPLICATE KEY UPDATE payments = p.n, completed_payments = p.c, revenue = p.r""")
+            cursor.execute("""INSERT INTO rollup_daily (day, results)
+                              SELECT * FROM (SELECT DATE(generated_at) AS d, COUNT(*) AS n
+                                  FROM career_results GROUP BY DATE(generated_at)) r
+                              ON DUPLICATE KEY UPDATE results = r.n""")
+            cursor.execute("""INSERT INTO rollup_daily_grades (day, subject, grade, students)
+                              SELECT DATE(u.created_at), s.subject_name, s.grade, COUNT(*)
+                              FROM user_subjects s JOIN users u ON u.id = s.user_id
+                              GROUP BY DATE(u.created_at), s.subject_name, s.grade""")
+            cursor.execute("""INSERT INTO rollup_daily_clusters (day, cluster_id, top_results, results)
+                              SELECT DATE(r.generated_at), i.cluster_id, SUM(i.is_top), COUNT(*)
+                              FROM (SELECT result_id, cluster_id, MAX(position = 0) AS is_top
+                                    FROM career_result_items GROUP BY result_id, cluster_id) i
+                              JOIN career_results r ON r.id = i.result_id
+                              GROUP BY DATE(r.generated_at), i.cluster_id""")
+            # Results stored as JSON text have to be parsed, a chunk at a time
+            last_id = 0
+            while True:
+                cursor.execute("""SELECT id, DATE(generated_at) AS day, recommendations FROM career_results
+                                  WHERE recommendations IS NOT NULL AND id > %s ORDER BY id LIMIT %s""",
+                               (last_id, chunk_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1]['id']
+                results = []
+                for row in rows:
+                    try:
+                        results.append((row['day'], json.loads(row['recommendations'])))
+                    except ValueError:
+                        continue
+                self._rollup_clusters(cursor, results)
+
+    def stats(self):
+        return {'backend': self.name, 'database': self.database, 'write_behind': None}
+
+
+REPOSITORIES = {
+    'memory': InMemoryRepository,
+    'session': SessionStateRepository,
+    'sqlite': SQLiteRepository,
+    'mysql': MySQLRepository
+}
+
+
+def create_repository(backend, **options):
+    """
+    Create a storage repository by name ('memory', 'session', 'sqlite' or 'mysql').
+
+    Options are passed to the repository class, e.g. path= or write_behind= for sqlite
+    and database= for mysql.
+    """
+    try:
+        repository_class = REPOSITORIES[backend]
+    except KeyError:
+        raise ValueError(f"Unknown storage backend: {backend} (expected one of {', '.join(REPOSITORIES)})")
+    return repository_class(**options)
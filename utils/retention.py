@@ -0,0 +1,292 @@
+"""
+Retention and archival job for the SQLite storage backend
+
+Users created before the cutoff are removed together with their subjects,
+skills, interests, payments and career results. The job works through them
+a chunk of users at a time, each chunk in its own short write transaction,
+so live saves are never blocked for long. Before a chunk is deleted its rows
+are appended to a gzip-compressed JSON Lines archive (one gzip member per
+chunk, one line per user). Freed pages are then returned to the filesystem
+with incremental vacuum.
+
+Run it by hand or from cron:
+
+    python -m utils.retention --days 365
+
+or let the app run it periodically by setting CAREER_GUIDE_RETENTION_INTERVAL_HOURS.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from decouple import config
+
+RETENTION_DAYS = config('CAREER_GUIDE_RETENTION_DAYS', default=365, cast=int)
+# 0 disables the in-app scheduler; run python -m utils.retention from cron instead
+RETENTION_INTERVAL_HOURS = config('CAREER_GUIDE_RETENTION_INTERVAL_HOURS', default=0.0, cast=float)
+ARCHIVE_DIR = config('CAREER_GUIDE_ARCHIVE_DIR',
+                     default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'archives'))
+
+# Tables keyed by user_id, archived under the same name
+USER_CHILD_TABLES = ('user_subjects', 'user_skills', 'user_interests', 'payments', 'career_results')
+
+
+def retention_cutoff(days_old):
+    """Cutoff timestamp in the format SQLite's CURRENT_TIMESTAMP uses"""
+    return (datetime.now(timezone.utc) - timedelta(days=days_old)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class RetentionJob:
+    """
+    Chunked purge of users older than a cutoff.
+
+    Args:
+        pool: SQLiteConnectionPool of the database to clean
+        chunk_size (int): Users deleted per write transaction
+        pause_seconds (float): Sleep between chunks so live traffic gets the write lock
+        archive_dir (str): Where archives are written; None deletes without archiving
+        vacuum_pages (int): Pages released per incremental_vacuum step
+    """
+
+    # Read snapshots taken per chunk before it is archived under the write lock instead
+    SNAPSHOT_ATTEMPTS = 3
+
+    def __init__(self, pool, chunk_size=200, pause_seconds=0.05, archive_dir=ARCHIVE_DIR, vacuum_pages=500):
+        self.pool = pool
+        self.chunk_size = chunk_size
+        self.pause_seconds = pause_seconds
+        self.archive_dir = archive_dir
+        self.vacuum_pages = vacuum_pages
+
+    def run(self, days_old=RETENTION_DAYS, vacuum=True):
+        """
+        Purge (and archive) everything belonging to users created more than days_old days ago.
+
+        Returns:
+            dict: Report with rows purged per table, chunks, archive path and timings
+        """
+        started = time.perf_counter()
+        cutoff = retention_cutoff(days_old)
+        rows_purged = {table: 0 for table in ('users',) + USER_CHILD_TABLES + ('career_result_items',)}
+        report = {
+            'cutoff': cutoff,
+            'rows_purged': rows_purged,
+            'total_rows_purged': 0,
+            'chunks': 0,
+            'archive_path': None,
+            'archived_bytes': 0,
+            'max_chunk_seconds': 0.0,
+            'vacuum': None,
+            'seconds': 0.0
+        }
+
+        archive = None
+        try:
+            if self.archive_dir and self._has_expired_users(cutoff):
+                os.makedirs(self.archive_dir, exist_ok=True)
+                report['archive_path'] = os.path.join(
+                    self.archive_dir, f"retention-{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl.gz")
+                archive = open(report['archive_path'], 'ab')
+            while True:
+                chunk_started = time.perf_counter()
+                chunk = self._purge_chunk(cutoff, archive)
+                if chunk is None:
+                    break
+                counts, archived_bytes = chunk
+                for table, count in counts.items():
+                    rows_purged[table] += count
+                report['chunks'] += 1
+                report['archived_bytes'] += archived_bytes
+                report['max_chunk_seconds'] = max(report['max_chunk_seconds'], time.perf_counter() - chunk_started)
+                time.sleep(self.pause_seconds)
+        finally:
+            if archive is not None:
+                archive.close()
+
+        report['total_rows_purged'] = sum(rows_purged.values())
+        if vacuum:
+            report['vacuum'] = self.vacuum()
+        report['seconds'] = time.perf_counter() - started
+        print(f"✅ Retention purged {report['total_rows_purged']} rows older than {cutoff} "
+              f"in {report['chunks']} chunks ({report['seconds']:.2f}s)")
+        return report
+
+    def _has_expired_users(self, cutoff):
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT 1 FROM users WHERE created_at < ? LIMIT 1", (cutoff,)).fetchone() is not None
+
+    def _purge_chunk(self, cutoff, archive):
+        """Archive and delete one chunk of users; returns None when nothing is left"""
+        for attempt in range(self.SNAPSHOT_ATTEMPTS):
+            records = None
+            archived_bytes = 0
+            if archive is not None:
+                # The archive is built and synced from a read snapshot, before the write lock is taken
+                with self.pool.connection() as conn:
+                    conn.execute("BEGIN")
+                    user_ids = self._expired_user_ids(conn, cutoff)
+                    if not user_ids:
+                        return None
+                    records = self._archive_records(conn, user_ids)
+                archived_bytes = self._write_archive(archive, records)
+
+            with self.pool.transaction() as conn:
+                if records is None:
+                    user_ids = self._expired_user_ids(conn, cutoff)
+                    if not user_ids:
+                        return None
+                else:
+                    current = self._archive_records(conn, user_ids)
+                    if current != records:
+                        if attempt < self.SNAPSHOT_ATTEMPTS - 1:
+                            continue  # rows changed since the snapshot: archive the chunk again
+                        # Still changing: archive under the write lock so the job makes progress
+                        archived_bytes += self._write_archive(archive, current)
+                placeholders = ", ".join("?" * len(user_ids))
+                counts = {'career_result_items': conn.execute(
+                    f"DELETE FROM career_result_items WHERE result_id IN "
+                    f"(SELECT id FROM career_results WHERE user_id IN ({placeholders}))", user_ids
+                ).rowcount}
+                for table in USER_CHILD_TABLES:
+                    counts[table] = conn.execute(f"DELETE FROM {table} WHERE user_id IN ({placeholders})",
+                                                 user_ids).rowcount
+                counts['users'] = conn.execute(f"DELETE FROM users WHERE id IN ({placeholders})", user_ids).rowcount
+            return counts, archived_bytes
+
+    def _write_archive(self, archive, records):
+        """
+        Append records as one gzip member and sync it; returns the bytes written.
+
+        A complete member per chunk keeps an interrupted run's file readable, and the sync
+        happens before the delete commits: a retry can duplicate archived rows, never lose them.
+        """
+        payload = gzip.compress("".join(json.dumps(record) + "\n" for record in records).encode('utf-8'))
+        archive.write(payload)
+        archive.flush()
+        os.fsync(archive.fileno())
+        return len(payload)
+
+    def _expired_user_ids(self, conn, cutoff):
+        return [row[0] for row in conn.execute(
+            "SELECT id FROM users WHERE created_at < ? ORDER BY id LIMIT ?", (cutoff, self.chunk_size)
+        )]
+
+    def _archive_records(self, conn, user_ids):
+        """One JSON-serializable record per user with all of their rows"""
+        placeholders = ", ".join("?" * len(user_ids))
+        records = {}
+        for row in conn.execute(f"SELECT * FROM users WHERE id IN ({placeholders}) ORDER BY id", user_ids):
+            records[row['id']] = {'user': dict(row), **{table: [] for table in USER_CHILD_TABLES}}
+        results = {}
+        for table in USER_CHILD_TABLES:
+            for row in conn.execute(f"SELECT * FROM {table} WHERE user_id IN ({placeholders}) ORDER BY id", user_ids):
+                record = dict(row)
+                records[row['user_id']][table].append(record)
+                if table == 'career_results':
+                    record['items'] = []
+                    results[row['id']] = record
+        if results:
+            for row in conn.execute(
+                f"SELECT i.*, p.name AS programme FROM career_result_items i "
+                f"JOIN programmes p ON p.id = i.programme_id "
+                f"WHERE i.result_id IN (SELECT id FROM career_results WHERE user_id IN ({placeholders})) "
+                f"ORDER BY i.result_id, i.position", user_ids
+            ):
+                results[row['result_id']]['items'].append(dict(row))
+        return list(records.values())
+
+    def vacuum(self):
+        """
+        Release free pages with incremental vacuum, a few hundred pages per step.
+
+        Databases created before auto_vacuum=INCREMENTAL was enabled need one full
+        VACUUM (see full_vacuum) before this frees anything.
+        """
+        with self.pool.connection() as conn:
+            mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+            free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if mode != 2:
+                return {'mode': mode, 'pages_freed': 0, 'free_pages': free_before, 'full_vacuum_needed': True}
+            # Only the pages free at the start: live saves keep freeing and reusing pages meanwhile
+            for _ in range(-(-free_before // self.vacuum_pages)):
+                # executescript steps the pragma to completion; execute() frees a single page per call
+                conn.executescript(f"PRAGMA incremental_vacuum({int(self.vacuum_pages)})")
+                if conn.execute("PRAGMA freelist_count").fetchone()[0] == 0:
+                    break
+                time.sleep(self.pause_seconds)
+            free_after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return {'mode': mode, 'pages_freed': free_before - free_after, 'free_pages': free_after,
+                'full_vacuum_needed': False}
+
+    def full_vacuum(self):
+        """Rebuild the database file and switch it to incremental auto-vacuum (takes an exclusive lock)"""
+        with self.pool.connection() as conn:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+
+
+class RetentionScheduler:
+    """Runs the retention job on a background thread every interval_hours"""
+
+    def __init__(self, run_job, interval_hours=RETENTION_INTERVAL_HOURS):
+        self.run_job = run_job
+        self.interval_hours = interval_hours
+        self.last_report = None
+        self.last_error = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """Start the scheduler thread (idempotent; does nothing when the interval is 0)"""
+        if self.interval_hours <= 0:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._loop, name="retention-job", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop_event.wait(self.interval_hours * 3600):
+            try:
+                self.last_report = self.run_job()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"❌ Retention job failed: {self.last_error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Purge and archive old career guide data")
+    parser.add_argument('--days', type=int, default=RETENTION_DAYS, help="Delete users created more than this many days ago")
+    parser.add_argument('--chunk-size', type=int, default=200, help="Users deleted per transaction")
+    parser.add_argument('--archive-dir', default=ARCHIVE_DIR, help="Directory for .jsonl.gz archives")
+    parser.add_argument('--no-archive', action='store_true', help="Delete without writing an archive")
+    parser.add_argument('--full-vacuum', action='store_true',
+                        help="Run a one-off VACUUM that enables incremental auto-vacuum (exclusive lock)")
+    args = parser.parse_args()
+
+    from .database import run_retention_job, get_backend
+
+    report = run_retention_job(args.days, chunk_size=args.chunk_size,
+                               archive_dir=None if args.no_archive else args.archive_dir)
+    if args.full_vacuum:
+        RetentionJob(get_backend().pool).full_vacuum()
+        print("✅ Full VACUUM complete; incremental auto-vacuum enabled")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Storage backend benchmark for the KCSE Career Guidance Tool
+
+Runs one workload against each storage repository and reports throughput
+and per-operation latency, so the backend for a deployment can be chosen
+from measured numbers:
+
+    python -m utils.storage_benchmark --users 500 --threads 4
+    python -m utils.storage_benchmark --backends memory,sqlite,sqlite-write-behind,mysql
+
+Each simulated student is saved, pays, gets results and then loads the
+Results page (payment check, profile, payment history, latest results). SQLite
+runs against a temporary file; MySQL uses CAREER_GUIDE_BENCHMARK_MYSQL_DATABASE,
+which is emptied before and after the run.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from decouple import config
+
+from .career_engine import get_career_engine
+from .repository import create_repository
+
+BENCHMARK_MYSQL_DATABASE = config('CAREER_GUIDE_BENCHMARK_MYSQL_DATABASE', default='career_guide_benchmark')
+
+GRADES = ["A", "A-", "B+", "B", "B-", "C+", "C", "C-", "D+", "D", "D-", "E"]
+MANDATORY_SUBJECTS = ["Mathematics", "English", "Kiswahili"]
+OPTIONAL_SUBJECTS = ["Biology", "Chemistry", "Physics", "History", "Geography", "CRE",
+                     "Business Studies", "Agriculture", "Computer Studies"]
+SKILLS = ["Problem Solving", "Critical Thinking", "Communication", "Leadership", "Creativity",
+          "Teamwork", "Analytical Thinking", "Research", "Technical Skills", "Attention to Detail"]
+INTERESTS = ["Technology", "Medicine", "Engineering", "Business", "Arts", "Sciences",
+             "Education", "Agriculture", "Law", "Environment"]
+
+OPERATIONS = ('save_user_data', 'save_payment', 'save_career_results', 'check_payment_status',
+              'get_user_data', 'get_payment_history', 'get_career_results')
+
+DEFAULT_BACKENDS = ('memory', 'sqlite', 'sqlite-write-behind')
+
+
+def make_workload(users, seed=42):
+    """Synthetic students with their precomputed recommendations"""
+    rng = random.Random(seed)
+    engine = get_career_engine()
+    workload = []
+    for i in range(users):
+        subjects_grades = {subject: rng.choice(GRADES) for subject in MANDATORY_SUBJECTS}
+        for subject in rng.sample(OPTIONAL_SUBJECTS, rng.randint(4, 6)):
+            subjects_grades[subject] = rng.choice(GRADES)
+        skills_interests = {'skills': rng.sample(SKILLS, rng.randint(1, 5)),
+                            'interests': rng.sample(INTERESTS, rng.randint(1, 4))}
+        student_info = {'name': f"Student {i}", 'phone': f"2547{rng.randint(0, 99999999):08d}",
+                        'email': f"student{i}@example.com"}
+        workload.append((student_info, subjects_grades, skills_interests))
+    recommendations = engine.generate_recommendations_batch(
+        [(subjects_grades, skills_interests) for _, subjects_grades, skills_interests in workload]
+    )
+    return [profile + (result,) for profile, result in zip(workload, recommendations)]
+
+
+def open_backend(name, workdir):
+    """Create a fresh repository for one benchmark backend name"""
+    if name == 'memory':
+        return create_repository('memory')
+    if name in ('sqlite', 'sqlite-write-behind'):
+        return create_repository('sqlite', path=os.path.join(workdir, f"{name}.db"),
+                                 write_behind=name == 'sqlite-write-behind')
+    if name == 'mysql':
+        repository = create_repository('mysql', database=BENCHMARK_MYSQL_DATABASE)
+        repository.init_db()
+        repository.clear_all_data()
+        return repository
+    raise ValueError(f"Unknown benchmark backend: {name}")
+
+
+def run_student(repository, student, timings):
+    student_info, subjects_grades, skills_interests, recommendations = student
+
+    def timed(operation, *args):
+        started = time.perf_counter()
+        result = getattr(repository, operation)(*args)
+        timings[operation].append(time.perf_counter() - started)
+        return result
+
+    user_id = timed('save_user_data', student_info, subjects_grades, skills_interests)
+    timed('save_payment', user_id, 20, f"CAREER_{user_id}", 'completed', f"ws_CO_{user_id}")
+    timed('save_career_results', user_id, recommendations)
+    # Results page load
+    timed('check_payment_status', user_id)
+    timed('get_user_data', user_id)
+    timed('get_payment_history', user_id)
+    timed('get_career_results', user_id)
+
+
+def run_benchmark(repository, workload, threads=1):
+    """
+    Run the workload against one repository.
+
+    Returns:
+        dict: Total seconds, operations per second and per-operation latency percentiles (ms)
+    """
+    repository.init_db()
+    per_thread = [{operation: [] for operation in OPERATIONS} for _ in range(threads)]
+    shards = [workload[i::threads] for i in range(threads)]
+
+    def worker(shard, timings):
+        for student in shard:
+            run_student(repository, student, timings)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(shards[i], per_thread[i])) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    flush_started = time.perf_counter()
+    repository.flush()
+    flush_seconds = time.perf_counter() - flush_started
+    seconds = time.perf_counter() - started
+
+    operations = {}
+    total_ops = 0
+    for operation in OPERATIONS:
+        samples = sorted(sample for timings in per_thread for sample in timings[operation])
+        total_ops += len(samples)
+        operations[operation] = {
+            'count': len(samples),
+            'p50_ms': percentile(samples, 50) * 1000,
+            'p95_ms': percentile(samples, 95) * 1000,
+            'max_ms': samples[-1] * 1000 if samples else 0.0
+        }
+    return {
+        'seconds': seconds,
+        'flush_seconds': flush_seconds,
+        'ops_per_second': total_ops / seconds if seconds else 0.0,
+        'operations': operations
+    }
+
+
+def percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(round(pct / 100 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def print_report(results):
+    for backend, result in results.items():
+        if 'error' in result:
+            print(f"\n{backend}: skipped ({result['error']})")
+            continue
+        print(f"\n{backend}: {result['ops_per_second']:.0f} ops/s, {result['seconds']:.2f}s total "
+              f"(final flush {result['flush_seconds']:.3f}s)")
+        print(f"  {'operation':<22}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+        for operation, stats in result['operations'].items():
+            print(f"  {operation:<22}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}{stats['max_ms']:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the career guide storage backends")
+    parser.add_argument('--backends', default=",".join(DEFAULT_BACKENDS),
+                        help="Comma-separated: memory, sqlite, sqlite-write-behind, mysql")
+    parser.add_argument('--users', type=int, default=500, help="Simulated students")
+    parser.add_argument('--threads', type=int, default=4, help="Concurrent sessions")
+    parser.add_argument('--json', help="Also write the results to this file")
+    args = parser.parse_args()
+
+    workload = make_workload(args.users)
+    workdir = tempfile.mkdtemp(prefix="career_guide_benchmark_")
+    results = {}
+    try:
+        for name in [name.strip() for name in args.backends.split(",") if name.strip()]:
+            try:
+                repository = open_backend(name, workdir)
+            except Exception as e:
+                results[name] = {'error': f"{type(e).__name__}: {e}"}
+                continue
+            try:
+                results[name] = run_benchmark(repository, workload, args.threads)
+            finally:
+                if name == 'mysql':
+                    repository.clear_all_data()
+                repository.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"Workload: {args.users} students, {args.threads} threads")
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Write-behind queue for the SQLite storage backend
+
+Saves are appended to an in-memory queue and committed by a background
+thread in batches, either every flush interval or as soon as a batch fills
+up. Until a record is committed it stays in a pending overlay keyed by its
+row id, so reads in the same process see their own writes. The queue is
+flushed when the interpreter exits.
+
+When a batch fails on a record the database rejects (e.g. a payment for a
+user that does not exist), the batch is replayed one record at a time: the
+good records are committed and each rejected one is moved to the
+write_behind_dead_letters table, so one bad record never holds up the
+queue. Batches that fail because the database is locked or busy are retried
+whole for as long as it takes; other operational errors (e.g. "no such
+table") are retried a few times and then treated like a rejected record.
+Rejected records stay readable through rejected() and are listed in stats(),
+so a caller that was already handed their id is not left with a silent gap.
+
+Row ids are allocated up front in blocks (see IdAllocator) so a save can
+return its id before the row reaches disk.
+"""
+
+import atexit
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+
+DEAD_LETTER_SCHEMA = """CREATE TABLE IF NOT EXISTS write_behind_dead_letters (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            kind TEXT NOT NULL,
+                            row_id INTEGER,
+                            record TEXT NOT NULL,
+                            error TEXT NOT NULL,
+                            failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                        )"""
+INSERT_DEAD_LETTER = "INSERT INTO write_behind_dead_letters (kind, row_id, record, error) VALUES (?, ?, ?, ?)"
+
+
+def is_busy(error):
+    """True for the transient errors of a database another connection holds locked"""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+
+class IdAllocator:
+    """
+    Hands out row ids from blocks reserved in sqlite_sequence.
+
+    Reserving a block bumps the AUTOINCREMENT counter past it, so synchronous
+    writers and other processes never reuse an id that is still queued here.
+    """
+
+    def __init__(self, pool, block_size=100):
+        self.pool = pool
+        self.block_size = block_size
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    def next_id(self, table):
+        with self._lock:
+            next_id, last_id = self._blocks.get(table, (1, 0))
+            if next_id > last_id:
+                next_id, last_id = self._reserve_block(table)
+            self._blocks[table] = (next_id + 1, last_id)
+            return next_id
+
+    def _reserve_block(self, table):
+        with self.pool.transaction() as conn:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+            max_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+            current = max(row[0] if row is not None else 0, max_id)
+            last_id = current + self.block_size
+            if row is not None:
+                conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = ?", (last_id, table))
+            else:
+                conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table, last_id))
+        return current + 1, last_id
+
+
+class WriteBehindWriter:
+    """
+    Background group-commit writer.
+
+    Args:
+        pool: SQLiteConnectionPool used for commits
+        apply: Callable(conn, ops) that writes a list of (kind, row_id, record) ops
+        flush_ms (int): Longest time a record waits before its batch is committed
+        batch_size (int): Commit immediately once this many records are queued
+        on_reject: Optional callable(kind, row_id, record, error) run for each rejected record
+    """
+
+    # Attempts per batch once the writer is shutting down
+    CLOSE_RETRIES = 3
+    # Attempts per batch for operational errors other than a locked or busy database
+    OPERATIONAL_RETRIES = 3
+    # Backoff between attempts: doubles from RETRY_DELAY up to MAX_RETRY_DELAY seconds
+    RETRY_DELAY = 0.1
+    MAX_RETRY_DELAY = 5.0
+    # Rejected records kept readable, oldest dropped first
+    MAX_REJECTED = 1000
+
+    def __init__(self, pool, apply, flush_ms=50, batch_size=200, on_reject=None):
+        self.pool = pool
+        self.apply = apply
+        self.on_reject = on_reject
+        self.flush_seconds = flush_ms / 1000.0
+        self.batch_size = batch_size
+        self._queue = deque()
+        self._pending = {}
+        # (kind, row_id) -> (record, error) of records that never reached the table
+        self._rejected = {}
+        self._in_flight = 0
+        self._flush_requested = False
+        self._closing = False
+        self._thread = None
+        self._cond = threading.Condition()
+        self.batches_committed = 0
+        self.records_committed = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        self.last_commit_ms = None
+        self.max_commit_ms = 0.0
+        self.total_commit_ms = 0.0
+        self.failed_commits = 0
+        self.dead_letters = 0
+        self.dropped_records = 0
+        self.last_error = None
+        atexit.register(self.close)
+
+    def submit(self, kind, row_id, record):
+        """Queue a record for writing; it is readable via pending() straight away"""
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("Write-behind writer is closed")
+            self._pending.setdefault(kind, {})[row_id] = record
+            self._queue.append((kind, row_id, record))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="db-write-behind", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def pending(self, kind):
+        """Return the queued, not yet committed records of one kind"""
+        with self._cond:
+            return list(self._pending.get(kind, {}).values())
+
+    def rejected(self, kind):
+        """Return the records of one kind the database rejected (dead-lettered or dropped), oldest first"""
+        with self._cond:
+            return [record for (record_kind, row_id), (record, error) in self._rejected.items() if record_kind == kind]
+
+    def flush(self, timeout=None):
+        """
+        Commit everything queued so far.
+
+        Returns:
+            bool: True if the queue drained before the timeout
+        """
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            drained = self._cond.wait_for(lambda: not self._queue and not self._in_flight, timeout)
+            self._flush_requested = False
+            return drained
+
+    def close(self, timeout=30):
+        """Flush the queue and stop the writer thread"""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._closing)
+                if not self._queue:
+                    return
+                # Give the batch until the flush interval to fill up
+                deadline = time.monotonic() + self.flush_seconds
+                while len(self._queue) < self.batch_size and not (self._closing or self._flush_requested):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                self._in_flight = len(batch)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        attempts = 0
+        one_by_one = False
+        rejected = []
+        dropped = []
+        while True:
+            started = time.perf_counter()
+            try:
+                with self.pool.transaction() as conn:
+                    if one_by_one:
+                        rejected = self._apply_one_by_one(conn, batch)
+                    else:
+                        self.apply(conn, batch)
+                break
+            except Exception as e:
+                rejected = []
+                attempts += 1
+                self.failed_commits += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"❌ Write-behind commit of {len(batch)} records failed: {self.last_error}")
+                if is_busy(e):
+                    # Another connection holds the lock: the batch is retried until it gets it
+                    if self._closing and attempts >= self.CLOSE_RETRIES:
+                        print(f"❌ Dropping {len(batch)} uncommitted records on shutdown")
+                        dropped = [(kind, row_id, record, self.last_error) for kind, row_id, record in batch]
+                        break
+                elif one_by_one:
+                    # Not even the dead letters could be written: keep the records in memory only
+                    print(f"❌ Dropping {len(batch)} records that could not be dead-lettered")
+                    dropped = [(kind, row_id, record, self.last_error) for kind, row_id, record in batch]
+                    break
+                elif not isinstance(e, sqlite3.OperationalError) or attempts >= self.OPERATIONAL_RETRIES:
+                    # Probably one bad record: find it instead of retrying the same batch forever
+                    one_by_one = True
+                    continue
+                time.sleep(min(self.RETRY_DELAY * 2 ** (attempts - 1), self.MAX_RETRY_DELAY))
+        commit_ms = (time.perf_counter() - started) * 1000
+
+        with self._cond:
+            # Drop from the overlay only after the commit, so readers always find the row somewhere
+            for kind, row_id, record in batch:
+                pending = self._pending.get(kind, {})
+                if pending.get(row_id) is record:
+                    del pending[row_id]
+            for kind, row_id, record, error in rejected + dropped:
+                self._rejected[(kind, row_id)] = (record, error)
+            while len(self._rejected) > self.MAX_REJECTED:
+                del self._rejected[next(iter(self._rejected))]
+            self._in_flight = 0
+            self.batches_committed += 1
+            self.records_committed += len(batch) - len(rejected) - len(dropped)
+            self.dead_letters += len(rejected)
+            self.dropped_records += len(dropped)
+            self.last_batch_size = len(batch)
+            self.max_batch_size = max(self.max_batch_size, len(batch))
+            self.last_commit_ms = commit_ms
+            self.max_commit_ms = max(self.max_commit_ms, commit_ms)
+            self.total_commit_ms += commit_ms
+            self._cond.notify_all()
+
+        if self.on_reject is not None:
+            for kind, row_id, record, error in rejected + dropped:
+                try:
+                    self.on_reject(kind, row_id, record, error)
+                except Exception as e:
+                    print(f"❌ Write-behind reject callback failed: {e}")
+
+    def _apply_one_by_one(self, conn, batch):
+        """
+        Apply each op under its own savepoint, dead-lettering the ones the database rejects.
+
+        A locked or busy database is raised so the whole batch is retried; any other
+        error, including operational ones such as "no such table", rejects the op.
+
+        Returns:
+            list: The rejected (kind, row_id, record, error) ops
+        """
+        rejected = []
+        for kind, row_id, record in batch:
+            conn.execute("SAVEPOINT write_behind_op")
+            try:
+                self.apply(conn, [(kind, row_id, record)])
+            except Exception as e:
+                if is_busy(e):
+                    raise
+                conn.execute("ROLLBACK TO write_behind_op")
+                error = f"{type(e).__name__}: {e}"
+                print(f"❌ Write-behind {kind} record {row_id} rejected, moved to write_behind_dead_letters: {error}")
+                conn.execute(DEAD_LETTER_SCHEMA)
+                conn.execute(INSERT_DEAD_LETTER, (kind, row_id, json.dumps(record, default=str), error))
+                rejected.append((kind, row_id, record, error))
+            conn.execute("RELEASE write_behind_op")
+        return rejected
+
+    def stats(self):
+        """Queue depth, batch sizes and commit latency for monitoring"""
+        with self._cond:
+            batches = self.batches_committed
+            return {
+                'queue_depth': len(self._queue),
+                'in_flight': self._in_flight,
+                'pending_records': sum(len(records) for records in self._pending.values()),
+                'batches_committed': batches,
+                'records_committed': self.records_committed,
+                'last_batch_size': self.last_batch_size,
+                'max_batch_size': self.max_batch_size,
+                'avg_batch_size': self.records_committed / batches if batches else 0.0,
+                'last_commit_ms': self.last_commit_ms,
+                'max_commit_ms': self.max_commit_ms,
+                'avg_commit_ms': self.total_commit_ms / batches if batches else 0.0,
+                'failed_commits': self.failed_commits,
+                'dead_letters': self.dead_letters,
+                'dropped_records': self.dropped_records,
+                'rejected_ids': self._rejected_ids(),
+                'last_error': self.last_error,
+                'running': self._thread is not None and self._thread.is_alive()
+            }
+
+    def _rejected_ids(self):
+        """{kind: [row_id, ...]} of the rejected records still kept (call with the lock held)"""
+        ids = {}
+        for kind, row_id in self._rejected:
+            ids.setdefault(kind, []).append(row_id)
+        return ids